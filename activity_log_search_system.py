@@ -361,9 +361,8 @@ class ActivityLogSearchSystem:
             self.status_label.config(text="📊 جاري تحميل سجل العمليات من Activity_Log_v2_20251108...")
             self.window.update()
             
-            # محاولة الوصول لشيت سجل العمليات
-            activity_worksheet = self.sheets_manager.spreadsheet.worksheet('Activity_Log_v2_20251108')
-            activity_values = activity_worksheet.get_all_values()
+            # النسخة المحلية من سجل العمليات (يتم جلب الصفوف الجديدة فقط)
+            activity_values = self.sheets_manager.get_activity_log_values('Activity_Log_v2_20251108')
             
             if not activity_values:
                 print("⚠️ لا توجد بيانات في شيت Activity_Log_v2_20251108")
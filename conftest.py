@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+أدوات مشتركة لاختبارات pytest
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+
+@pytest.fixture
+def project_dir(tmp_path, monkeypatch):
+    """تشغيل الاختبار داخل مجلد مؤقت حتى لا تتأثر ملفات المشاريع والبيانات الحقيقية"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def manager(project_dir):
+    """مدير ملفات Excel جديد يعمل داخل المجلد المؤقت"""
+    from excel_manager import ExcelManager
+    return ExcelManager()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+جدول Google Sheets وهمي في الذاكرة لاختبارات طبقة sheets بدون اتصال
+يطبق نفس واجهة gspread المستخدمة في المشروع ويعد الطلبات المرسلة لكل نوع
+"""
+
+from collections import Counter
+
+import gspread
+
+
+def _cell_value(cell):
+    """استخراج القيمة من CellData كما يرسلها batch_update"""
+    value = cell.get("userEnteredValue", {})
+    for key in ("stringValue", "numberValue", "boolValue"):
+        if key in value:
+            return str(value[key]) if key != "stringValue" else value[key]
+    return ""
+
+
+class FakeWorksheet:
+    """ورقة عمل وهمية: صفوف من النصوص مثل get_all_values"""
+
+    def __init__(self, spreadsheet, title, sheet_id, rows=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.rows = [list(map(str, row)) for row in (rows or [])]
+
+    def _call(self, name, modifies=False):
+        self.spreadsheet._call(name, modifies)
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        while len(cells) < col:
+            cells.append("")
+        cells[col - 1] = "" if value is None else str(value)
+
+    def get_all_values(self):
+        self._call("get_all_values")
+        return [list(row) for row in self.rows]
+
+    def get_all_records(self):
+        self._call("get_all_records")
+        if not self.rows:
+            return []
+        headers = self.rows[0]
+        return [
+            {header: (row[i] if i < len(row) else "") for i, header in enumerate(headers)}
+            for row in self.rows[1:]
+        ]
+
+    def get(self, range_name):
+        """قراءة نطاق بالشكل A{n}:L (الصفوف من n حتى النهاية)"""
+        self._call("get")
+        start = int("".join(ch for ch in range_name.split(":")[0] if ch.isdigit()))
+        return [list(row) for row in self.rows[start - 1:]]
+
+    def _column(self, col):
+        """قيم عمود كما ترجعها Sheets (بدون الخلايا الفارغة في النهاية)"""
+        values = [row[col - 1] if col <= len(row) else "" for row in self.rows]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def batch_get(self, ranges):
+        """قراءة عدة أعمدة كاملة بالشكل A:A في طلب واحد"""
+        self._call("batch_get")
+        result = []
+        for range_name in ranges:
+            col = gspread.utils.a1_to_rowcol(range_name.split(":")[0] + "1")[1]
+            result.append([[value] if value != "" else [] for value in self._column(col)])
+        return result
+
+    def col_values(self, col):
+        self._call("col_values")
+        return self._column(col)
+
+    def row_values(self, row):
+        self._call("row_values")
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def cell(self, row, col):
+        self._call("cell")
+        values = self.rows[row - 1] if row <= len(self.rows) else []
+
+        class _Cell:
+            value = values[col - 1] if col <= len(values) else None
+        return _Cell()
+
+    def update(self, range_name=None, values=None, **kwargs):
+        self._call("update", modifies=True)
+        if isinstance(range_name, list):
+            range_name, values = values, range_name
+        row, col = gspread.utils.a1_to_rowcol(range_name.split(":")[0])
+        for r, row_values in enumerate(values):
+            for c, value in enumerate(row_values):
+                self._set(row + r, col + c, value)
+
+    def append_row(self, values, **kwargs):
+        self._call("append_row", modifies=True)
+        self.rows.append([str(v) for v in values])
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows", modifies=True)
+        for row in values:
+            self.rows.append([str(v) for v in row])
+
+    def delete_rows(self, index, end_index=None):
+        self._call("delete_rows", modifies=True)
+        end_index = end_index or index
+        del self.rows[index - 1:end_index]
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+
+class FakeSpreadsheet:
+    """جدول وهمي يحتوي أوراق العمل ويعد طلبات الـ API"""
+
+    def __init__(self, title="Inventory Management"):
+        self.title = title
+        self.id = "fake-spreadsheet"
+        self.sheets = {}
+        self.calls = Counter()
+        self.fail_next = 0  # عدد الطلبات القادمة التي ستفشل (لمحاكاة انقطاع الشبكة)
+        self.revision = 1  # يزيد مع كل تعديل مثل وقت آخر تعديل في Drive
+
+    def _call(self, name, modifies=False):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise ConnectionError("fake network failure")
+        self.calls[name] += 1
+        if modifies:
+            self.revision += 1
+
+    def edit_externally(self, title, row, col, value):
+        """تعديل خلية من مستخدم آخر (بدون المرور بالمدير)"""
+        self.sheets[title]._set(row, col, value)
+        self.revision += 1
+
+    def get_lastUpdateTime(self):
+        self._call("get_lastUpdateTime")
+        return f"revision-{self.revision}"
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def add_worksheet(self, title, rows=1000, cols=10, values=None):
+        self._call("add_worksheet", modifies=True)
+        sheet = FakeWorksheet(self, title, len(self.sheets) + 1, values)
+        self.sheets[title] = sheet
+        return sheet
+
+    def worksheet(self, title):
+        self._call("worksheet")
+        if title not in self.sheets:
+            raise gspread.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def worksheets(self):
+        self._call("worksheets")
+        return list(self.sheets.values())
+
+    def batch_update(self, body):
+        self._call("batch_update", modifies=True)
+        by_id = {sheet.id: sheet for sheet in self.sheets.values()}
+        for request in body["requests"]:
+            if "updateCells" in request:
+                update = request["updateCells"]
+                grid = update["range"]
+                sheet = by_id[grid["sheetId"]]
+                for r, row in enumerate(update["rows"]):
+                    for c, cell in enumerate(row["values"]):
+                        sheet._set(grid["startRowIndex"] + r + 1, grid["startColumnIndex"] + c + 1, _cell_value(cell))
+            elif "appendCells" in request:
+                append = request["appendCells"]
+                sheet = by_id[append["sheetId"]]
+                for row in append["rows"]:
+                    sheet.rows.append([_cell_value(cell) for cell in row["values"]])
+            elif "deleteDimension" in request:
+                grid = request["deleteDimension"]["range"]
+                del by_id[grid["sheetId"]].rows[grid["startIndex"]:grid["endIndex"]]
+            else:
+                raise ValueError(f"unsupported request: {list(request)}")
+        return {"replies": [{} for _ in body["requests"]]}
+
+
+INVENTORY_HEADERS = ["اسم العنصر", "التصنيف", "الوحدة", "رقم المشروع", "الكمية", "السعر",
+                     "القيمة الإجمالية", "تاريخ التحديث", "آخر مستخدم", "ملاحظات"]
+
+ACTIVITY_HEADERS = ["التاريخ", "الوقت", "نوع العملية", "اسم العنصر", "التصنيف", "الكمية المضافة",
+                    "الكمية المخرجة", "الكمية السابقة", "الكمية الحالية", "اسم المستخدم",
+                    "رقم المشروع", "التفاصيل"]
+
+
+def make_inventory_spreadsheet(items=()):
+    """
+    إنشاء جدول وهمي بورقة المخزون وسجل الأنشطة
+    items: قائمة (اسم العنصر، التصنيف، رقم المشروع، الكمية)
+    """
+    spreadsheet = FakeSpreadsheet()
+    rows = [INVENTORY_HEADERS] + [
+        [name, category, "قطعة", project_id, quantity, "0", "0", "2025-01-01 00:00:00", "", ""]
+        for name, category, project_id, quantity in items
+    ]
+    spreadsheet.add_worksheet("Inventory", values=rows)
+    spreadsheet.add_worksheet("Activity_Log", values=[["التاريخ والوقت"]])
+    spreadsheet.add_worksheet("Activity_Log_v2_20251108", values=[ACTIVITY_HEADERS])
+    spreadsheet.calls.clear()
+    return spreadsheet
+
+
+def attach_manager(manager, spreadsheet):
+    """ربط SheetsManager بالجدول الوهمي بدلاً من الاتصال الحقيقي"""
+    from sheets.session import SheetsSession
+
+    manager.session = SheetsSession(manager.credentials_file, manager.spreadsheet_name, connector=lambda: spreadsheet)
+    manager.background_sync = False  # الاختبارات ترسل التعديلات بـ flush()
+    manager.connect()
+    spreadsheet.calls.clear()
+    return manager
@@ -526,7 +526,7 @@ class MainWindow:
         if new_quantity is not None:
             def update_quantity():
                 try:
-                    if self.sheets_manager.update_quantity(selected_item["row"], new_quantity):
+                    if self.sheets_manager.update_quantity(selected_item, new_quantity):
                         self.root.after(0, self.on_quantity_updated)
                     else:
                         self.root.after(0, self.on_operation_error, "Failed to update quantity")
@@ -582,14 +582,13 @@ class MainWindow:
         from datetime import datetime, timedelta
         
         try:
-            # الحصول على جميع العمليات من activity sheet مباشرة
+            # الحصول على جميع العمليات من النسخة المحلية لسجل الأنشطة (الصفوف الجديدة فقط تجلب من الشيت)
             try:
-                activity_sheet = self.sheets_manager.spreadsheet.worksheet('Activity_Log_v2_20251108')
+                all_values = self.sheets_manager.get_activity_log_values('Activity_Log_v2_20251108')
             except Exception as e:
                 print(f"DEBUG: لا يمكن الوصول لـ activity sheet: {e}")
                 return []
             
-            all_values = activity_sheet.get_all_values()
             if not all_values or len(all_values) < 2:
                 print("DEBUG: لا توجد بيانات في activity sheet")
                 return []
@@ -835,7 +834,7 @@ class MainWindow:
                 try:
                     # تحديث الكمية في الشيت
                     print(f"DEBUG: تحديث الكمية في الشيت - الصف: {selected_item['row']}, الكمية الجديدة: {new_total_quantity}")
-                    if self.sheets_manager.update_quantity(selected_item["row"], new_total_quantity):
+                    if self.sheets_manager.update_quantity(selected_item, new_total_quantity):
                         # لا حاجة لتسجيل إضافي - update_quantity تسجل تلقائياً
                         # تم إزالة التسجيل المزدوج لتجنب ظهور سطرين
                         
@@ -886,7 +885,7 @@ class MainWindow:
             
             def process_outbound():
                 try:
-                    if self.sheets_manager.outbound_item(selected_item["row"], outbound_quantity, recipient_name):
+                    if self.sheets_manager.outbound_item(selected_item, outbound_quantity, recipient_name):
                         self.root.after(0, self.on_outbound_processed)
                     else:
                         self.root.after(0, self.on_operation_error, get_text("insufficient_quantity"))
@@ -928,7 +927,7 @@ class MainWindow:
         if result:
             def remove_from_sheets():
                 try:
-                    if self.sheets_manager.remove_item(selected_item["row"]):
+                    if self.sheets_manager.remove_item(selected_item):
                         self.root.after(0, self.on_item_removed)
                     else:
                         self.root.after(0, self.on_operation_error, get_text("operation_failed"))
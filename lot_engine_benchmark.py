@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس زمن بناء الدفعات (FIFO) من سجل كبير وزمن استعلام الصلاحية بالبحث الثنائي
+
+الاستخدام: python lot_engine_benchmark.py [عدد الحركات، افتراضيا 100000]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+from lot_engine import build_lot_state
+
+
+def random_history(count, seed=7):
+    """سجل حركات عشوائي بتواريخ متزايدة"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    records = []
+    for i in range(1, count + 1):
+        records.append({
+            'رقم_المعاملة': i, 'المشروع': 'مشروع',
+            'التاريخ': (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'),
+            'اسم_العنصر': f"عنصر {rng.randint(1, 20)}", 'التصنيف': 'أغذية',
+            'نوع_العملية': rng.choice(['دخول', 'دخول', 'خروج', 'تعديل زيادة', 'تعديل نقص']),
+            'الكمية': rng.randint(1, 40), 'اسم_المستلم': '',
+            'مدة_الصلاحية_بالأيام': rng.choice([0, 30, 365]),
+            'ملاحظات': '', 'رقم_المعاملة_المرجعية': None,
+        })
+    return records
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = pd.DataFrame(random_history(count))
+
+    start = time.perf_counter()
+    state = build_lot_state(df)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    state.get_expiring_lots(30, datetime(2034, 1, 1))
+    query_time = time.perf_counter() - start
+
+    print(f"⏱️ بناء الدفعات لـ {count:,} حركة: {build_time:.2f} ثانية، الاستعلام: {query_time * 1000:.2f} م.ث")
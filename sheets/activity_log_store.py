@@ -0,0 +1,105 @@
+"""
+Local append-only copy of an activity log worksheet.
+The log only grows, so after the first download only rows after the last
+synced row are fetched (one range read of A{n}:L) and appended to a
+JSON Lines file, one line per sheet row.
+"""
+
+import json
+import os
+from typing import Any, Callable, List, Optional
+
+import gspread
+
+
+class ActivityLogStore:
+    """Incrementally synced local copy of an activity log worksheet."""
+
+    def __init__(self, cache_file: str, last_column: str = "L"):
+        """
+        Initialize the store and load rows saved by a previous run.
+
+        Args:
+            cache_file: JSON Lines file holding the synced rows
+            last_column: Last column of the log (columns after it are not stored)
+        """
+        self.cache_file = cache_file
+        self.last_column = last_column
+        self.width = gspread.utils.a1_to_rowcol(f"{last_column}1")[1]
+        self.rows: List[List[str]] = []  # rows[0] is sheet row 1 (the header row)
+        self.load()
+
+    @property
+    def last_row(self) -> int:
+        """Last sheet row stored locally (0 before the first sync)."""
+        return len(self.rows)
+
+    def load(self):
+        """Load the stored rows (a damaged or out-of-order tail is dropped)."""
+        self.rows = []
+        if not os.path.exists(self.cache_file):
+            return
+        with open(self.cache_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"Warning: ignored a damaged line in the activity log cache: {self.cache_file}")
+                    break
+                if record.get("row") != len(self.rows) + 1:
+                    break
+                self.rows.append(record["values"])
+
+    def _normalize(self, row: List[Any]) -> List[str]:
+        """Pad/trim a row to the log width, like get_all_values() does."""
+        values = [str(value) for value in row[:self.width]]
+        return values + [""] * (self.width - len(values))
+
+    def _append(self, first_row: int, rows: List[List[str]]):
+        """Append rows to the cache file and to memory."""
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        with open(self.cache_file, 'a', encoding='utf-8') as f:
+            for offset, row in enumerate(rows):
+                f.write(json.dumps({"row": first_row + offset, "values": row}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows.extend(rows)
+
+    def _reset(self):
+        """Forget the local copy (the sheet was cleared or rewritten)."""
+        self.rows = []
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def sync(self, worksheet, run: Optional[Callable[[Callable[[], Any]], Any]] = None) -> int:
+        """
+        Fetch rows added since the last sync.
+        The last stored row is read again with the new rows, so a log that was
+        cleared or rewritten is detected and downloaded again.
+
+        Args:
+            worksheet: gspread Worksheet of the activity log
+            run: Optional function running the request (e.g. with reconnect)
+
+        Returns:
+            Number of new rows stored
+        """
+        run = run or (lambda operation: operation())
+        start = max(self.last_row, 1)
+        fetched = run(lambda: worksheet.get(f"A{start}:{self.last_column}"))
+        fetched = [self._normalize(row) for row in fetched]
+
+        if self.rows and (not fetched or fetched[0] != self.rows[start - 1]):
+            print(f"⚠️ تغير سجل الأنشطة '{worksheet.title}'، إعادة تحميله بالكامل")
+            self._reset()
+            fetched = [self._normalize(row) for row in run(lambda: worksheet.get(f"A1:{self.last_column}"))]
+            start = 1
+
+        new_rows = fetched[self.last_row - start + 1:] if self.rows else fetched
+        if new_rows:
+            self._append(self.last_row + 1, new_rows)
+        return len(new_rows)
+
+    def get_all_values(self) -> List[List[str]]:
+        """All stored rows including the header row (same shape as get_all_values)."""
+        return [list(row) for row in self.rows]
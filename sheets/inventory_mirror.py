@@ -0,0 +1,231 @@
+"""
+Local read-through mirror of the Inventory worksheet.
+Keeps a copy of the worksheet values on disk with an (item name, project) -> row
+index, updated from our own writes and refreshed only when the spreadsheet revision changes.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+ITEM_NAME_COLUMN = 1  # A: اسم العنصر
+PROJECT_COLUMN = 4    # D: رقم المشروع
+
+
+def get_revision(spreadsheet) -> str:
+    """
+    Get the spreadsheet modification time from the Drive API (a small metadata request).
+
+    Args:
+        spreadsheet: gspread Spreadsheet
+
+    Returns:
+        Revision string that changes whenever the spreadsheet is modified
+    """
+    if hasattr(spreadsheet, "get_lastUpdateTime"):
+        return spreadsheet.get_lastUpdateTime()
+    return spreadsheet.lastUpdateTime
+
+
+def make_item_key(item_name: Any, project_id: Any) -> Tuple[str, str]:
+    """
+    Build the lookup key of an item (case-insensitive name, exact project).
+
+    Args:
+        item_name: Item name
+        project_id: Project ID
+
+    Returns:
+        Tuple key used by the row index
+    """
+    return (str(item_name or "").strip().lower(), str(project_id or "").strip())
+
+
+class InventoryMirror:
+    """Local copy of the Inventory worksheet with an item-key -> row index."""
+
+    def __init__(self, cache_file: str, max_age_seconds: float = 300, check_interval_seconds: float = 5):
+        """
+        Initialize the mirror.
+
+        Args:
+            cache_file: JSON file the mirror is persisted to
+            max_age_seconds: Download the whole sheet at least this often
+            check_interval_seconds: Minimum time between revision checks
+        """
+        self.cache_file = cache_file
+        self.max_age_seconds = max_age_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.rows: List[List[str]] = []
+        self.index: Dict[Tuple[str, str], int] = {}
+        self.revision: Optional[str] = None
+        self.synced_at = 0.0
+        self.checked_at = 0.0
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once the mirror holds a copy of the worksheet."""
+        return bool(self.rows)
+
+    @property
+    def row_count(self) -> int:
+        """Number of rows including the header row."""
+        return len(self.rows)
+
+    def load(self) -> bool:
+        """
+        Load the mirror saved by a previous run.
+
+        Returns:
+            True if a saved copy was loaded, False otherwise
+        """
+        if not os.path.exists(self.cache_file):
+            return False
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.rows = data["rows"]
+            self.revision = data.get("revision")
+            self.synced_at = data.get("synced_at", 0.0)
+            self._rebuild_index()
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: could not load inventory mirror: {e}")
+            self.rows, self.index, self.revision = [], {}, None
+            return False
+
+    def save(self):
+        """Persist the mirror to disk (temp file then replace)."""
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({"rows": self.rows, "revision": self.revision, "synced_at": self.synced_at},
+                          f, ensure_ascii=False)
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            print(f"Warning: could not save inventory mirror: {e}")
+
+    def should_check(self) -> bool:
+        """True if enough time has passed since the last revision check."""
+        return not self.is_loaded or time.time() - self.checked_at >= self.check_interval_seconds
+
+    def needs_refresh(self, revision: Optional[str]) -> bool:
+        """
+        Check whether the mirror must be downloaded again.
+
+        Args:
+            revision: Current spreadsheet revision
+
+        Returns:
+            True if the sheet changed since the last download or the copy is too old
+        """
+        self.checked_at = time.time()
+        if not self.is_loaded or revision != self.revision:
+            return True
+        return time.time() - self.synced_at >= self.max_age_seconds
+
+    def replace_all(self, values: List[List[Any]], revision: Optional[str]):
+        """
+        Replace the mirror with a full download of the worksheet.
+
+        Args:
+            values: Result of worksheet.get_all_values()
+            revision: Spreadsheet revision the values belong to
+        """
+        self.rows = [[str(value) for value in row] for row in values]
+        self.revision = revision
+        self.synced_at = self.checked_at = time.time()
+        self._rebuild_index()
+        self.save()
+
+    def _rebuild_index(self):
+        """Rebuild the item-key -> row index (first row wins, like a top-down scan)."""
+        self.index = {}
+        for row_number, row in enumerate(self.rows[1:], start=2):
+            if row and row[0]:
+                self.index.setdefault(self._row_key(row), row_number)
+
+    @staticmethod
+    def _row_key(row: List[str]) -> Tuple[str, str]:
+        return make_item_key(row[ITEM_NAME_COLUMN - 1] if row else "",
+                             row[PROJECT_COLUMN - 1] if len(row) >= PROJECT_COLUMN else "")
+
+    def find_row(self, item_name: Any, project_id: Any) -> Optional[int]:
+        """
+        Find the row of an item without any request.
+
+        Args:
+            item_name: Item name (case-insensitive)
+            project_id: Project ID
+
+        Returns:
+            Row number or None if the item is not in the sheet
+        """
+        return self.index.get(make_item_key(item_name, project_id))
+
+    def get_row(self, row: int) -> List[str]:
+        """Get the values of a row (empty list if it does not exist)."""
+        if 1 <= row <= len(self.rows):
+            return list(self.rows[row - 1])
+        return []
+
+    def set_cells(self, row: int, values: Dict[int, Any]):
+        """
+        Apply our own cell writes to the mirror.
+
+        Args:
+            row: Row number (1-based)
+            values: Mapping of column number (1-based) to new value
+        """
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        old_key = self._row_key(cells) if cells and cells[0] else None
+        for col, value in values.items():
+            while len(cells) < col:
+                cells.append("")
+            cells[col - 1] = "" if value is None else str(value)
+
+        new_key = self._row_key(cells) if cells and cells[0] else None
+        if old_key != new_key:
+            if old_key is not None and self.index.get(old_key) == row:
+                self._rebuild_index()
+            elif new_key is not None:
+                self.index.setdefault(new_key, row)
+
+    def set_row(self, row: int, row_values: List[Any]):
+        """Apply our own write of a whole row to the mirror."""
+        self.set_cells(row, {i + 1: value for i, value in enumerate(row_values)})
+
+    def delete_row(self, row: int):
+        """Apply our own row deletion (later rows move up by one)."""
+        if 1 <= row <= len(self.rows):
+            deleted = self.rows.pop(row - 1)
+            # Shift the index instead of rescanning every row
+            self.index = {key: (r - 1 if r > row else r) for key, r in self.index.items() if r != row}
+            if deleted and deleted[0]:
+                key = self._row_key(deleted)
+                if key not in self.index:
+                    # A later duplicate of the deleted item becomes the first one
+                    for row_number in range(row, len(self.rows) + 1):
+                        values = self.rows[row_number - 1]
+                        if values and values[0] and self._row_key(values) == key:
+                            self.index[key] = row_number
+                            break
+
+    def records(self) -> List[Tuple[int, Dict[str, str]]]:
+        """
+        Get the data rows as header -> value dictionaries (like get_all_records).
+
+        Returns:
+            List of (row number, record) tuples
+        """
+        if not self.rows:
+            return []
+        headers = self.rows[0]
+        return [
+            (row_number, {header: (row[i] if i < len(row) else "") for i, header in enumerate(headers)})
+            for row_number, row in enumerate(self.rows[1:], start=2)
+        ]
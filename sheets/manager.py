@@ -8,6 +8,13 @@ from google.auth.exceptions import DefaultCredentialsError
 from typing import List, Dict, Optional, Any
 import datetime
 import os
+import time
+
+from .activity_log_store import ActivityLogStore
+from .inventory_mirror import InventoryMirror, get_revision
+from .session import get_session
+from .sync_queue import APPEND_ACTIVITY, APPEND_ITEM, DELETE_ITEM, SET_CELLS, SyncQueue, apply_to_mirror, item_key
+from .sync_worker import SheetsSyncer, SyncWorker
 
 class SheetsManager:
     """Manages connections and operations with Google Sheets."""
@@ -25,11 +32,23 @@ class SheetsManager:
         self.spreadsheet_name = spreadsheet_name
         self.worksheet_name = worksheet_name
         self.activity_log_name = "Activity_Log"
+        self.activity_log_v2_name = "Activity_Log_v2_20251108"
         self.client = None
         self.spreadsheet = None
         self.worksheet = None
         self.current_user = ""  # المستخدم الحالي
         self.activity_log = None
+        self.flush_latency_ms = 250  # أقصى تأخير قبل إرسال الكتابات المجمعة
+        self.session = None
+        self.mirror = None
+        self.sync_queue = None  # التعديلات التي لم تصل إلى Google Sheets بعد
+        self.activity_stores = {}  # نسخ محلية من أوراق سجل الأنشطة (تحدث بالصفوف الجديدة فقط)
+        self.syncer = None
+        self.sync_worker = None
+        self.background_sync = True  # إرسال التعديلات من خيط خلفي (الاختبارات تستدعي flush مباشرة)
+        self.offline = False
+        self.cache_dir = os.path.join("data", "sheets_cache")
+        self.connect_calls = 0  # عدد استدعاءات connect() (يبقى ثابتاً أثناء العمليات)
         
     def set_current_user(self, username: str):
         """Set the current user for activity logging."""
@@ -42,50 +61,186 @@ class SheetsManager:
         Returns:
             True if connection successful, False otherwise
         """
+        self.connect_calls += 1
+        # Shared session: authenticates only the first time, later calls reuse the client
+        if self.session is None:
+            self.session = get_session(self.credentials_file, self.spreadsheet_name)
+        # Local state first: the app keeps working from it while offline
+        self._setup_local_state()
         try:
-            if not os.path.exists(self.credentials_file):
-                raise FileNotFoundError(f"Credentials file not found: {self.credentials_file}")
-                
-            # Authenticate and create client
-            self.client = gspread.service_account(filename=self.credentials_file)
-            
-            # Open the spreadsheet
-            try:
-                self.spreadsheet = self.client.open(self.spreadsheet_name)
-            except gspread.SpreadsheetNotFound:
-                # Create new spreadsheet if it doesn't exist
-                self.spreadsheet = self.client.create(self.spreadsheet_name)
+            self.spreadsheet = self.session.connect()
+            self.client = self.session.client
                 
             # Get or create the worksheet
             try:
-                self.worksheet = self.spreadsheet.worksheet(self.worksheet_name)
+                self.worksheet = self.session.worksheet(self.worksheet_name)
             except gspread.WorksheetNotFound:
-                self.worksheet = self.spreadsheet.add_worksheet(
-                    title=self.worksheet_name, 
-                    rows=1000, 
-                    cols=10
-                )
+                self.worksheet = self.session.add_worksheet(self.worksheet_name, rows=1000, cols=10)
                 # Add headers
                 self._setup_headers()
                 
             # Get or create the activity log worksheet
             try:
-                self.activity_log = self.spreadsheet.worksheet(self.activity_log_name)
+                self.activity_log = self.session.worksheet(self.activity_log_name)
             except gspread.WorksheetNotFound:
-                self.activity_log = self.spreadsheet.add_worksheet(
-                    title=self.activity_log_name, 
-                    rows=1000, 
-                    cols=6
-                )
+                self.activity_log = self.session.add_worksheet(self.activity_log_name, rows=1000, cols=6)
                 # Add activity log headers
                 self._setup_activity_log_headers()
                 
+            self.offline = False
+            self._start_sync_worker()
             return True
             
         except (DefaultCredentialsError, FileNotFoundError, Exception) as e:
             print(f"Error connecting to Google Sheets: {e}")
+            if self.mirror.is_loaded:
+                # Offline mode: work on the local copy, queued changes are synced later
+                print("⚠️ العمل بدون اتصال: ستتم مزامنة التعديلات عند عودة الاتصال")
+                self.offline = True
+                self._start_sync_worker()
+                return True
+            return False
+            
+    def _setup_local_state(self):
+        """Load the local inventory copy and the queue of unsynced changes left by the previous run."""
+        if self.mirror is None:
+            cache_file = os.path.join(self.cache_dir, f"{self.spreadsheet_name}_{self.worksheet_name}.json")
+            self.mirror = InventoryMirror(cache_file)
+            self.mirror.load()
+        if self.sync_queue is None:
+            queue_file = os.path.join(self.cache_dir, f"{self.spreadsheet_name}_pending.jsonl")
+            self.sync_queue = SyncQueue(queue_file)
+            
+    def _start_sync_worker(self):
+        """Create the syncer and start the background sync worker (once)."""
+        if self.syncer is None:
+            self.syncer = SheetsSyncer(self.session, self.sync_queue, inventory_title=self.worksheet_name)
+        if self.background_sync and self.sync_worker is None:
+            self.sync_worker = SyncWorker(self.syncer, latency_ms=self.flush_latency_ms, on_synced=self._on_synced)
+            self.sync_worker.start()
+            
+    def _on_synced(self):
+        """Called by the sync worker after the queue was replayed."""
+        if self.offline:
+            try:
+                self._refresh_handles()
+                self.offline = False
+                print("✅ عاد الاتصال بـ Google Sheets وتمت مزامنة التعديلات")
+            except Exception as e:
+                print(f"Error reconnecting to Google Sheets: {e}")
+                
+    def _enqueue(self, kind: str, **fields):
+        """
+        Queue a change for Google Sheets and apply it to the local copy immediately.
+        
+        Args:
+            kind: Operation kind (see sheets.sync_queue)
+            **fields: Operation data
+        """
+        op = self.sync_queue.enqueue(kind, **fields)
+        if kind != APPEND_ACTIVITY:
+            apply_to_mirror(self.mirror, op)
+            self.mirror.save()
+        if self.sync_worker is not None:
+            self.sync_worker.notify()
+        return op
+        
+    def _enqueue_cell_updates(self, row: int, values: Dict[int, Any]):
+        """
+        Queue cell updates of an inventory row, remembering which item and
+        quantity they were made for so the sync can detect conflicts.
+        
+        Args:
+            row: Row number of the item
+            values: Mapping of column number (1-based) to new value
+        """
+        current = self.mirror.get_row(row)
+        self._enqueue(SET_CELLS, row=row,
+                      key=item_key(current[0] if current else "", current[3] if len(current) > 3 else ""),
+                      values={str(col): value for col, value in values.items()},
+                      before=current[4] if len(current) > 4 else "")
+            
+    def _refresh_handles(self):
+        """Re-resolve worksheet handles after the session reconnected."""
+        self.spreadsheet = self.session.connect()
+        self.client = self.session.client
+        self.worksheet = self.session.worksheet(self.worksheet_name)
+        self.activity_log = self.session.worksheet(self.activity_log_name)
+        
+    def _run(self, operation):
+        """
+        Run a Sheets request, reconnecting once on auth or transport errors.
+        
+        Args:
+            operation: Function performing the request
+            
+        Returns:
+            Result of the operation
+        """
+        if self.session is None:
+            return operation()
+        return self.session.run(operation, on_reconnect=self._refresh_handles)
+        
+    def sync_mirror(self, force: bool = False) -> bool:
+        """
+        Bring the local inventory mirror up to date.
+        The revision is checked at most every mirror.check_interval_seconds, and the
+        whole worksheet is only downloaded when the spreadsheet revision changed.
+        Without a connection the local copy is used as it is.
+        
+        Args:
+            force: Download the worksheet without checking the revision
+            
+        Returns:
+            True if the mirror is usable, False otherwise
+        """
+        if self.mirror is None:
             return False
+        if not force and not self.mirror.should_check():
+            return self.mirror.is_loaded
             
+        try:
+            if self.worksheet is None:
+                # Started offline: resolve the handles now that the sheet may be reachable
+                self._refresh_handles()
+            revision = self._run(lambda: get_revision(self.spreadsheet))
+            if force or self.mirror.needs_refresh(revision):
+                pending = self.sync_queue.pending()
+                values = self._run(lambda: self.worksheet.get_all_values())
+                self.mirror.replace_all(values, revision)
+                # Changes not synced yet stay visible on top of the downloaded copy
+                seen = set()
+                for op in pending + self.sync_queue.pending():
+                    if op["op_id"] not in seen:
+                        seen.add(op["op_id"])
+                        apply_to_mirror(self.mirror, op)
+                if seen:
+                    self.mirror.save()
+            self.offline = False
+        except Exception as e:
+            if not self.mirror.is_loaded:
+                raise
+            print(f"⚠️ تعذر تحديث النسخة المحلية من Google Sheets، استخدام النسخة المحفوظة: {e}")
+            self.mirror.checked_at = time.time()
+            self.offline = True
+        return True
+        
+    def flush(self) -> bool:
+        """
+        Send all queued changes to Google Sheets now.
+        
+        Returns:
+            True if successful, False otherwise (the changes stay queued)
+        """
+        if self.syncer is None:
+            return True
+        try:
+            self.syncer.sync()
+            return True
+        except Exception as e:
+            print(f"Error syncing Sheets changes: {e}")
+            return False
+        
     def _setup_headers(self):
         """Set up the initial headers for the inventory worksheet."""
         headers = ["اسم العنصر", "التصنيف", "الكمية الابتدائية", "الكمية الداخلة", "الكمية الخارجة", "الكمية المتبقية", "رقم المشروع", "آخر تحديث"]
@@ -113,8 +268,6 @@ class SheetsManager:
         try:
             # Log to activity sheet if available
             try:
-                activity_sheet = self.spreadsheet.worksheet('Activity_Log_v2_20251108')
-                
                 import datetime as dt
                 
                 # Prepare activity data
@@ -145,8 +298,8 @@ class SheetsManager:
                     details                # التفاصيل
                 ]
                 
-                # Add to activity sheet
-                activity_sheet.append_row(activity_row)
+                # Add to activity sheet (queued, sent by the sync worker)
+                self._enqueue(APPEND_ACTIVITY, sheet=self.activity_log_v2_name, values=activity_row)
                 print(f"📝 تم تسجيل العملية في سجل الأنشطة: {operation_type} - {item_name} (الفرق: {quantity_difference:+.1f})")
                 
             except Exception as log_error:
@@ -169,11 +322,8 @@ class SheetsManager:
             current_user: Current user performing the operation
         """
         try:
-            # استخدام SheetsManager للكتابة في الشيت الجديد
-            # Using current manager instance
-            enhanced_manager = self
-            
-            if enhanced_manager.connect():
+            # الاتصال فقط إذا لم يكن هناك اتصال سابق (الجلسة تعيد الاتصال عند الحاجة فقط)
+            if self.session is not None or self.connect():
                 # تحديد الكميات حسب نوع العملية
                 quantity_added = 0
                 quantity_removed = 0
@@ -208,8 +358,6 @@ class SheetsManager:
                 
                 # Log to activity sheet if available
                 try:
-                    activity_sheet = self.spreadsheet.worksheet('Activity_Log_v2_20251108')
-                    
                     import datetime as dt
                     
                     # Prepare activity data
@@ -231,8 +379,8 @@ class SheetsManager:
                         details                # التفاصيل
                     ]
                     
-                    # Add to activity sheet
-                    activity_sheet.append_row(activity_row)
+                    # Add to activity sheet (queued, sent by the sync worker)
+                    self._enqueue(APPEND_ACTIVITY, sheet=self.activity_log_v2_name, values=activity_row)
                     print(f"📝 تم تسجيل العملية في سجل الأنشطة: {operation_type} - {item_name}")
                     
                 except Exception as log_error:
@@ -249,15 +397,12 @@ class SheetsManager:
             List of dictionaries containing item data
         """
         try:
-            if not self.worksheet:
+            if not self.sync_mirror():
                 return []
                 
-            # Get all records (excluding header row)
-            records = self.worksheet.get_all_records()
-            
-            # Convert to our format
+            # Convert to our format (from the local mirror, excluding header row)
             items = []
-            for i, record in enumerate(records, start=2):  # Start at row 2
+            for i, record in self.mirror.records():
                 if record.get("اسم العنصر"):  # Only include rows with item names
                     item = {
                         "row": i,
@@ -333,12 +478,8 @@ class SheetsManager:
             raise ValueError("Quantity must be a non-negative number")
             
         try:
-            if not self.worksheet:
-                return False
-                
-            # Get all current data
-            all_data = self.worksheet.get_all_values()
-            if not all_data:
+            # Current data from the local mirror (downloaded only if the sheet changed)
+            if not self.sync_mirror() or not self.mirror.is_loaded:
                 return False
             
             # Clean the inputs
@@ -346,17 +487,9 @@ class SheetsManager:
             category = category.strip()
             project_id = project_id.strip()
             
-            # Search for existing item with same name and project
-            existing_row = None
-            for i, row in enumerate(all_data[1:], start=2):  # Skip header row
-                if len(row) >= 4:  # Ensure we have enough columns
-                    row_item = row[0].strip() if row[0] else ""
-                    row_project = row[3].strip() if len(row) > 3 and row[3] else ""  # رقم المشروع في العمود D (فهرس 3)
-                    
-                    # Check if same item and same project
-                    if row_item.lower() == item_name.lower() and row_project == project_id:
-                        existing_row = i
-                        break
+            # Search for existing item with same name and project (case-insensitive name)
+            existing_row = self.mirror.find_row(item_name, project_id)
+            existing_values = self.mirror.get_row(existing_row) if existing_row else []
             
             last_updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
@@ -365,21 +498,21 @@ class SheetsManager:
                 current_quantity = 0
                 try:
                     # الكمية في العمود E (فهرس 4) في التنسيق الجديد
-                    current_quantity = float(all_data[existing_row - 1][4]) if len(all_data[existing_row - 1]) > 4 and all_data[existing_row - 1][4] else 0
+                    current_quantity = float(existing_values[4]) if len(existing_values) > 4 and existing_values[4] else 0
                 except (ValueError, IndexError):
                     current_quantity = 0
                 
                 new_quantity = current_quantity + quantity
                 
                 # Get other current values
-                current_unit = all_data[existing_row - 1][2] if len(all_data[existing_row - 1]) > 2 else "قطعة"
-                current_price = all_data[existing_row - 1][5] if len(all_data[existing_row - 1]) > 5 else "0"
+                current_unit = existing_values[2] if len(existing_values) > 2 else "قطعة"
+                current_price = existing_values[5] if len(existing_values) > 5 else "0"
                 current_total = float(current_price) * new_quantity if current_price and current_price.replace('.', '').isdigit() else 0
-                current_notes = all_data[existing_row - 1][9] if len(all_data[existing_row - 1]) > 9 else ""
+                current_notes = existing_values[9] if len(existing_values) > 9 else ""
                 
                 # Update the existing row with new format: [اسم، تصنيف، وحدة، مشروع، كمية، سعر، إجمالي، تاريخ، مستخدم، ملاحظات]
                 row_data = [item_name, category, current_unit, project_id, str(new_quantity), current_price, str(current_total), last_updated, self.current_user, current_notes]
-                self.worksheet.update(values=[row_data], range_name=f"A{existing_row}:J{existing_row}")
+                self._enqueue_cell_updates(existing_row, {i + 1: value for i, value in enumerate(row_data)})
                 
                 # Log the activity
                 details = f"تحديث كمية العنصر من {current_quantity} إلى {new_quantity} (إضافة {quantity})"
@@ -394,14 +527,13 @@ class SheetsManager:
                 
             else:
                 # Add new item with new format: [اسم، تصنيف، وحدة، مشروع، كمية، سعر، إجمالي، تاريخ، مستخدم، ملاحظات]
-                next_row = len(all_data) + 1
                 default_unit = "قطعة"
                 default_price = "0"
                 total_value = "0"
                 notes = ""
                 
                 row_data = [item_name, category, default_unit, project_id, str(quantity), default_price, total_value, last_updated, self.current_user, notes]
-                self.worksheet.update(values=[row_data], range_name=f"A{next_row}:J{next_row}")
+                self._enqueue(APPEND_ITEM, key=item_key(item_name, project_id), values=row_data)
                 
                 # Log the activity
                 details = f"إضافة عنصر جديد بكمية {quantity}"
@@ -423,27 +555,26 @@ class SheetsManager:
             print(f"❌ خطأ في إضافة/تحديث العنصر: {e}")
             return False
             
-    def update_quantity(self, row: int, new_quantity) -> bool:
+    def update_quantity(self, item, new_quantity) -> bool:
         """
         Update the quantity of an item.
         
         Args:
-            row: Row number of the item in the spreadsheet
+            item: Item key (item name, project ID), item dictionary from get_all_items() or row number
             new_quantity: New quantity value (int or float)
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            if not self.worksheet:
+            row = self.find_item_row(item)
+            if row is None:
                 return False
                 
             last_updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
             # Get item name, category and old quantity for logging (التنسيق الجديد)
-            item_name = self.worksheet.cell(row, 1).value
-            category = self.worksheet.cell(row, 2).value or "متنوع"
-            old_quantity = self._parse_number(self.worksheet.cell(row, 5).value)  # العمود E للكمية (فهرس 5)
+            item_name, category, old_quantity = self._read_row_details(row)
             
             # Convert new_quantity to float
             new_quantity_float = float(new_quantity)
@@ -454,8 +585,8 @@ class SheetsManager:
             # Update quantity and last updated (quantity in column E, date in column H)
             # تحديث الكمية والتاريخ في التنسيق الجديد
             print(f"DEBUG: تحديث الكمية في الشيت - الصف {row}: {old_quantity} -> {new_quantity_float} (الفرق: {quantity_difference:+.1f})")
-            self.worksheet.update(f"E{row}", [[new_quantity_float]])  # العمود E للكمية
-            self.worksheet.update(f"H{row}", [[last_updated]])         # العمود H للتاريخ
+            # العمود E للكمية والعمود H للتاريخ في دفعة واحدة
+            self._enqueue_cell_updates(row, {5: new_quantity_float, 8: last_updated})
             
             # Log the activity with the calculated difference
             details = f"تعديل الكمية من {old_quantity} إلى {new_quantity_float} (الفرق: {quantity_difference:+.1f})"
@@ -467,12 +598,12 @@ class SheetsManager:
             print(f"Error updating quantity: {e}")
             return False
             
-    def outbound_item(self, row: int, outbound_quantity: int, recipient_name: str) -> bool:
+    def outbound_item(self, item, outbound_quantity: int, recipient_name: str) -> bool:
         """
         Process outbound items (إخراج بضاعة).
         
         Args:
-            row: Row number of the item in the spreadsheet
+            item: Item key (item name, project ID), item dictionary from get_all_items() or row number
             outbound_quantity: Quantity to be taken out
             recipient_name: Name of the person receiving the items
             
@@ -480,13 +611,12 @@ class SheetsManager:
             True if successful, False otherwise
         """
         try:
-            if not self.worksheet:
+            row = self.find_item_row(item)
+            if row is None:
                 return False
                 
             # Get current item details (التنسيق الجديد)
-            item_name = self.worksheet.cell(row, 1).value
-            category = self.worksheet.cell(row, 2).value or "متنوع"
-            current_quantity = self._parse_number(self.worksheet.cell(row, 5).value)  # العمود E للكمية الحالية
+            item_name, category, current_quantity = self._read_row_details(row)
             
             # Check if there's enough quantity
             if current_quantity < outbound_quantity:
@@ -498,8 +628,8 @@ class SheetsManager:
             
             # Update quantity and last updated (التنسيق الجديد)
             print(f"DEBUG: إخراج من المخزن - الصف {row}: {current_quantity} -> {new_quantity} (إخراج: {outbound_quantity})")
-            self.worksheet.update(f"E{row}", [[new_quantity]])     # العمود E للكمية الجديدة
-            self.worksheet.update(f"H{row}", [[last_updated]])     # العمود H للتاريخ
+            # العمود E للكمية الجديدة والعمود H للتاريخ في دفعة واحدة
+            self._enqueue_cell_updates(row, {5: new_quantity, 8: last_updated})
             
             # Log the activity
             details = f"إخراج بضاعة إلى: {recipient_name} - الكمية المخرجة: {outbound_quantity}, الكمية المتبقية: {new_quantity}"
@@ -511,36 +641,83 @@ class SheetsManager:
             print(f"Error processing outbound: {e}")
             return False
             
-    def remove_item(self, row: int) -> bool:
+    def remove_item(self, item) -> bool:
         """
         Remove an item from the inventory.
         
         Args:
-            row: Row number of the item to remove
+            item: Item key (item name, project ID), item dictionary from get_all_items() or row number
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            if not self.worksheet:
+            row = self.find_item_row(item)
+            if row is None:
                 return False
                 
-            # Get item details for logging before deletion
-            item_name = self.worksheet.cell(row, 1).value
-            category = self.worksheet.cell(row, 2).value or "متنوع"
-            quantity = self.worksheet.cell(row, 6).value  # الكمية المتبقية في العمود السادس (F)
+            # Get item details for logging before deletion (from the local mirror)
+            values = self.mirror.get_row(row)
+            item_name = values[0] if len(values) > 0 else ""
+            category = (values[1] if len(values) > 1 else "") or "متنوع"
+            quantity = values[5] if len(values) > 5 else ""  # الكمية المتبقية في العمود السادس (F)
             
             # Log the activity before deletion
             details = f"حذف العنصر - الكمية كانت: {quantity}"
             self._log_activity("حذف", item_name, str(quantity), "", details, category, self.current_user)
                 
-            self.worksheet.delete_rows(row)
+            # The sync resolves the row by item key, so later row shifts do not matter
+            self._enqueue(DELETE_ITEM, row=row, key=item_key(item_name, values[3] if len(values) > 3 else ""))
             return True
             
         except Exception as e:
             print(f"Error removing item: {e}")
             return False
             
+    def find_item_row(self, item) -> Optional[int]:
+        """
+        Resolve an item to its current row from the local index (no request).
+        Item keys stay valid when other rows are inserted or deleted; row
+        numbers are only checked to exist.
+        
+        Args:
+            item: Item key (item name, project ID), item dictionary from get_all_items() or row number
+            
+        Returns:
+            Row number or None if the item is not in the sheet
+        """
+        if not self.sync_mirror():
+            return None
+        if isinstance(item, dict):
+            row = self.mirror.find_row(item.get("item_name", ""), item.get("project_id", ""))
+        elif isinstance(item, (tuple, list)):
+            row = self.mirror.find_row(*item)
+        else:
+            row = int(item)
+            if row < 2 or not self.mirror.get_row(row):
+                row = None
+        if row is None:
+            print(f"Item not found in inventory: {item}")
+        return row
+        
+    def _read_row_details(self, row: int):
+        """
+        Read item name, category and quantity of a row from the local mirror.
+        
+        Args:
+            row: Row number of the item in the spreadsheet
+            
+        Returns:
+            Tuple of (item name, category, quantity)
+        """
+        if not self.sync_mirror():
+            raise RuntimeError("Inventory worksheet is not available")
+        values = self.mirror.get_row(row)
+        item_name = values[0] if len(values) > 0 else ""
+        category = (values[1] if len(values) > 1 else "") or "متنوع"
+        quantity = self._parse_number(values[4] if len(values) > 4 else 0)  # العمود E للكمية
+        return item_name, category, quantity
+        
     def _parse_number(self, value: Any) -> float:
         """
         Parse a value as a number, returning 0 if not possible.
@@ -570,11 +747,8 @@ class SheetsManager:
             List of activity log entries
         """
         try:
-            if not self.activity_log:
-                return []
-                
-            # Get all values from activity log
-            all_values = self.activity_log.get_all_values()
+            # Get all values from the local copy of the activity log
+            all_values = self.get_activity_log_values(self.activity_log_name, last_column="F")
             
             # Return all rows except header
             return all_values[1:] if len(all_values) > 1 else []
@@ -582,6 +756,37 @@ class SheetsManager:
         except Exception as e:
             print(f"Error getting activity log: {e}")
             return []
+            
+    def get_activity_log_values(self, title: Optional[str] = None, last_column: str = "L") -> List[List[str]]:
+        """
+        Get all rows of an activity log worksheet, fetching only the rows added
+        since the last call (the rest comes from the local copy).
+        
+        Args:
+            title: Worksheet title (default: the enhanced activity log)
+            last_column: Last column of the log
+            
+        Returns:
+            All rows including the header row, like get_all_values()
+        """
+        title = title or self.activity_log_v2_name
+        store = self.activity_stores.get(title)
+        if store is None:
+            cache_file = os.path.join(self.cache_dir, f"{self.spreadsheet_name}_{title}.jsonl")
+            store = self.activity_stores[title] = ActivityLogStore(cache_file, last_column=last_column)
+            
+        # Queued changes must reach the sheet before reading it back
+        self.flush()
+        try:
+            worksheet = self._run(lambda: self.session.worksheet(title))
+            new_rows = store.sync(worksheet, run=self._run)
+            if new_rows:
+                print(f"📥 تم جلب {new_rows} صف جديد من {title}")
+        except Exception as e:
+            if not store.rows:
+                raise
+            print(f"⚠️ تعذر تحديث سجل الأنشطة، استخدام النسخة المحفوظة: {e}")
+        return store.get_all_values()
     
     def get_all_items_raw(self) -> List[List[str]]:
         """
@@ -591,11 +796,11 @@ class SheetsManager:
             List of lists containing item data
         """
         try:
-            if not self.worksheet:
+            if not self.sync_mirror():
                 return []
                 
-            # Get all values from worksheet
-            all_values = self.worksheet.get_all_values()
+            # Get all values from the local mirror
+            all_values = [list(row) for row in self.mirror.rows]
             
             # Return all rows except header
             return all_values[1:] if len(all_values) > 1 else []
@@ -1,51 +1,239 @@
 """
 تحكم في معدل الطلبات لتجنب تجاوز حدود Google Sheets API
+يستخدم دلو رموز (token bucket) منفصل للقراءة والكتابة حسب حصص Google
+(60 طلب قراءة و60 طلب كتابة في الدقيقة لكل مستخدم)، مع حساب دقيق لمدة الانتظار
+وإعادة المحاولة بتأخير أسي عشوائي يحترم Retry-After عند الخطأ 429.
 """
 
-import time
+import asyncio
+import random
 import threading
+import time
+from email.utils import parsedate_to_datetime
 from functools import wraps
 
-class RateLimiter:
-    """فئة للتحكم في معدل الطلبات"""
-    
-    def __init__(self, max_calls=100, time_window=60):
-        self.max_calls = max_calls
-        self.time_window = time_window
-        self.calls = []
+READ = "read"
+WRITE = "write"
+
+
+class TokenBucket:
+    """دلو رموز: سعة للطلبات المتتالية ومعدل ثابت لإعادة الملء"""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        """
+        Args:
+            rate_per_minute: عدد الطلبات المسموح بها في الدقيقة
+            capacity: أقصى عدد طلبات متتالية بدون انتظار (افتراضياً عُشر حصة الدقيقة)
+            clock: دالة الوقت (قابلة للاستبدال في الاختبارات)
+        """
+        if capacity is None:
+            capacity = max(1, rate_per_minute // 10)
+        capacity = min(capacity, rate_per_minute)
+        # الدفعة الأولى جزء من حصة الدقيقة: أي نافذة 60 ثانية تحصل على الدفعة
+        # ثم (الحصة - السعة) رمزاً بإعادة الملء، فلا تتجاوز rate_per_minute
+        self.rate = (rate_per_minute - capacity + 1) / 60.0
+        self.capacity = float(capacity)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
         self.lock = threading.Lock()
-    
-    def can_make_call(self):
-        """التحقق من إمكانية إجراء طلب"""
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """أخذ رمز إذا كان متاحاً الآن بدون انتظار"""
         with self.lock:
-            now = time.time()
-            # إزالة الطلبات القديمة
-            self.calls = [call_time for call_time in self.calls if now - call_time < self.time_window]
-            
-            if len(self.calls) < self.max_calls:
-                self.calls.append(now)
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
                 return True
             return False
-    
-    def wait_if_needed(self):
-        """انتظار إذا لزم الأمر"""
-        while not self.can_make_call():
-            time.sleep(1)
 
-# إنشاء محدد معدل عالمي
-sheets_rate_limiter = RateLimiter(max_calls=90, time_window=60)
-
-def rate_limited(func):
-    """ديكوريتر للتحكم في معدل الطلبات"""
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        sheets_rate_limiter.wait_if_needed()
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            if "429" in str(e) or "Quota exceeded" in str(e):
-                print(f"تم تجاوز الحد المسموح - انتظار 60 ثانية...")
-                time.sleep(60)
+    def reserve(self, tokens=1):
+        """
+        حجز رمز وإرجاع مدة الانتظار الدقيقة قبل استخدامه.
+        الرصيد قد يصبح سالباً، فتنتظر الطلبات بترتيب وصولها بدون انتظار متكرر.
+
+        Returns:
+            عدد الثواني الواجب انتظارها (0 إذا كان الرمز متاحاً)
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+
+def is_rate_limit_error(error):
+    """التحقق من أن الخطأ بسبب تجاوز الحصة (429)"""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return "429" in str(error) or "Quota exceeded" in str(error)
+
+
+def get_retry_after(error):
+    """
+    قراءة ترويسة Retry-After من استجابة الخطأ.
+
+    Returns:
+        عدد الثواني المطلوب انتظارها أو None إذا لم تحدد
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """محدد معدل الطلبات بدلوين للقراءة والكتابة مع إحصائيات وقت الانتظار"""
+
+    def __init__(self, read_per_minute=60, write_per_minute=60, max_retries=5,
+                 base_delay=1.0, max_delay=64.0, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            read_per_minute: حصة طلبات القراءة في الدقيقة
+            write_per_minute: حصة طلبات الكتابة في الدقيقة
+            max_retries: عدد مرات إعادة المحاولة بعد الخطأ 429
+            base_delay: التأخير الأساسي لإعادة المحاولة الأولى (ثوان)
+            max_delay: أقصى تأخير بين محاولتين (ثوان)
+            clock: دالة الوقت (قابلة للاستبدال في الاختبارات)
+            sleep: دالة الانتظار (قابلة للاستبدال في الاختبارات)
+        """
+        self.buckets = {
+            READ: TokenBucket(read_per_minute, clock=clock),
+            WRITE: TokenBucket(write_per_minute, clock=clock),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.metrics_lock = threading.Lock()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        """تصفير الإحصائيات"""
+        with self.metrics_lock:
+            self.metrics = {
+                kind: {"calls": 0, "throttled_calls": 0, "throttled_seconds": 0.0,
+                       "rate_limit_errors": 0, "backoff_seconds": 0.0}
+                for kind in self.buckets
+            }
+
+    def get_metrics(self):
+        """
+        إحصائيات كل نوع: عدد الطلبات، عدد مرات وزمن الانتظار بسبب الحصة،
+        وعدد أخطاء 429 وزمن إعادة المحاولة.
+        """
+        with self.metrics_lock:
+            return {kind: dict(values) for kind, values in self.metrics.items()}
+
+    def _record(self, kind, **increments):
+        with self.metrics_lock:
+            for name, value in increments.items():
+                self.metrics[kind][name] += value
+
+    def _reserve(self, kind):
+        """حجز رمز وتسجيل مدة الانتظار في الإحصائيات"""
+        wait = self.buckets[kind].reserve()
+        self._record(kind, calls=1)
+        if wait > 0:
+            self._record(kind, throttled_calls=1, throttled_seconds=wait)
+        return wait
+
+    def can_make_call(self, kind=READ):
+        """التحقق من إمكانية إجراء طلب الآن (ويحجز الرمز إن أمكن)"""
+        if self.buckets[kind].try_acquire():
+            self._record(kind, calls=1)
+            return True
+        return False
+
+    def wait_if_needed(self, kind=READ):
+        """
+        الانتظار حتى يتاح رمز (انتظار واحد بالمدة المحسوبة بدل الفحص المتكرر).
+
+        Returns:
+            عدد الثواني التي تم انتظارها
+        """
+        wait = self._reserve(kind)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    async def acquire(self, kind=READ):
+        """
+        نسخة asyncio من wait_if_needed: تنتظر بدون حجز حلقة الأحداث.
+
+        Returns:
+            عدد الثواني التي تم انتظارها
+        """
+        wait = self._reserve(kind)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def backoff_delay(self, attempt, error=None):
+        """
+        مدة الانتظار قبل إعادة المحاولة: Retry-After إن وجدت،
+        وإلا تأخير أسي بعشوائية كاملة (full jitter).
+
+        Args:
+            attempt: رقم إعادة المحاولة (يبدأ من 0)
+            error: الخطأ الذي سبب إعادة المحاولة
+        """
+        retry_after = get_retry_after(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func, *args, kind=READ, **kwargs):
+        """
+        تنفيذ طلب ضمن الحصة مع إعادة المحاولة عند الخطأ 429.
+
+        Args:
+            func: الدالة التي تنفذ الطلب
+            kind: READ أو WRITE
+        """
+        attempt = 0
+        while True:
+            self.wait_if_needed(kind)
+            try:
                 return func(*args, **kwargs)
-            raise e
-    return wrapper
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                self._record(kind, rate_limit_errors=1, backoff_seconds=delay)
+                print(f"تم تجاوز الحد المسموح - إعادة المحاولة بعد {delay:.1f} ثانية...")
+                self.sleep(delay)
+                attempt += 1
+
+
+# إنشاء محدد معدل عالمي
+sheets_rate_limiter = RateLimiter()
+
+
+def rate_limited(func=None, *, kind=READ, limiter=None):
+    """
+    ديكوريتر للتحكم في معدل الطلبات.
+    يستخدم بدون معاملات (@rate_limited) أو مع نوع الطلب (@rate_limited(kind=WRITE)).
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            return (limiter or sheets_rate_limiter).call(f, *args, kind=kind, **kwargs)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -0,0 +1,185 @@
+"""
+Persistent Google Sheets session.
+Authenticates once, keeps the spreadsheet and worksheet handles, and only
+reconnects when a request fails with an authentication or transport error.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import gspread
+import requests
+from google.auth.exceptions import RefreshError, TransportError
+
+from .rate_limiter import READ, WRITE, RateLimiter, sheets_rate_limiter
+
+
+def is_reconnect_error(error: Exception) -> bool:
+    """
+    Check whether an error means the connection must be re-established.
+
+    Args:
+        error: Exception raised by a Sheets request
+
+    Returns:
+        True for expired/invalid credentials and network failures
+    """
+    if isinstance(error, gspread.exceptions.APIError):
+        response = getattr(error, "response", None)
+        return getattr(response, "status_code", None) == 401
+    return isinstance(error, (RefreshError, TransportError, requests.exceptions.ConnectionError, ConnectionError))
+
+
+class SheetsSession:
+    """One authenticated connection to a spreadsheet, shared by all managers."""
+
+    def __init__(self, credentials_file: str, spreadsheet_name: str, connector: Optional[Callable[[], Any]] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """
+        Initialize the session (no request is made until first use).
+
+        Args:
+            credentials_file: Path to Google Sheets API credentials JSON file
+            spreadsheet_name: Name of the Google Sheets spreadsheet
+            connector: Optional function returning an opened spreadsheet (used by tests)
+            rate_limiter: Quota limiter applied to every request (None: unlimited)
+        """
+        self.credentials_file = credentials_file
+        self.spreadsheet_name = spreadsheet_name
+        self.connector = connector
+        self.rate_limiter = rate_limiter
+        self.client = None
+        self.spreadsheet = None
+        self.worksheets: Dict[str, Any] = {}
+        self.connect_count = 0  # Number of real (re)authentications
+        self.lock = threading.RLock()
+
+    def _open(self):
+        """Authenticate and open the spreadsheet."""
+        if self.connector is not None:
+            return self.connector()
+
+        if not os.path.exists(self.credentials_file):
+            raise FileNotFoundError(f"Credentials file not found: {self.credentials_file}")
+
+        # The client keeps the service account token and refreshes it when it expires
+        self.client = gspread.service_account(filename=self.credentials_file)
+        try:
+            return self.client.open(self.spreadsheet_name)
+        except gspread.SpreadsheetNotFound:
+            return self.client.create(self.spreadsheet_name)
+
+    def connect(self, force: bool = False):
+        """
+        Return the opened spreadsheet, connecting only if not connected yet.
+
+        Args:
+            force: Reconnect even if a connection exists
+
+        Returns:
+            gspread Spreadsheet
+        """
+        with self.lock:
+            if self.spreadsheet is None or force:
+                self.spreadsheet = self._open()
+                self.worksheets = {}
+                self.connect_count += 1
+            return self.spreadsheet
+
+    def invalidate(self):
+        """Drop the connection and cached handles; the next request reconnects."""
+        with self.lock:
+            self.client = None
+            self.spreadsheet = None
+            self.worksheets = {}
+
+    def worksheet(self, title: str):
+        """
+        Get a worksheet handle, resolving it only once per connection.
+
+        Args:
+            title: Worksheet title
+
+        Returns:
+            gspread Worksheet
+
+        Raises:
+            gspread.WorksheetNotFound: If the worksheet does not exist
+        """
+        with self.lock:
+            if title not in self.worksheets:
+                self.worksheets[title] = self.connect().worksheet(title)
+            return self.worksheets[title]
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 10):
+        """
+        Create a worksheet and cache its handle.
+
+        Args:
+            title: Worksheet title
+            rows: Initial number of rows
+            cols: Initial number of columns
+
+        Returns:
+            gspread Worksheet
+        """
+        with self.lock:
+            self.worksheets[title] = self.connect().add_worksheet(title=title, rows=rows, cols=cols)
+            return self.worksheets[title]
+
+    def run(self, operation: Callable[[], Any], on_reconnect: Optional[Callable[[], None]] = None,
+            kind: str = READ):
+        """
+        Run a Sheets request within the quota, reconnecting and retrying once on
+        auth/transport errors (quota errors are retried by the rate limiter).
+
+        Args:
+            operation: Function performing the request (must look up handles when called)
+            on_reconnect: Called after reconnecting so callers can refresh their handles
+            kind: Quota the request counts against (READ or WRITE)
+
+        Returns:
+            Result of the operation
+        """
+        def attempt():
+            if self.rate_limiter is None:
+                return operation()
+            return self.rate_limiter.call(operation, kind=kind)
+
+        try:
+            return attempt()
+        except Exception as e:
+            if not is_reconnect_error(e):
+                raise
+            print(f"Sheets connection lost ({e}), reconnecting...")
+            self.connect(force=True)
+            if on_reconnect is not None:
+                on_reconnect()
+            return attempt()
+
+    def batch_update(self, body: Dict[str, Any]):
+        """Spreadsheet batch_update through the session (used by the sync worker to replay queued operations)."""
+        return self.run(lambda: self.connect().batch_update(body), kind=WRITE)
+
+
+_sessions: Dict[tuple, SheetsSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(credentials_file: str, spreadsheet_name: str) -> SheetsSession:
+    """
+    Get the shared session for a spreadsheet, creating it on first use.
+
+    Args:
+        credentials_file: Path to Google Sheets API credentials JSON file
+        spreadsheet_name: Name of the Google Sheets spreadsheet
+
+    Returns:
+        SheetsSession shared by every manager using the same spreadsheet
+    """
+    key = (os.path.abspath(credentials_file), spreadsheet_name)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = SheetsSession(credentials_file, spreadsheet_name, rate_limiter=sheets_rate_limiter)
+        return _sessions[key]
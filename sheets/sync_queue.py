@@ -0,0 +1,241 @@
+"""
+Durable queue of pending Google Sheets changes (offline-first).
+Every mutation is appended to a JSON Lines file with fsync before it is applied
+to the local mirror, so changes made without a connection survive restarts
+until the sync worker has replayed them to Google Sheets.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from .inventory_mirror import InventoryMirror, make_item_key
+
+# Operation kinds
+SET_CELLS = "set_cells"            # Update cells of an existing inventory item
+APPEND_ITEM = "append_item"        # Add a new inventory row
+DELETE_ITEM = "delete_item"        # Delete an inventory row
+APPEND_ACTIVITY = "append_activity"  # Add an activity log row
+
+
+class SyncQueue:
+    """Append-only queue of pending Sheets operations, kept in order."""
+
+    def __init__(self, queue_file: str, conflicts_file: Optional[str] = None,
+                 dead_letters_file: Optional[str] = None):
+        """
+        Initialize the queue and load operations left by a previous run.
+
+        Args:
+            queue_file: JSON Lines file holding pending operations
+            conflicts_file: JSON Lines file where rejected operations are recorded
+            dead_letters_file: JSON Lines file where operations that kept failing are moved
+        """
+        self.queue_file = queue_file
+        self.conflicts_file = conflicts_file or queue_file.replace("_pending.jsonl", "_conflicts.jsonl")
+        self.dead_letters_file = dead_letters_file or queue_file.replace("_pending.jsonl", "_dead_letters.jsonl")
+        self.lock = threading.RLock()
+        self.ops: List[Dict[str, Any]] = self._read()
+
+    def _read(self) -> List[Dict[str, Any]]:
+        """Read pending operations from disk (incomplete last line is ignored)."""
+        if not os.path.exists(self.queue_file):
+            return []
+        ops = []
+        with open(self.queue_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ops.append(json.loads(line))
+                except ValueError:
+                    print(f"Warning: ignored a damaged line in the sync queue: {self.queue_file}")
+        return ops
+
+    def _append_line(self, file_path: str, record: Dict[str, Any]):
+        """Append one JSON line and force it to disk."""
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite(self):
+        """Rewrite the queue file from memory (temp file then replace)."""
+        os.makedirs(os.path.dirname(self.queue_file) or ".", exist_ok=True)
+        temp_file = f"{self.queue_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            for op in self.ops:
+                f.write(json.dumps(op, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.queue_file)
+
+    def enqueue(self, kind: str, **fields) -> Dict[str, Any]:
+        """
+        Durably add an operation to the end of the queue.
+
+        Args:
+            kind: Operation kind (SET_CELLS, APPEND_ITEM, DELETE_ITEM, APPEND_ACTIVITY)
+            **fields: Operation data
+
+        Returns:
+            The queued operation
+        """
+        op = {"op_id": uuid.uuid4().hex, "kind": kind, "attempts": 0, "queued_at": time.time()}
+        op.update(fields)
+        with self.lock:
+            self._append_line(self.queue_file, op)
+            self.ops.append(op)
+        return op
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Copy of the pending operations in order."""
+        with self.lock:
+            return [dict(op) for op in self.ops]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.ops)
+
+    def next_batch(self, max_ops: int = 100) -> List[Dict[str, Any]]:
+        """
+        Get the next operations to replay together.
+
+        Args:
+            max_ops: Maximum number of operations in the batch
+
+        Returns:
+            Operations from the head of the queue, in order
+        """
+        with self.lock:
+            return [dict(op) for op in self.ops[:max_ops]]
+
+    def mark_attempt(self, op_ids: List[str]):
+        """Record that a batch is about to be sent (its outcome is unknown until acked)."""
+        ids = set(op_ids)
+        with self.lock:
+            for op in self.ops:
+                if op["op_id"] in ids:
+                    op["attempts"] = op.get("attempts", 0) + 1
+            self._rewrite()
+
+    def ack(self, op_ids: List[str]):
+        """Remove operations that were applied (or rejected) from the queue."""
+        ids = set(op_ids)
+        with self.lock:
+            self.ops = [op for op in self.ops if op["op_id"] not in ids]
+            self._rewrite()
+
+    def record_failure(self, op_id: str) -> int:
+        """
+        Count a failed replay of an operation (an error other than a lost connection).
+
+        Returns:
+            Number of failures of the operation so far
+        """
+        with self.lock:
+            for op in self.ops:
+                if op["op_id"] == op_id:
+                    op["failures"] = op.get("failures", 0) + 1
+                    self._rewrite()
+                    return op["failures"]
+        return 0
+
+    def dead_letter(self, op: Dict[str, Any], error: str):
+        """
+        Move an operation that keeps failing out of the queue so the operations
+        behind it still sync; it is kept in the dead letters file for review.
+
+        Args:
+            op: Failing operation
+            error: Last error raised when replaying it
+        """
+        print(f"⚠️ تعذرت مزامنة عملية بعد عدة محاولات ({error}): {op.get('kind')} - {op.get('key')}")
+        with self.lock:
+            self._append_line(self.dead_letters_file, {"op": op, "error": error, "failed_at": time.time()})
+            self.ops = [pending for pending in self.ops if pending["op_id"] != op["op_id"]]
+            self._rewrite()
+
+    def get_dead_letters(self) -> List[Dict[str, Any]]:
+        """Read the operations moved out of the queue after failing repeatedly."""
+        if not os.path.exists(self.dead_letters_file):
+            return []
+        with open(self.dead_letters_file, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def record_conflict(self, op: Dict[str, Any], reason: str, server_values: Optional[List[str]] = None):
+        """
+        Keep a rejected operation for review instead of overwriting remote changes.
+
+        Args:
+            op: Rejected operation
+            reason: Why it could not be applied
+            server_values: Row values found in Google Sheets
+        """
+        print(f"⚠️ تعارض في المزامنة ({reason}): {op.get('kind')} - {op.get('key')}")
+        with self.lock:
+            self._append_line(self.conflicts_file, {
+                "op": op, "reason": reason, "server_values": server_values, "detected_at": time.time(),
+            })
+
+    def get_conflicts(self) -> List[Dict[str, Any]]:
+        """Read the recorded conflicts."""
+        if not os.path.exists(self.conflicts_file):
+            return []
+        with open(self.conflicts_file, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def apply_to_mirror(mirror: InventoryMirror, op: Dict[str, Any]):
+    """
+    Apply a queued operation to the local mirror.
+    Rows are resolved by item key so the operation lands on the right row
+    even after the mirror was downloaded again.
+
+    Args:
+        mirror: Local inventory mirror
+        op: Queued operation
+    """
+    kind = op["kind"]
+    if kind == SET_CELLS:
+        row = resolve_row(mirror.get_row(op["row"]), op, mirror.find_row)
+        if row is not None:
+            mirror.set_cells(row, {int(col): value for col, value in op["values"].items()})
+    elif kind == APPEND_ITEM:
+        if mirror.find_row(*op["key"]) is None:
+            mirror.set_row(mirror.row_count + 1, op["values"])
+    elif kind == DELETE_ITEM:
+        row = resolve_row(mirror.get_row(op["row"]), op, mirror.find_row)
+        if row is not None:
+            mirror.delete_row(row)
+
+
+def row_matches(row_values: List[str], key: List[str]) -> bool:
+    """Check whether a row still holds the item the operation was made for."""
+    return bool(row_values) and list(make_item_key(
+        row_values[0], row_values[3] if len(row_values) > 3 else "")) == list(key)
+
+
+def resolve_row(row_values: List[str], op: Dict[str, Any], find_row) -> Optional[int]:
+    """
+    Find the row an operation applies to: its original row if the item is still
+    there, otherwise wherever the item moved (row drift), or None if it is gone.
+
+    Args:
+        row_values: Current values of the operation's original row
+        op: Queued operation with "row" and "key"
+        find_row: Function (item name, project id) -> row number or None
+    """
+    if row_matches(row_values, op["key"]):
+        return op["row"]
+    return find_row(*op["key"])
+
+
+def item_key(item_name: Any, project_id: Any) -> List[str]:
+    """Item key in the JSON-friendly form stored in queued operations."""
+    return list(make_item_key(item_name, project_id))
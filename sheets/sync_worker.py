@@ -0,0 +1,306 @@
+"""
+Background replay of the offline sync queue to Google Sheets.
+Pending operations are sent in order, one batch_update (write quota) per batch.
+Before it, batches that touch the inventory make one batch_get (read quota) of
+the item, project and quantity columns, so a replayed batch never applies twice
+and never overwrites changes made by someone else in the meantime; that check
+has to see the server, so it is not served from the local mirror. Retried
+activity rows also read the op id column of their log sheet once.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import gspread
+
+from .inventory_mirror import make_item_key
+from .session import is_reconnect_error
+from .sync_queue import APPEND_ACTIVITY, APPEND_ITEM, DELETE_ITEM, SET_CELLS, SyncQueue
+
+QUANTITY_COLUMN = 5        # E: الكمية
+OP_ID_COLUMN = 13          # M: معرف العملية في سجل الأنشطة (لمنع التكرار عند إعادة الإرسال)
+
+
+def _cell_data(value: Any) -> Dict[str, Any]:
+    """
+    Convert a Python value to a Sheets API CellData (same result as a RAW update).
+
+    Args:
+        value: Cell value
+
+    Returns:
+        CellData dictionary
+    """
+    if value is None:
+        return {"userEnteredValue": {"stringValue": ""}}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def _same_value(left: Any, right: Any) -> bool:
+    """Compare two cell values, numerically when both are numbers ("15" == "15.0")."""
+    try:
+        return float(left) == float(right)
+    except (TypeError, ValueError):
+        return str(left or "") == str(right or "")
+
+
+class SheetsSyncer:
+    """Replays queued operations against the spreadsheet."""
+
+    def __init__(self, session, queue: SyncQueue, inventory_title: str = "Inventory",
+                 max_batch: int = 100, max_failures: int = 5):
+        """
+        Initialize the syncer.
+
+        Args:
+            session: SheetsSession used for all requests
+            queue: Queue of pending operations
+            inventory_title: Title of the inventory worksheet
+            max_batch: Maximum number of operations sent in one batch_update
+            max_failures: Failed replays after which an operation is moved to the dead letters
+        """
+        self.session = session
+        self.queue = queue
+        self.inventory_title = inventory_title
+        self.max_batch = max_batch
+        self.max_failures = max_failures
+        self.lock = threading.Lock()
+        self.synced_ops = 0
+        self.conflicts = 0
+        self.dead_letters = 0
+
+    def sync(self) -> int:
+        """
+        Replay all pending operations.
+
+        Returns:
+            Number of operations removed from the queue (applied or rejected)
+
+        Raises:
+            Exception: Request errors (the operations stay queued)
+        """
+        done = 0
+        with self.lock:
+            while True:
+                batch = self.queue.next_batch(self.max_batch)
+                if not batch:
+                    return done
+                try:
+                    self._replay(batch)
+                except Exception as e:
+                    if is_reconnect_error(e):
+                        raise
+                    # A lasting error: replay one by one to find the failing operation
+                    self._replay_each(batch)
+                done += len(batch)
+
+    def _replay_each(self, batch: List[Dict[str, Any]]):
+        """
+        Replay operations one at a time (batch_update applies all or nothing, so
+        nothing from the failed batch landed). An operation that keeps failing is
+        moved to the dead letters after max_failures attempts instead of blocking
+        the operations queued behind it.
+
+        Raises:
+            Exception: The error of an operation that has not reached max_failures
+        """
+        for op in batch:
+            try:
+                self._replay([op])
+            except Exception as e:
+                if is_reconnect_error(e):
+                    raise
+                if self.queue.record_failure(op["op_id"]) < self.max_failures:
+                    raise
+                self.queue.dead_letter(op, str(e))
+                self.dead_letters += 1
+
+    def _read_inventory(self) -> List[List[str]]:
+        """
+        Read item name, project and quantity of every inventory row in one request.
+
+        Returns:
+            Rows as [item name, project, quantity], index 0 is the header row
+        """
+        worksheet = self.session.worksheet(self.inventory_title)
+        names, projects, quantities = self.session.run(
+            lambda: worksheet.batch_get(["A:A", "D:D", "E:E"]))
+
+        def column(values, i):
+            return values[i][0] if i < len(values) and values[i] else ""
+
+        return [[column(names, i), column(projects, i), column(quantities, i)]
+                for i in range(max(len(names), len(projects), len(quantities)))]
+
+    def _replay(self, batch: List[Dict[str, Any]]):
+        """
+        Send one batch of operations in a single batch_update.
+        If the batch touches the inventory, it is read first (one batch_get on
+        the read quota) and the batch is simulated on that copy, so every request
+        uses the row numbers the sheet will have when it is applied and remote
+        quantity changes are detected. A batch of activity rows only makes no read.
+        """
+        inventory_ops = [op for op in batch if op["kind"] != APPEND_ACTIVITY]
+        rows = self._read_inventory() if inventory_ops else []
+        inventory = self.session.worksheet(self.inventory_title) if inventory_ops else None
+
+        # Activity rows already sent by an interrupted attempt carry their op id in column M
+        sent_ids = set()
+        retried = [op for op in batch if op["kind"] == APPEND_ACTIVITY and op.get("attempts")]
+        activity_sheets = {}
+        for op in batch:
+            if op["kind"] == APPEND_ACTIVITY and op["sheet"] not in activity_sheets:
+                try:
+                    activity_sheets[op["sheet"]] = self.session.worksheet(op["sheet"])
+                except gspread.WorksheetNotFound:
+                    activity_sheets[op["sheet"]] = None  # Recorded as a conflict below
+        for title in {op["sheet"] for op in retried}:
+            sheet = activity_sheets[title]
+            if sheet is not None:
+                sent_ids.update(self.session.run(lambda: sheet.col_values(OP_ID_COLUMN)))
+
+        def find(key):
+            for row_number, row in enumerate(rows[1:], start=2):
+                if list(make_item_key(row[0], row[1])) == list(key):
+                    return row_number
+            return None
+
+        def resolve(op):
+            row = op["row"]
+            if 1 < row <= len(rows) and list(make_item_key(rows[row - 1][0], rows[row - 1][1])) == list(op["key"]):
+                return row
+            return find(op["key"])
+
+        requests = []
+        conflicts = []  # Recorded once the batch was sent, so a failed send does not record them twice
+        for op in batch:
+            kind = op["kind"]
+            if kind == SET_CELLS:
+                row = resolve(op)
+                if row is None:
+                    conflicts.append((op, "item not found", None))
+                    continue
+                values = {int(col): value for col, value in op["values"].items()}
+                current = rows[row - 1][2]
+                if ("before" in op and QUANTITY_COLUMN in values and not _same_value(current, op["before"])
+                        and not _same_value(current, values[QUANTITY_COLUMN])):
+                    conflicts.append((op, "quantity changed on the server", rows[row - 1]))
+                    continue
+                for col in sorted(values):
+                    requests.append(self._update_request(inventory.id, row, col, values[col]))
+                if QUANTITY_COLUMN in values:
+                    rows[row - 1][2] = str(values[QUANTITY_COLUMN])
+            elif kind == APPEND_ITEM:
+                if find(op["key"]) is not None:
+                    if not op.get("attempts"):
+                        conflicts.append((op, "item already exists", None))
+                    continue
+                requests.append(self._append_request(inventory.id, op["values"]))
+                values = op["values"]
+                rows.append([values[0], values[3] if len(values) > 3 else "",
+                             values[4] if len(values) > 4 else ""])
+            elif kind == DELETE_ITEM:
+                row = resolve(op)
+                if row is None:
+                    continue  # Already deleted
+                requests.append({"deleteDimension": {"range": {
+                    "sheetId": inventory.id, "dimension": "ROWS", "startIndex": row - 1, "endIndex": row}}})
+                del rows[row - 1]
+            elif kind == APPEND_ACTIVITY:
+                if activity_sheets[op["sheet"]] is None:
+                    conflicts.append((op, "activity log sheet not found", None))
+                    continue
+                if op["op_id"] in sent_ids:
+                    continue
+                values = list(op["values"])[:OP_ID_COLUMN - 1]
+                values += [""] * (OP_ID_COLUMN - 1 - len(values)) + [op["op_id"]]
+                requests.append(self._append_request(activity_sheets[op["sheet"]].id, values))
+
+        op_ids = [op["op_id"] for op in batch]
+        if requests:
+            # From here the outcome is unknown until acked: a retry must check what already landed
+            self.queue.mark_attempt(op_ids)
+            self.session.batch_update({"requests": requests})
+        for op, reason, server_values in conflicts:
+            self.queue.record_conflict(op, reason, server_values)
+        self.conflicts += len(conflicts)
+        self.queue.ack(op_ids)
+        self.synced_ops += len(batch)
+
+    @staticmethod
+    def _update_request(sheet_id: int, row: int, col: int, value: Any) -> Dict[str, Any]:
+        return {"updateCells": {
+            "range": {"sheetId": sheet_id, "startRowIndex": row - 1, "endRowIndex": row,
+                      "startColumnIndex": col - 1, "endColumnIndex": col},
+            "rows": [{"values": [_cell_data(value)]}],
+            "fields": "userEnteredValue",
+        }}
+
+    @staticmethod
+    def _append_request(sheet_id: int, row_values: List[Any]) -> Dict[str, Any]:
+        return {"appendCells": {
+            "sheetId": sheet_id,
+            "rows": [{"values": [_cell_data(value) for value in row_values]}],
+            "fields": "userEnteredValue",
+        }}
+
+
+class SyncWorker(threading.Thread):
+    """Daemon thread replaying the queue shortly after changes, retrying while offline."""
+
+    def __init__(self, syncer: SheetsSyncer, latency_ms: int = 250, max_backoff_seconds: float = 60,
+                 on_synced: Optional[Callable[[], None]] = None):
+        """
+        Initialize the worker.
+
+        Args:
+            syncer: Syncer performing the replay
+            latency_ms: Time to wait after a change so close changes share a batch
+            max_backoff_seconds: Longest wait between retries while offline
+            on_synced: Called after the queue was replayed successfully
+        """
+        super().__init__(name="SheetsSyncWorker", daemon=True)
+        self.syncer = syncer
+        self.latency_ms = latency_ms
+        self.max_backoff_seconds = max_backoff_seconds
+        self.on_synced = on_synced
+        self.online = True
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def notify(self):
+        """Signal that new operations were queued."""
+        self._wakeup.set()
+
+    def stop(self):
+        """Stop the worker (pending operations stay in the queue file)."""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run(self):
+        backoff = 1.0
+        self._wakeup.set()  # Replay what a previous run left in the queue
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            if self._stopped.wait(self.latency_ms / 1000.0):
+                break
+            self._wakeup.clear()
+            try:
+                if self.syncer.sync() and self.on_synced is not None:
+                    self.on_synced()
+                self.online = True
+                backoff = 1.0
+            except Exception as e:
+                if is_reconnect_error(e):
+                    self.online = False
+                    print(f"⚠️ لا يوجد اتصال بـ Google Sheets، ستتم المزامنة لاحقاً ({len(self.syncer.queue)} عملية معلقة)")
+                else:
+                    print(f"Error syncing Sheets changes: {e}")
+                # Retry later even without new changes
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff_seconds)
+                self._wakeup.set()
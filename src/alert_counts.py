@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+حساب أعداد تنبيهات المشروع (المخزون المنخفض وقرب انتهاء الصلاحية) وحفظ آخر نتيجة
+تحفظ الأعداد في projects/<name>_Alerts.json مع بصمة ملفات المشروع، بحيث تعرض
+الواجهة آخر أعداد محسوبة فور فتحها ولا يعاد الحساب إلا إذا تغيرت ملفات المشروع
+"""
+
+import json
+import os
+from datetime import date
+
+from excel_manager import excel_manager
+from stock_balances import get_transactions_signature
+
+# الحد الأدنى الافتراضي للكمية قبل اعتبار العنصر منخفض المخزون
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+
+# مدة تنبيه انتهاء الصلاحية الافتراضية بالأيام
+DEFAULT_EXPIRY_DAYS = 30
+
+
+def get_project_signature(project_name, projects_path="projects"):
+    """
+    بصمة كل ما يؤثر على أعداد التنبيهات: ملفات الحركات (أو رقم إصدار المشروع في قاعدة البيانات)
+    وملف الإعدادات وتاريخ اليوم
+    (تاريخ اليوم لأن الدفعات تقترب من الانتهاء مع مرور الأيام دون تغير الملفات)
+    """
+    signature = get_transactions_signature(projects_path, project_name)
+    try:
+        stat = os.stat(os.path.join(projects_path, f"{project_name}_settings.json"))
+        signature['settings'] = [stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        signature['settings'] = None
+    if excel_manager.storage_backend is not None:
+        # مع قاعدة البيانات لا تتغير ملفات الحركات - رقم إصدار المشروع يتغير مع كل كتابة
+        version = excel_manager.storage_backend.get_data_version(project_name)
+        signature['data_version'] = list(version) if version is not None else None
+    signature['date'] = date.today().isoformat()
+    return signature
+
+
+def compute_alert_counts(project_name, projects_path="projects"):
+    """
+    حساب أعداد التنبيهات من الدفعات المفتوحة
+    يتم الحساب تحت قفل المشروع لأن الدفعات المحفوظة في الذاكرة يعدلها خيط الواجهة عند تسجيل المعاملات
+    """
+    from project_settings import ProjectSettingsDialog
+    settings = ProjectSettingsDialog.get_project_settings(project_name)
+    low_stock_threshold = settings.get('low_stock_threshold', DEFAULT_LOW_STOCK_THRESHOLD)
+    expiry_days = settings.get('expiry_threshold_days', DEFAULT_EXPIRY_DAYS)
+
+    with excel_manager.lock_project(project_name):
+        lot_state = excel_manager.get_lot_state(project_name)
+        low_stock = [item for item in lot_state.get_low_stock_items(low_stock_threshold) if item['quantity'] > 0]
+        return {
+            'low_stock': len(low_stock),
+            'expiry': len(lot_state.get_expiring_lots(expiry_days)),
+        }
+
+
+class AlertCountsCache:
+    """آخر أعداد تنبيهات محسوبة لكل مشروع"""
+
+    def __init__(self, projects_path="projects"):
+        self.projects_path = projects_path
+
+    def get_cache_file(self, project_name):
+        """الحصول على مسار ملف الأعداد المحفوظة للمشروع"""
+        return os.path.join(self.projects_path, f"{project_name}_Alerts.json")
+
+    def load(self, project_name):
+        """قراءة آخر أعداد محفوظة: (الأعداد، البصمة) أو (None، None)"""
+        cache_file = self.get_cache_file(project_name)
+        if not os.path.exists(cache_file):
+            return None, None
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data['counts'], data.get('signature')
+        except (OSError, ValueError, KeyError) as e:
+            print(f"تحذير: تعذرت قراءة أعداد التنبيهات المحفوظة: {e}")
+            return None, None
+
+    def save(self, project_name, counts, signature):
+        """حفظ الأعداد مع بصمة الملفات التي حسبت منها"""
+        os.makedirs(self.projects_path, exist_ok=True)
+        cache_file = self.get_cache_file(project_name)
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'counts': counts, 'signature': signature}, f, ensure_ascii=False)
+        os.replace(temp_file, cache_file)
+
+    def refresh(self, project_name, force=False):
+        """
+        إعادة حساب الأعداد فقط إذا تغيرت ملفات المشروع منذ آخر حساب
+        تعيد (الأعداد، هل تم الحساب من جديد)
+        """
+        signature = get_project_signature(project_name, self.projects_path)
+        counts, cached_signature = self.load(project_name)
+        if not force and counts is not None and cached_signature == signature:
+            return counts, False
+
+        counts = compute_alert_counts(project_name, self.projects_path)
+        # البصمة المأخوذة قبل الحساب: أي كتابة أثناءه ستؤدي لإعادة الحساب في المرة التالية
+        self.save(project_name, counts, signature)
+        return counts, True
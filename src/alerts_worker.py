@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+حساب أعداد التنبيهات في الخلفية للواجهة الرئيسية
+يعمل الحساب على QThreadPool حتى لا تتجمد الواجهة، ويؤجل الطلبات المتتالية
+(مثل حفظ عدة حركات متتابعة) إلى حساب واحد، ولا يعيد الحساب إلا إذا تغيرت ملفات المشروع
+"""
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from alert_counts import AlertCountsCache, get_project_signature
+
+# مدة الانتظار بعد آخر طلب قبل بدء الحساب (بالملي ثانية)
+DEBOUNCE_MS = 500
+
+# الفاصل بين فحوصات تغير ملفات المشروع (بالملي ثانية)
+POLL_INTERVAL_MS = 5000
+
+
+class AlertsTaskSignals(QObject):
+    """إشارات مهمة الحساب (QRunnable لا يستطيع إرسال إشارات بنفسه)"""
+    finished = pyqtSignal(str, dict)
+    failed = pyqtSignal(str, str)
+
+
+class AlertsTask(QRunnable):
+    """مهمة حساب أعداد التنبيهات على خيط من مجموعة الخيوط"""
+
+    def __init__(self, cache, project_name, force=False):
+        super().__init__()
+        self.cache = cache
+        self.project_name = project_name
+        self.force = force
+        self.signals = AlertsTaskSignals()
+
+    def run(self):
+        try:
+            counts, _ = self.cache.refresh(self.project_name, force=self.force)
+            self.signals.finished.emit(self.project_name, counts)
+        except Exception as e:
+            self.signals.failed.emit(self.project_name, str(e))
+
+
+class AlertsService(QObject):
+    """
+    خدمة أعداد التنبيهات لمشروع واحد
+    request_update تؤجل الحساب DEBOUNCE_MS، والنتيجة تصل عبر الإشارة counts_ready
+    """
+    counts_ready = pyqtSignal(dict)
+
+    def __init__(self, project_name, parent=None, projects_path="projects"):
+        super().__init__(parent)
+        self.project_name = project_name
+        self.projects_path = projects_path
+        self.cache = AlertCountsCache(projects_path)
+        self.pool = QThreadPool.globalInstance()
+        self._running = False
+        self._pending = False
+        self._force = False
+        self._last_signature = None
+        self._current_task = None
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self._start_task)
+
+        # فحص دوري لتغير الملفات (مثلاً عند الكتابة من نافذة أو برنامج آخر)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(POLL_INTERVAL_MS)
+        self.poll_timer.timeout.connect(self._check_for_changes)
+
+    def get_cached_counts(self):
+        """آخر أعداد محفوظة لعرضها فوراً عند فتح المشروع (None إذا لم تحسب من قبل)"""
+        counts, signature = self.cache.load(self.project_name)
+        self._last_signature = signature
+        return counts
+
+    def start(self):
+        """بدء الفحص الدوري وطلب حساب أولي"""
+        self.poll_timer.start()
+        self.request_update()
+
+    def stop(self):
+        """إيقاف المؤقتات (المهمة الجارية تكمل ونتيجتها تحفظ في الملف)"""
+        self.poll_timer.stop()
+        self.debounce_timer.stop()
+        self._pending = False
+
+    def request_update(self, force=False):
+        """طلب إعادة الحساب، الطلبات المتقاربة تدمج في حساب واحد"""
+        self._force = self._force or force
+        self.debounce_timer.start()
+
+    def _check_for_changes(self):
+        """طلب حساب فقط إذا تغيرت بصمة ملفات المشروع منذ آخر نتيجة"""
+        if self._running or self.debounce_timer.isActive():
+            return
+        try:
+            signature = get_project_signature(self.project_name, self.projects_path)
+        except OSError as e:
+            print(f"خطأ في فحص ملفات المشروع: {e}")
+            return
+        if signature != self._last_signature:
+            self.request_update()
+
+    def _start_task(self):
+        """تشغيل مهمة الحساب، أو تأجيلها حتى تنتهي المهمة الجارية"""
+        if self._running:
+            self._pending = True
+            return
+
+        self._running = True
+        task = AlertsTask(self.cache, self.project_name, force=self._force)
+        self._force = False
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        # الاحتفاظ بمرجع للإشارات حتى تصل النتيجة
+        self._current_task = task
+        self.pool.start(task)
+
+    def _on_finished(self, project_name, counts):
+        self._task_done()
+        if project_name != self.project_name:
+            return
+        self._last_signature = self.cache.load(project_name)[1]
+        self.counts_ready.emit(counts)
+
+    def _on_failed(self, project_name, message):
+        self._task_done()
+        print(f"خطأ في حساب أعداد التنبيهات: {message}")
+
+    def _task_done(self):
+        self._running = False
+        self._current_task = None
+        if self._pending:
+            self._pending = False
+            self.debounce_timer.start()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+نسخة عمودية سريعة (Feather) بجانب ملفات Excel الخاصة بالمشاريع
+تحليل ملفات Excel بواسطة openpyxl هو أبطأ عملية قراءة في النظام، لذلك يتم حفظ
+نسخة Feather بجانب كل ملف (_Items / _Transactions / _Modifications) تُقرأ
+افتراضياً، مع الرجوع لملف Excel إذا كانت النسخة غير موجودة أو أقدم منه
+
+يتطلب مكتبة pyarrow (اختيارية) - بدونها يعمل النظام بملفات Excel فقط
+التثبيت: pip install -r requirements_optional.txt
+
+الاستخدام من سطر الأوامر لإنشاء النسخ لجميع المشاريع الموجودة:
+    python src/columnar_sidecar.py [مجلد_المشاريع]
+"""
+
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# مفتاح بصمة ملف Excel المصدر داخل بيانات Feather الوصفية
+SIGNATURE_KEY = b'source_signature'
+
+# الملفات التي تُحفظ لها نسخة عمودية
+SIDECAR_SUFFIXES = ("_Items.xlsx", "_Transactions.xlsx", "_Modifications.xlsx")
+
+_failed_conversions = set()
+
+
+def get_sidecar_file(excel_file):
+    """مسار النسخة العمودية الخاصة بملف Excel"""
+    return os.path.splitext(excel_file)[0] + ".feather"
+
+
+def _get_signature(excel_file):
+    """بصمة ملف Excel (وقت التعديل والحجم)"""
+    try:
+        stat = os.stat(excel_file)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def read_sidecar(excel_file):
+    """قراءة النسخة العمودية إذا كانت موجودة ومطابقة لملف Excel الحالي (وإلا None)"""
+    if not PYARROW_AVAILABLE:
+        return None
+
+    sidecar_file = get_sidecar_file(excel_file)
+    if not os.path.exists(sidecar_file):
+        return None
+
+    try:
+        table = feather.read_table(sidecar_file)
+        metadata = table.schema.metadata or {}
+        signature = metadata.get(SIGNATURE_KEY)
+        if signature is None or json.loads(signature) != _get_signature(excel_file):
+            # تم تعديل ملف Excel بعد إنشاء النسخة
+            return None
+        return table.to_pandas()
+    except Exception as e:
+        print(f"تحذير: تعذرت قراءة النسخة العمودية {sidecar_file}: {e}")
+        return None
+
+
+def write_sidecar(excel_file, df):
+    """حفظ النسخة العمودية لملف Excel بعد كتابته"""
+    if not PYARROW_AVAILABLE:
+        return False
+
+    sidecar_file = get_sidecar_file(excel_file)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[SIGNATURE_KEY] = json.dumps(_get_signature(excel_file)).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+        # اسم مؤقت خاص بالعملية لأن إعادة إنشاء النسخة قد تتم أثناء القراءة من عدة برامج
+        temp_file = f"{sidecar_file}.{os.getpid()}.tmp"
+        feather.write_feather(table, temp_file)
+        os.replace(temp_file, sidecar_file)
+        return True
+    except Exception as e:
+        # أعمدة بأنواع مختلطة لا يمكن تحويلها - يستمر العمل بملف Excel فقط
+        if excel_file not in _failed_conversions:
+            _failed_conversions.add(excel_file)
+            print(f"تحذير: تعذر إنشاء النسخة العمودية لملف {excel_file}: {e}")
+        return False
+
+
+def read_table(excel_file):
+    """قراءة ملف المشروع من النسخة العمودية مع الرجوع لملف Excel وإعادة إنشاء النسخة"""
+    df = read_sidecar(excel_file)
+    if df is not None:
+        return df
+
+    df = pd.read_excel(excel_file, engine='openpyxl')
+    write_sidecar(excel_file, df)
+    return df
+
+
+def migrate_projects(projects_path="projects"):
+    """إنشاء النسخ العمودية لجميع ملفات المشاريع الموجودة"""
+    migrated = []
+    if not os.path.exists(projects_path):
+        return migrated
+
+    for file_name in sorted(os.listdir(projects_path)):
+        if not file_name.endswith(SIDECAR_SUFFIXES):
+            continue
+        excel_file = os.path.join(projects_path, file_name)
+        if read_sidecar(excel_file) is not None:
+            continue
+        try:
+            df = pd.read_excel(excel_file, engine='openpyxl')
+        except Exception as e:
+            print(f"خطأ في قراءة الملف {excel_file}: {e}")
+            continue
+        if write_sidecar(excel_file, df):
+            migrated.append(excel_file)
+    return migrated
+
+
+if __name__ == "__main__":
+    import sys
+
+    if not PYARROW_AVAILABLE:
+        print("❌ مكتبة pyarrow غير مثبتة: pip install -r requirements_optional.txt")
+        sys.exit(1)
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "projects"
+    for migrated_file in migrate_projects(path):
+        print(f"✅ تم إنشاء النسخة العمودية: {get_sidecar_file(migrated_file)}")
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة تخزين مؤقت مشتركة لملفات Excel المقروءة
+يتم حفظ DataFrame لكل ملف مع مفتاح (المسار، وقت التعديل، الحجم) بحيث تكلف
+القراءات المتكررة خلال نفس العملية استدعاء stat() فقط بدلاً من تحليل الملف
+بواسطة openpyxl، مع حذف الأقدم استخداماً (LRU) عند تجاوز حد الذاكرة
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# الحد الأقصى لعدد الملفات وحجم الذاكرة المستخدمة في التخزين المؤقت
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class DataFrameCache:
+    """تخزين مؤقت لـ DataFrame حسب (المسار، وقت التعديل، الحجم) مع حذف LRU"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _get_signature(file_path):
+        """بصمة الملف الحالية (None إذا لم يكن موجوداً)"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_path, loader):
+        """
+        الحصول على نسخة من DataFrame الخاص بالملف
+        يتم استدعاء loader(file_path) فقط إذا لم يكن الملف في الذاكرة أو تغير على القرص
+        """
+        key = os.path.abspath(file_path)
+        signature = self._get_signature(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and signature is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # إرجاع نسخة حتى لا تؤثر تعديلات المستدعي على النسخة المحفوظة
+                return entry[1].copy()
+            self.misses += 1
+
+        df = loader(file_path)
+
+        if signature is not None and signature == self._get_signature(key):
+            self._store(key, signature, df)
+        return df.copy()
+
+    def read_excel(self, file_path):
+        """قراءة ملف Excel مع الاستفادة من التخزين المؤقت"""
+        return self.get(file_path, lambda path: pd.read_excel(path, engine='openpyxl'))
+
+    def _store(self, key, signature, df):
+        """حفظ DataFrame في الذاكرة مع حذف الأقدم استخداماً عند تجاوز الحدود"""
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._total_bytes -= old_entry[2]
+
+            self._entries[key] = (signature, df, size)
+            self._total_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._total_bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def invalidate(self, file_path):
+        """حذف الملف من الذاكرة بعد الكتابة عليه"""
+        key = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[2]
+
+    def clear(self):
+        """مسح جميع الملفات المحفوظة"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self):
+        """إحصائيات التخزين المؤقت"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# إنشاء مثيل عام
+dataframe_cache = DataFrameCache()
@@ -12,7 +12,8 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                            QGroupBox, QFormLayout, QTextEdit, QComboBox)
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont, QColor
-from excel_manager import excel_manager
+from excel_manager import excel_manager, normalize_transaction_id
+from stock_calculator import compute_item_stock
 
 
 class EditRecentTransactionsDialog(QDialog):
@@ -22,6 +23,8 @@ class EditRecentTransactionsDialog(QDialog):
         super().__init__(parent)
         self.project_name = project_name
         self.recent_transactions = pd.DataFrame()
+        # فهرس عدد تعديلات كل معاملة {رقم المعاملة: عدد التعديلات} يبنى مرة واحدة عند كل تحميل
+        self.modification_counts = {}
         self.setup_ui()
         self.setup_styles()
         self.load_recent_transactions()
@@ -215,8 +218,12 @@ class EditRecentTransactionsDialog(QDialog):
                 self.update_table()
                 return
             
-            # قراءة جميع المعاملات
-            all_transactions = pd.read_excel(project_file, engine='openpyxl')
+            # حساب الحد الزمني (آخر 24 ساعة)
+            now = datetime.now()
+            time_limit = now - timedelta(hours=24)
+            
+            # قراءة معاملات آخر 24 ساعة فقط
+            all_transactions = excel_manager.get_transactions_in_range(self.project_name, start_date=time_limit)
             
             if all_transactions.empty:
                 self.recent_transactions = pd.DataFrame()
@@ -226,9 +233,8 @@ class EditRecentTransactionsDialog(QDialog):
             # تحويل عمود التاريخ
             all_transactions['التاريخ'] = pd.to_datetime(all_transactions['التاريخ'])
             
-            # حساب الحد الزمني (آخر 24 ساعة)
-            now = datetime.now()
-            time_limit = now - timedelta(hours=24)
+            # قراءة ملف التعديلات مرة واحدة وبناء فهرس التعديلات لكل معاملة
+            self.modification_counts = excel_manager.get_modification_counts(self.project_name, all_transactions)
             
             # فلترة المعاملات الحديثة فقط
             recent_mask = all_transactions['التاريخ'] >= time_limit
@@ -256,7 +262,7 @@ class EditRecentTransactionsDialog(QDialog):
                             # المعاملات العكسية
                             filtered_transactions['ملاحظات'].str.contains('إلغاء معاملة رقم', na=False) |
                             # المعاملات الأصلية التي تم تعديلها
-                            filtered_transactions['رقم_المعاملة'].isin(modified_transaction_ids)
+                            filtered_transactions['رقم_المعاملة'].map(normalize_transaction_id).isin(modified_transaction_ids)
                         )
                         filtered_transactions = filtered_transactions[~exclude_mask].copy()
                     elif 'ملاحظات' in filtered_transactions.columns:
@@ -309,77 +315,15 @@ class EditRecentTransactionsDialog(QDialog):
         return f"{hours}س {minutes}د"
     
     def check_modification_status(self, row):
-        """فحص حالة التعديل للمعاملة"""
-        # فحص إذا كان هناك سجل تعديل لهذه المعاملة
-        try:
-            modifications_file = os.path.join("projects", f"{self.project_name}_Modifications.xlsx")
-            if os.path.exists(modifications_file):
-                modifications = pd.read_excel(modifications_file, engine='openpyxl')
-                
-                if not modifications.empty and 'معرف_المعاملة_الأصلية' in modifications.columns:
-                    # البحث عن تعديلات لهذه المعاملة
-                    transaction_id = f"{row['التاريخ']}_{row['اسم_العنصر']}_{row['الكمية']}"
-                    modified = modifications['معرف_المعاملة_الأصلية'].str.contains(transaction_id, na=False)
-                    
-                    if modified.any():
-                        mod_count = len(modifications[modified])
-                        return f"تم التعديل {mod_count} مرة"
-            
-            return "قابل للتعديل"
-            
-        except Exception as e:
-            return "قابل للتعديل"
+        """فحص حالة التعديل للمعاملة من فهرس التعديلات"""
+        mod_count = self.modification_counts.get(normalize_transaction_id(row.get('رقم_المعاملة')), 0)
+        if mod_count:
+            return f"تم التعديل {mod_count} مرة"
+        return "قابل للتعديل"
     
     def get_modified_transaction_ids(self):
         """الحصول على قائمة أرقام المعاملات التي تم تعديلها"""
-        try:
-            modifications_file = os.path.join("projects", f"{self.project_name}_Modifications.xlsx")
-            modified_ids = []
-            
-            if os.path.exists(modifications_file):
-                modifications = pd.read_excel(modifications_file, engine='openpyxl')
-                
-                if not modifications.empty and 'معرف_المعاملة_الأصلية' in modifications.columns:
-                    # استخراج أرقام المعاملات من المعرف
-                    for _, row in modifications.iterrows():
-                        transaction_id_str = str(row['معرف_المعاملة_الأصلية'])
-                        # المعرف في شكل: "تاريخ_اسم_العنصر_كمية"، نحتاج لاستخراج رقم المعاملة من السجل الأصلي
-                        parts = transaction_id_str.split('_')
-                        if len(parts) >= 3:
-                            # البحث في ملف المعاملات عن المعاملة المطابقة
-                            matching_id = self.find_transaction_id_by_details(parts[0], parts[1], parts[2])
-                            if matching_id:
-                                modified_ids.append(matching_id)
-            
-            return modified_ids
-            
-        except Exception as e:
-            return []
-    
-    def find_transaction_id_by_details(self, date_str, item_name, quantity_str):
-        """البحث عن رقم المعاملة بناء على التفاصيل"""
-        try:
-            project_file = os.path.join("projects", f"{self.project_name}_Transactions.xlsx")
-            
-            if os.path.exists(project_file):
-                all_transactions = pd.read_excel(project_file, engine='openpyxl')
-                
-                if not all_transactions.empty and 'رقم_المعاملة' in all_transactions.columns:
-                    # تحويل التاريخ للمقارنة
-                    all_transactions['التاريخ'] = pd.to_datetime(all_transactions['التاريخ'])
-                    
-                    # البحث عن المعاملة المطابقة
-                    for _, row in all_transactions.iterrows():
-                        row_date = row['التاريخ'].strftime('%Y-%m-%d %H:%M:%S')
-                        if (row_date.startswith(date_str.split(' ')[0]) and  # مقارنة التاريخ فقط
-                            str(row['اسم_العنصر']) == item_name and 
-                            str(int(row['الكمية'])) == quantity_str.split('.')[0]):  # مقارنة الكمية كرقم صحيح
-                            return row['رقم_المعاملة']
-            
-            return None
-            
-        except Exception as e:
-            return None
+        return list(self.modification_counts)
     
     def is_transaction_editable(self, transaction):
         """تحديد ما إذا كانت المعاملة قابلة للتعديل"""
@@ -409,33 +353,13 @@ class EditRecentTransactionsDialog(QDialog):
                 return 0
                 
             # قراءة جميع المعاملات
-            all_transactions = pd.read_excel(project_file, engine='openpyxl')
+            all_transactions = excel_manager.load_transactions(self.project_name)
             
             if all_transactions.empty:
                 return 0
             
-            # استبعاد المعاملة المحددة من الحساب
-            if 'رقم_المعاملة' in all_transactions.columns:
-                item_transactions = all_transactions[
-                    (all_transactions['اسم_العنصر'] == item_name) &
-                    (all_transactions['رقم_المعاملة'] != exclude_transaction_id)
-                ]
-            else:
-                # للملفات القديمة بدون أرقام معاملات
-                item_transactions = all_transactions[all_transactions['اسم_العنصر'] == item_name]
-            
-            if item_transactions.empty:
-                return 0
-            
-            # حساب المخزون
-            incoming = item_transactions[item_transactions['نوع_العملية'] == 'دخول']['الكمية'].sum()
-            outgoing = item_transactions[item_transactions['نوع_العملية'] == 'خروج']['الكمية'].sum()
-            
-            # إضافة عمليات التعديل
-            modifications_increase = item_transactions[item_transactions['نوع_العملية'] == 'تعديل زيادة']['الكمية'].sum()
-            modifications_decrease = item_transactions[item_transactions['نوع_العملية'] == 'تعديل نقص']['الكمية'].sum()
-            
-            available_stock = incoming - outgoing + modifications_increase - modifications_decrease
+            # حساب المخزون مع استبعاد المعاملة المحددة
+            available_stock = compute_item_stock(all_transactions, item_name, exclude_transaction_id)
             
             return int(available_stock) if available_stock >= 0 else 0
             
@@ -452,7 +376,7 @@ class EditRecentTransactionsDialog(QDialog):
                 return False
                 
             # قراءة جميع المعاملات
-            all_transactions = pd.read_excel(project_file, engine='openpyxl')
+            all_transactions = excel_manager.load_transactions(self.project_name)
             
             if all_transactions.empty:
                 return False
@@ -479,49 +403,13 @@ class EditRecentTransactionsDialog(QDialog):
             return True
     
     def get_current_stock(self, item_name):
-        """حساب المخزون الحالي للعنصر بشكل مباشر"""
+        """الحصول على المخزون الحالي للعنصر من جدول الأرصدة المحفوظ"""
         try:
-            # قراءة ملف المعاملات مباشرة وحساب المخزون
-            project_file = os.path.join("projects", f"{self.project_name}_Transactions.xlsx")
-            
-            if not os.path.exists(project_file):
-                return 0
-                
-            # قراءة جميع المعاملات
-            all_transactions = pd.read_excel(project_file, engine='openpyxl')
-            
-            if all_transactions.empty:
-                return 0
-            
-            # فلترة معاملات العنصر المحدد
-            item_transactions = all_transactions[all_transactions['اسم_العنصر'] == item_name]
-            
-            if item_transactions.empty:
-                return 0
-            
-            # حساب المخزون
-            incoming = item_transactions[item_transactions['نوع_العملية'] == 'دخول']['الكمية'].sum()
-            outgoing = item_transactions[item_transactions['نوع_العملية'] == 'خروج']['الكمية'].sum()
-            
-            # إضافة عمليات التعديل إذا كانت موجودة
-            modifications_increase = item_transactions[item_transactions['نوع_العملية'] == 'تعديل زيادة']['الكمية'].sum()
-            modifications_decrease = item_transactions[item_transactions['نوع_العملية'] == 'تعديل نقص']['الكمية'].sum()
-            
-            current_stock = incoming - outgoing + modifications_increase - modifications_decrease
-            
+            current_stock = excel_manager.get_item_stock(self.project_name, item_name)
             return int(current_stock) if current_stock >= 0 else 0
-            
         except Exception as e:
-            # في حالة الخطأ، محاولة استخدام الطريقة الأصلية
-            try:
-                inventory_summary = excel_manager.get_inventory_summary(self.project_name)
-                if not inventory_summary.empty:
-                    item_data = inventory_summary[inventory_summary['اسم_العنصر'] == item_name]
-                    if not item_data.empty:
-                        return int(item_data.iloc[0]['الكمية_الحالية'])
-                return 0
-            except:
-                return 0
+            # في حالة الخطأ، نرجع 0 للأمان
+            return 0
     
     def update_table(self):
         """تحديث جدول المعاملات"""
@@ -783,11 +671,13 @@ class EditRecentTransactionsDialog(QDialog):
     def apply_modification(self, original_transaction, new_quantity, difference):
         """تطبيق التعديل على المعاملة الفردية"""
         try:
-            # 1. تسجيل التعديل في ملف منفصل (للتوثيق فقط)
-            self.log_modification(original_transaction, new_quantity, difference)
-            
-            # 2. تحديث المعاملة الأصلية بالكمية الجديدة (لا نضيف معاملات تعديل)
-            self.update_original_transaction(original_transaction, new_quantity)
+            # قفل المشروع حتى لا تضيع معاملات يضيفها برنامج آخر بين القراءة والحفظ
+            with excel_manager.lock_project(self.project_name):
+                # 1. تسجيل التعديل في ملف منفصل (للتوثيق فقط)
+                self.log_modification(original_transaction, new_quantity, difference)
+                
+                # 2. تحديث المعاملة الأصلية بالكمية الجديدة (لا نضيف معاملات تعديل)
+                self.update_original_transaction(original_transaction, new_quantity)
             
             return True
             
@@ -799,7 +689,7 @@ class EditRecentTransactionsDialog(QDialog):
     def log_modification(self, original_transaction, new_quantity, difference):
         """تسجيل التعديل في ملف منفصل"""
         try:
-            modifications_file = os.path.join("projects", f"{self.project_name}_Modifications.xlsx")
+            modifications_file = excel_manager.get_project_modifications_file(self.project_name)
             
             # إنشاء سجل التعديل
             modification_record = {
@@ -815,17 +705,18 @@ class EditRecentTransactionsDialog(QDialog):
                 'سبب_التعديل': self.reason_combo.currentText(),
                 'ملاحظات': self.notes_text.toPlainText(),
                 'المستخدم': 'النظام',  # يمكن إضافة نظام المستخدمين لاحقاً
+                'رقم_المعاملة_الأصلية': original_transaction.get('رقم_المعاملة'),
             }
             
             # قراءة التعديلات الموجودة أو إنشاء ملف جديد
             if os.path.exists(modifications_file):
-                modifications_df = pd.read_excel(modifications_file, engine='openpyxl')
+                modifications_df = excel_manager.read_excel_file(modifications_file)
                 modifications_df = pd.concat([modifications_df, pd.DataFrame([modification_record])], ignore_index=True)
             else:
                 modifications_df = pd.DataFrame([modification_record])
             
             # حفظ التعديلات
-            modifications_df.to_excel(modifications_file, index=False, engine='openpyxl')
+            excel_manager.write_excel_file(modifications_file, modifications_df)
             
         except Exception as e:
             raise Exception(f"خطأ في تسجيل التعديل: {str(e)}")
@@ -840,7 +731,7 @@ class EditRecentTransactionsDialog(QDialog):
                 raise Exception("ملف المشروع غير موجود")
             
             # قراءة ملف المعاملات
-            transactions_df = pd.read_excel(project_file, engine='openpyxl')
+            transactions_df = excel_manager.load_transactions(self.project_name)
             
             # البحث عن المعاملة باستخدام رقم المعاملة (الطريقة الأكثر دقة)
             transaction_id = original_transaction.get('رقم_المعاملة', None)
@@ -896,7 +787,7 @@ class EditRecentTransactionsDialog(QDialog):
                 transactions_df.at[first_match_idx, 'ملاحظات'] = new_notes
             
             # حفظ الملف المحدث
-            transactions_df.to_excel(project_file, index=False, engine='openpyxl')
+            excel_manager.save_transactions(self.project_name, transactions_df)
             
         except Exception as e:
             raise Exception(f"خطأ في تحديث المعاملة: {str(e)}")
@@ -5,17 +5,164 @@
 """
 
 import pandas as pd
+import hashlib
 import os
-from datetime import datetime
+from datetime import date, datetime, time
+from transaction_journal import TransactionJournal
+from stock_balances import StockBalances
+from report_rollups import ROLLUP_COLUMNS, ReportRollups, build_rollups
+from lot_engine import LotEngine, build_lot_state
+from dataframe_cache import dataframe_cache
+from columnar_sidecar import read_table, write_sidecar
+from sqlite_backend import TABLE_FILE_SUFFIXES, TRANSACTION_COLUMNS, load_storage_backend
+from transaction_ids import TransactionIdSequence
+from project_lock import FileLock, project_lock
+from stock_calculator import OPERATION_SIGNS
+
+# حجم السجل الإلحاقي الذي يتم عنده دمجه تلقائياً في ملف Excel
+JOURNAL_COMPACTION_BYTES = 256 * 1024
+
+
+def normalize_transaction_id(value):
+    """توحيد شكل رقم المعاملة للمقارنة (رقم صحيح إن أمكن، وإلا نص، و None للقيم الفارغة)"""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        number = float(text)
+        if number.is_integer():
+            return int(number)
+    except ValueError:
+        pass
+    return text
 
 
 class ExcelManager:
     """مدير ملفات Excel"""
     
-    def __init__(self, base_path="data"):
+    def __init__(self, base_path="data", storage_backend=None):
         self.base_path = base_path
+        # واجهة تخزين بديلة لبيانات المشاريع (None = ملفات Excel مباشرة)
+        self.storage_backend = storage_backend
         self.master_items_file = os.path.join(base_path, "Master_Items.xlsx")  # للتوافق مع الملفات القديمة
+        self.journal = TransactionJournal("projects")
+        self.balances = StockBalances("projects")
+        self.lots = LotEngine("projects")
+        self.rollups = ReportRollups("projects")
+        self.id_sequence = TransactionIdSequence("projects")
+        
+    def read_excel_file(self, file_path):
+        """قراءة ملف Excel عبر التخزين المؤقت المشترك (يعاد التحليل فقط إذا تغير الملف)"""
+        location = self._get_backend_table(file_path)
+        if location:
+            return self.storage_backend.read_table(*location)
+        return self._read_project_file(file_path)
+    
+    def write_excel_file(self, file_path, df):
+        """حفظ ملف Excel وإلغاء النسخة المخزنة مؤقتاً"""
+        with self.lock_file(file_path):
+            location = self._get_backend_table(file_path)
+            if location:
+                self.storage_backend.write_table(*location, df)
+                if not os.path.exists(file_path):
+                    # الإبقاء على ملف Excel (بالأعمدة فقط) ليظهر المشروع في قائمة المشاريع
+                    self._write_project_file(file_path, df.iloc[0:0])
+                return
+            self._write_project_file(file_path, df)
+    
+    def lock_project(self, project_name):
+        """
+        قفل المشروع بين العمليات والنوافذ المختلفة
+        يستخدم حول أي عملية قراءة ثم تعديل ثم حفظ لملفات المشروع حتى لا تضيع كتابة
+        برنامج آخر يعمل على نفس المجلد المشترك
+        """
+        return project_lock(project_name)
+    
+    def lock_file(self, file_path):
+        """القفل المناسب لملف: قفل المشروع لملفات المشاريع، وقفل خاص بالملف لغيرها"""
+        if os.path.basename(os.path.dirname(os.path.abspath(file_path))) == "projects":
+            file_name = os.path.basename(file_path)
+            for suffix in TABLE_FILE_SUFFIXES:
+                if file_name.endswith(suffix):
+                    return project_lock(file_name[:-len(suffix)])
+        return FileLock(file_path + ".lock")
+    
+    def _read_project_file(self, file_path):
+        """قراءة ملف من القرص مباشرة"""
+        # تتم القراءة من النسخة العمودية (Feather) إن وجدت مع الرجوع لملف Excel
+        return dataframe_cache.get(file_path, read_table)
+    
+    def _write_project_file(self, file_path, df):
+        """كتابة ملف على القرص مباشرة"""
+        # الكتابة في ملف مؤقت ثم استبداله لتجنب تلف الملف عند انقطاع التشغيل
+        with self.lock_file(file_path):
+            temp_file = file_path + ".tmp.xlsx"
+            try:
+                df.to_excel(temp_file, index=False, engine='openpyxl')
+                # التأكد من وصول الملف المؤقت إلى القرص قبل استبدال الملف الأصلي
+                with open(temp_file, 'rb') as f:
+                    os.fsync(f.fileno())
+                os.replace(temp_file, file_path)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            write_sidecar(file_path, df)
+            dataframe_cache.invalidate(file_path)
         
+    def _get_backend_table(self, file_path):
+        """(اسم المشروع، الجدول) إذا كان الملف من ملفات المشاريع المخزنة في واجهة التخزين"""
+        if self.storage_backend is None:
+            return None
+        location = self.storage_backend.get_table_for_file(file_path)
+        if location:
+            self._ensure_imported(location[0])
+        return location
+    
+    def _ensure_imported(self, project_name):
+        """استيراد بيانات المشروع من ملفات Excel عند أول استخدام لواجهة التخزين"""
+        if not self.storage_backend.has_project(project_name):
+            self.import_project_from_excel(project_name)
+    
+    def import_project_from_excel(self, project_name):
+        """استيراد ملفات Excel الخاصة بالمشروع إلى واجهة التخزين"""
+        try:
+            tables = {}
+            for suffix, table in TABLE_FILE_SUFFIXES.items():
+                file_path = os.path.join("projects", f"{project_name}{suffix}")
+                if table == 'transactions':
+                    tables[table] = self._load_transactions_from_files(project_name)
+                elif os.path.exists(file_path):
+                    tables[table] = self._read_project_file(file_path)
+            self.storage_backend.import_project(project_name, tables)
+            return True
+        except Exception as e:
+            print(f"خطأ في استيراد بيانات المشروع: {e}")
+            return False
+    
+    def export_project_to_excel(self, project_name):
+        """تصدير بيانات المشروع من واجهة التخزين إلى ملفات Excel"""
+        try:
+            if self.storage_backend is None:
+                return self.compact_transactions(project_name)
+            self._ensure_imported(project_name)
+            os.makedirs("projects", exist_ok=True)
+            for suffix, table in TABLE_FILE_SUFFIXES.items():
+                df = self.storage_backend.read_table(project_name, table)
+                self._write_project_file(os.path.join("projects", f"{project_name}{suffix}"), df)
+            # جميع المعاملات أصبحت في ملف Excel المصدّر
+            self.journal.truncate(project_name)
+            return True
+        except Exception as e:
+            print(f"خطأ في تصدير بيانات المشروع: {e}")
+            return False
+    
     def get_project_items_file(self, project_name):
         """الحصول على مسار ملف العناصر الخاص بالمشروع"""
         if not os.path.exists("projects"):
@@ -26,7 +173,14 @@ class ExcelManager:
         """إنشاء ملف العناصر الخاص بالمشروع"""
         project_items_file = self.get_project_items_file(project_name)
         
-        if not os.path.exists(project_items_file):
+        if os.path.exists(project_items_file):
+            return project_items_file
+        
+        with self.lock_project(project_name):
+            if os.path.exists(project_items_file):
+                # أنشأه برنامج آخر أثناء انتظار القفل
+                return project_items_file
+            
             # إنشاء DataFrame فارغ مع الأعمدة المطلوبة
             columns = [
                 'Item_ID',          # رقم تسلسلي
@@ -42,7 +196,7 @@ class ExcelManager:
             os.makedirs("projects", exist_ok=True)
             
             # حفظ الملف
-            df.to_excel(project_items_file, index=False, engine='openpyxl')
+            self._write_project_file(project_items_file, df)
             print(f"تم إنشاء ملف العناصر للمشروع: {project_items_file}")
         
         return project_items_file
@@ -92,14 +246,25 @@ class ExcelManager:
             os.makedirs(self.base_path, exist_ok=True)
             
             # حفظ الملف
-            df.to_excel(self.master_items_file, index=False, engine='openpyxl')
+            self.write_excel_file(self.master_items_file, df)
             print(f"تم إنشاء ملف العناصر الأساسي: {self.master_items_file}")
     
+    def get_project_transactions_file(self, project_name):
+        """الحصول على مسار ملف حركات المشروع"""
+        return os.path.join("projects", f"{project_name}_Transactions.xlsx")
+    
     def create_site_transactions_file(self, project_name):
         """إنشاء ملف حركات المشروع"""
-        project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
+        project_file = self.get_project_transactions_file(project_name)
         
-        if not os.path.exists(project_file):
+        if os.path.exists(project_file):
+            return project_file
+        
+        with self.lock_project(project_name):
+            if os.path.exists(project_file):
+                # أنشأه برنامج آخر أثناء انتظار القفل
+                return project_file
+            
             # إنشاء DataFrame فارغ مع الأعمدة المطلوبة (مع أرقام المعاملات)
             columns = [
                 'رقم_المعاملة',      # رقم المعاملة المميز
@@ -121,7 +286,7 @@ class ExcelManager:
             os.makedirs("projects", exist_ok=True)
             
             # حفظ الملف
-            df.to_excel(project_file, index=False, engine='openpyxl')
+            self._write_project_file(project_file, df)
             print(f"تم إنشاء ملف حركات المشروع: {project_file}")
             
         return project_file
@@ -138,7 +303,7 @@ class ExcelManager:
             if not os.path.exists(items_file):
                 return None
             
-            df = pd.read_excel(items_file, engine='openpyxl')
+            df = self.read_excel_file(items_file)
             item = df[df['Item_ID'] == item_id]
             
             if not item.empty:
@@ -155,28 +320,27 @@ class ExcelManager:
             print(f"خطأ في قراءة ملف العناصر: {e}")
             return None
     
-    def generate_transaction_id(self, project_name):
-        """توليد رقم معاملة مميز"""
-        try:
-            project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
-            
-            if os.path.exists(project_file):
-                df = pd.read_excel(project_file, engine='openpyxl')
-                
-                # التحقق من وجود عمود رقم المعاملة والتوافق مع الملفات القديمة
-                if not df.empty and 'رقم_المعاملة' in df.columns:
-                    # الحصول على أعلى رقم موجود
-                    max_id = df['رقم_المعاملة'].max()
-                    return max_id + 1 if not pd.isna(max_id) else 1
-                else:
-                    # للملفات القديمة، نبدأ من رقم الصفوف + 1
-                    return len(df) + 1 if not df.empty else 1
-            else:
-                return 1
-                
-        except Exception as e:
-            # في حالة الخطأ، نستخدم timestamp كرقم مميز
-            return int(datetime.now().timestamp())
+    def generate_transaction_id(self, project_name, count=1):
+        """توليد رقم معاملة مميز (أو أول رقم من count أرقام متتالية) من عداد المشروع"""
+        return self.id_sequence.allocate(
+            project_name, count, lambda: self._get_max_transaction_id(project_name)
+        )
+
+    def _get_max_transaction_id(self, project_name):
+        """أعلى رقم معاملة في بيانات المشروع (يستخدم مرة واحدة لتهيئة عداد المشاريع القديمة)"""
+        # قراءة الحركات المحفوظة والمعاملات الموجودة في السجل الإلحاقي
+        df = self.load_transactions(project_name)
+        if df.empty:
+            return 0
+
+        # التحقق من وجود عمود رقم المعاملة والتوافق مع الملفات القديمة
+        if 'رقم_المعاملة' in df.columns:
+            ids = pd.to_numeric(df['رقم_المعاملة'], errors='coerce').dropna()
+            if not ids.empty:
+                return int(ids.max())
+
+        # للملفات القديمة (بدون أرقام رقمية)، نبدأ من عدد الصفوف
+        return len(df)
 
     def ensure_columns_compatibility(self, df):
         """ضمان توافق الأعمدة مع الملفات القديمة"""
@@ -200,23 +364,100 @@ class ExcelManager:
         
         return df[required_columns]  # إعادة ترتيب الأعمدة
 
+    def load_transactions(self, project_name):
+        """قراءة جميع حركات المشروع (ملف Excel + المعاملات غير المدمجة من السجل الإلحاقي)"""
+        if self.storage_backend is not None:
+            self._ensure_imported(project_name)
+            return self.storage_backend.read_table(project_name, 'transactions')
+        return self._load_transactions_from_files(project_name)
+
+    def _load_transactions_from_files(self, project_name):
+        """قراءة الحركات من ملف Excel والسجل الإلحاقي"""
+        project_file = self.get_project_transactions_file(project_name)
+
+        if os.path.exists(project_file):
+            df = self._read_project_file(project_file)
+        else:
+            df = pd.DataFrame(columns=TRANSACTION_COLUMNS)
+
+        journal_records = self.journal.read(project_name)
+        if not journal_records:
+            return df
+
+        # تجاهل المعاملات التي تم دمجها مسبقاً في ملف Excel
+        # (قد يحدث ذلك إذا انقطع التشغيل بعد حفظ الملف وقبل تفريغ السجل)
+        if 'رقم_المعاملة' in df.columns:
+            saved_ids = set(pd.to_numeric(df['رقم_المعاملة'], errors='coerce').dropna().astype(int))
+            journal_records = [r for r in journal_records if r.get('رقم_المعاملة') not in saved_ids]
+
+        if not journal_records:
+            return df
+
+        journal_df = pd.DataFrame(journal_records)
+        if df.empty:
+            # الحفاظ على ترتيب أعمدة الملف دون دمج DataFrame فارغ
+            columns = list(df.columns) + [c for c in journal_df.columns if c not in df.columns]
+            return journal_df.reindex(columns=columns)
+        return pd.concat([df, journal_df], ignore_index=True)
+
+    def save_transactions(self, project_name, df):
+        """حفظ جميع حركات المشروع في ملف Excel وتفريغ السجل الإلحاقي"""
+        if self.storage_backend is not None:
+            self._ensure_imported(project_name)
+            self.storage_backend.write_table(project_name, 'transactions', df)
+            return
+
+        project_file = self.get_project_transactions_file(project_name)
+        os.makedirs("projects", exist_ok=True)
+
+        with self.lock_project(project_name):
+            self.write_excel_file(project_file, df)
+
+            # جميع معاملات السجل أصبحت الآن في ملف Excel
+            self.journal.truncate(project_name)
+
+            # إعادة بناء جدول الأرصدة من البيانات المحفوظة (قد تكون الكميات تغيرت بالتعديل)
+            self.balances.rebuild(project_name, df)
+            self.lots.rebuild(project_name, df)
+            self.rollups.rebuild(project_name, df)
+
+    def compact_transactions(self, project_name):
+        """دمج السجل الإلحاقي في ملف Excel وإعادة توليده في عملية واحدة"""
+        if self.storage_backend is not None:
+            # لا يوجد سجل إلحاقي عند استخدام واجهة التخزين
+            return True
+        try:
+            # القراءة والحفظ تحت نفس القفل حتى لا تضيع معاملة تضاف أثناء الدمج
+            with self.lock_project(project_name):
+                df = self.load_transactions(project_name)
+                df = self.ensure_columns_compatibility(df)
+                self.save_transactions(project_name, df)
+            return True
+        except Exception as e:
+            print(f"خطأ في دمج سجل المعاملات: {e}")
+            return False
+
+    def _commit_transactions(self, project_name, transactions):
+        """تسجيل المعاملات في السجل الإلحاقي ودمجه عند تجاوز الحجم المحدد"""
+        if self.storage_backend is not None:
+            self._ensure_imported(project_name)
+            with self.lock_project(project_name):
+                self.storage_backend.append_rows(project_name, 'transactions', transactions)
+            return
+
+        with self.lock_project(project_name):
+            # الأرصدة والدفعات والملخصات لا تحفظ هنا: تقرأ المعاملات الجديدة من نهاية السجل
+            # الإلحاقي عند القراءة التالية، وتحفظ لقطاتها عند الدمج
+            self.journal.append(project_name, transactions)
+
+            if self.journal.size(project_name) >= JOURNAL_COMPACTION_BYTES:
+                self.compact_transactions(project_name)
+
     def add_transaction(self, project_name, item_info, operation_type, quantity, receiver_name, notes="", reference_id=None):
         """إضافة حركة جديدة مع رقم تسلسلي"""
         try:
-            project_file = self.create_site_transactions_file(project_name)
-            
-            # قراءة الملف الحالي
-            try:
-                df = pd.read_excel(project_file, engine='openpyxl')
-                # ضمان توافق الأعمدة
-                df = self.ensure_columns_compatibility(df)
-            except:
-                # إذا كان الملف فارغاً
-                df = pd.DataFrame(columns=[
-                    'رقم_المعاملة', 'المشروع', 'التاريخ', 'اسم_العنصر', 'التصنيف', 
-                    'نوع_العملية', 'الكمية', 'اسم_المستلم', 'مدة_الصلاحية_بالأيام', 'ملاحظات', 'رقم_المعاملة_المرجعية'
-                ])
-            
+            self.create_site_transactions_file(project_name)
+
             # توليد رقم المعاملة
             transaction_id = self.generate_transaction_id(project_name)
             
@@ -241,11 +482,8 @@ class ExcelManager:
                 'رقم_المعاملة_المرجعية': reference_id
             }
             
-            # إضافة الصف الجديد
-            df = pd.concat([df, pd.DataFrame([new_transaction])], ignore_index=True)
-            
-            # حفظ الملف
-            df.to_excel(project_file, index=False, engine='openpyxl')
+            # تسجيل الحركة في السجل الإلحاقي (بدون إعادة كتابة ملف Excel)
+            self._commit_transactions(project_name, new_transaction)
             
             return True
             
@@ -253,10 +491,94 @@ class ExcelManager:
             print(f"خطأ في إضافة الحركة: {e}")
             return False
     
+    def add_transactions(self, project_name, rows, check_stock=True):
+        """
+        إضافة مجموعة حركات دفعة واحدة (مثل استلام شحنة من عدة أسطر)
+        كل سطر قاموس يحتوي: item_info, operation_type, quantity, receiver_name
+        واختيارياً: notes, date (datetime أو نص), reference_id
+        يتم التحقق من جميع الأسطر مقابل الرصيد الحالي في تمريرة واحدة، ثم حجز
+        أرقام متتالية وتسجيل جميع الحركات في عملية كتابة واحدة (إما كلها أو لا شيء)
+        """
+        if not rows:
+            return False, "لا توجد حركات لإضافتها"
+
+        try:
+            self.create_site_transactions_file(project_name)
+
+            with self.lock_project(project_name):
+                # الرصيد الحالي لجميع العناصر من جدول الأرصدة (قراءة واحدة)
+                running_stock = {}
+                if check_stock:
+                    summary = self.get_inventory_summary(project_name)
+                    if not summary.empty:
+                        running_stock = dict(zip(summary['اسم_العنصر'], summary['الكمية_الحالية']))
+
+                now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                transactions = []
+                for line_number, row in enumerate(rows, start=1):
+                    item_info = row['item_info']
+                    item_name = item_info.get('اسم العنصر', '')
+                    operation_type = row['operation_type']
+
+                    if operation_type not in OPERATION_SIGNS:
+                        return False, f"السطر {line_number}: نوع عملية غير معروف ({operation_type})"
+
+                    try:
+                        quantity = float(row['quantity'])
+                    except (TypeError, ValueError):
+                        return False, f"السطر {line_number}: كمية غير صحيحة"
+                    if quantity <= 0:
+                        return False, f"السطر {line_number}: يجب أن تكون الكمية أكبر من صفر"
+
+                    if check_stock:
+                        balance = float(running_stock.get(item_name, 0)) + OPERATION_SIGNS[operation_type] * quantity
+                        if balance < 0:
+                            return False, (f"السطر {line_number}: الكمية المطلوبة من '{item_name}' "
+                                           f"أكبر من الرصيد المتاح ({balance + quantity:g})")
+                        running_stock[item_name] = balance
+
+                    shelf_life = item_info.get('مدة الصلاحية (أيام)', None)
+                    if shelf_life is not None and pd.notna(shelf_life):
+                        shelf_life = int(shelf_life)
+                    else:
+                        shelf_life = None
+
+                    transaction_date = row.get('date') or now
+                    if isinstance(transaction_date, datetime):
+                        transaction_date = transaction_date.strftime('%Y-%m-%d %H:%M:%S')
+
+                    transactions.append({
+                        'رقم_المعاملة': None,
+                        'المشروع': project_name,
+                        'التاريخ': transaction_date,
+                        'اسم_العنصر': item_name,
+                        'التصنيف': item_info.get('التصنيف', ''),
+                        'نوع_العملية': operation_type,
+                        'الكمية': quantity,
+                        'اسم_المستلم': row.get('receiver_name', ''),
+                        'مدة_الصلاحية_بالأيام': shelf_life,
+                        'ملاحظات': row.get('notes') or '',
+                        'رقم_المعاملة_المرجعية': row.get('reference_id'),
+                    })
+
+                # حجز نطاق متتالي من الأرقام لجميع الأسطر
+                first_id = self.generate_transaction_id(project_name, count=len(transactions))
+                for offset, transaction in enumerate(transactions):
+                    transaction['رقم_المعاملة'] = first_id + offset
+
+                # تسجيل جميع الحركات في كتابة واحدة
+                self._commit_transactions(project_name, transactions)
+
+            return True, f"تم حفظ {len(transactions)} حركة بنجاح"
+
+        except Exception as e:
+            print(f"خطأ في إضافة الحركات: {e}")
+            return False, f"خطأ في إضافة الحركات: {e}"
+
     def record_transaction(self, project_name, item_name, quantity, operation_type, notes="", custom_date=None, reference_id=None, category=None, item_details=None):
         """تسجيل معاملة مع إمكانية تحديد التاريخ والتصنيف وتفاصيل العنصر"""
         try:
-            project_file = self.create_site_transactions_file(project_name)
+            self.create_site_transactions_file(project_name)
             
             # إذا تم توفير تفاصيل العنصر (مثل عند التعديل)، استخدمها
             if item_details is not None:
@@ -272,17 +594,6 @@ class ExcelManager:
                         'مدة الصلاحية (أيام)': None
                     }
             
-            # قراءة الملف الحالي
-            try:
-                df = pd.read_excel(project_file, engine='openpyxl')
-                # ضمان توافق الأعمدة
-                df = self.ensure_columns_compatibility(df)
-            except:
-                df = pd.DataFrame(columns=[
-                    'رقم_المعاملة', 'المشروع', 'التاريخ', 'اسم_العنصر', 'التصنيف', 
-                    'نوع_العملية', 'الكمية', 'اسم_المستلم', 'مدة_الصلاحية_بالأيام', 'ملاحظات', 'رقم_المعاملة_المرجعية'
-                ])
-            
             # تحديد التاريخ
             transaction_date = custom_date if custom_date else datetime.now()
             if isinstance(transaction_date, str):
@@ -318,11 +629,8 @@ class ExcelManager:
                 'رقم_المعاملة_المرجعية': reference_id
             }
             
-            # إضافة الصف الجديد
-            df = pd.concat([df, pd.DataFrame([new_transaction])], ignore_index=True)
-            
-            # حفظ الملف
-            df.to_excel(project_file, index=False, engine='openpyxl')
+            # تسجيل المعاملة في السجل الإلحاقي (بدون إعادة كتابة ملف Excel)
+            self._commit_transactions(project_name, new_transaction)
             
             return True
             
@@ -331,52 +639,199 @@ class ExcelManager:
             return False
     
     def get_inventory_summary(self, project_name):
-        """الحصول على ملخص المخزون الحالي"""
+        """الحصول على ملخص المخزون الحالي من جدول الأرصدة المحفوظ"""
         try:
-            project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
-            
-            if not os.path.exists(project_file):
-                return pd.DataFrame()
-            
-            df = pd.read_excel(project_file, engine='openpyxl')
-            
-            if df.empty:
-                return pd.DataFrame()
-            
-            # حساب المخزون لكل عنصر
-            inventory = []
-            
-            for item_name in df['اسم_العنصر'].unique():
-                item_data = df[df['اسم_العنصر'] == item_name]
-                
-                # حساب الداخل والخارج والتعديلات
-                incoming = item_data[item_data['نوع_العملية'] == 'دخول']['الكمية'].sum()
-                outgoing = item_data[item_data['نوع_العملية'] == 'خروج']['الكمية'].sum()
-                
-                # إضافة عمليات التعديل
-                modifications_increase = item_data[item_data['نوع_العملية'] == 'تعديل زيادة']['الكمية'].sum()
-                modifications_decrease = item_data[item_data['نوع_العملية'] == 'تعديل نقص']['الكمية'].sum()
-                
-                current_stock = incoming - outgoing + modifications_increase - modifications_decrease
-                
-                # الحصول على آخر معلومات للعنصر
-                last_entry = item_data.iloc[-1]
-                
-                inventory.append({
-                    'اسم_العنصر': item_name,
-                    'التصنيف': last_entry['التصنيف'],
-                    'الكمية_الحالية': current_stock,
-                    'إجمالي_الداخل': incoming,
-                    'إجمالي_الخارج': outgoing,
-                    'مدة_الصلاحية_بالأيام': last_entry['مدة_الصلاحية_بالأيام']
-                })
-            
-            return pd.DataFrame(inventory)
+            if self.storage_backend is not None:
+                self._ensure_imported(project_name)
+                return self.storage_backend.get_inventory_summary(project_name)
+            return self.balances.get_summary(project_name, self.load_transactions)
             
         except Exception as e:
             print(f"خطأ في حساب المخزون: {e}")
             return pd.DataFrame()
     
+    def get_item_stock(self, project_name, item_name):
+        """الحصول على الرصيد الحالي لعنصر واحد من جدول الأرصدة المحفوظ"""
+        try:
+            if self.storage_backend is not None:
+                self._ensure_imported(project_name)
+                return self.storage_backend.get_item_balance(project_name, item_name)
+            return self.balances.get_item_balance(project_name, item_name, self.load_transactions)
+        except Exception as e:
+            print(f"خطأ في حساب رصيد العنصر: {e}")
+            return 0
+    
+    def get_lot_state(self, project_name):
+        """الدفعات المفتوحة للمشروع (FIFO) من محرك الدفعات"""
+        if self.storage_backend is not None:
+            # لا توجد ملفات حركات لمتابعة تغيرها - تبنى الدفعات من قاعدة البيانات مباشرة
+            return build_lot_state(self.load_transactions(project_name))
+        return self.lots.get_state(project_name, self.load_transactions)
+    
+    def get_report_rollups(self, project_name):
+        """ملخصات الحركات اليومية (يوم × عنصر × تصنيف × نوع عملية) لتقارير التحليل"""
+        try:
+            if self.storage_backend is not None:
+                # لا توجد ملفات حركات لمتابعة تغيرها - تبنى الملخصات من قاعدة البيانات مباشرة
+                return build_rollups(self.load_transactions(project_name))
+            return self.rollups.get_frame(project_name, self.load_transactions)
+        except Exception as e:
+            print(f"خطأ في قراءة ملخصات الحركات: {e}")
+            return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    
+    def get_data_version(self, project_name):
+        """
+        بصمة بيانات المشروع (العناصر والحركات والتعديلات وإعدادات المشروع)
+        تتغير مع أي معاملة جديدة في المشروع، وتعيد None إذا تعذر حسابها
+        """
+        try:
+            digest = hashlib.sha1()
+            # إعدادات المشروع تغير التنبيهات في التقارير (عتبة المخزون ومدة الصلاحية)
+            settings_file = os.path.join("projects", f"{project_name}_settings.json")
+            digest.update(repr(self._get_file_signature(settings_file)).encode('utf-8'))
+            if self.storage_backend is not None:
+                # رقم إصدار المشروع في قاعدة البيانات بدلاً من قراءة جداوله
+                version = self.storage_backend.get_data_version(project_name)
+                if version is None:
+                    # لم يستورد المشروع بعد - سيستورد عند إنشاء التقرير فتتغير البصمة
+                    return None
+                digest.update(repr(version).encode('utf-8'))
+            else:
+                # ملف العناصر ينشأ فارغاً عند أول قراءة، فيعامل الملف الفارغ كأنه غير موجود
+                # حتى لا تتغير البصمة أثناء إنشاء التقرير
+                items_file = self.get_project_items_file(project_name)
+                if os.path.exists(items_file) and not self._read_project_file(items_file).empty:
+                    digest.update(repr(self._get_file_signature(items_file)).encode('utf-8'))
+                for file_path in (self.get_project_transactions_file(project_name),
+                                  self.journal.get_journal_file(project_name),
+                                  self.get_project_modifications_file(project_name)):
+                    digest.update(repr(self._get_file_signature(file_path)).encode('utf-8'))
+            return digest.hexdigest()
+        except Exception as e:
+            print(f"خطأ في حساب بصمة بيانات المشروع: {e}")
+            return None
+    
+    @staticmethod
+    def _get_file_signature(file_path):
+        """(المسار، وقت التعديل، الحجم) أو (المسار، None) إذا لم يوجد الملف"""
+        try:
+            stat = os.stat(file_path)
+            return (file_path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return (file_path, None)
+    
+    def get_expiring_lots(self, project_name, days):
+        """الدفعات المفتوحة التي تنتهي صلاحيتها خلال days يوم (الأقرب انتهاءً أولاً)"""
+        try:
+            return self.get_lot_state(project_name).get_expiring_lots(days)
+        except Exception as e:
+            print(f"خطأ في قراءة دفعات الصلاحية: {e}")
+            return []
+    
+    def get_low_stock_items(self, project_name, threshold):
+        """العناصر التي مجموع دفعاتها المفتوحة لا يتجاوز threshold (الأقل كمية أولاً)"""
+        try:
+            return self.get_lot_state(project_name).get_low_stock_items(threshold)
+        except Exception as e:
+            print(f"خطأ في حساب المخزون المنخفض: {e}")
+            return []
+    
+    def rebuild_stock_balances(self, project_name):
+        """إعادة بناء جدول الأرصدة بالكامل من جميع الحركات"""
+        if self.storage_backend is not None:
+            # الأرصدة تحسب مباشرة من قاعدة البيانات
+            return True
+        try:
+            # القراءة وإعادة البناء تحت قفل المشروع حتى لا تضيع معاملة تسجل أثناء القراءة
+            with self.lock_project(project_name):
+                df = self.load_transactions(project_name)
+                self.balances.rebuild(project_name, df)
+                self.lots.rebuild(project_name, df)
+                self.rollups.rebuild(project_name, df)
+            return True
+        except Exception as e:
+            print(f"خطأ في إعادة بناء جدول الأرصدة: {e}")
+            return False
+    
+    def get_transactions_in_range(self, project_name, start_date=None, end_date=None):
+        """
+        حركات المشروع في فترة زمنية (شاملة الحدين)
+        إذا كان الحد تاريخاً بدون وقت يتم اعتبار اليوم كاملاً
+        """
+        if isinstance(start_date, date) and not isinstance(start_date, datetime):
+            start_date = datetime.combine(start_date, time.min)
+        if isinstance(end_date, date) and not isinstance(end_date, datetime):
+            end_date = datetime.combine(end_date, time(23, 59, 59))
+
+        try:
+            if self.storage_backend is not None:
+                self._ensure_imported(project_name)
+                return self.storage_backend.get_transactions_in_range(project_name, start_date, end_date)
+
+            df = self.load_transactions(project_name)
+            if df.empty:
+                return df
+
+            dates = pd.to_datetime(df['التاريخ'], errors='coerce')
+            mask = dates.notna()
+            if start_date is not None:
+                mask &= dates >= pd.to_datetime(start_date)
+            if end_date is not None:
+                mask &= dates <= pd.to_datetime(end_date)
+            return df[mask]
+
+        except Exception as e:
+            print(f"خطأ في قراءة حركات الفترة: {e}")
+            return pd.DataFrame()
+    
+    def get_project_modifications_file(self, project_name):
+        """الحصول على مسار ملف تعديلات المشروع"""
+        return os.path.join("projects", f"{project_name}_Modifications.xlsx")
+    
+    def get_modification_counts(self, project_name, transactions=None):
+        """
+        فهرس عدد مرات تعديل كل معاملة {رقم المعاملة: عدد التعديلات} بقراءة واحدة لملف التعديلات
+        سجلات التعديل القديمة (بدون رقم المعاملة الأصلية) تُطابق مع transactions حسب
+        يوم المعاملة واسم العنصر والكمية الأصلية
+        """
+        try:
+            modifications_file = self.get_project_modifications_file(project_name)
+            if not os.path.exists(modifications_file):
+                return {}
+
+            modifications = self.read_excel_file(modifications_file)
+            if modifications.empty:
+                return {}
+
+            if 'رقم_المعاملة_الأصلية' in modifications.columns:
+                ids = modifications['رقم_المعاملة_الأصلية'].map(normalize_transaction_id)
+            else:
+                ids = pd.Series(None, index=modifications.index, dtype=object)
+
+            legacy = modifications[ids.isna()]
+            if not legacy.empty and transactions is not None and not transactions.empty:
+                # مفتاح المطابقة لكل معاملة (أول معاملة مطابقة كما في الطريقة القديمة)
+                keys = (
+                    pd.to_datetime(transactions['التاريخ'], errors='coerce').dt.strftime('%Y-%m-%d')
+                    + '_' + transactions['اسم_العنصر'].astype(str)
+                    + '_' + pd.to_numeric(transactions['الكمية'], errors='coerce').fillna(0).astype(int).astype(str)
+                )
+                id_by_key = dict(zip(keys[::-1], transactions['رقم_المعاملة'][::-1]))
+
+                legacy_keys = (
+                    legacy['تاريخ_المعاملة_الأصلية'].astype(str).str[:10]
+                    + '_' + legacy['اسم_العنصر'].astype(str)
+                    + '_' + pd.to_numeric(legacy['الكمية_الأصلية'], errors='coerce').fillna(0).astype(int).astype(str)
+                )
+                ids = ids.copy()
+                ids[legacy.index] = legacy_keys.map(id_by_key).map(normalize_transaction_id)
+
+            return ids.dropna().value_counts().to_dict()
+
+        except Exception as e:
+            print(f"خطأ في قراءة سجل التعديلات: {e}")
+            return {}
+    
     def get_all_projects(self):
         """الحصول على قائمة بجميع المشاريع"""
         try:
@@ -402,7 +857,7 @@ class ExcelManager:
             if not os.path.exists(items_file):
                 return 1
             
-            df = pd.read_excel(items_file, engine='openpyxl')
+            df = self.read_excel_file(items_file)
             if df.empty:
                 return 1
             return df['Item_ID'].max() + 1
@@ -420,28 +875,30 @@ class ExcelManager:
                 if not os.path.exists(items_file):
                     os.makedirs(self.base_path, exist_ok=True)
             
-            # قراءة الملف الحالي
-            if os.path.exists(items_file):
-                df = pd.read_excel(items_file, engine='openpyxl')
-            else:
-                df = pd.DataFrame(columns=['Item_ID', 'اسم_العنصر', 'التصنيف', 'مدة_الصلاحية_بالأيام', 'وصف'])
-            
-            # الحصول على الرقم التسلسلي التالي
-            new_id = self.get_next_item_id(project_name)
-            
-            # إضافة العنصر الجديد
-            new_item = {
-                'Item_ID': new_id,
-                'اسم_العنصر': item_name,
-                'التصنيف': category,
-                'مدة_الصلاحية_بالأيام': shelf_life if shelf_life else None,
-                'وصف': description
-            }
-            
-            df = pd.concat([df, pd.DataFrame([new_item])], ignore_index=True)
-            
-            # حفظ الملف
-            df.to_excel(items_file, index=False, engine='openpyxl')
+            # القراءة وتوليد الرقم والحفظ تحت قفل واحد حتى لا يتكرر رقم العنصر
+            with self.lock_file(items_file):
+                # قراءة الملف الحالي
+                if os.path.exists(items_file):
+                    df = self.read_excel_file(items_file)
+                else:
+                    df = pd.DataFrame(columns=['Item_ID', 'اسم_العنصر', 'التصنيف', 'مدة_الصلاحية_بالأيام', 'وصف'])
+                
+                # الحصول على الرقم التسلسلي التالي
+                new_id = self.get_next_item_id(project_name)
+                
+                # إضافة العنصر الجديد
+                new_item = {
+                    'Item_ID': new_id,
+                    'اسم_العنصر': item_name,
+                    'التصنيف': category,
+                    'مدة_الصلاحية_بالأيام': shelf_life if shelf_life else None,
+                    'وصف': description
+                }
+                
+                df = pd.concat([df, pd.DataFrame([new_item])], ignore_index=True)
+                
+                # حفظ الملف
+                self.write_excel_file(items_file, df)
             
             return new_id
             
@@ -462,7 +919,7 @@ class ExcelManager:
                 if not os.path.exists(items_file):
                     self.create_master_items_file()
             
-            df = pd.read_excel(items_file, engine='openpyxl')
+            df = self.read_excel_file(items_file)
             
             # استخراج التصنيفات الفريدة (بدون القيم الفارغة)
             categories = df['التصنيف'].dropna().unique().tolist()
@@ -489,7 +946,7 @@ class ExcelManager:
                 if not os.path.exists(items_file):
                     self.create_master_items_file()
             
-            df = pd.read_excel(items_file, engine='openpyxl')
+            df = self.read_excel_file(items_file)
             
             # تصفية العناصر حسب التصنيف
             filtered_items = df[df['التصنيف'] == category]
@@ -513,7 +970,7 @@ class ExcelManager:
                 if not os.path.exists(items_file):
                     self.create_master_items_file()
             
-            df = pd.read_excel(items_file, engine='openpyxl')
+            df = self.read_excel_file(items_file)
             return df
             
         except Exception as e:
@@ -530,4 +987,4 @@ class ExcelManager:
 
 
 # إنشاء instance للاستخدام
-excel_manager = ExcelManager()
\ No newline at end of file
+excel_manager = ExcelManager(storage_backend=load_storage_backend())
\ No newline at end of file
@@ -592,10 +592,11 @@ class ItemsManager(QDialog):
             try:
                 # حذف من ملف العناصر الخاص بالمشروع
                 items_file = excel_manager.get_project_items_file(self.project_name)
-                if os.path.exists(items_file):
-                    df = pd.read_excel(items_file, engine='openpyxl')
-                    df = df[df['Item_ID'] != item_id]
-                    df.to_excel(items_file, index=False, engine='openpyxl')
+                with excel_manager.lock_project(self.project_name):
+                    if os.path.exists(items_file):
+                        df = excel_manager.read_excel_file(items_file)
+                        df = df[df['Item_ID'] != item_id]
+                        excel_manager.write_excel_file(items_file, df)
                 
                 QMessageBox.information(self, "نجح", f"تم حذف العنصر '{item_name}' من هذا المشروع بنجاح")
                 
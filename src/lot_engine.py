@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+محرك الدفعات (Lots) لكل مشروع
+كل حركة دخول تنشئ دفعة، وحركات الخروج تستهلك الدفعات المفتوحة بترتيب FIFO
+(الأقدم دخولاً أولاً)، ويحفظ المحرك الدفعات المفتوحة فقط مع الكمية المتبقية في كل منها.
+تنبيهات انتهاء الصلاحية والمخزون المنخفض تعتمد على الدفعات المفتوحة فقط، لذلك لا تظهر
+دفعات صرفت بالكامل مهما طال سجل الحركات.
+
+يتم بناء الحالة من جميع الحركات في تمريرة واحدة، ثم تحديثها بالمعاملات الجديدة من السجل الإلحاقي.
+الدفعات المفتوحة ذات الصلاحية محفوظة أيضاً في قائمة مرتبة حسب تاريخ الانتهاء
+بحيث يصبح سؤال "ما الذي ينتهي خلال N يوم" بحثاً ثنائياً (bisect)
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from stock_balances import DerivedTable, _clean_value, _to_number
+from stock_calculator import OPERATION_SIGNS
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# مواضع حقول الدفعة: [رقم المعاملة، تاريخ الدخول، تاريخ الانتهاء أو None، الكمية المتبقية، الكمية الأصلية]
+LOT_ID, LOT_ENTRY, LOT_EXPIRY, LOT_REMAINING, LOT_QUANTITY = range(5)
+
+# دقة تقريب الكميات العشرية حتى لا تبقى دفعة مفتوحة بسبب أخطاء الفاصلة العائمة
+QUANTITY_DECIMALS = 6
+
+
+def _parse_date(value):
+    """تحويل تاريخ المعاملة إلى datetime (None للقيم غير الصالحة)"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value), DATE_FORMAT)
+    except (TypeError, ValueError):
+        parsed = pd.to_datetime(value, errors='coerce')
+        return None if pd.isna(parsed) else parsed.to_pydatetime()
+
+
+def _lot_dates(record):
+    """(تاريخ الدخول، تاريخ الانتهاء) كنصوص لحركة واحدة"""
+    entry_date = _parse_date(record.get('التاريخ'))
+    if entry_date is None:
+        return None, None
+    shelf_life = _to_number(record.get('مدة_الصلاحية_بالأيام'))
+    expiry = None
+    if shelf_life > 0:
+        expiry = (entry_date + timedelta(days=int(shelf_life))).strftime(DATE_FORMAT)
+    return entry_date.strftime(DATE_FORMAT), expiry
+
+
+def _expiry_key(entry):
+    """مفتاح ترتيب قائمة الصلاحية (تاريخ الانتهاء)"""
+    return entry[0]
+
+
+class LotState:
+    """الدفعات المفتوحة لمشروع واحد مع قائمة الصلاحية المرتبة"""
+
+    def __init__(self, items=None):
+        # اسم العنصر -> {'lots': الدفعات المفتوحة بترتيب الدخول، 'shortfall': خروج لم تغطه أي دفعة}
+        self.items = items if items is not None else {}
+        # (تاريخ الانتهاء، اسم العنصر، الدفعة) للدفعات المفتوحة ذات الصلاحية
+        self.expiry_list = sorted(
+            ((lot[LOT_EXPIRY], item_name, lot)
+             for item_name, item in self.items.items()
+             for lot in item['lots'] if lot[LOT_EXPIRY]),
+            key=_expiry_key,
+        )
+        # تواريخ الانتهاء وحدها بنفس الترتيب للبحث الثنائي
+        # (معامل key في bisect غير متوفر قبل Python 3.10)
+        self.expiry_keys = [entry[0] for entry in self.expiry_list]
+
+    def _get_item(self, item_name):
+        item = self.items.get(item_name)
+        if item is None:
+            item = {'lots': [], 'shortfall': 0}
+            self.items[item_name] = item
+        return item
+
+    def _remove_from_expiry_list(self, lot):
+        """حذف دفعة مغلقة من قائمة الصلاحية"""
+        position = bisect_left(self.expiry_keys, lot[LOT_EXPIRY])
+        while position < len(self.expiry_list) and self.expiry_keys[position] == lot[LOT_EXPIRY]:
+            if self.expiry_list[position][2] is lot:
+                del self.expiry_list[position]
+                del self.expiry_keys[position]
+                return
+            position += 1
+
+    def apply(self, item_name, operation_type, quantity, transaction_id, entry_date, expiry):
+        """تطبيق حركة واحدة على دفعات العنصر"""
+        sign = OPERATION_SIGNS.get(operation_type)
+        if not item_name or not sign or quantity <= 0:
+            return
+
+        item = self._get_item(item_name)
+        if sign > 0:
+            # الدخول يغطي أولاً أي خروج سابق تجاوز الرصيد
+            covered = min(item['shortfall'], quantity)
+            item['shortfall'] = round(item['shortfall'] - covered, QUANTITY_DECIMALS)
+            remaining = round(quantity - covered, QUANTITY_DECIMALS)
+            if remaining > 0:
+                lot = [transaction_id, entry_date, expiry, remaining, quantity]
+                item['lots'].append(lot)
+                if expiry:
+                    position = bisect_right(self.expiry_keys, expiry)
+                    self.expiry_keys.insert(position, expiry)
+                    self.expiry_list.insert(position, (expiry, item_name, lot))
+            return
+
+        # الخروج يستهلك الدفعات المفتوحة بترتيب FIFO
+        lots = item['lots']
+        while quantity > 0 and lots:
+            lot = lots[0]
+            taken = min(lot[LOT_REMAINING], quantity)
+            lot[LOT_REMAINING] = round(lot[LOT_REMAINING] - taken, QUANTITY_DECIMALS)
+            quantity = round(quantity - taken, QUANTITY_DECIMALS)
+            if lot[LOT_REMAINING] <= 0:
+                lots.pop(0)
+                if lot[LOT_EXPIRY]:
+                    self._remove_from_expiry_list(lot)
+        if quantity > 0:
+            item['shortfall'] = round(item['shortfall'] + quantity, QUANTITY_DECIMALS)
+
+    def apply_record(self, record):
+        """تطبيق معاملة محفوظة (قاموس بأعمدة ملف الحركات)"""
+        entry_date, expiry = _lot_dates(record)
+        self.apply(
+            _clean_value(record.get('اسم_العنصر')),
+            record.get('نوع_العملية'),
+            _to_number(record.get('الكمية')),
+            _clean_value(record.get('رقم_المعاملة')),
+            entry_date,
+            expiry,
+        )
+
+    def get_open_quantity(self, item_name):
+        """مجموع الكميات المتبقية في الدفعات المفتوحة لعنصر"""
+        item = self.items.get(item_name)
+        if item is None:
+            return 0
+        return round(sum(lot[LOT_REMAINING] for lot in item['lots']), QUANTITY_DECIMALS)
+
+    def get_expiring_lots(self, days, now=None):
+        """
+        الدفعات المفتوحة التي تنتهي صلاحيتها خلال days يوم (الأقرب انتهاءً أولاً)
+        الأيام المتبقية = (تاريخ الانتهاء - الآن) بالأيام الكاملة، والمطلوب 0 <= المتبقي <= days
+        """
+        now = now or datetime.now()
+        start = now.strftime(DATE_FORMAT)
+        end = (now + timedelta(days=int(days) + 1)).strftime(DATE_FORMAT)
+
+        first = bisect_left(self.expiry_keys, start)
+        last = bisect_right(self.expiry_keys, end, lo=first)
+
+        result = []
+        for expiry, item_name, lot in self.expiry_list[first:last]:
+            expiry_date = datetime.strptime(expiry, DATE_FORMAT)
+            days_remaining = (expiry_date - now).days
+            if not 0 <= days_remaining <= days:
+                # الحدود بدقة الثانية قد تشمل دفعة على بعد أجزاء من الثانية خارج الفترة
+                continue
+            result.append({
+                'item_name': item_name,
+                'quantity': lot[LOT_REMAINING],
+                'original_quantity': lot[LOT_QUANTITY],
+                'entry_date': lot[LOT_ENTRY],
+                'expiry_date': expiry,
+                'days_remaining': days_remaining,
+                'transaction_id': lot[LOT_ID],
+            })
+        return result
+
+    def get_low_stock_items(self, threshold):
+        """العناصر التي مجموع دفعاتها المفتوحة لا يتجاوز threshold (الأقل كمية أولاً)"""
+        result = []
+        for item_name in self.items:
+            quantity = self.get_open_quantity(item_name)
+            if quantity <= threshold:
+                result.append({'item_name': item_name, 'quantity': quantity})
+        result.sort(key=lambda item: item['quantity'])
+        return result
+
+
+def build_lot_state(transactions_df):
+    """بناء الدفعات المفتوحة من جميع الحركات في تمريرة واحدة بترتيب الملف"""
+    state = LotState()
+    required = ('اسم_العنصر', 'نوع_العملية', 'الكمية', 'التاريخ')
+    if transactions_df.empty or any(column not in transactions_df.columns for column in required):
+        return state
+
+    # تحويل التواريخ والكميات دفعة واحدة قبل المرور على الحركات
+    entry_dates = pd.to_datetime(transactions_df['التاريخ'], errors='coerce')
+    if 'مدة_الصلاحية_بالأيام' in transactions_df.columns:
+        shelf_life = pd.to_numeric(transactions_df['مدة_الصلاحية_بالأيام'], errors='coerce')
+    else:
+        shelf_life = pd.Series(float('nan'), index=transactions_df.index)
+    expiry_dates = entry_dates + pd.to_timedelta(shelf_life.where(shelf_life > 0).fillna(0).astype(int), unit='D')
+    entry_text = entry_dates.dt.strftime(DATE_FORMAT)
+    expiry_text = expiry_dates.dt.strftime(DATE_FORMAT).where(shelf_life > 0)
+    quantities = pd.to_numeric(transactions_df['الكمية'], errors='coerce').fillna(0)
+    if 'رقم_المعاملة' in transactions_df.columns:
+        transaction_ids = transactions_df['رقم_المعاملة']
+    else:
+        transaction_ids = pd.Series(None, index=transactions_df.index, dtype=object)
+
+    rows = zip(transactions_df['اسم_العنصر'], transactions_df['نوع_العملية'], quantities,
+               transaction_ids, entry_text, expiry_text)
+    for item_name, operation_type, quantity, transaction_id, entry_date, expiry in rows:
+        state.apply(
+            _clean_value(item_name),
+            operation_type,
+            _to_number(quantity),
+            _clean_value(transaction_id),
+            _clean_value(entry_date),
+            _clean_value(expiry),
+        )
+    return state
+
+
+class LotEngine(DerivedTable):
+    """الدفعات المفتوحة المحفوظة في projects/<name>_Lots.json"""
+
+    file_suffix = "_Lots.json"
+    label = "الدفعات"
+
+    def get_lots_file(self, project_name):
+        """الحصول على مسار ملف الدفعات الخاص بالمشروع"""
+        return self.get_state_file(project_name)
+
+    def _state_to_json(self, state):
+        return {'items': state.items}
+
+    def _state_from_json(self, data):
+        return LotState(data['items'])
+
+    def _apply_record(self, state, record):
+        state.apply_record(record)
+
+    def _build_state(self, transactions_df):
+        return build_lot_state(transactions_df)
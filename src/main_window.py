@@ -13,6 +13,7 @@ from PyQt6.QtGui import QFont, QIcon, QPalette, QColor
 from datetime import datetime
 from excel_manager import excel_manager
 from report_manager import ReportManager
+from alerts_worker import AlertsService
 
 
 class MainWindow(QMainWindow):
@@ -27,8 +28,13 @@ class MainWindow(QMainWindow):
         self.setup_ui()
         self.setup_styles()
         
-        # تحديث فوري للتنبيهات بعد تهيئة الواجهة
-        QTimer.singleShot(100, self.update_project_info)
+        # حساب التنبيهات في الخلفية مع عرض آخر أعداد محفوظة فوراً
+        self.alerts_service = AlertsService(self.project_name, self)
+        self.alerts_service.counts_ready.connect(self.show_alert_counts)
+        cached_counts = self.alerts_service.get_cached_counts()
+        if cached_counts is not None:
+            self.show_alert_counts(cached_counts)
+        self.alerts_service.start()
         
         # تحديث الوقت كل ثانية
         self.timer = QTimer()
@@ -476,51 +482,20 @@ class MainWindow(QMainWindow):
     def update_project_info(self):
         """تحديث معلومات التنبيهات"""
         try:
-            # تحديث معلومات التنبيهات فقط (بدون إنشاء بيانات تجريبية تلقائية)
+            # الحساب يتم في الخلفية والنتيجة تصل إلى show_alert_counts
             self.update_alerts_info()
         except Exception as e:
             print(f"خطأ في تحديث التنبيهات: {e}")
     
     def update_alerts_info(self):
+        """طلب إعادة حساب التنبيهات (الطلبات المتتالية تدمج في حساب واحد)"""
+        self.alerts_service.request_update()
+    
+    def show_alert_counts(self, counts):
         """تحديث معلومات التنبيهات في الأزرار"""
         try:
-            from excel_manager import excel_manager
-            import pandas as pd
-            import os
-            from datetime import datetime, timedelta
-            
-            # حساب عدد المواد ذات المخزون المنخفض
-            low_stock_count = 0
-            try:
-                inventory_df = excel_manager.get_inventory_summary(self.project_name)
-                if not inventory_df.empty:
-                    for _, item in inventory_df.iterrows():
-                        current_qty = item.get('الكمية_الحالية', 0)
-                        if current_qty <= 10 and current_qty > 0:
-                            low_stock_count += 1
-            except:
-                pass
-            
-            # حساب عدد المواد قاربة انتهاء الصلاحية
-            expiry_count = 0
-            try:
-                project_file = os.path.join("projects", f"{self.project_name}_Transactions.xlsx")
-                if os.path.exists(project_file):
-                    transactions_df = pd.read_excel(project_file, engine='openpyxl')
-                    if not transactions_df.empty:
-                        incoming_transactions = transactions_df[transactions_df['نوع_العملية'] == 'دخول'].copy()
-                        if not incoming_transactions.empty:
-                            incoming_transactions['التاريخ'] = pd.to_datetime(incoming_transactions['التاريخ'])
-                            for _, transaction in incoming_transactions.iterrows():
-                                shelf_life_days = transaction.get('مدة_الصلاحية_بالأيام')
-                                if pd.notna(shelf_life_days) and shelf_life_days > 0:
-                                    entry_date = transaction['التاريخ']
-                                    expiry_date = entry_date + timedelta(days=int(shelf_life_days))
-                                    days_remaining = (expiry_date - datetime.now()).days
-                                    if days_remaining <= 10 and days_remaining >= 0:
-                                        expiry_count += 1
-            except:
-                pass
+            low_stock_count = counts.get('low_stock', 0)
+            expiry_count = counts.get('expiry', 0)
             
             # تحديث نص المعلومات
             if low_stock_count > 0:
@@ -540,6 +515,18 @@ class MainWindow(QMainWindow):
         except Exception as e:
             print(f"خطأ في تحديث معلومات التنبيهات: {e}")
     
+    def get_expiry_threshold_days(self):
+        """عدد أيام تنبيه انتهاء الصلاحية من إعدادات المشروع"""
+        from project_settings import ProjectSettingsDialog
+        settings = ProjectSettingsDialog.get_project_settings(self.project_name)
+        return settings.get('expiry_threshold_days', 30)
+    
+    def get_low_stock_threshold(self):
+        """عتبة المخزون المنخفض من إعدادات المشروع"""
+        from project_settings import ProjectSettingsDialog
+        settings = ProjectSettingsDialog.get_project_settings(self.project_name)
+        return settings.get('low_stock_threshold', 10)
+    
     def show_low_stock_alerts(self):
         """عرض نافذة المخزون المنخفض"""
         try:
@@ -698,20 +685,17 @@ class MainWindow(QMainWindow):
             from PyQt6.QtGui import QColor
             from PyQt6.QtWidgets import QTableWidgetItem
 
-            inventory_df = excel_manager.get_inventory_summary(self.project_name)
             low_stock_items = []
+            min_qty = self.get_low_stock_threshold()
 
-            if not inventory_df.empty:
-                for _, item in inventory_df.iterrows():
-                    current_qty = item.get('الكمية_الحالية', 0)
-                    min_qty = 10
-
-                    if current_qty <= min_qty and current_qty > 0:
-                        low_stock_items.append({
-                            'item_name': item.get('اسم_العنصر', '').strip(),
-                            'current_qty': current_qty,
-                            'min_qty': min_qty
-                        })
+            # العناصر ذات الكمية المنخفضة في الدفعات المفتوحة
+            for item in excel_manager.get_low_stock_items(self.project_name, min_qty):
+                if item['quantity'] > 0:
+                    low_stock_items.append({
+                        'item_name': str(item['item_name']).strip(),
+                        'current_qty': item['quantity'],
+                        'min_qty': min_qty
+                    })
 
             # لا نضيف بيانات تجريبية - نعتمد على البيانات الحقيقية فقط
 
@@ -753,9 +737,7 @@ class MainWindow(QMainWindow):
     def populate_expiry_table(self, table):
         """ملء جدول انتهاء الصلاحية"""
         try:
-            import pandas as pd
             import os
-            from datetime import datetime, timedelta
             from PyQt6.QtGui import QColor
             from PyQt6.QtWidgets import QTableWidgetItem
 
@@ -763,28 +745,14 @@ class MainWindow(QMainWindow):
 
             project_file = os.path.join("projects", f"{self.project_name}_Transactions.xlsx")
             if os.path.exists(project_file):
-                transactions_df = pd.read_excel(project_file, engine='openpyxl')
-
-                if not transactions_df.empty:
-                    incoming_transactions = transactions_df[transactions_df['نوع_العملية'] == 'دخول'].copy()
-                    incoming_transactions['التاريخ'] = pd.to_datetime(incoming_transactions['التاريخ'])
-
-                    for _, transaction in incoming_transactions.iterrows():
-                        shelf_life_days = transaction.get('مدة_الصلاحية_بالأيام')
-                        item_name = transaction.get('اسم_العنصر', '').strip()
-
-                        if pd.notna(shelf_life_days) and shelf_life_days > 0 and item_name:
-                            entry_date = transaction['التاريخ']
-                            expiry_date = entry_date + timedelta(days=int(shelf_life_days))
-                            days_remaining = (expiry_date - datetime.now()).days
-
-                            if 0 <= days_remaining <= 10:
-                                expiry_items.append({
-                                    'item_name': item_name,
-                                    'quantity': int(float(transaction['الكمية'])),
-                                    'entry_date': entry_date.strftime('%Y-%m-%d'),
-                                    'days_remaining': days_remaining
-                                })
+                # الدفعات القريبة من الانتهاء من فهرس الصلاحية (مرتبة حسب تاريخ الانتهاء)
+                for lot in excel_manager.get_expiring_lots(self.project_name, self.get_expiry_threshold_days()):
+                    expiry_items.append({
+                        'item_name': str(lot['item_name']).strip(),
+                        'quantity': int(float(lot['quantity'])),
+                        'entry_date': lot['entry_date'][:10],
+                        'days_remaining': lot['days_remaining']
+                    })
 
             # لا نضيف بيانات تجريبية - نعتمد على البيانات الحقيقية فقط
 
@@ -897,6 +865,9 @@ class MainWindow(QMainWindow):
             # إضافة حركات تجريبية
             start_date = datetime.now() - timedelta(days=30)  # 30 يوم ماضية
             
+            # تجميع الحركات ثم حفظها دفعة واحدة بدلاً من كتابة الملف لكل حركة
+            rows = []
+            
             # حركات الدخول
             for i in range(15):  # 15 حركة دخول
                 random_days = random.randint(0, 30)
@@ -912,7 +883,10 @@ class MainWindow(QMainWindow):
                 notes = f"حركة تجريبية - دخول {i+1}"
                 
                 # إضافة الحركة مع تاريخ مخصص
-                self._add_transaction_with_date(item_info, 'دخول', quantity, '', notes, transaction_date)
+                rows.append({
+                    'item_info': item_info, 'operation_type': 'دخول', 'quantity': quantity,
+                    'receiver_name': '', 'notes': notes, 'date': transaction_date
+                })
             
             # حركات الخروج
             for i in range(8):  # 8 حركة خروج
@@ -929,47 +903,24 @@ class MainWindow(QMainWindow):
                 receiver = random.choice(['محمد أحمد', 'علي حسن', 'فاطمة سعد', 'أحمد علي'])
                 notes = f"حركة تجريبية - خروج {i+1}"
                 
-                self._add_transaction_with_date(item_info, 'خروج', quantity, receiver, notes, transaction_date)
+                rows.append({
+                    'item_info': item_info, 'operation_type': 'خروج', 'quantity': quantity,
+                    'receiver_name': receiver, 'notes': notes, 'date': transaction_date
+                })
+            
+            # ترتيب الحركات حسب التاريخ وحفظها في عملية كتابة واحدة
+            # (البيانات عشوائية لذلك لا يتم التحقق من الرصيد كما في السابق)
+            rows.sort(key=lambda row: row['date'])
+            success, message = excel_manager.add_transactions(self.project_name, rows, check_stock=False)
+            if not success:
+                QMessageBox.warning(self, "خطأ", message)
+                return
             
             QMessageBox.information(self, "نجح", "تم تحميل البيانات التجريبية بنجاح!\nتم إضافة 6 عناصر و 23 حركة")
             
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"خطأ في تحميل البيانات: {str(e)}")
     
-    def _add_transaction_with_date(self, item_info, transaction_type, quantity, receiver, notes, custom_date):
-        """إضافة حركة مع تاريخ مخصص"""
-        try:
-            import pandas as pd
-            project_file = excel_manager.create_site_transactions_file(self.project_name)
-            
-            # قراءة الملف الحالي
-            try:
-                df = pd.read_excel(project_file, engine='openpyxl')
-            except:
-                df = pd.DataFrame(columns=[
-                    'المشروع', 'التاريخ', 'اسم_العنصر', 'التصنيف', 
-                    'نوع_العملية', 'الكمية', 'اسم_المستلم', 'مدة_الصلاحية_بالأيام', 'ملاحظات'
-                ])
-            
-            # إضافة الحركة الجديدة
-            new_transaction = {
-                'المشروع': self.project_name,
-                'التاريخ': custom_date.strftime('%Y-%m-%d %H:%M:%S'),
-                'اسم_العنصر': item_info['اسم العنصر'],
-                'التصنيف': item_info['التصنيف'],
-                'نوع_العملية': transaction_type,
-                'الكمية': float(quantity),
-                'اسم_المستلم': receiver,
-                'مدة_الصلاحية_بالأيام': item_info.get('مدة الصلاحية (أيام)', None),
-                'ملاحظات': notes
-            }
-            
-            df = pd.concat([df, pd.DataFrame([new_transaction])], ignore_index=True)
-            df.to_excel(project_file, index=False, engine='openpyxl')
-            
-        except Exception as e:
-            print(f"خطأ في إضافة الحركة: {e}")
-    
     def print_report(self):
         """طباعة آخر تقرير"""
         try:
@@ -1140,6 +1091,7 @@ class MainWindow(QMainWindow):
             # إذا كنا في عملية تغيير مشروع، لا نظهر رسالة التأكيد
             if hasattr(self, '_changing_project') and self._changing_project:
                 print("إغلاق مقبول - تغيير مشروع")
+                self.alerts_service.stop()
                 event.accept()
                 return
             
@@ -1153,6 +1105,7 @@ class MainWindow(QMainWindow):
             
             if reply == QMessageBox.StandardButton.Yes:
                 print("المستخدم اختار إغلاق البرنامج")
+                self.alerts_service.stop()
                 event.accept()
             else:
                 print("المستخدم الغى إغلاق البرنامج")
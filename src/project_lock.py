@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+أقفال الملفات بين العمليات (Advisory Locks) لحماية ملفات المشاريع
+يستخدم fcntl على Linux/macOS و msvcrt على Windows، والقفل قابل لإعادة الدخول
+داخل نفس الخيط بحيث يمكن لعملية كتابة محمية أن تستدعي عمليات محمية أخرى
+"""
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+# المدة القصوى لانتظار القفل بالثواني
+DEFAULT_LOCK_TIMEOUT = 30.0
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+# الأقفال المحجوزة من الخيط الحالي: مسار الملف -> [عدد مرات الدخول، الملف المفتوح]
+_held = threading.local()
+
+
+def _get_held_locks():
+    held = getattr(_held, 'locks', None)
+    if held is None:
+        held = {}
+        _held.locks = held
+    return held
+
+
+def _get_thread_lock(lock_file):
+    """قفل داخلي لكل ملف لتنظيم الخيوط داخل نفس العملية"""
+    with _thread_locks_guard:
+        lock = _thread_locks.get(lock_file)
+        if lock is None:
+            lock = threading.RLock()
+            _thread_locks[lock_file] = lock
+        return lock
+
+
+class FileLock:
+    """قفل حصري على ملف بين العمليات المختلفة"""
+
+    def __init__(self, lock_file, timeout=DEFAULT_LOCK_TIMEOUT):
+        self.lock_file = os.path.abspath(lock_file)
+        self.timeout = timeout
+        self._thread_lock = _get_thread_lock(self.lock_file)
+
+    def _try_lock(self, handle):
+        """محاولة القفل بدون انتظار"""
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(self, handle):
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def acquire(self):
+        """الحصول على القفل (مع الانتظار حتى المدة القصوى)"""
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"انتهت مهلة انتظار القفل: {self.lock_file}")
+
+        held = _get_held_locks()
+        if self.lock_file in held:
+            # القفل محجوز مسبقاً من نفس الخيط
+            held[self.lock_file][0] += 1
+            return self
+
+        try:
+            os.makedirs(os.path.dirname(self.lock_file), exist_ok=True)
+            handle = open(self.lock_file, 'a+')
+            while not self._try_lock(handle):
+                if time.monotonic() >= deadline:
+                    handle.close()
+                    raise TimeoutError(f"انتهت مهلة انتظار القفل: {self.lock_file}")
+                time.sleep(0.01)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+        held[self.lock_file] = [1, handle]
+        return self
+
+    def release(self):
+        """تحرير القفل"""
+        held = _get_held_locks()
+        entry = held.get(self.lock_file)
+        if entry is None:
+            return
+        entry[0] -= 1
+        if entry[0] == 0:
+            del held[self.lock_file]
+            try:
+                self._unlock(entry[1])
+            finally:
+                entry[1].close()
+        self._thread_lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def project_lock(project_name, projects_path="projects"):
+    """القفل الخاص بمشروع معين"""
+    return FileLock(os.path.join(projects_path, f"{project_name}.lock"))
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة تخزين مؤقت لنتائج التقارير
+كل تقرير ينشأ يحفظ (ملف Excel وجداول أوراقه) بمفتاح من نوع التقرير والمشروع والفترة
+وبصمة بيانات المشروع، فإذا طلب نفس التقرير مرة أخرى ولم تتغير بيانات المشروع
+ينسخ الملف المحفوظ مباشرة بدلاً من إعادة حساب الأوراق وكتابتها.
+أي معاملة جديدة تغير بصمة مشروعها فقط، فتحذف تقارير ذلك المشروع السابقة دون غيرها
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import date, datetime
+
+import pandas as pd
+
+from project_lock import FileLock
+
+CACHE_PATH = os.path.join("reports", "cache")
+MAX_ENTRIES_PER_PROJECT = 20  # عدد التقارير المحفوظة لكل مشروع (يحذف الأقدم بعده)
+
+
+def report_key(report_type, project_name, start_date, end_date, data_version):
+    """مفتاح التقرير: (نوع التقرير، المشروع، الفترة، بصمة البيانات)"""
+    parts = [report_type, project_name,
+             str(start_date) if start_date is not None else None,
+             str(end_date) if end_date is not None else None,
+             data_version]
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class ReportCache:
+    """تقارير محفوظة لكل مشروع في reports/cache/<المشروع>/ مع فهرس index.json"""
+
+    def __init__(self, cache_path=CACHE_PATH, max_entries=MAX_ENTRIES_PER_PROJECT):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get_project_dir(self, project_name):
+        """مجلد التقارير المحفوظة الخاص بالمشروع"""
+        return os.path.join(self.cache_path, project_name)
+
+    def _index_file(self, project_name):
+        return os.path.join(self.get_project_dir(project_name), "index.json")
+
+    def _lock(self, project_name):
+        return FileLock(os.path.join(self.get_project_dir(project_name), "index.lock"))
+
+    def _load_index(self, project_name):
+        index_file = self._index_file(project_name)
+        if not os.path.exists(index_file):
+            return {}
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"تحذير: فهرس التقارير المحفوظة تالف وسيعاد إنشاؤه: {e}")
+            return {}
+
+    def _save_index(self, project_name, index):
+        index_file = self._index_file(project_name)
+        temp_file = index_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, index_file)
+
+    def _remove_files(self, entry):
+        for path in (entry.get('workbook'), entry.get('frames')):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def _drop_stale(self, index, data_version):
+        """
+        حذف التقارير التي لم تعد صالحة: المنشأة من بيانات مختلفة (حدثت معاملة بعدها)
+        أو في يوم سابق (التنبيهات وأعمار المخزون تحسب بالنسبة لتاريخ اليوم)
+        """
+        today = date.today().isoformat()
+        for key, entry in list(index.items()):
+            if entry.get('data_version') != data_version or entry.get('day') != today:
+                self._remove_files(index.pop(key))
+
+    def lookup(self, report_type, project_name, start_date, end_date, data_version):
+        """معلومات التقرير المحفوظ المطابق للطلب ولبيانات المشروع الحالية (None إذا لم يوجد)"""
+        if data_version is None:
+            return None
+
+        key = report_key(report_type, project_name, start_date, end_date, data_version)
+        entry = self._load_index(project_name).get(key)
+        if (entry is None or entry.get('day') != date.today().isoformat()
+                or not os.path.exists(entry['workbook'])):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, report_type, project_name, start_date, end_date, data_version, workbook_path, frames):
+        """
+        حفظ نسخة من التقرير وجداول أوراقه
+        frames: {اسم الورقة: DataFrame} بترتيب الأوراق في الملف
+        """
+        if data_version is None:
+            return None
+
+        key = report_key(report_type, project_name, start_date, end_date, data_version)
+        project_dir = self.get_project_dir(project_name)
+        os.makedirs(project_dir, exist_ok=True)
+
+        entry = {
+            'type': report_type,
+            'start_date': str(start_date) if start_date is not None else None,
+            'end_date': str(end_date) if end_date is not None else None,
+            'data_version': data_version,
+            'day': date.today().isoformat(),
+            'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'workbook': os.path.join(project_dir, f"{key}.xlsx"),
+            'frames': os.path.join(project_dir, f"{key}.pkl"),
+            'sheets': list(frames),
+        }
+        shutil.copy2(workbook_path, entry['workbook'])
+        pd.to_pickle(frames, entry['frames'])
+
+        with self._lock(project_name):
+            index = self._load_index(project_name)
+            self._drop_stale(index, data_version)
+            index[key] = entry
+            # حذف الأقدم عند تجاوز الحد (الفهرس مرتب حسب وقت الحفظ)
+            while len(index) > self.max_entries:
+                self._remove_files(index.pop(next(iter(index))))
+            self._save_index(project_name, index)
+        return entry
+
+    def load_frames(self, entry):
+        """جداول أوراق تقرير محفوظ {اسم الورقة: DataFrame}"""
+        return pd.read_pickle(entry['frames'])
+
+    def invalidate(self, project_name, data_version=None):
+        """حذف تقارير المشروع المحفوظة التي لا تطابق data_version (أو جميعها إذا لم تحدد)"""
+        if not os.path.exists(self._index_file(project_name)):
+            return
+        with self._lock(project_name):
+            index = self._load_index(project_name)
+            self._drop_stale(index, data_version)
+            self._save_index(project_name, index)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+سياق التقرير: تحميل بيانات المشروع مرة واحدة لكل تقرير
+جميع أوراق التقرير تستخدم نفس البيانات (العناصر، الحركات، الأرصدة، الدفعات، التعديلات)
+بدلاً من قراءة ملف الحركات وحساب ملخص المخزون في كل ورقة من جديد،
+مع قياس الوقت المستغرق في كل ورقة لمعرفة أين يذهب وقت التقرير
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+class ReportContext:
+    """
+    بيانات المشروع المشتركة بين أوراق تقرير واحد (كل مصدر يحمل عند أول استخدام فقط)
+    آمنة للاستخدام من عدة خيوط عند حساب الأوراق بالتوازي
+    """
+
+    def __init__(self, excel_manager, project_name):
+        self.excel_manager = excel_manager
+        self.project_name = project_name
+        self._data = {}
+        self.timings = []  # [(اسم الورقة أو المرحلة, الثواني)]
+        self._span = None  # (أول بداية, آخر نهاية) للمراحل المقاسة
+        self._load_lock = threading.RLock()
+        self._timings_lock = threading.Lock()
+
+    def get(self, name, loader):
+        """
+        تحميل أو حساب بيانات مشتركة مرة واحدة وتسجيل وقتها
+        التحميل يتم تحت قفل واحد: الخيوط التي تطلب نفس البيانات تنتظر النتيجة بدلاً من تكرارها،
+        وقراءات ملفات المشروع لا تتداخل
+        """
+        if name in self._data:
+            return self._data[name]
+        with self._load_lock:
+            if name not in self._data:
+                with self.timed(f"تحميل: {name}"):
+                    self._data[name] = loader()
+            return self._data[name]
+
+    @property
+    def has_transactions_file(self):
+        """هل يوجد ملف حركات للمشروع"""
+        return os.path.exists(os.path.join("projects", f"{self.project_name}_Transactions.xlsx"))
+
+    @property
+    def transactions(self):
+        """جميع حركات المشروع (DataFrame فارغ إذا لم يوجد ملف حركات)"""
+        def load():
+            if not self.has_transactions_file:
+                return pd.DataFrame()
+            df = self.excel_manager.load_transactions(self.project_name)
+            return df if df is not None else pd.DataFrame()
+        return self.get('الحركات', load)
+
+    @property
+    def dated_transactions(self):
+        """نسخة من الحركات مع تحويل عمود التاريخ إلى datetime (مرة واحدة لكل التقرير)"""
+        def convert():
+            df = self.transactions.copy()
+            if not df.empty and 'التاريخ' in df.columns:
+                df['التاريخ'] = pd.to_datetime(df['التاريخ'], errors='coerce')
+            return df
+        return self.get('تحويل التواريخ', convert)
+
+    @property
+    def inventory(self):
+        """ملخص المخزون الحالي (الأرصدة)"""
+        def load():
+            df = self.excel_manager.get_inventory_summary(self.project_name)
+            return df if df is not None else pd.DataFrame()
+        return self.get('الأرصدة', load)
+
+    @property
+    def items(self):
+        """قاعدة عناصر المشروع"""
+        return self.get('العناصر', lambda: self.excel_manager.get_all_items(self.project_name))
+
+    @property
+    def lot_state(self):
+        """الدفعات المفتوحة (للتنبيهات)"""
+        return self.get('الدفعات', lambda: self.excel_manager.get_lot_state(self.project_name))
+
+    @property
+    def rollups(self):
+        """ملخصات الحركات اليومية (للتحليلات الشهرية وحسب التصنيف وأعلى العناصر)"""
+        return self.get('ملخصات الحركات', lambda: self.excel_manager.get_report_rollups(self.project_name))
+
+    @property
+    def modification_counts(self):
+        """عدد مرات تعديل كل معاملة"""
+        return self.get('التعديلات', lambda: self.excel_manager.get_modification_counts(
+            self.project_name, self.transactions))
+
+    @contextmanager
+    def timed(self, name):
+        """قياس الوقت المستغرق في ورقة أو مرحلة من التقرير"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._timings_lock:
+                self.timings.append((name, end - start))
+                if self._span is None:
+                    self._span = (start, end)
+                else:
+                    self._span = (min(self._span[0], start), max(self._span[1], end))
+
+    def total_time(self):
+        """
+        إجمالي الوقت الفعلي للمراحل المقاسة (ثوان)
+        من أول بداية إلى آخر نهاية، فالتحميل داخل ورقة والأوراق المتوازية لا تجمع مرتين
+        """
+        if self._span is None:
+            return 0.0
+        return self._span[1] - self._span[0]
+
+    def print_timings(self, title="توقيت أوراق التقرير"):
+        """طباعة الوقت المستغرق لكل ورقة (الأبطأ أولاً)"""
+        print(f"⏱️ {title} - {self.project_name}: {self.total_time():.2f} ث")
+        for name, seconds in sorted(self.timings, key=lambda entry: entry[1], reverse=True):
+            print(f"   {name}: {seconds * 1000:.0f} مللي ثانية")
@@ -8,8 +8,11 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                            QDateEdit, QTextEdit)
 from PyQt6.QtCore import Qt, QDate
 from PyQt6.QtGui import QFont
-from datetime import datetime as dt, timedelta
+from datetime import date, datetime as dt, time, timedelta
 from report_manager import ReportManager
+from report_pipeline import ReportPipeline
+from report_rollups import build_rollups, filter_rollups, period_statistics
+from streaming_excel import StreamingExcelWriter
 from excel_manager import excel_manager
 import os
 
@@ -303,17 +306,17 @@ class ReportFilterDialog(QDialog):
         try:
             import pandas as pd
             
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+            with StreamingExcelWriter(filepath) as writer:
                 
                 # 1. ملخص المخزون الحالي
                 inventory_df = self.report_manager.excel_manager.get_inventory_summary(self.project_name)
                 if not inventory_df.empty:
-                    inventory_df.to_excel(writer, sheet_name='المخزون الحالي', index=False)
+                    writer.write(inventory_df, sheet_name='المخزون الحالي')
                 
                 # 2. جميع الحركات التفصيلية
                 project_file = os.path.join("projects", f"{self.project_name}_Transactions.xlsx")
                 if os.path.exists(project_file):
-                    transactions_df = pd.read_excel(project_file, engine='openpyxl')
+                    transactions_df = self.report_manager.excel_manager.load_transactions(self.project_name)
                     
                     # ترتيب الحركات حسب التاريخ (الأحدث أولاً)
                     transactions_df['التاريخ'] = pd.to_datetime(transactions_df['التاريخ'])
@@ -322,17 +325,17 @@ class ReportFilterDialog(QDialog):
                     # تنسيق التاريخ للعرض
                     transactions_df['التاريخ'] = transactions_df['التاريخ'].dt.strftime('%Y-%m-%d %H:%M:%S')
                     
-                    transactions_df.to_excel(writer, sheet_name='جميع الحركات', index=False)
+                    writer.write(transactions_df, sheet_name='جميع الحركات')
                     
                     # 3. تقرير حركات الدخول
                     incoming_df = transactions_df[transactions_df['نوع_العملية'] == 'دخول'].copy()
                     if not incoming_df.empty:
-                        incoming_df.to_excel(writer, sheet_name='حركات الدخول', index=False)
+                        writer.write(incoming_df, sheet_name='حركات الدخول')
                     
                     # 4. تقرير حركات الخروج
                     outgoing_df = transactions_df[transactions_df['نوع_العملية'] == 'خروج'].copy()
                     if not outgoing_df.empty:
-                        outgoing_df.to_excel(writer, sheet_name='حركات الخروج', index=False)
+                        writer.write(outgoing_df, sheet_name='حركات الخروج')
                 
                 # 5. إحصائيات المشروع
                 stats = self.report_manager.get_project_statistics(self.project_name)
@@ -340,12 +343,12 @@ class ReportFilterDialog(QDialog):
                     stats_df = pd.DataFrame([stats]).T
                     stats_df.columns = ['القيمة']
                     stats_df.index.name = 'الإحصائية'
-                    stats_df.to_excel(writer, sheet_name='إحصائيات المشروع')
+                    writer.write(stats_df, sheet_name='إحصائيات المشروع', index=True)
                 
                 # 6. ملخص عناصر المشروع
                 project_items = self.report_manager.excel_manager.get_all_items(self.project_name)
                 if not project_items.empty:
-                    project_items.to_excel(writer, sheet_name='عناصر المشروع', index=False)
+                    writer.write(project_items, sheet_name='عناصر المشروع')
                 
                 # 7. تقرير منفصل حسب التصنيف
                 if not inventory_df.empty and 'التصنيف' in inventory_df.columns:
@@ -353,13 +356,7 @@ class ReportFilterDialog(QDialog):
                     for category in categories:
                         category_data = inventory_df[inventory_df['التصنيف'] == category]
                         sheet_name = f"تصنيف_{category}"[:31]  # Excel sheet name limit
-                        category_data.to_excel(writer, sheet_name=sheet_name, index=False)
-                
-                # تنسيق جميع الأوراق
-                workbook = writer.book
-                for sheet_name in writer.sheets:
-                    sheet = writer.sheets[sheet_name]
-                    self.report_manager._format_excel_sheet(sheet, workbook)
+                        writer.write(category_data, sheet_name=sheet_name)
             
             return True
             
@@ -380,73 +377,76 @@ class ReportFilterDialog(QDialog):
             elif not isinstance(start_date, (pd.Timestamp, dt)):
                 start_date = pd.to_datetime(start_date)
             
+            # نهاية الفترة تبقى كما هي إذا كانت تاريخاً ووقتاً، والتاريخ وحده يشمل يومه كاملاً
             if isinstance(end_datetime, str):
                 end_datetime = pd.to_datetime(end_datetime)
-            elif hasattr(end_datetime, 'date') and callable(end_datetime.date):
-                end_datetime = pd.to_datetime(end_datetime.date())
-            elif not isinstance(end_datetime, (pd.Timestamp, dt)):
+            elif isinstance(end_datetime, dt):
+                end_datetime = pd.Timestamp(end_datetime)
+            elif isinstance(end_datetime, date):
+                end_datetime = pd.Timestamp(dt.combine(end_datetime, time(23, 59, 59)))
+            else:
                 end_datetime = pd.to_datetime(end_datetime)
             
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+            # 1. معلومات الفلتر
+            filter_info = pd.DataFrame({
+                'المعلومة': ['المشروع', 'من تاريخ', 'إلى تاريخ', 'تاريخ إنشاء التقرير'],
+                'القيمة': [
+                    self.project_name,
+                    start_date.strftime('%Y-%m-%d'),
+                    end_datetime.strftime('%Y-%m-%d'),
+                    dt.now().strftime('%Y-%m-%d %H:%M:%S')
+                ]
+            })
+            
+            # 2. الحركات المفلترة
+            filtered_transactions = pd.DataFrame()
+            project_file = os.path.join("projects", f"{self.project_name}_Transactions.xlsx")
+            if os.path.exists(project_file):
+                all_transactions = self.report_manager.excel_manager.get_transactions_in_range(
+                    self.project_name, start_date, end_datetime)
                 
-                # 1. معلومات الفلتر
-                filter_info = pd.DataFrame({
-                    'المعلومة': ['المشروع', 'من تاريخ', 'إلى تاريخ', 'تاريخ إنشاء التقرير'],
-                    'القيمة': [
-                        self.project_name,
-                        start_date.strftime('%Y-%m-%d'),
-                        end_datetime.strftime('%Y-%m-%d'),
-                        dt.now().strftime('%Y-%m-%d %H:%M:%S')
-                    ]
-                })
-                filter_info.to_excel(writer, sheet_name='معلومات التقرير', index=False)
-                
-                # 2. الحركات المفلترة
-                project_file = os.path.join("projects", f"{self.project_name}_Transactions.xlsx")
-                if os.path.exists(project_file):
-                    all_transactions = pd.read_excel(project_file, engine='openpyxl')
+                if not all_transactions.empty:
+                    # فلترة البيانات حسب التاريخ
+                    all_transactions['التاريخ'] = pd.to_datetime(all_transactions['التاريخ'])
+                    filtered_transactions = all_transactions[
+                        (all_transactions['التاريخ'] >= start_date) & 
+                        (all_transactions['التاريخ'] <= end_datetime)
+                    ].copy()
                     
-                    if not all_transactions.empty:
-                        # فلترة البيانات حسب التاريخ
-                        all_transactions['التاريخ'] = pd.to_datetime(all_transactions['التاريخ'])
-                        filtered_transactions = all_transactions[
-                            (all_transactions['التاريخ'] >= start_date) & 
-                            (all_transactions['التاريخ'] <= end_datetime)
-                        ].copy()
+                    if not filtered_transactions.empty:
+                        # ترتيب الحركات حسب التاريخ (الأحدث أولاً)
+                        filtered_transactions = filtered_transactions.sort_values('التاريخ', ascending=False)
                         
-                        if not filtered_transactions.empty:
-                            # ترتيب الحركات حسب التاريخ (الأحدث أولاً)
-                            filtered_transactions = filtered_transactions.sort_values('التاريخ', ascending=False)
-                            
-                            # تنسيق التاريخ للعرض
-                            filtered_transactions['التاريخ'] = filtered_transactions['التاريخ'].dt.strftime('%Y-%m-%d %H:%M:%S')
-                            
-                            # جميع الحركات المفلترة
-                            filtered_transactions.to_excel(writer, sheet_name='الحركات المفلترة', index=False)
-                            
-                            # حركات الدخول المفلترة
-                            incoming_filtered = filtered_transactions[filtered_transactions['نوع_العملية'] == 'دخول']
-                            if not incoming_filtered.empty:
-                                incoming_filtered.to_excel(writer, sheet_name='دخول مفلتر', index=False)
-                            
-                            # حركات الخروج المفلترة
-                            outgoing_filtered = filtered_transactions[filtered_transactions['نوع_العملية'] == 'خروج']
-                            if not outgoing_filtered.empty:
-                                outgoing_filtered.to_excel(writer, sheet_name='خروج مفلتر', index=False)
-                            
-                            # إحصائيات الفترة
-                            period_stats = self.get_period_statistics(filtered_transactions)
-                            if period_stats:
-                                stats_df = pd.DataFrame([period_stats]).T
-                                stats_df.columns = ['القيمة']
-                                stats_df.index.name = 'الإحصائية'
-                                stats_df.to_excel(writer, sheet_name='إحصائيات الفترة')
-                
-                # تنسيق جميع الأوراق
-                workbook = writer.book
-                for sheet_name in writer.sheets:
-                    sheet = writer.sheets[sheet_name]
-                    self.report_manager._format_excel_sheet(sheet, workbook)
+                        # تنسيق التاريخ للعرض
+                        filtered_transactions['التاريخ'] = filtered_transactions['التاريخ'].dt.strftime('%Y-%m-%d %H:%M:%S')
+            
+            def transactions_of_type(operation):
+                return lambda: filtered_transactions[filtered_transactions['نوع_العملية'] == operation]
+            
+            # إحصائيات الفترة (من ملخصات أيام الفترة المحفوظة بدلاً من الحركات نفسها)
+            def period_statistics_sheet():
+                if filtered_transactions.empty:
+                    return None
+                rollups = self.report_manager.excel_manager.get_report_rollups(self.project_name)
+                period_stats = period_statistics(filter_rollups(rollups, start_date, end_datetime))
+                if not period_stats:
+                    return None
+                stats_df = pd.DataFrame([period_stats]).T
+                stats_df.columns = ['القيمة']
+                stats_df.index.name = 'الإحصائية'
+                return stats_df
+            
+            # أوراق الحركات تحسب بالتوازي وتكتب بالترتيب
+            pipeline = ReportPipeline()
+            pipeline.add('معلومات التقرير', lambda: filter_info)
+            if not filtered_transactions.empty:
+                pipeline.add('الحركات المفلترة', lambda: filtered_transactions)
+                pipeline.add('دخول مفلتر', transactions_of_type('دخول'))
+                pipeline.add('خروج مفلتر', transactions_of_type('خروج'))
+                pipeline.add('إحصائيات الفترة', period_statistics_sheet, index=True)
+            
+            with StreamingExcelWriter(filepath) as writer:
+                pipeline.write(writer)
             
             return True
             
@@ -460,17 +460,7 @@ class ReportFilterDialog(QDialog):
             if transactions_df.empty:
                 return {}
             
-            stats = {
-                'إجمالي عدد الحركات': len(transactions_df),
-                'عدد حركات الدخول': len(transactions_df[transactions_df['نوع_العملية'] == 'دخول']),
-                'عدد حركات الخروج': len(transactions_df[transactions_df['نوع_العملية'] == 'خروج']),
-                'إجمالي كمية الدخول': transactions_df[transactions_df['نوع_العملية'] == 'دخول']['الكمية'].sum(),
-                'إجمالي كمية الخروج': transactions_df[transactions_df['نوع_العملية'] == 'خروج']['الكمية'].sum(),
-                'عدد العناصر المختلفة': transactions_df['اسم_العنصر'].nunique(),
-                'عدد التصنيفات': transactions_df['التصنيف'].nunique() if 'التصنيف' in transactions_df.columns else 0
-            }
-            
-            return stats
+            return period_statistics(build_rollups(transactions_df))
             
         except Exception as e:
             return {}
@@ -504,9 +494,6 @@ class ReportFilterDialog(QDialog):
             if not filepath:
                 return
             
-            # تحويل التواريخ (استخدام الاستيرادات الموجودة)
-            from datetime import time, date
-            
             # تحويل QDate إلى Python date
             qstart_date = self.start_date.date()
             qend_date = self.end_date.date()
@@ -6,6 +6,7 @@
 
 import pandas as pd
 import os
+import shutil
 from datetime import datetime
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
@@ -17,6 +18,13 @@ from reportlab.lib.units import inch
 import arabic_reshaper
 from bidi.algorithm import get_display
 
+from report_cache import ReportCache
+from report_context import ReportContext
+from report_pipeline import ReportPipeline
+from report_rollups import (build_rollups, category_analysis, filter_rollups, monthly_analysis,
+                            top_items_analysis)
+from streaming_excel import StreamingExcelWriter
+
 
 class ReportManager:
     """مدير التقارير"""
@@ -24,6 +32,9 @@ class ReportManager:
     def __init__(self, excel_manager):
         self.excel_manager = excel_manager
         self.reports_path = "reports"
+        self.last_report_timings = []  # الوقت المستغرق لكل ورقة في آخر تقرير
+        self.report_cache = ReportCache(os.path.join(self.reports_path, "cache"))
+        self.last_report_cached = False  # هل أخذ آخر تقرير من التقارير المحفوظة
         os.makedirs(self.reports_path, exist_ok=True)
         
         # تسجيل الخط العربي
@@ -59,74 +70,22 @@ class ReportManager:
             filename = f"مخزون_{project_name}_{timestamp}.xlsx"
             filepath = os.path.join(self.reports_path, filename)
             
-            # تصدير إلى Excel مع تنسيق جميل
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+            # تصدير إلى Excel مع تنسيق جميل (التنسيق يطبق أثناء كتابة الصفوف)
+            with StreamingExcelWriter(filepath) as writer:
                 # كتابة ملخص المخزون
-                inventory_df.to_excel(writer, sheet_name='ملخص المخزون', index=False)
+                writer.write(inventory_df, sheet_name='ملخص المخزون')
                 
                 # الحصول على الحركات التفصيلية
                 project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
                 if os.path.exists(project_file):
-                    transactions_df = pd.read_excel(project_file, engine='openpyxl')
-                    transactions_df.to_excel(writer, sheet_name='الحركات التفصيلية', index=False)
-                
-                # تنسيق الأوراق
-                workbook = writer.book
-                
-                # تنسيق ورقة المخزون
-                inventory_sheet = writer.sheets['ملخص المخزون']
-                self._format_excel_sheet(inventory_sheet, workbook)
-                
-                # تنسيق ورقة الحركات إذا وجدت
-                if 'الحركات التفصيلية' in writer.sheets:
-                    transactions_sheet = writer.sheets['الحركات التفصيلية']
-                    self._format_excel_sheet(transactions_sheet, workbook)
+                    transactions_df = self.excel_manager.load_transactions(project_name)
+                    writer.write(transactions_df, sheet_name='الحركات التفصيلية')
             
             return filepath, "تم تصدير التقرير بنجاح"
             
         except Exception as e:
             return None, f"خطأ في تصدير التقرير: {str(e)}"
     
-    def _format_excel_sheet(self, sheet, workbook):
-        """تنسيق ورقة Excel"""
-        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-        
-        # تنسيق الرؤوس
-        header_font = Font(bold=True, size=12)
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # تطبيق التنسيق على الصف الأول (الرؤوس)
-        for cell in sheet[1]:
-            cell.font = Font(bold=True, size=12, color="FFFFFF")
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # تنسيق البيانات
-        data_font = Font(size=11)
-        data_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # تطبيق التنسيق على باقي الصفوف
-        for row in sheet.iter_rows(min_row=2):
-            for cell in row:
-                cell.font = data_font
-                cell.alignment = data_alignment
-        
-        # ضبط عرض الأعمدة
-        for column in sheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            sheet.column_dimensions[column_letter].width = adjusted_width
-    
     def export_inventory_to_pdf(self, project_name):
         """تصدير المخزون الحالي إلى ملف PDF"""
         try:
@@ -260,7 +219,7 @@ class ReportManager:
             if not os.path.exists(project_file):
                 return {}
             
-            df = pd.read_excel(project_file, engine='openpyxl')
+            df = self.excel_manager.load_transactions(project_name)
             
             if df.empty:
                 return {}
@@ -288,17 +247,17 @@ class ReportManager:
             filename = f"تقرير_شامل_{project_name}_{timestamp}.xlsx"
             filepath = os.path.join(self.reports_path, filename)
             
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+            with StreamingExcelWriter(filepath) as writer:
                 
                 # 1. ملخص المخزون الحالي
                 inventory_df = self.excel_manager.get_inventory_summary(project_name)
                 if not inventory_df.empty:
-                    inventory_df.to_excel(writer, sheet_name='المخزون الحالي', index=False)
+                    writer.write(inventory_df, sheet_name='المخزون الحالي')
                 
                 # 2. جميع الحركات التفصيلية
                 project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
                 if os.path.exists(project_file):
-                    transactions_df = pd.read_excel(project_file, engine='openpyxl')
+                    transactions_df = self.excel_manager.load_transactions(project_name)
                     
                     # ترتيب الحركات حسب التاريخ (الأحدث أولاً)
                     transactions_df['التاريخ'] = pd.to_datetime(transactions_df['التاريخ'])
@@ -307,19 +266,19 @@ class ReportManager:
                     # تنسيق التاريخ للعرض
                     transactions_df['التاريخ'] = transactions_df['التاريخ'].dt.strftime('%Y-%m-%d %H:%M:%S')
                     
-                    transactions_df.to_excel(writer, sheet_name='جميع الحركات', index=False)
+                    writer.write(transactions_df, sheet_name='جميع الحركات')
                 
                 # 3. تقرير حركات الدخول
                 if os.path.exists(project_file):
                     incoming_df = transactions_df[transactions_df['نوع_العملية'] == 'دخول'].copy()
                     if not incoming_df.empty:
-                        incoming_df.to_excel(writer, sheet_name='حركات الدخول', index=False)
+                        writer.write(incoming_df, sheet_name='حركات الدخول')
                 
                 # 4. تقرير حركات الخروج
                 if os.path.exists(project_file):
                     outgoing_df = transactions_df[transactions_df['نوع_العملية'] == 'خروج'].copy()
                     if not outgoing_df.empty:
-                        outgoing_df.to_excel(writer, sheet_name='حركات الخروج', index=False)
+                        writer.write(outgoing_df, sheet_name='حركات الخروج')
                 
                 # 5. إحصائيات المشروع
                 stats = self.get_project_statistics(project_name)
@@ -327,12 +286,12 @@ class ReportManager:
                     stats_df = pd.DataFrame([stats]).T
                     stats_df.columns = ['القيمة']
                     stats_df.index.name = 'الإحصائية'
-                    stats_df.to_excel(writer, sheet_name='إحصائيات المشروع')
+                    writer.write(stats_df, sheet_name='إحصائيات المشروع', index=True)
                 
                 # 6. ملخص العناصر الخاصة بالمشروع
                 project_items = self.excel_manager.get_all_items(project_name)
                 if not project_items.empty:
-                    project_items.to_excel(writer, sheet_name='عناصر المشروع', index=False)
+                    writer.write(project_items, sheet_name='عناصر المشروع')
                 
                 # 7. تقرير منفصل حسب التصنيف
                 if not inventory_df.empty:
@@ -340,13 +299,7 @@ class ReportManager:
                     for category in categories:
                         category_data = inventory_df[inventory_df['التصنيف'] == category]
                         sheet_name = f"تصنيف_{category}"[:31]  # Excel sheet name limit
-                        category_data.to_excel(writer, sheet_name=sheet_name, index=False)
-                
-                # تنسيق جميع الأوراق
-                workbook = writer.book
-                for sheet_name in writer.sheets:
-                    sheet = writer.sheets[sheet_name]
-                    self._format_excel_sheet(sheet, workbook)
+                        writer.write(category_data, sheet_name=sheet_name)
             
             return filepath, "تم إنشاء التقرير الشامل بنجاح"
             
@@ -375,7 +328,7 @@ class ReportManager:
             elif not isinstance(end_date, (pd.Timestamp, datetime)):
                 end_date = pd.to_datetime(end_date)
             
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+            with StreamingExcelWriter(filepath) as writer:
                 
                 # 1. معلومات الفلتر
                 filter_info = {
@@ -388,14 +341,14 @@ class ReportManager:
                     ]
                 }
                 filter_df = pd.DataFrame(filter_info)
-                filter_df.to_excel(writer, sheet_name='معلومات التقرير', index=False)
+                writer.write(filter_df, sheet_name='معلومات التقرير')
                 
                 # قراءة الحركات المفلترة
                 project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
                 filtered_transactions = pd.DataFrame()
                 
                 if os.path.exists(project_file):
-                    all_transactions = pd.read_excel(project_file, engine='openpyxl')
+                    all_transactions = self.excel_manager.get_transactions_in_range(project_name, start_date, end_date)
                     
                     if not all_transactions.empty:
                         # تحويل عمود التاريخ
@@ -419,22 +372,22 @@ class ReportManager:
                 
                 # 2. جميع الحركات المفلترة
                 if not filtered_transactions.empty:
-                    filtered_transactions.to_excel(writer, sheet_name='الحركات المفلترة', index=False)
+                    writer.write(filtered_transactions, sheet_name='الحركات المفلترة')
                 else:
                     empty_df = pd.DataFrame({'رسالة': ['لا توجد حركات في الفترة المحددة']})
-                    empty_df.to_excel(writer, sheet_name='الحركات المفلترة', index=False)
+                    writer.write(empty_df, sheet_name='الحركات المفلترة')
                 
                 # 3. حركات الدخول المفلترة
                 if not filtered_transactions.empty:
                     incoming_filtered = filtered_transactions[filtered_transactions['نوع_العملية'] == 'دخول'].copy()
                     if not incoming_filtered.empty:
-                        incoming_filtered.to_excel(writer, sheet_name='دخول مفلتر', index=False)
+                        writer.write(incoming_filtered, sheet_name='دخول مفلتر')
                 
                 # 4. حركات الخروج المفلترة
                 if not filtered_transactions.empty:
                     outgoing_filtered = filtered_transactions[filtered_transactions['نوع_العملية'] == 'خروج'].copy()
                     if not outgoing_filtered.empty:
-                        outgoing_filtered.to_excel(writer, sheet_name='خروج مفلتر', index=False)
+                        writer.write(outgoing_filtered, sheet_name='خروج مفلتر')
                 
                 # 5. إحصائيات الفترة المحددة
                 if not filtered_transactions.empty:
@@ -443,24 +396,18 @@ class ReportManager:
                         stats_df = pd.DataFrame([period_stats]).T
                         stats_df.columns = ['القيمة']
                         stats_df.index.name = 'الإحصائية'
-                        stats_df.to_excel(writer, sheet_name='إحصائيات الفترة')
+                        writer.write(stats_df, sheet_name='إحصائيات الفترة', index=True)
                 
                 # 6. ملخص العناصر المتأثرة في الفترة
                 if not filtered_transactions.empty:
                     affected_items = self._get_affected_items_summary(filtered_transactions)
                     if not affected_items.empty:
-                        affected_items.to_excel(writer, sheet_name='العناصر المتأثرة', index=False)
+                        writer.write(affected_items, sheet_name='العناصر المتأثرة')
                 
                 # 7. المخزون الحالي (مرجعي)
                 current_inventory = self.excel_manager.get_current_inventory(project_name)
                 if not current_inventory.empty:
-                    current_inventory.to_excel(writer, sheet_name='المخزون الحالي', index=False)
-                
-                # تنسيق جميع الأوراق
-                workbook = writer.book
-                for sheet_name in writer.sheets:
-                    sheet = writer.sheets[sheet_name]
-                    self._format_excel_sheet(sheet, workbook)
+                    writer.write(current_inventory, sheet_name='المخزون الحالي')
             
             return filepath, "تم إنشاء التقرير المفلتر بنجاح"
             
@@ -538,11 +485,40 @@ class ReportManager:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"تقرير_شامل_مفصل_{project_name}_{timestamp}.xlsx"
             filepath = os.path.join(self.reports_path, filename)
-            
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                
-                # 1. معلومات عامة عن التقرير
-                report_info = {
+            message = "تم إنشاء التقرير الشامل بنجاح! يحتوي على 12 ورقة عمل مع جميع التفاصيل"
+            
+            # نفس التقرير لنفس بيانات المشروع ينسخ من التقارير المحفوظة
+            data_version = self.excel_manager.get_data_version(project_name)
+            if self._copy_cached_report('شامل', project_name, None, None, data_version, filepath):
+                return filepath, message
+            
+            # بيانات المشروع تحمل مرة واحدة وتستخدم في جميع الأوراق
+            context = ReportContext(self.excel_manager, project_name)
+            
+            def enhanced_transactions():
+                """جميع الحركات مرتبة ومحسنة (تحسب مرة واحدة وتشترك فيها أوراق الحركات والتحليلات)"""
+                return context.get('الحركات المفصلة',
+                                   lambda: self._enhance_transactions_details(context.dated_transactions))
+            
+            def from_transactions(analyze):
+                """ورقة محسوبة من الحركات المحسنة (لا تكتب إذا لم توجد حركات)"""
+                def compute():
+                    transactions = enhanced_transactions()
+                    if transactions is None or transactions.empty:
+                        return None
+                    return analyze(transactions)
+                return compute
+            
+            def from_rollups(analyze):
+                """ورقة تحليل محسوبة من ملخصات الحركات اليومية المحفوظة"""
+                def compute():
+                    rollups = context.rollups
+                    return analyze(rollups) if not rollups.empty else None
+                return compute
+            
+            # 1. معلومات عامة عن التقرير
+            def report_info():
+                return pd.DataFrame({
                     'معلومات التقرير': [
                         f"اسم المشروع: {project_name}",
                         f"تاريخ إنشاء التقرير: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
@@ -550,124 +526,73 @@ class ReportManager:
                         f"وصف: تقرير يحتوي على جميع بيانات المشروع وإحصائياته",
                         f"الإصدار: نظام إدارة المخزن - StrucTech"
                     ]
-                }
-                info_df = pd.DataFrame(report_info)
-                info_df.to_excel(writer, sheet_name='معلومات التقرير', index=False)
-                
-                # 2. الملخص التنفيذي (للإدارة)
-                executive_summary = self._create_executive_summary(project_name)
-                if executive_summary is not None and not executive_summary.empty:
-                    executive_summary.to_excel(writer, sheet_name='الملخص التنفيذي', index=False)
-                
-                # 3. المخزون الحالي (مع التفاصيل)
-                try:
-                    inventory_df = self.excel_manager.get_inventory_summary(project_name)
-                    if inventory_df is not None and not inventory_df.empty:
-                        # إضافة تفاصيل إضافية
-                        enhanced_inventory = self._enhance_inventory_details(inventory_df)
-                        enhanced_inventory.to_excel(writer, sheet_name='المخزون الحالي', index=False)
-                except Exception as e:
-                    print(f"خطأ في المخزون الحالي: {e}")
-                
-                # 4. جميع الحركات (مرتبة بالتاريخ)
-                try:
-                    project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
-                    if os.path.exists(project_file):
-                        all_transactions = pd.read_excel(project_file, engine='openpyxl')
-                        if all_transactions is not None and not all_transactions.empty:
-                            # ترتيب وتحسين الحركات
-                            enhanced_transactions = self._enhance_transactions_details(all_transactions)
-                            enhanced_transactions.to_excel(writer, sheet_name='جميع الحركات', index=False)
-                except Exception as e:
-                    print(f"خطأ في جميع الحركات: {e}")
-                    enhanced_transactions = pd.DataFrame()  # DataFrame فارغ للاستخدام لاحقاً
-                
-                # معالجة الحركات إذا كانت متوفرة
-                if 'enhanced_transactions' in locals() and enhanced_transactions is not None and not enhanced_transactions.empty:
-                    # 5. حركات الدخول (مفصلة)
-                    try:
-                        incoming_detailed = enhanced_transactions[enhanced_transactions['نوع_العملية'] == 'إدخال'].copy()
-                        if not incoming_detailed.empty:
-                            incoming_detailed.to_excel(writer, sheet_name='حركات الدخول', index=False)
-                    except Exception as e:
-                        print(f"خطأ في حركات الدخول: {e}")
-                    
-                    # 6. حركات الخروج (مفصلة)
-                    try:
-                        outgoing_detailed = enhanced_transactions[enhanced_transactions['نوع_العملية'] == 'إخراج'].copy()
-                        if not outgoing_detailed.empty:
-                            outgoing_detailed.to_excel(writer, sheet_name='حركات الخروج', index=False)
-                    except Exception as e:
-                        print(f"خطأ في حركات الخروج: {e}")
-                    
-                    # 7. تحليل حسب التصنيف
-                    try:
-                        category_analysis = self._analyze_by_category(enhanced_transactions)
-                        if category_analysis is not None and not category_analysis.empty:
-                            category_analysis.to_excel(writer, sheet_name='تحليل التصنيفات', index=False)
-                    except Exception as e:
-                        print(f"خطأ في تحليل التصنيفات: {e}")
-                    
-                    # 8. تحليل زمني (شهري)
-                    try:
-                        time_analysis = self._analyze_by_time(enhanced_transactions)
-                        if time_analysis is not None and not time_analysis.empty:
-                            time_analysis.to_excel(writer, sheet_name='التحليل الزمني', index=False)
-                    except Exception as e:
-                        print(f"خطأ في التحليل الزمني: {e}")
-                    
-                    # 9. أعلى العناصر حركة
-                    try:
-                        top_items = self._get_top_items_analysis(enhanced_transactions)
-                        if top_items is not None and not top_items.empty:
-                            top_items.to_excel(writer, sheet_name='أعلى العناصر حركة', index=False)
-                    except Exception as e:
-                        print(f"خطأ في تحليل أعلى العناصر: {e}")
-                
-                # 10. عناصر المشروع (قاعدة البيانات)
-                try:
-                    project_items = self.excel_manager.get_all_items(project_name)
-                    if project_items is not None and not project_items.empty:
-                        project_items.to_excel(writer, sheet_name='قاعدة عناصر المشروع', index=False)
-                except Exception as e:
-                    print(f"خطأ في قاعدة عناصر المشروع: {e}")
-                
-                # 11. تنبيهات المخزون والصلاحية
-                try:
-                    alerts_data = self._get_alerts_data(project_name)
-                    if alerts_data and len(alerts_data) > 0:
-                        alerts_df = pd.DataFrame(alerts_data)
-                        alerts_df.to_excel(writer, sheet_name='تنبيهات وإنذارات', index=False)
-                except Exception as e:
-                    print(f"خطأ في التنبيهات: {e}")
-                
-                # 12. إحصائيات شاملة
-                try:
-                    comprehensive_stats = self._get_comprehensive_statistics(project_name)
-                    if comprehensive_stats and len(comprehensive_stats) > 0:
-                        stats_df = pd.DataFrame([comprehensive_stats]).T
-                        stats_df.columns = ['القيمة']
-                        stats_df.index.name = 'الإحصائية'
-                        stats_df.to_excel(writer, sheet_name='إحصائيات شاملة')
-                except Exception as e:
-                    print(f"خطأ في الإحصائيات: {e}")
-                
-                # تنسيق جميع الأوراق
-                workbook = writer.book
-                for sheet_name in writer.sheets:
-                    sheet = writer.sheets[sheet_name]
-                    self._format_excel_sheet(sheet, workbook)
-            
-            return filepath, "تم إنشاء التقرير الشامل بنجاح! يحتوي على 12 ورقة عمل مع جميع التفاصيل"
+                })
+            
+            # 3. المخزون الحالي (مع التفاصيل)
+            def current_inventory():
+                inventory_df = context.inventory
+                if inventory_df is None or inventory_df.empty:
+                    return None
+                return self._enhance_inventory_details(inventory_df)
+            
+            # الأوراق تحسب بالتوازي وتكتب بهذا الترتيب
+            pipeline = ReportPipeline(context)
+            pipeline.add('معلومات التقرير', report_info)
+            pipeline.add('الملخص التنفيذي', lambda: self._create_executive_summary(project_name, context))
+            pipeline.add('المخزون الحالي', current_inventory)
+            pipeline.add('جميع الحركات', from_transactions(lambda df: df))
+            pipeline.add('حركات الدخول', from_transactions(lambda df: df[df['نوع_العملية'] == 'إدخال'].copy()))
+            pipeline.add('حركات الخروج', from_transactions(lambda df: df[df['نوع_العملية'] == 'إخراج'].copy()))
+            pipeline.add('تحليل التصنيفات', from_rollups(category_analysis))
+            pipeline.add('التحليل الزمني', from_rollups(monthly_analysis))
+            pipeline.add('أعلى العناصر حركة', from_rollups(top_items_analysis))
+            pipeline.add('قاعدة عناصر المشروع', lambda: context.items)
+            pipeline.add('تنبيهات وإنذارات', lambda: self._alerts_sheet(project_name, context))
+            pipeline.add('إحصائيات شاملة', lambda: self._statistics_sheet(project_name, context), index=True)
+            
+            with StreamingExcelWriter(filepath) as writer:
+                pipeline.write(writer)
+            
+            # الوقت المستغرق في كل ورقة (متاح أيضاً في last_report_timings)
+            self.last_report_timings = context.timings
+            context.print_timings()
+            
+            self._store_report('شامل', project_name, None, None, data_version, filepath, pipeline.frames)
+            return filepath, message
             
         except Exception as e:
             return None, f"خطأ في إنشاء التقرير الشامل: {str(e)}"
     
-    def _create_executive_summary(self, project_name):
+    def _copy_cached_report(self, report_type, project_name, start_date, end_date, data_version, filepath):
+        """نسخ التقرير المحفوظ إلى filepath إذا لم تتغير بيانات المشروع منذ إنشائه"""
+        self.last_report_cached = False
+        try:
+            entry = self.report_cache.lookup(report_type, project_name, start_date, end_date, data_version)
+            if entry is None:
+                return False
+            os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+            shutil.copy2(entry['workbook'], filepath)
+            self.last_report_cached = True
+            self.last_report_timings = []
+            return True
+        except Exception as e:
+            print(f"خطأ في قراءة التقرير المحفوظ: {e}")
+            return False
+    
+    def _store_report(self, report_type, project_name, start_date, end_date, data_version, filepath, frames):
+        """حفظ التقرير الناتج وجداول أوراقه لإعادة استخدامها (خطأ الحفظ لا يفشل التقرير)"""
+        try:
+            self.report_cache.store(report_type, project_name, start_date, end_date, data_version, filepath, frames)
+        except Exception as e:
+            print(f"خطأ في حفظ التقرير في الذاكرة المؤقتة: {e}")
+    
+    def _create_executive_summary(self, project_name, context=None):
         """إنشاء الملخص التنفيذي"""
         try:
+            context = context or ReportContext(self.excel_manager, project_name)
+            
             # الحصول على البيانات الأساسية
-            inventory_df = self.excel_manager.get_inventory_summary(project_name)
+            inventory_df = context.inventory
             
             # إحصائيات أساسية
             total_items = len(inventory_df) if not inventory_df.empty else 0
@@ -676,23 +601,22 @@ class ReportManager:
             # حالة المخزون
             low_stock_items = 0
             if not inventory_df.empty:
-                low_stock_items = len(inventory_df[inventory_df['الكمية_الحالية'] <= 10])
+                low_stock_threshold = self._get_low_stock_threshold(project_name)
+                low_stock_items = len(inventory_df[inventory_df['الكمية_الحالية'] <= low_stock_threshold])
             
             # إحصائيات الحركات
-            project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
             transactions_count = 0
             latest_transaction = "غير متوفر"
             
-            if os.path.exists(project_file):
-                transactions_df = pd.read_excel(project_file, engine='openpyxl')
+            if context.has_transactions_file:
+                transactions_df = context.dated_transactions
                 transactions_count = len(transactions_df)
                 if not transactions_df.empty:
-                    # تحويل التاريخ بأمان
+                    # التواريخ محولة مسبقاً في سياق التقرير
                     try:
-                        transactions_df['التاريخ'] = pd.to_datetime(transactions_df['التاريخ'])
                         latest_transaction = transactions_df['التاريخ'].max().strftime('%Y/%m/%d')
                     except:
-                        latest_transaction = str(transactions_df['التاريخ'].max())
+                        latest_transaction = str(context.transactions['التاريخ'].max())
             
             # إنشاء الملخص
             summary_data = {
@@ -759,15 +683,8 @@ class ReportManager:
                 print(f"أعمدة مفقودة في تحليل التصنيفات: {missing_columns}")
                 return pd.DataFrame()
             
-            # تجميع حسب التصنيف ونوع العملية
-            category_analysis = transactions_df.groupby(['التصنيف', 'نوع_العملية']).agg({
-                'الكمية': 'sum',
-                'التاريخ': 'count'
-            }).reset_index()
-            
-            category_analysis.columns = ['التصنيف', 'نوع_العملية', 'إجمالي_الكمية', 'عدد_العمليات']
-            
-            return category_analysis
+            # تجميع حسب التصنيف ونوع العملية (عبر الملخصات اليومية)
+            return category_analysis(build_rollups(transactions_df))
             
         except Exception as e:
             print(f"خطأ في تحليل التصنيفات: {e}")
@@ -786,22 +703,8 @@ class ReportManager:
                 print(f"أعمدة مفقودة في التحليل الزمني: {missing_columns}")
                 return pd.DataFrame()
             
-            # عمل نسخة لتجنب تعديل الأصل
-            df_copy = transactions_df.copy()
-            
-            # تحويل التاريخ
-            df_copy['التاريخ'] = pd.to_datetime(df_copy['التاريخ'])
-            df_copy['الشهر'] = df_copy['التاريخ'].dt.strftime('%Y-%m')
-            
-            # تحليل شهري
-            monthly_analysis = df_copy.groupby(['الشهر', 'نوع_العملية']).agg({
-                'الكمية': 'sum',
-                'التاريخ': 'count'
-            }).reset_index()
-            
-            monthly_analysis.columns = ['الشهر', 'نوع_العملية', 'إجمالي_الكمية', 'عدد_العمليات']
-            
-            return monthly_analysis
+            # تحليل شهري (عبر الملخصات اليومية: الشهر يحسب لكل يوم وليس لكل حركة)
+            return monthly_analysis(build_rollups(transactions_df))
             
         except Exception as e:
             print(f"خطأ في التحليل الزمني: {e}")
@@ -820,41 +723,53 @@ class ReportManager:
                 print(f"أعمدة مفقودة في تحليل أعلى العناصر: {missing_columns}")
                 return pd.DataFrame()
             
-            # تجميع حسب العنصر
-            item_analysis = transactions_df.groupby('اسم_العنصر').agg({
-                'الكمية': 'sum',
-                'التاريخ': 'count',
-                'نوع_العملية': lambda x: ', '.join(x.unique())
-            }).reset_index()
-            
-            item_analysis.columns = ['اسم_العنصر', 'إجمالي_الكمية', 'عدد_العمليات', 'أنواع_العمليات']
-            
-            # ترتيب حسب العدد
-            item_analysis = item_analysis.sort_values('عدد_العمليات', ascending=False).head(20)
-            
-            return item_analysis
+            # تجميع حسب العنصر وترتيب حسب العدد (عبر الملخصات اليومية)
+            return top_items_analysis(build_rollups(transactions_df))
             
         except Exception as e:
             print(f"خطأ في تحليل أعلى العناصر: {e}")
             return pd.DataFrame()
     
-    def _get_alerts_data(self, project_name):
+    def _alerts_sheet(self, project_name, context=None):
+        """ورقة تنبيهات المخزون والصلاحية (None إذا لم توجد تنبيهات)"""
+        alerts_data = self._get_alerts_data(project_name, context)
+        return pd.DataFrame(alerts_data) if alerts_data else None
+    
+    def _statistics_sheet(self, project_name, context=None):
+        """ورقة الإحصائيات الشاملة (الإحصائية كفهرس والقيمة كعمود)"""
+        comprehensive_stats = self._get_comprehensive_statistics(project_name, context)
+        if not comprehensive_stats:
+            return None
+        stats_df = pd.DataFrame([comprehensive_stats]).T
+        stats_df.columns = ['القيمة']
+        stats_df.index.name = 'الإحصائية'
+        return stats_df
+    
+    def _get_alerts_data(self, project_name, context=None):
         """الحصول على بيانات التنبيهات"""
         try:
             alerts = []
-            
-            # تنبيهات المخزون المنخفض
-            inventory_df = self.excel_manager.get_inventory_summary(project_name)
-            if not inventory_df.empty:
-                low_stock = inventory_df[inventory_df['الكمية_الحالية'] <= 10]
-                for _, item in low_stock.iterrows():
-                    alerts.append({
-                        'نوع_التنبيه': 'مخزون منخفض',
-                        'اسم_العنصر': item['اسم_العنصر'],
-                        'الكمية_الحالية': item['الكمية_الحالية'],
-                        'مستوى_الخطر': 'عالي' if item['الكمية_الحالية'] <= 5 else 'متوسط',
-                        'التاريخ': datetime.now().strftime('%Y/%m/%d')
-                    })
+            lot_state = context.lot_state if context is not None else self.excel_manager.get_lot_state(project_name)
+            
+            # تنبيهات المخزون المنخفض (مجموع الدفعات المفتوحة لكل عنصر)
+            for item in lot_state.get_low_stock_items(self._get_low_stock_threshold(project_name)):
+                alerts.append({
+                    'نوع_التنبيه': 'مخزون منخفض',
+                    'اسم_العنصر': item['item_name'],
+                    'الكمية_الحالية': item['quantity'],
+                    'مستوى_الخطر': 'عالي' if item['quantity'] <= 5 else 'متوسط',
+                    'التاريخ': datetime.now().strftime('%Y/%m/%d')
+                })
+            
+            # تنبيهات انتهاء الصلاحية (الدفعات المفتوحة فقط)
+            for lot in lot_state.get_expiring_lots(self._get_expiry_threshold_days(project_name)):
+                alerts.append({
+                    'نوع_التنبيه': 'قرب انتهاء الصلاحية',
+                    'اسم_العنصر': lot['item_name'],
+                    'الكمية_الحالية': lot['quantity'],
+                    'مستوى_الخطر': 'عالي' if lot['days_remaining'] <= 3 else 'متوسط',
+                    'التاريخ': lot['expiry_date'][:10].replace('-', '/')
+                })
             
             return alerts
             
@@ -862,13 +777,30 @@ class ReportManager:
             print(f"خطأ في الحصول على التنبيهات: {e}")
             return []
     
-    def _get_comprehensive_statistics(self, project_name):
+    def _get_expiry_threshold_days(self, project_name):
+        """عدد أيام تنبيه انتهاء الصلاحية من إعدادات المشروع"""
+        try:
+            from project_settings import ProjectSettingsDialog
+            return ProjectSettingsDialog.get_project_settings(project_name).get('expiry_threshold_days', 30)
+        except ImportError:
+            return 30
+    
+    def _get_low_stock_threshold(self, project_name):
+        """عتبة المخزون المنخفض من إعدادات المشروع"""
+        try:
+            from project_settings import ProjectSettingsDialog
+            return ProjectSettingsDialog.get_project_settings(project_name).get('low_stock_threshold', 10)
+        except ImportError:
+            return 10
+    
+    def _get_comprehensive_statistics(self, project_name, context=None):
         """إحصائيات شاملة"""
         try:
+            context = context or ReportContext(self.excel_manager, project_name)
             stats = {}
             
             # إحصائيات المخزون
-            inventory_df = self.excel_manager.get_inventory_summary(project_name)
+            inventory_df = context.inventory
             if not inventory_df.empty:
                 stats['إجمالي العناصر'] = len(inventory_df)
                 stats['إجمالي الكميات'] = int(inventory_df['الكمية_الحالية'].sum())
@@ -877,18 +809,16 @@ class ReportManager:
                 stats['أقل كمية'] = int(inventory_df['الكمية_الحالية'].min())
             
             # إحصائيات الحركات
-            project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
-            if os.path.exists(project_file):
+            if context.has_transactions_file:
                 try:
-                    transactions_df = pd.read_excel(project_file, engine='openpyxl')
+                    transactions_df = context.dated_transactions
                     if transactions_df is not None and not transactions_df.empty:
                         stats['إجمالي الحركات'] = len(transactions_df)
                         stats['حركات الإدخال'] = len(transactions_df[transactions_df['نوع_العملية'] == 'إدخال'])
                         stats['حركات الإخراج'] = len(transactions_df[transactions_df['نوع_العملية'] == 'إخراج'])
                         
-                        # التحقق من وجود التواريخ وتحويلها
+                        # التواريخ محولة مسبقاً في سياق التقرير
                         if 'التاريخ' in transactions_df.columns:
-                            transactions_df['التاريخ'] = pd.to_datetime(transactions_df['التاريخ'])
                             stats['آخر حركة'] = transactions_df['التاريخ'].max().strftime('%Y/%m/%d')
                             stats['أول حركة'] = transactions_df['التاريخ'].min().strftime('%Y/%m/%d')
                 except Exception as e:
@@ -913,14 +843,19 @@ class ReportManager:
             if not filepath:
                 filename = f"تقرير_مخصص_{project_name}_{timestamp}.xlsx"
                 filepath = os.path.join(self.reports_path, filename)
+            message = "تم إنشاء التقرير المخصص بنجاح! يحتوي على 12 ورقة عمل مع جميع التفاصيل مفلترة حسب التاريخ"
+            
+            data_version = self.excel_manager.get_data_version(project_name)
+            if self._copy_cached_report('مخصص', project_name, start_date, end_date, data_version, filepath):
+                return filepath, message
             
             # الحصول على الحركات في الفترة المحددة
             project_file = os.path.join("projects", f"{project_name}_Transactions.xlsx")
             if not os.path.exists(project_file):
                 return None, "لا توجد حركات مسجلة للمشروع"
             
-            # قراءة جميع الحركات
-            all_transactions = pd.read_excel(project_file, engine='openpyxl')
+            # قراءة حركات الفترة المحددة فقط
+            all_transactions = self.excel_manager.get_transactions_in_range(project_name, start_date, end_date)
             if all_transactions is None or all_transactions.empty:
                 return None, "لا توجد حركات في الفترة المحددة"
             
@@ -936,14 +871,13 @@ class ReportManager:
             if filtered_df.empty:
                 return None, f"لا توجد حركات في الفترة من {start_date} إلى {end_date}"
             
-            # الحصول على المخزون الحالي
-            inventory_df = self.excel_manager.get_inventory_summary(project_name)
+            # الحصول على المخزون الحالي (البيانات المشتركة تحمل مرة واحدة للتقرير)
+            context = ReportContext(self.excel_manager, project_name)
+            inventory_df = context.inventory
             
-            # إنشاء ملف Excel مع جميع الأوراق (مثل التقرير الشامل)
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                
-                # 1. معلومات التقرير
-                report_info = {
+            # 1. معلومات التقرير
+            def report_info():
+                return pd.DataFrame({
                     'المعلومة': ['المشروع', 'نوع التقرير', 'من تاريخ', 'إلى تاريخ', 'تاريخ الإنشاء', 'عدد الحركات'],
                     'القيمة': [
                         project_name,
@@ -953,131 +887,77 @@ class ReportManager:
                         datetime.now().strftime('%Y/%m/%d %H:%M'),
                         len(filtered_df)
                     ]
-                }
-                info_df = pd.DataFrame(report_info)
-                info_df.to_excel(writer, sheet_name='معلومات التقرير', index=False)
-                
-                # 2. الملخص التنفيذي (للفترة المحددة)
-                try:
-                    summary_data = {
-                        'البيان': [
-                            'إجمالي العناصر المسجلة',
-                            'إجمالي الكميات الحالية', 
-                            'عناصر بمخزون منخفض',
-                            'إجمالي الحركات في الفترة',
-                            'حركات الإدخال',
-                            'حركات الإخراج',
-                            'تاريخ إنشاء التقرير',
-                            'حالة المشروع'
-                        ],
-                        'القيمة': [
-                            len(inventory_df) if inventory_df is not None else 0,
-                            int(inventory_df['الكمية_الحالية'].sum()) if inventory_df is not None else 0,
-                            len(inventory_df[inventory_df['الكمية_الحالية'] <= 10]) if inventory_df is not None else 0,
-                            len(filtered_df),
-                            len(filtered_df[filtered_df['نوع_العملية'] == 'إدخال']),
-                            len(filtered_df[filtered_df['نوع_العملية'] == 'إخراج']),
-                            datetime.now().strftime('%Y/%m/%d %H:%M'),
-                            'نشط'
-                        ]
-                    }
-                    exec_df = pd.DataFrame(summary_data)
-                    exec_df.to_excel(writer, sheet_name='الملخص التنفيذي', index=False)
-                except Exception as e:
-                    print(f"خطأ في الملخص التنفيذي: {e}")
-                
-                # 3. المخزون الحالي
-                try:
-                    if inventory_df is not None and not inventory_df.empty:
-                        enhanced_inventory = self._enhance_inventory_details(inventory_df)
-                        enhanced_inventory.to_excel(writer, sheet_name='المخزون الحالي', index=False)
-                except Exception as e:
-                    print(f"خطأ في المخزون: {e}")
-                
-                # 4. جميع الحركات المفلترة
-                try:
-                    enhanced_df = self._enhance_transactions_details(filtered_df)
-                    enhanced_df.to_excel(writer, sheet_name='الحركات', index=False)
-                except Exception as e:
-                    print(f"خطأ في الحركات: {e}")
-                
-                # 5. حركات الإدخال
-                try:
-                    incoming = filtered_df[filtered_df['نوع_العملية'] == 'إدخال'].copy()
-                    if not incoming.empty:
-                        enhanced_incoming = self._enhance_transactions_details(incoming)
-                        enhanced_incoming.to_excel(writer, sheet_name='حركات الدخول', index=False)
-                except Exception as e:
-                    print(f"خطأ في حركات الدخول: {e}")
-                
-                # 6. حركات الإخراج
-                try:
-                    outgoing = filtered_df[filtered_df['نوع_العملية'] == 'إخراج'].copy()
-                    if not outgoing.empty:
-                        enhanced_outgoing = self._enhance_transactions_details(outgoing)
-                        enhanced_outgoing.to_excel(writer, sheet_name='حركات الخروج', index=False)
-                except Exception as e:
-                    print(f"خطأ في حركات الخروج: {e}")
-                
-                # 7. تحليل حسب التصنيف
-                try:
-                    category_analysis = self._analyze_by_category(filtered_df)
-                    if category_analysis is not None and not category_analysis.empty:
-                        category_analysis.to_excel(writer, sheet_name='تحليل التصنيفات', index=False)
-                except Exception as e:
-                    print(f"خطأ في التصنيفات: {e}")
-                
-                # 8. التحليل الزمني
-                try:
-                    time_analysis = self._analyze_by_time(filtered_df)
-                    if time_analysis is not None and not time_analysis.empty:
-                        time_analysis.to_excel(writer, sheet_name='التحليل الزمني', index=False)
-                except Exception as e:
-                    print(f"خطأ في التحليل الزمني: {e}")
-                
-                # 9. أعلى العناصر حركة
-                try:
-                    top_items = self._get_top_items_analysis(filtered_df)
-                    if top_items is not None and not top_items.empty:
-                        top_items.to_excel(writer, sheet_name='أعلى العناصر حركة', index=False)
-                except Exception as e:
-                    print(f"خطأ في أعلى العناصر: {e}")
-                
-                # 10. قاعدة عناصر المشروع
-                try:
-                    project_items = self.excel_manager.get_all_items(project_name)
-                    if project_items is not None and not project_items.empty:
-                        project_items.to_excel(writer, sheet_name='قاعدة عناصر المشروع', index=False)
-                except Exception as e:
-                    print(f"خطأ في قاعدة عناصر المشروع: {e}")
-                
-                # 11. التنبيهات
-                try:
-                    alerts_data = self._get_alerts_data(project_name)
-                    if alerts_data and len(alerts_data) > 0:
-                        alerts_df = pd.DataFrame(alerts_data)
-                        alerts_df.to_excel(writer, sheet_name='تنبيهات وإنذارات', index=False)
-                except Exception as e:
-                    print(f"خطأ في التنبيهات: {e}")
-                
-                # 12. الإحصائيات الشاملة
-                try:
-                    comprehensive_stats = self._get_comprehensive_statistics(project_name)
-                    if comprehensive_stats and len(comprehensive_stats) > 0:
-                        stats_df = pd.DataFrame([comprehensive_stats]).T
-                        stats_df.columns = ['القيمة']
-                        stats_df.index.name = 'الإحصائية'
-                        stats_df.to_excel(writer, sheet_name='إحصائيات شاملة')
-                except Exception as e:
-                    print(f"خطأ في الإحصائيات: {e}")
-                
-                # تنسيق جميع الأوراق
-                workbook = writer.book
-                for sheet_name in writer.sheets:
-                    sheet = writer.sheets[sheet_name]
-                    self._format_excel_sheet(sheet, workbook)
-            
-            return filepath, "تم إنشاء التقرير المخصص بنجاح! يحتوي على 12 ورقة عمل مع جميع التفاصيل مفلترة حسب التاريخ"
+                })
+            
+            # 2. الملخص التنفيذي (للفترة المحددة)
+            def executive_summary():
+                return pd.DataFrame({
+                    'البيان': [
+                        'إجمالي العناصر المسجلة',
+                        'إجمالي الكميات الحالية', 
+                        'عناصر بمخزون منخفض',
+                        'إجمالي الحركات في الفترة',
+                        'حركات الإدخال',
+                        'حركات الإخراج',
+                        'تاريخ إنشاء التقرير',
+                        'حالة المشروع'
+                    ],
+                    'القيمة': [
+                        len(inventory_df) if inventory_df is not None else 0,
+                        int(inventory_df['الكمية_الحالية'].sum()) if inventory_df is not None else 0,
+                        len(inventory_df[inventory_df['الكمية_الحالية'] <= 10]) if inventory_df is not None else 0,
+                        len(filtered_df),
+                        len(filtered_df[filtered_df['نوع_العملية'] == 'إدخال']),
+                        len(filtered_df[filtered_df['نوع_العملية'] == 'إخراج']),
+                        datetime.now().strftime('%Y/%m/%d %H:%M'),
+                        'نشط'
+                    ]
+                })
+            
+            # 3. المخزون الحالي
+            def current_inventory():
+                if inventory_df is None or inventory_df.empty:
+                    return None
+                return self._enhance_inventory_details(inventory_df)
+            
+            # 7، 8، 9. التحليلات من ملخصات أيام الفترة
+            def from_period_rollups(analyze):
+                def compute():
+                    rollups = context.get('ملخصات الفترة',
+                                          lambda: filter_rollups(context.rollups, start_date, end_date))
+                    return analyze(rollups) if not rollups.empty else None
+                return compute
+            
+            # 5، 6. حركات الإدخال والإخراج
+            def transactions_of_type(operation):
+                def compute():
+                    selected = filtered_df[filtered_df['نوع_العملية'] == operation].copy()
+                    return self._enhance_transactions_details(selected) if not selected.empty else None
+                return compute
+            
+            # الأوراق تحسب بالتوازي وتكتب بهذا الترتيب (مثل التقرير الشامل)
+            pipeline = ReportPipeline(context)
+            pipeline.add('معلومات التقرير', report_info)
+            pipeline.add('الملخص التنفيذي', executive_summary)
+            pipeline.add('المخزون الحالي', current_inventory)
+            pipeline.add('الحركات', lambda: self._enhance_transactions_details(filtered_df))
+            pipeline.add('حركات الدخول', transactions_of_type('إدخال'))
+            pipeline.add('حركات الخروج', transactions_of_type('إخراج'))
+            pipeline.add('تحليل التصنيفات', from_period_rollups(category_analysis))
+            pipeline.add('التحليل الزمني', from_period_rollups(monthly_analysis))
+            pipeline.add('أعلى العناصر حركة', from_period_rollups(top_items_analysis))
+            pipeline.add('قاعدة عناصر المشروع', lambda: context.items)
+            pipeline.add('تنبيهات وإنذارات', lambda: self._alerts_sheet(project_name, context))
+            pipeline.add('إحصائيات شاملة', lambda: self._statistics_sheet(project_name, context), index=True)
+            
+            # إنشاء ملف Excel مع جميع الأوراق
+            with StreamingExcelWriter(filepath) as writer:
+                pipeline.write(writer)
+            
+            self.last_report_timings = context.timings
+            
+            self._store_report('مخصص', project_name, start_date, end_date, data_version, filepath, pipeline.frames)
+            return filepath, message
             
         except Exception as e:
             return None, f"خطأ في إنشاء التقرير المخصص: {str(e)}"
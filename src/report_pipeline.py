@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+خط إنتاج أوراق التقارير متعددة الأوراق
+أقسام التقرير (التحليل حسب التصنيف، التحليل الزمني، أعلى العناصر، حركات الدخول والخروج،
+التنبيهات، الإحصائيات...) حسابات pandas مستقلة، فتحسب بالتوازي على مجموعة خيوط،
+ثم تكتب الأوراق إلى الملف بالترتيب من الخيط الرئيسي فقط
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+# عدد الخيوط لحساب أقسام التقرير
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class ReportPipeline:
+    """أوراق تقرير واحد: تضاف بالترتيب، تحسب بالتوازي، وتكتب بنفس الترتيب"""
+
+    def __init__(self, context=None, max_workers=MAX_WORKERS):
+        """
+        context: سياق التقرير (ReportContext) لتسجيل وقت كل ورقة، اختياري
+        """
+        self.context = context
+        self.max_workers = max_workers
+        self.sections = []  # [(اسم الورقة, دالة الحساب, كتابة الفهرس)]
+        self.frames = {}  # جداول الأوراق المكتوبة {اسم الورقة: DataFrame} بترتيب الكتابة
+
+    def add(self, sheet_name, compute, index=False):
+        """إضافة ورقة: compute ترجع DataFrame (أو None/فارغ لتجاهل الورقة)"""
+        self.sections.append((sheet_name, compute, index))
+
+    def _timed(self, name):
+        if self.context is not None:
+            return self.context.timed(name)
+        return nullcontext()
+
+    def _compute(self, sheet_name, compute):
+        """حساب ورقة واحدة (خطأ في ورقة لا يوقف باقي التقرير)"""
+        try:
+            with self._timed(sheet_name):
+                return compute()
+        except Exception as e:
+            print(f"خطأ في {sheet_name}: {e}")
+            return None
+
+    def compute(self):
+        """حساب جميع الأوراق بالتوازي، والنتيجة بترتيب الإضافة [(اسم الورقة, DataFrame, كتابة الفهرس)]"""
+        workers = max(1, min(self.max_workers, len(self.sections)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report") as pool:
+            futures = [pool.submit(self._compute, sheet_name, compute)
+                       for sheet_name, compute, _ in self.sections]
+            return [(sheet_name, future.result(), index)
+                    for (sheet_name, _, index), future in zip(self.sections, futures)]
+
+    def write(self, writer):
+        """حساب الأوراق ثم كتابتها بالترتيب (الكتابة وحدها متسلسلة)، ويرجع أسماء الأوراق المكتوبة"""
+        written = []
+        self.frames = {}
+        for sheet_name, df, index in self.compute():
+            if df is None or df.empty:
+                continue
+            try:
+                with self._timed(f"كتابة: {sheet_name}"):
+                    writer.write(df, sheet_name=sheet_name, index=index)
+                written.append(sheet_name)
+                self.frames[sheet_name] = df
+            except Exception as e:
+                print(f"خطأ في كتابة {sheet_name}: {e}")
+        return written
+
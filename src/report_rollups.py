@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+ملخصات الحركات اليومية المحفوظة لكل مشروع (لتقارير التحليل)
+لكل (يوم، عنصر، تصنيف، نوع عملية): مجموع الكميات وعدد الحركات.
+يتم تحديث الملخص بالمعاملات الجديدة من السجل الإلحاقي، فيبقى حجمه صغيراً مهما طال سجل المشروع،
+وتحسب منه التحليلات الشهرية وحسب التصنيف وأعلى العناصر وإحصائيات الفترات
+بدلاً من تحويل تاريخ كل حركة وتجميع السجل بالكامل في كل تقرير
+"""
+
+import json
+
+import pandas as pd
+
+from stock_balances import DerivedTable, _clean_value, _to_number
+
+# أعمدة جدول الملخصات (اليوم بصيغة YYYY-MM-DD، وفارغ للحركات بدون تاريخ صالح)
+ROLLUP_COLUMNS = ['اليوم', 'اسم_العنصر', 'التصنيف', 'نوع_العملية', 'الكمية', 'عدد_الحركات']
+
+DAY_FORMAT = '%Y-%m-%d'
+
+
+def _day(value):
+    """اليوم بصيغة YYYY-MM-DD ('' للتواريخ غير الصالحة)"""
+    timestamp = pd.to_datetime(value, errors='coerce')
+    if pd.isna(timestamp):
+        return ''
+    return timestamp.strftime(DAY_FORMAT)
+
+
+def _row_key(day, item_name, category, operation_type):
+    return json.dumps([day, item_name, category, operation_type], ensure_ascii=False)
+
+
+def build_rollups(transactions_df):
+    """بناء جدول الملخصات من جدول حركات في تمريرة واحدة"""
+    if transactions_df is None or transactions_df.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    def column(name):
+        # الأعمدة الناقصة في الملفات القديمة تعامل كقيم فارغة
+        if name in transactions_df.columns:
+            return transactions_df[name]
+        return pd.Series(None, index=transactions_df.index, dtype=object)
+
+    frame = pd.DataFrame({
+        'اليوم': pd.to_datetime(column('التاريخ'), errors='coerce').dt.normalize(),
+        'اسم_العنصر': column('اسم_العنصر'),
+        'التصنيف': column('التصنيف'),
+        'نوع_العملية': column('نوع_العملية'),
+        'الكمية': pd.to_numeric(column('الكمية'), errors='coerce').fillna(0),
+    })
+    # الحركات بدون اسم عنصر لا تدخل في الملخصات (مثل التحديث التدريجي)
+    frame = frame[frame['اسم_العنصر'].notna()]
+    rollups = frame.groupby(['اليوم', 'اسم_العنصر', 'التصنيف', 'نوع_العملية'], dropna=False).agg(
+        الكمية=('الكمية', 'sum'),
+        عدد_الحركات=('الكمية', 'size'),
+    ).reset_index()
+
+    # تحويل الأيام إلى نص بعد التجميع (صف لكل يوم وعنصر بدلاً من كل حركة)
+    rollups['اليوم'] = rollups['اليوم'].dt.strftime(DAY_FORMAT).fillna('')
+    return rollups[ROLLUP_COLUMNS]
+
+
+def filter_rollups(rollups, start_date=None, end_date=None):
+    """ملخصات الأيام من start_date إلى end_date (شاملة الحدين، حسب اليوم فقط)"""
+    mask = rollups['اليوم'] != ''
+    if start_date is not None:
+        mask &= rollups['اليوم'] >= _day(start_date)
+    if end_date is not None:
+        mask &= rollups['اليوم'] <= _day(end_date)
+    return rollups[mask]
+
+
+def category_analysis(rollups):
+    """إجمالي الكميات وعدد العمليات لكل تصنيف ونوع عملية"""
+    analysis = rollups.groupby(['التصنيف', 'نوع_العملية']).agg(
+        إجمالي_الكمية=('الكمية', 'sum'),
+        عدد_العمليات=('عدد_الحركات', 'sum'),
+    ).reset_index()
+    return analysis
+
+
+def monthly_analysis(rollups):
+    """إجمالي الكميات وعدد العمليات لكل شهر ونوع عملية"""
+    dated = rollups[rollups['اليوم'] != '']
+    analysis = dated.groupby([dated['اليوم'].str[:7].rename('الشهر'), 'نوع_العملية']).agg(
+        إجمالي_الكمية=('الكمية', 'sum'),
+        عدد_العمليات=('عدد_الحركات', 'sum'),
+    ).reset_index()
+    return analysis
+
+
+def top_items_analysis(rollups, limit=20):
+    """العناصر الأكثر حركة (حسب عدد العمليات)"""
+    analysis = rollups.groupby('اسم_العنصر').agg(
+        إجمالي_الكمية=('الكمية', 'sum'),
+        عدد_العمليات=('عدد_الحركات', 'sum'),
+        أنواع_العمليات=('نوع_العملية', lambda x: ', '.join(x.unique())),
+    ).reset_index()
+    return analysis.sort_values('عدد_العمليات', ascending=False).head(limit)
+
+
+def period_statistics(rollups):
+    """إحصائيات فترة (أعداد وكميات الدخول والخروج، العناصر والتصنيفات المختلفة)"""
+    if rollups.empty:
+        return {}
+
+    incoming = rollups[rollups['نوع_العملية'] == 'دخول']
+    outgoing = rollups[rollups['نوع_العملية'] == 'خروج']
+    return {
+        'إجمالي عدد الحركات': int(rollups['عدد_الحركات'].sum()),
+        'عدد حركات الدخول': int(incoming['عدد_الحركات'].sum()),
+        'عدد حركات الخروج': int(outgoing['عدد_الحركات'].sum()),
+        'إجمالي كمية الدخول': incoming['الكمية'].sum(),
+        'إجمالي كمية الخروج': outgoing['الكمية'].sum(),
+        'عدد العناصر المختلفة': rollups['اسم_العنصر'].nunique(),
+        'عدد التصنيفات': rollups['التصنيف'].nunique(),
+    }
+
+
+class ReportRollups(DerivedTable):
+    """ملخصات الحركات اليومية المحفوظة في projects/<name>_Rollups.json"""
+
+    file_suffix = "_Rollups.json"
+    label = "ملخصات الحركات"
+
+    def get_rollups_file(self, project_name):
+        """الحصول على مسار ملف الملخصات الخاص بالمشروع"""
+        return self.get_state_file(project_name)
+
+    def _state_to_json(self, state):
+        return {'rows': state['rows']}
+
+    def _state_from_json(self, data):
+        return {'rows': data['rows']}
+
+    def _apply_record(self, state, record):
+        """إضافة معاملة واحدة إلى ملخص يومها"""
+        item_name = _clean_value(record.get('اسم_العنصر'))
+        if item_name is None:
+            return
+
+        key = _row_key(_day(record.get('التاريخ')), item_name,
+                       _clean_value(record.get('التصنيف')), _clean_value(record.get('نوع_العملية')))
+        totals = state['rows'].setdefault(key, [0, 0])
+        totals[0] += _to_number(record.get('الكمية'))
+        totals[1] += 1
+
+    def _build_state(self, transactions_df):
+        """بناء الملخصات من جميع الحركات"""
+        rows = {}
+        for day, item_name, category, operation_type, quantity, count in build_rollups(
+                transactions_df).itertuples(index=False, name=None):
+            key = _row_key(day, _clean_value(item_name), _clean_value(category), _clean_value(operation_type))
+            rows[key] = [_to_number(quantity), int(count)]
+        return {'rows': rows}
+
+    def get_frame(self, project_name, load_transactions):
+        """جدول الملخصات كـ DataFrame (مرتب حسب اليوم)"""
+        rows = self.get_state(project_name, load_transactions)['rows']
+        records = [json.loads(key) + totals for key, totals in rows.items()]
+        frame = pd.DataFrame(records, columns=ROLLUP_COLUMNS)
+        return frame.sort_values('اليوم', kind='stable').reset_index(drop=True)
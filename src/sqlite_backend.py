@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+واجهة تخزين SQLite لبيانات المشاريع
+بديل اختياري لملفات Excel يحفظ العناصر والحركات والتعديلات لجميع المشاريع في
+قاعدة بيانات واحدة مع فهارس تجعل استعلامات الفترات الزمنية ورصيد العنصر
+استعلامات مفهرسة بدلاً من قراءة الملف بالكامل. تبقى ملفات Excel صيغة للاستيراد والتصدير
+
+التفعيل من خلال الملف projects/storage_settings.json:
+    {"backend": "sqlite"}
+
+الاستخدام من سطر الأوامر:
+    python src/sqlite_backend.py import <اسم_المشروع> | --all
+    python src/sqlite_backend.py export <اسم_المشروع> | --all
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+
+STORAGE_SETTINGS_FILE = os.path.join("projects", "storage_settings.json")
+DEFAULT_DB_FILE = os.path.join("projects", "inventory.db")
+
+# عمود داخلي لتمييز بيانات كل مشروع
+PROJECT_COLUMN = '_project'
+
+ITEM_COLUMNS = ['Item_ID', 'اسم_العنصر', 'التصنيف', 'مدة_الصلاحية_بالأيام', 'وصف']
+
+TRANSACTION_COLUMNS = [
+    'رقم_المعاملة', 'المشروع', 'التاريخ', 'اسم_العنصر', 'التصنيف',
+    'نوع_العملية', 'الكمية', 'اسم_المستلم', 'مدة_الصلاحية_بالأيام',
+    'ملاحظات', 'رقم_المعاملة_المرجعية'
+]
+
+MODIFICATION_COLUMNS = [
+    'تاريخ_التعديل', 'معرف_المعاملة_الأصلية', 'اسم_العنصر', 'التصنيف',
+    'نوع_العملية', 'تاريخ_المعاملة_الأصلية', 'الكمية_الأصلية', 'الكمية_الجديدة',
+    'فرق_الكمية', 'سبب_التعديل', 'ملاحظات', 'المستخدم', 'رقم_المعاملة_الأصلية'
+]
+
+TABLE_COLUMNS = {
+    'items': ITEM_COLUMNS,
+    'transactions': TRANSACTION_COLUMNS,
+    'modifications': MODIFICATION_COLUMNS,
+}
+
+# ملفات Excel المقابلة لكل جدول
+TABLE_FILE_SUFFIXES = {
+    '_Items.xlsx': 'items',
+    '_Transactions.xlsx': 'transactions',
+    '_Modifications.xlsx': 'modifications',
+}
+
+INDEXES = [
+    ('idx_transactions_item_date', 'transactions', ['اسم_العنصر', 'التاريخ']),
+    ('idx_transactions_id', 'transactions', ['رقم_المعاملة']),
+    ('idx_transactions_type_date', 'transactions', ['نوع_العملية', 'التاريخ']),
+    ('idx_transactions_date', 'transactions', ['التاريخ']),
+    ('idx_items_id', 'items', ['Item_ID']),
+]
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _quote(name):
+    """وضع اسم العمود بين علامتي تنصيص (الأعمدة بأسماء عربية)"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _to_sql_value(value):
+    """تحويل القيمة إلى نوع يدعمه SQLite"""
+    if value is None:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime(DATE_FORMAT)
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, 'item'):
+        # تحويل أنواع numpy إلى أنواع Python
+        return value.item()
+    return value
+
+
+def _format_date(value):
+    """تحويل حد الفترة إلى نص بنفس صيغة التواريخ المحفوظة"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = pd.to_datetime(value)
+    return value.strftime(DATE_FORMAT)
+
+
+class SQLiteBackend:
+    """تخزين بيانات المشاريع في قاعدة بيانات SQLite"""
+
+    def __init__(self, db_file=DEFAULT_DB_FILE):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._initialize()
+
+    def _connect(self):
+        """اتصال مستقل لكل خيط تنفيذ"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_file)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """إغلاق الاتصال الخاص بالخيط الحالي"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _initialize(self):
+        """إنشاء الجداول والفهارس إذا لم تكن موجودة"""
+        conn = self._connect()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS projects (name TEXT PRIMARY KEY, imported_at TEXT)")
+            # رقم يزداد مع كل كتابة في جداول المشروع (بصمة رخيصة لبيانات المشروع)
+            if 'data_version' not in [row[1] for row in conn.execute("PRAGMA table_info(projects)")]:
+                conn.execute("ALTER TABLE projects ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+            for table, columns in TABLE_COLUMNS.items():
+                column_defs = ", ".join([f"{PROJECT_COLUMN} TEXT NOT NULL"] + [_quote(c) for c in columns])
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_defs})")
+            for index_name, table, columns in INDEXES:
+                index_columns = ", ".join([PROJECT_COLUMN] + [_quote(c) for c in columns])
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({index_columns})")
+
+    def _get_columns(self, conn, table):
+        """أعمدة الجدول الحالية (بدون العمود الداخلي)"""
+        rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        return [row[1] for row in rows if row[1] != PROJECT_COLUMN]
+
+    def _ensure_columns(self, conn, table, columns):
+        """إضافة الأعمدة الجديدة للجدول (للتوافق مع إضافة أعمدة لملفات Excel)"""
+        existing = self._get_columns(conn, table)
+        for column in columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(column)}")
+                existing.append(column)
+        return existing
+
+    def _insert_rows(self, conn, project_name, table, records):
+        """إدخال مجموعة صفوف في جدول"""
+        if not records:
+            return
+        columns = []
+        for record in records:
+            for column in record:
+                if column not in columns:
+                    columns.append(column)
+        self._ensure_columns(conn, table, columns)
+
+        placeholders = ", ".join(["?"] * (len(columns) + 1))
+        column_list = ", ".join([PROJECT_COLUMN] + [_quote(c) for c in columns])
+        conn.executemany(
+            f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})",
+            [[project_name] + [_to_sql_value(record.get(c)) for c in columns] for record in records]
+        )
+
+    def _bump_data_version(self, conn, project_name):
+        """زيادة رقم إصدار بيانات المشروع (ضمن نفس المعاملة التي تكتب الجداول)"""
+        conn.execute("UPDATE projects SET data_version = data_version + 1 WHERE name = ?", (project_name,))
+
+    def _query(self, sql, params=()):
+        """تنفيذ استعلام وإرجاع النتيجة كـ DataFrame"""
+        conn = self._connect()
+        cursor = conn.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    @staticmethod
+    def get_table_for_file(file_path):
+        """تحديد (اسم المشروع، الجدول) المقابلين لملف Excel خاص بمشروع (أو None)"""
+        if os.path.basename(os.path.dirname(os.path.abspath(file_path))) != "projects":
+            return None
+        file_name = os.path.basename(file_path)
+        for suffix, table in TABLE_FILE_SUFFIXES.items():
+            if file_name.endswith(suffix):
+                return file_name[:-len(suffix)], table
+        return None
+
+    def has_project(self, project_name):
+        """التحقق مما إذا كانت بيانات المشروع مستوردة في قاعدة البيانات"""
+        row = self._connect().execute(
+            "SELECT 1 FROM projects WHERE name = ?", (project_name,)
+        ).fetchone()
+        return row is not None
+
+    def import_project(self, project_name, tables):
+        """استيراد بيانات مشروع (قاموس: اسم الجدول -> DataFrame) واستبدال أي بيانات سابقة"""
+        conn = self._connect()
+        with conn:
+            for table, df in tables.items():
+                conn.execute(f"DELETE FROM {table} WHERE {PROJECT_COLUMN} = ?", (project_name,))
+                if df is not None and not df.empty:
+                    self._insert_rows(conn, project_name, table, df.to_dict('records'))
+            # لا يستخدم INSERT OR REPLACE حتى لا يعود رقم الإصدار للصفر عند إعادة الاستيراد
+            imported_at = datetime.now().strftime(DATE_FORMAT)
+            updated = conn.execute(
+                "UPDATE projects SET imported_at = ?, data_version = data_version + 1 WHERE name = ?",
+                (imported_at, project_name)
+            )
+            if updated.rowcount == 0:
+                conn.execute(
+                    "INSERT INTO projects (name, imported_at, data_version) VALUES (?, ?, 1)",
+                    (project_name, imported_at)
+                )
+
+    def get_data_version(self, project_name):
+        """(تاريخ الاستيراد، رقم الإصدار) لبيانات المشروع، أو None إذا لم يستورد بعد"""
+        row = self._connect().execute(
+            "SELECT imported_at, data_version FROM projects WHERE name = ?", (project_name,)
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def read_table(self, project_name, table):
+        """قراءة جدول مشروع كاملاً بترتيب الإدخال"""
+        columns = self._get_columns(self._connect(), table)
+        column_list = ", ".join(_quote(c) for c in columns)
+        return self._query(
+            f"SELECT {column_list} FROM {table} WHERE {PROJECT_COLUMN} = ? ORDER BY rowid",
+            (project_name,)
+        )
+
+    def write_table(self, project_name, table, df):
+        """استبدال جدول مشروع كاملاً"""
+        conn = self._connect()
+        with conn:
+            conn.execute(f"DELETE FROM {table} WHERE {PROJECT_COLUMN} = ?", (project_name,))
+            self._insert_rows(conn, project_name, table, df.to_dict('records'))
+            self._bump_data_version(conn, project_name)
+
+    def append_rows(self, project_name, table, records):
+        """إضافة صفوف جديدة لجدول مشروع"""
+        if isinstance(records, dict):
+            records = [records]
+        conn = self._connect()
+        with conn:
+            self._insert_rows(conn, project_name, table, records)
+            self._bump_data_version(conn, project_name)
+
+    def get_transactions_in_range(self, project_name, start_date=None, end_date=None):
+        """حركات المشروع في فترة زمنية (استعلام مفهرس على التاريخ)"""
+        columns = self._get_columns(self._connect(), 'transactions')
+        column_list = ", ".join(_quote(c) for c in columns)
+        sql = f"SELECT {column_list} FROM transactions WHERE {PROJECT_COLUMN} = ?"
+        params = [project_name]
+        if start_date is not None:
+            sql += ' AND "التاريخ" >= ?'
+            params.append(_format_date(start_date))
+        if end_date is not None:
+            sql += ' AND "التاريخ" <= ?'
+            params.append(_format_date(end_date))
+        return self._query(sql + " ORDER BY rowid", params)
+
+    def get_item_balance(self, project_name, item_name):
+        """رصيد عنصر واحد (استعلام مفهرس على اسم العنصر)"""
+        row = self._connect().execute(
+            """
+            SELECT COALESCE(SUM(CASE "نوع_العملية"
+                WHEN 'دخول' THEN "الكمية"
+                WHEN 'تعديل زيادة' THEN "الكمية"
+                WHEN 'خروج' THEN -"الكمية"
+                WHEN 'تعديل نقص' THEN -"الكمية"
+                ELSE 0 END), 0)
+            FROM transactions
+            WHERE _project = ? AND "اسم_العنصر" = ?
+            """,
+            (project_name, item_name)
+        ).fetchone()
+        return row[0]
+
+    def get_inventory_summary(self, project_name):
+        """ملخص المخزون لجميع العناصر بتجميع واحد داخل قاعدة البيانات"""
+        df = self._query(
+            """
+            SELECT b."اسم_العنصر" AS "اسم_العنصر",
+                   t."التصنيف" AS "التصنيف",
+                   b.incoming - b.outgoing + b.increase - b.decrease AS "الكمية_الحالية",
+                   b.incoming AS "إجمالي_الداخل",
+                   b.outgoing AS "إجمالي_الخارج",
+                   t."مدة_الصلاحية_بالأيام" AS "مدة_الصلاحية_بالأيام"
+            FROM (
+                SELECT "اسم_العنصر",
+                       SUM(CASE WHEN "نوع_العملية" = 'دخول' THEN "الكمية" ELSE 0 END) AS incoming,
+                       SUM(CASE WHEN "نوع_العملية" = 'خروج' THEN "الكمية" ELSE 0 END) AS outgoing,
+                       SUM(CASE WHEN "نوع_العملية" = 'تعديل زيادة' THEN "الكمية" ELSE 0 END) AS increase,
+                       SUM(CASE WHEN "نوع_العملية" = 'تعديل نقص' THEN "الكمية" ELSE 0 END) AS decrease,
+                       MIN(rowid) AS first_row,
+                       MAX(rowid) AS last_row
+                FROM transactions
+                WHERE _project = ? AND "اسم_العنصر" IS NOT NULL
+                GROUP BY "اسم_العنصر"
+            ) b
+            JOIN transactions t ON t.rowid = b.last_row
+            ORDER BY b.first_row
+            """,
+            (project_name,)
+        )
+        return df if not df.empty else pd.DataFrame()
+
+
+def load_storage_backend(settings_file=STORAGE_SETTINGS_FILE):
+    """إنشاء واجهة التخزين المحددة في الإعدادات (None = ملفات Excel)"""
+    try:
+        if not os.path.exists(settings_file):
+            return None
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+        if settings.get('backend') == 'sqlite':
+            return SQLiteBackend(settings.get('db_file', DEFAULT_DB_FILE))
+    except Exception as e:
+        print(f"خطأ في تحميل إعدادات التخزين، سيتم استخدام ملفات Excel: {e}")
+    return None
+
+
+if __name__ == "__main__":
+    import sys
+
+    from excel_manager import excel_manager
+
+    if len(sys.argv) < 3 or sys.argv[1] not in ('import', 'export'):
+        print("الاستخدام: python src/sqlite_backend.py import|export <اسم_المشروع> | --all")
+        sys.exit(1)
+
+    if excel_manager.storage_backend is None:
+        excel_manager.storage_backend = SQLiteBackend()
+
+    if sys.argv[2] == "--all":
+        project_names = excel_manager.get_all_projects()
+    else:
+        project_names = sys.argv[2:]
+
+    for name in project_names:
+        if sys.argv[1] == 'import':
+            success = excel_manager.import_project_from_excel(name)
+        else:
+            success = excel_manager.export_project_to_excel(name)
+        print(f"{'✅' if success else '❌'} {sys.argv[1]}: {name}")
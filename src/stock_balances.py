@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+جدول أرصدة المخزون المحفوظ لكل مشروع (Materialized View)
+يتم تحديث رصيد العنصر بالمعاملات الجديدة من السجل الإلحاقي بدلاً من إعادة حساب
+جميع الحركات، ويُعاد بناء الجدول بالكامل فقط عند دمج السجل أو عند الطلب أو عند
+اكتشاف أن ملفات الحركات تغيرت من خارج النظام
+"""
+
+import json
+import os
+
+import pandas as pd
+
+from project_lock import project_lock
+from stock_calculator import OPERATION_FIELDS, SUMMARY_COLUMNS, aggregate_balances
+from transaction_journal import TransactionJournal
+
+
+def _clean_value(value):
+    """تحويل القيم الفارغة (NaN) إلى None لحفظها في JSON"""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, 'item'):
+        # تحويل أنواع numpy إلى أنواع Python
+        return value.item()
+    return value
+
+
+def _to_number(value):
+    """تحويل الكمية إلى رقم (0 للقيم غير الصالحة)"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0
+    if pd.isna(number):
+        return 0
+    return int(number) if number.is_integer() else number
+
+
+def get_transactions_signature(projects_path, project_name):
+    """بصمة ملفات حركات المشروع (ملف Excel والسجل الإلحاقي) لاكتشاف أي تغيير خارجي"""
+    signature = {}
+    for key, file_name in (
+        ('transactions', f"{project_name}_Transactions.xlsx"),
+        ('journal', f"{project_name}_Transactions.journal"),
+    ):
+        try:
+            stat = os.stat(os.path.join(projects_path, file_name))
+            signature[key] = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            signature[key] = None
+    return signature
+
+
+def rebuild_if_stale(table, project_name, load_transactions):
+    """
+    إعادة بناء جدول مشتق من الحركات (الأرصدة، الدفعات، الملخصات) إذا لم يعد متطابقاً مع ملفاتها
+    التحقق والقراءة والبناء والحفظ تتم تحت قفل المشروع، والبصمة تؤخذ قبل القراءة،
+    حتى لا يختم الجدول ببصمة معاملة سجلت أثناء القراءة وهو لا يحتويها
+    ترجع الحالة المعاد بناؤها أو None إذا كان الجدول متطابقاً
+    """
+    if not table.is_stale(project_name):
+        return None
+    with project_lock(project_name, table.projects_path):
+        if not table.is_stale(project_name):
+            return None
+        signature = get_transactions_signature(table.projects_path, project_name)
+        return table.rebuild(project_name, load_transactions(project_name), signature)
+
+
+class DerivedTable:
+    """
+    أساس الجداول المشتقة من حركات المشروع (الأرصدة، الدفعات، الملخصات)
+    الملف المحفوظ لقطة (snapshot) تكتب عند إعادة البناء فقط - ومنها دمج السجل الإلحاقي -
+    مع بصمة ملف Excel وموضع السجل الإلحاقي الذي وصلت إليه. المعاملات المسجلة بعد اللقطة
+    تقرأ من نهاية السجل الإلحاقي وتطبق على الحالة في الذاكرة، فلا يعاد حفظ الملف مع كل معاملة
+    """
+
+    # لاحقة ملف اللقطة واسم الجدول في رسائل التحذير (تحدد في كل جدول)
+    file_suffix = None
+    label = None
+
+    def __init__(self, projects_path="projects"):
+        self.projects_path = projects_path
+        self.journal = TransactionJournal(projects_path)
+        # اسم المشروع -> {'signature': بصمة ملف Excel، 'journal_offset': موضع السجل، 'state': الحالة}
+        self._cache = {}
+
+    def get_state_file(self, project_name):
+        """الحصول على مسار ملف اللقطة الخاص بالمشروع"""
+        return os.path.join(self.projects_path, f"{project_name}{self.file_suffix}")
+
+    def _build_state(self, transactions_df):
+        """بناء الحالة من جميع الحركات"""
+        raise NotImplementedError
+
+    def _apply_record(self, state, record):
+        """تطبيق معاملة واحدة على الحالة"""
+        raise NotImplementedError
+
+    def _state_to_json(self, state):
+        """محتوى الحالة في ملف اللقطة (قاموس)"""
+        raise NotImplementedError
+
+    def _state_from_json(self, data):
+        """الحالة من محتوى ملف اللقطة"""
+        raise NotImplementedError
+
+    def _get_excel_signature(self, project_name):
+        return get_transactions_signature(self.projects_path, project_name)['transactions']
+
+    def _read_snapshot(self, project_name):
+        """قراءة ملف اللقطة (None إذا لم يوجد أو كان تالفاً)"""
+        state_file = self.get_state_file(project_name)
+        if not os.path.exists(state_file):
+            return None
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {
+                'signature': data['signature'],
+                'journal_offset': data['journal_offset'],
+                'state': self._state_from_json(data),
+            }
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"تحذير: ملف {self.label} تالف وسيعاد بناؤه: {e}")
+            return None
+
+    def _load_entry(self, project_name):
+        """
+        اللقطة من الذاكرة أو من الملف بعد تطبيق المعاملات الجديدة في السجل الإلحاقي
+        ترجع None إذا لم توجد أو لم تعد متطابقة مع ملفات الحركات
+        """
+        signature = self._get_excel_signature(project_name)
+        entry = self._cache.get(project_name)
+        if entry is None or entry['signature'] != signature:
+            # قد يكون برنامج آخر دمج السجل وحفظ لقطة جديدة
+            entry = self._read_snapshot(project_name)
+            if entry is None or entry['signature'] != signature:
+                self._cache.pop(project_name, None)
+                return None
+            self._cache[project_name] = entry
+
+        if not self._catch_up(project_name, entry):
+            self._cache.pop(project_name, None)
+            return None
+        return entry
+
+    def _catch_up(self, project_name, entry):
+        """تطبيق المعاملات المسجلة بعد موضع اللقطة (False إذا أصبح السجل أقصر منه)"""
+        size = self.journal.size(project_name)
+        if size == entry['journal_offset']:
+            return True
+        if size < entry['journal_offset']:
+            return False
+        # تحت قفل المشروع حتى لا تطبق المعاملات مرتين من خيطين، ولا تتغير الحالة أثناء قراءتها
+        with project_lock(project_name, self.projects_path):
+            records, offset = self.journal.read_from(project_name, entry['journal_offset'])
+            for record in records:
+                self._apply_record(entry['state'], record)
+            entry['journal_offset'] = offset
+        return True
+
+    def _save_snapshot(self, project_name, state, signature=None):
+        """حفظ لقطة الحالة مع بصمة ملفات الحركات وقت بنائها (الحالية إذا لم تحدد)"""
+        if signature is None:
+            signature = get_transactions_signature(self.projects_path, project_name)
+        journal = signature.get('journal')
+        entry = {
+            'signature': signature.get('transactions'),
+            'journal_offset': journal[1] if journal else 0,
+            'state': state,
+        }
+        self._cache[project_name] = entry
+
+        data = self._state_to_json(state)
+        data['signature'] = entry['signature']
+        data['journal_offset'] = entry['journal_offset']
+
+        os.makedirs(self.projects_path, exist_ok=True)
+        state_file = self.get_state_file(project_name)
+        temp_file = state_file + ".tmp"
+        # قد يعاد بناء الجدول أثناء القراءة لذلك تتم الكتابة تحت قفل المشروع
+        with project_lock(project_name, self.projects_path):
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, state_file)
+
+    def is_stale(self, project_name):
+        """التحقق مما إذا كان الجدول غير متطابق مع ملفات الحركات"""
+        return self._load_entry(project_name) is None
+
+    def rebuild(self, project_name, transactions_df, signature=None):
+        """
+        إعادة بناء الجدول بالكامل من جميع الحركات
+        signature: بصمة ملفات الحركات وقت قراءة transactions_df (الحالية إذا لم تحدد)
+        """
+        state = self._build_state(transactions_df)
+        self._save_snapshot(project_name, state, signature)
+        return state
+
+    def invalidate(self, project_name):
+        """حذف اللقطة المحفوظة لإجبار إعادة بناء الجدول عند القراءة التالية"""
+        self._cache.pop(project_name, None)
+        state_file = self.get_state_file(project_name)
+        if os.path.exists(state_file):
+            os.remove(state_file)
+
+    def get_state(self, project_name, load_transactions):
+        """الحصول على الحالة مع إعادة بنائها إذا كانت غير متطابقة مع الحركات"""
+        state = rebuild_if_stale(self, project_name, load_transactions)
+        return state if state is not None else self._cache[project_name]['state']
+
+
+class StockBalances(DerivedTable):
+    """جدول أرصدة العناصر المحفوظ في projects/<name>_Balances.json"""
+
+    file_suffix = "_Balances.json"
+    label = "الأرصدة"
+
+    def get_balances_file(self, project_name):
+        """الحصول على مسار ملف الأرصدة الخاص بالمشروع"""
+        return self.get_state_file(project_name)
+
+    def _state_to_json(self, state):
+        return {'items': state['items']}
+
+    def _state_from_json(self, data):
+        return {'items': data['items']}
+
+    def _apply_record(self, state, record):
+        """تحديث رصيد عنصر واحد بمعاملة واحدة"""
+        items = state['items']
+        item_name = _clean_value(record.get('اسم_العنصر'))
+        if item_name is None:
+            return
+
+        balance = items.get(item_name)
+        if balance is None:
+            balance = {
+                'incoming': 0,
+                'outgoing': 0,
+                'adjust_increase': 0,
+                'adjust_decrease': 0,
+            }
+            items[item_name] = balance
+
+        field = OPERATION_FIELDS.get(record.get('نوع_العملية'))
+        if field:
+            balance[field] += _to_number(record.get('الكمية'))
+
+        # آخر معلومات للعنصر حسب ترتيب الحركات
+        balance['category'] = _clean_value(record.get('التصنيف'))
+        balance['shelf_life'] = _clean_value(record.get('مدة_الصلاحية_بالأيام'))
+
+    def _build_state(self, transactions_df):
+        """بناء جدول الأرصدة من جميع الحركات"""
+        items = {}
+        balances = aggregate_balances(transactions_df)
+        for item_name, row in balances.iterrows():
+            items[_clean_value(item_name)] = {
+                'incoming': _to_number(row['incoming']),
+                'outgoing': _to_number(row['outgoing']),
+                'adjust_increase': _to_number(row['adjust_increase']),
+                'adjust_decrease': _to_number(row['adjust_decrease']),
+                'category': _clean_value(row['category']),
+                'shelf_life': _clean_value(row['shelf_life']),
+            }
+        return {'items': items}
+
+    def get_item_balance(self, project_name, item_name, load_transactions):
+        """الحصول على الرصيد الحالي لعنصر واحد"""
+        balance = self.get_state(project_name, load_transactions)['items'].get(item_name)
+        if balance is None:
+            return 0
+        return (balance['incoming'] - balance['outgoing']
+                + balance['adjust_increase'] - balance['adjust_decrease'])
+
+    def get_summary(self, project_name, load_transactions):
+        """ملخص المخزون لجميع العناصر كـ DataFrame"""
+        items = self.get_state(project_name, load_transactions)['items']
+        if not items:
+            return pd.DataFrame()
+
+        rows = []
+        for item_name, balance in items.items():
+            rows.append({
+                'اسم_العنصر': item_name,
+                'التصنيف': balance.get('category'),
+                'الكمية_الحالية': (balance['incoming'] - balance['outgoing']
+                                   + balance['adjust_increase'] - balance['adjust_decrease']),
+                'إجمالي_الداخل': balance['incoming'],
+                'إجمالي_الخارج': balance['outgoing'],
+                'مدة_الصلاحية_بالأيام': balance.get('shelf_life'),
+            })
+        return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
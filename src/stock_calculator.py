@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+حساب أرصدة المخزون من جدول الحركات
+جميع الحسابات تتم في تمريرة واحدة باستخدام عمود كمية موقّعة (موجب للإدخال
+وسالب للإخراج) وتجميع واحد حسب اسم العنصر بدلاً من تصفية الحركات لكل عنصر
+"""
+
+import pandas as pd
+
+
+# أعمدة ملخص المخزون
+SUMMARY_COLUMNS = [
+    'اسم_العنصر', 'التصنيف', 'الكمية_الحالية',
+    'إجمالي_الداخل', 'إجمالي_الخارج', 'مدة_الصلاحية_بالأيام'
+]
+
+# إشارة كل نوع عملية في رصيد العنصر
+OPERATION_SIGNS = {
+    'دخول': 1,
+    'خروج': -1,
+    'تعديل زيادة': 1,
+    'تعديل نقص': -1,
+}
+
+# اسم حقل الإجمالي لكل نوع عملية
+OPERATION_FIELDS = {
+    'دخول': 'incoming',
+    'خروج': 'outgoing',
+    'تعديل زيادة': 'adjust_increase',
+    'تعديل نقص': 'adjust_decrease',
+}
+
+
+def signed_quantities(transactions_df):
+    """الكمية موقّعة حسب نوع العملية (العمليات غير المعروفة لا تؤثر على الرصيد)"""
+    quantities = pd.to_numeric(transactions_df['الكمية'], errors='coerce').fillna(0)
+    signs = transactions_df['نوع_العملية'].map(OPERATION_SIGNS).fillna(0)
+    return quantities * signs
+
+
+def aggregate_balances(transactions_df):
+    """
+    حساب أرصدة جميع العناصر في تمريرة واحدة
+
+    يعيد DataFrame مفهرس باسم العنصر (بترتيب أول ظهور) يحتوي على:
+    incoming, outgoing, adjust_increase, adjust_decrease, current, category, shelf_life
+    حيث category و shelf_life من آخر حركة للعنصر
+    """
+    if transactions_df is None or transactions_df.empty:
+        return pd.DataFrame(columns=list(OPERATION_FIELDS.values()) + ['current', 'category', 'shelf_life'])
+
+    quantities = pd.to_numeric(transactions_df['الكمية'], errors='coerce').fillna(0)
+    operations = transactions_df['نوع_العملية']
+
+    frame = pd.DataFrame({'item': transactions_df['اسم_العنصر']})
+    for operation, field in OPERATION_FIELDS.items():
+        frame[field] = quantities.where(operations == operation, 0)
+    frame['current'] = quantities * operations.map(OPERATION_SIGNS).fillna(0)
+
+    balances = frame.groupby('item', sort=False).sum()
+
+    # آخر معلومات للعنصر حسب ترتيب الحركات
+    last_entries = transactions_df.drop_duplicates('اسم_العنصر', keep='last').set_index('اسم_العنصر')
+    balances['category'] = last_entries['التصنيف'].reindex(balances.index)
+    if 'مدة_الصلاحية_بالأيام' in last_entries.columns:
+        balances['shelf_life'] = last_entries['مدة_الصلاحية_بالأيام'].reindex(balances.index)
+    else:
+        balances['shelf_life'] = None
+
+    return balances
+
+
+def compute_inventory_summary(transactions_df):
+    """ملخص المخزون لجميع العناصر بنفس أعمدة ExcelManager.get_inventory_summary"""
+    balances = aggregate_balances(transactions_df)
+    if balances.empty:
+        return pd.DataFrame()
+
+    summary = pd.DataFrame({
+        'اسم_العنصر': balances.index,
+        'التصنيف': balances['category'].values,
+        'الكمية_الحالية': balances['current'].values,
+        'إجمالي_الداخل': balances['incoming'].values,
+        'إجمالي_الخارج': balances['outgoing'].values,
+        'مدة_الصلاحية_بالأيام': balances['shelf_life'].values,
+    })
+    return summary[SUMMARY_COLUMNS]
+
+
+def compute_item_stock(transactions_df, item_name, exclude_transaction_id=None):
+    """رصيد عنصر واحد مع إمكانية استبعاد معاملة محددة من الحساب"""
+    if transactions_df is None or transactions_df.empty:
+        return 0
+
+    mask = transactions_df['اسم_العنصر'] == item_name
+    if exclude_transaction_id is not None and 'رقم_المعاملة' in transactions_df.columns:
+        mask &= transactions_df['رقم_المعاملة'] != exclude_transaction_id
+
+    return signed_quantities(transactions_df[mask]).sum()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+كتابة تقارير Excel بشكل متدفق (وضع الكتابة فقط في openpyxl)
+كل ورقة تكتب صفاً صفاً مباشرة إلى الملف بدلاً من بناء المصنف كاملاً في الذاكرة
+ثم المرور على كل خلية مرتين للتنسيق وحساب عرض الأعمدة:
+- تنسيق الرؤوس والبيانات مشترك (نمط واحد ينسخ لكل خلية بدون بحث في جدول الأنماط)
+- عرض الأعمدة يحسب من أطوال النصوص بشكل متجه على عينة من الصفوف
+"""
+
+from copy import copy
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+MAX_COLUMN_WIDTH = 50
+DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'  # نفس تنسيق pandas.ExcelWriter
+DATE_FORMAT = 'YYYY-MM-DD'
+WIDTH_SAMPLE_ROWS = 5000  # عدد الصفوف المستخدمة لحساب عرض الأعمدة في الأوراق الكبيرة
+
+
+def column_widths(df, columns, sample_rows=WIDTH_SAMPLE_ROWS):
+    """
+    عرض كل عمود = أطول نص فيه (مع الرأس) + 2، بحد أقصى 50
+    الأوراق الكبيرة تقاس على أول وآخر الصفوف وعينة ثابتة من الوسط
+    """
+    if len(df) > sample_rows:
+        third = sample_rows // 3
+        middle = df.iloc[third:-third].sample(n=sample_rows - 2 * third, random_state=0)
+        df = pd.concat([df.iloc[:third], middle, df.iloc[-third:]])
+
+    widths = []
+    for position, header in enumerate(columns):
+        length = len(str(header))
+        # القيم الفارغة تكتب خلايا فارغة فلا تدخل في حساب العرض
+        values = df.iloc[:, position].astype(str).str.len().max() if len(df) else None
+        if pd.notna(values):
+            length = max(length, int(values))
+        widths.append(min(length + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def _cell_value(value):
+    """تحويل قيم pandas الفارغة (NaN/NaT) إلى خلية فارغة"""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+class StreamingExcelWriter:
+    """كاتب تقرير Excel متدفق: ورقة لكل DataFrame بنفس تنسيق التقارير (رؤوس زرقاء وبيانات في المنتصف)"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.book = Workbook(write_only=True)
+        self.sheets = {}  # اسم الورقة -> عدد صفوف البيانات
+
+    def _styles(self, sheet):
+        """أنماط الرؤوس والبيانات (تسجل مرة واحدة لكل ورقة ثم تنسخ مصفوفاتها لكل خلية)"""
+        header = WriteOnlyCell(sheet)
+        header.font = Font(bold=True, size=12, color="FFFFFF")
+        header.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header.alignment = Alignment(horizontal="center", vertical="center")
+
+        styles = {'header': header._style}
+        for name, number_format in (('data', None), ('datetime', DATETIME_FORMAT), ('date', DATE_FORMAT)):
+            data = WriteOnlyCell(sheet)
+            data.font = Font(size=11)
+            data.alignment = Alignment(horizontal="center", vertical="center")
+            if number_format:
+                data.number_format = number_format
+            styles[name] = data._style
+        return styles
+
+    def _cell(self, sheet, value, styles, name='data'):
+        value = _cell_value(value)
+        if name == 'data' and isinstance(value, date):
+            name = 'datetime' if isinstance(value, datetime) else 'date'
+        cell = WriteOnlyCell(sheet, value)
+        cell._style = copy(styles[name])
+        return cell
+
+    def write(self, df, sheet_name, index=False):
+        """
+        كتابة DataFrame في ورقة جديدة
+        index=True يكتب الفهرس كعمود أول (مثل to_excel) باسم index.name
+        """
+        if index:
+            df = df.reset_index()
+        columns = [str(column) for column in df.columns]
+        sheet = self.book.create_sheet(title=sheet_name)
+
+        # عرض الأعمدة يجب أن يحدد قبل كتابة أول صف في وضع الكتابة فقط
+        for position, width in enumerate(column_widths(df, columns), start=1):
+            sheet.column_dimensions[get_column_letter(position)].width = width
+
+        styles = self._styles(sheet)
+        sheet.append([self._cell(sheet, column, styles, 'header') for column in columns])
+        for row in df.itertuples(index=False, name=None):
+            sheet.append([self._cell(sheet, value, styles) for value in row])
+
+        self.sheets[sheet_name] = len(df)
+        return sheet
+
+    def close(self):
+        """حفظ الملف (ورقة فارغة إذا لم تكتب أي ورقة، لأن Excel لا يقبل مصنفاً بدون أوراق)"""
+        if not self.sheets:
+            self.book.create_sheet(title="Sheet1")
+        self.book.save(self.filepath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        return False
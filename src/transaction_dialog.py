@@ -21,6 +21,8 @@ class TransactionDialog(QDialog):
         self.project_name = project_name
         self.transaction_type = transaction_type  # "دخول" أو "خروج"
         self.item_info = None
+        # الأسطر المضافة إلى القائمة لحفظها دفعة واحدة (وضع الإدخال متعدد الأسطر)
+        self.pending_lines = []
         self.setup_ui()
         self.setup_styles()
     
@@ -147,8 +149,25 @@ class TransactionDialog(QDialog):
         self.notes_edit.setMaximumHeight(100)
         form_layout.addRow("ملاحظات:", self.notes_edit)
         
+        # أزرار قائمة الأسطر (لحفظ عدة حركات دفعة واحدة)
+        lines_buttons_layout = QHBoxLayout()
+        add_line_btn = QPushButton("➕ إضافة إلى القائمة")
+        add_line_btn.setObjectName("small_button")
+        add_line_btn.clicked.connect(self.add_line_to_list)
+        lines_buttons_layout.addWidget(add_line_btn)
+        
+        remove_line_btn = QPushButton("حذف السطر المحدد")
+        remove_line_btn.setObjectName("small_button")
+        remove_line_btn.clicked.connect(self.remove_selected_line)
+        lines_buttons_layout.addWidget(remove_line_btn)
+        form_layout.addRow("", lines_buttons_layout)
+        
         main_layout.addWidget(form_frame)
         
+        # جدول الأسطر المضافة (يظهر عند إضافة أول سطر)
+        self.create_lines_table()
+        main_layout.addWidget(self.lines_table)
+        
         # الأزرار - للدخول فقط في الأسفل
         if self.transaction_type == "دخول":
             buttons_layout = QHBoxLayout()
@@ -223,6 +242,84 @@ class TransactionDialog(QDialog):
         # ربط حدث اختيار الصف
         self.inventory_table.itemSelectionChanged.connect(self.on_inventory_selection_changed)
     
+    def create_lines_table(self):
+        """إنشاء جدول الأسطر المضافة إلى القائمة"""
+        self.lines_table = QTableWidget()
+        self.lines_table.setObjectName("lines_table")
+        self.lines_table.setColumnCount(4)
+        self.lines_table.setHorizontalHeaderLabels(["اسم العنصر", "الكمية", "اسم المستلم", "ملاحظات"])
+        self.lines_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.lines_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.lines_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.lines_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.lines_table.setMaximumHeight(200)
+        self.lines_table.setVisible(False)
+    
+    def refresh_lines_table(self):
+        """تحديث جدول الأسطر ونص زر الحفظ"""
+        self.lines_table.setRowCount(len(self.pending_lines))
+        for row, line in enumerate(self.pending_lines):
+            self.lines_table.setItem(row, 0, QTableWidgetItem(str(line['item_info']['اسم العنصر'])))
+            self.lines_table.setItem(row, 1, QTableWidgetItem(f"{line['quantity']:g}"))
+            self.lines_table.setItem(row, 2, QTableWidgetItem(line['receiver_name']))
+            self.lines_table.setItem(row, 3, QTableWidgetItem(line['notes']))
+        self.lines_table.setVisible(bool(self.pending_lines))
+        
+        save_text = "حفظ الدخول" if self.transaction_type == "دخول" else "حفظ الخروج"
+        if self.pending_lines:
+            save_text = f"{save_text} ({len(self.pending_lines)} سطر)"
+        self.save_btn.setText(save_text)
+    
+    def get_pending_quantity(self, item_name):
+        """مجموع الكميات المضافة إلى القائمة لعنصر معين"""
+        return sum(line['quantity'] for line in self.pending_lines
+                   if line['item_info']['اسم العنصر'] == item_name)
+    
+    def build_current_line(self):
+        """التحقق من البيانات المدخلة وتحويلها إلى سطر حركة (None عند وجود خطأ)"""
+        if not self.validate_inputs():
+            return None
+        
+        # اسم المستلم (للخروج فقط)
+        receiver_name = ""
+        if self.transaction_type == "خروج" and hasattr(self, 'receiver_edit'):
+            receiver_name = self.receiver_edit.text().strip()
+            # التحقق من وجود اسم المستلم في عمليات الخروج
+            if not receiver_name:
+                QMessageBox.warning(
+                    self, "تحذير", 
+                    "يجب إدخال اسم المستلم في عمليات الخروج."
+                )
+                return None
+        
+        return {
+            'item_info': dict(self.item_info),
+            'operation_type': self.transaction_type,
+            'quantity': float(self.quantity_edit.text().strip()),
+            'receiver_name': receiver_name,
+            'notes': self.notes_edit.toPlainText().strip(),
+        }
+    
+    def add_line_to_list(self):
+        """إضافة السطر الحالي إلى القائمة وتفريغ الحقول لإدخال سطر جديد"""
+        line = self.build_current_line()
+        if line is None:
+            return
+        
+        self.pending_lines.append(line)
+        self.refresh_lines_table()
+        
+        # تفريغ الكمية والملاحظات مع الإبقاء على اسم المستلم
+        self.quantity_edit.clear()
+        self.notes_edit.clear()
+    
+    def remove_selected_line(self):
+        """حذف السطر المحدد من القائمة"""
+        current_row = self.lines_table.currentRow()
+        if 0 <= current_row < len(self.pending_lines):
+            del self.pending_lines[current_row]
+            self.refresh_lines_table()
+    
     def load_inventory_data(self):
         """تحميل بيانات المخزون في الجدول"""
         try:
@@ -665,23 +762,15 @@ class TransactionDialog(QDialog):
     def load_available_quantity(self, item_id):
         """تحميل الكمية المتاحة للعنصر"""
         try:
-            inventory = excel_manager.get_inventory_summary(self.project_name)
+            # قراءة رصيد العنصر مباشرة من جدول الأرصدة
+            available_qty = excel_manager.get_item_stock(self.project_name, self.item_info['اسم العنصر'])
+            self.available_qty_label.setText(f"{available_qty}")
             
-            if not inventory.empty:
-                item_inventory = inventory[inventory['اسم_العنصر'] == self.item_info['اسم العنصر']]
-                if not item_inventory.empty:
-                    available_qty = item_inventory.iloc[0]['الكمية_الحالية']
-                    self.available_qty_label.setText(f"{available_qty}")
-                    
-                    # تحديد الحد الأقصى للكمية المسموح إخراجها
-                    if hasattr(self.quantity_edit, 'validator'):
-                        validator = self.quantity_edit.validator()
-                        if isinstance(validator, QDoubleValidator):
-                            validator.setTop(available_qty)
-                else:
-                    self.available_qty_label.setText("0")
-            else:
-                self.available_qty_label.setText("0")
+            # تحديد الحد الأقصى للكمية المسموح إخراجها
+            if hasattr(self.quantity_edit, 'validator'):
+                validator = self.quantity_edit.validator()
+                if isinstance(validator, QDoubleValidator):
+                    validator.setTop(available_qty)
                 
         except Exception as e:
             self.available_qty_label.setText("غير محدد")
@@ -735,7 +824,8 @@ class TransactionDialog(QDialog):
             try:
                 available_text = self.available_qty_label.text()
                 if available_text != "-" and available_text != "غير محدد":
-                    available_qty = float(available_text)
+                    # خصم الكميات المضافة مسبقاً إلى القائمة لنفس العنصر
+                    available_qty = float(available_text) - self.get_pending_quantity(self.item_info['اسم العنصر'])
                     if quantity > available_qty:
                         QMessageBox.warning(
                             self, "خطأ", 
@@ -749,41 +839,31 @@ class TransactionDialog(QDialog):
         return True
     
     def save_transaction(self):
-        """حفظ الحركة"""
-        if not self.validate_inputs():
+        """حفظ الحركة (أو جميع أسطر القائمة دفعة واحدة)"""
+        if self.pending_lines:
+            self.save_pending_lines()
+            return
+        
+        line = self.build_current_line()
+        if line is None:
             return
         
         try:
-            quantity = float(self.quantity_edit.text().strip())
-            notes = self.notes_edit.toPlainText().strip()
-            
-            # اسم المستلم (للخروج فقط)
-            receiver_name = ""
-            if self.transaction_type == "خروج" and hasattr(self, 'receiver_edit'):
-                receiver_name = self.receiver_edit.text().strip()
-                # التحقق من وجود اسم المستلم في عمليات الخروج
-                if not receiver_name:
-                    QMessageBox.warning(
-                        self, "تحذير", 
-                        "يجب إدخال اسم المستلم في عمليات الخروج."
-                    )
-                    return
-            
             # حفظ الحركة
             success = excel_manager.add_transaction(
                 self.project_name,
-                self.item_info,
+                line['item_info'],
                 self.transaction_type,
-                quantity,
-                receiver_name,
-                notes
+                line['quantity'],
+                line['receiver_name'],
+                line['notes']
             )
             
             if success:
                 operation = "إدخال" if self.transaction_type == "دخول" else "إخراج"
                 QMessageBox.information(
                     self, "نجح", 
-                    f"تم {operation} {quantity} من {self.item_info['اسم العنصر']} بنجاح"
+                    f"تم {operation} {line['quantity']} من {line['item_info']['اسم العنصر']} بنجاح"
                 )
                 self.accept()
             else:
@@ -792,3 +872,25 @@ class TransactionDialog(QDialog):
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"خطأ في حفظ الحركة: {str(e)}")
     
+    def save_pending_lines(self):
+        """حفظ جميع أسطر القائمة في عملية كتابة واحدة"""
+        lines = list(self.pending_lines)
+        
+        # إضافة السطر الحالي إذا تم إدخال كمية ولم يضف إلى القائمة
+        if self.quantity_edit.text().strip():
+            line = self.build_current_line()
+            if line is None:
+                return
+            lines.append(line)
+        
+        try:
+            success, message = excel_manager.add_transactions(self.project_name, lines)
+            
+            if success:
+                QMessageBox.information(self, "نجح", message)
+                self.accept()
+            else:
+                QMessageBox.critical(self, "خطأ", message)
+                
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"خطأ في حفظ الحركات: {str(e)}")
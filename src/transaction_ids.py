@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+مولد أرقام المعاملات لكل مشروع
+يحفظ الرقم التالي في projects/<name>_sequence.json ويحجز الأرقام تحت قفل المشروع،
+بحيث لا يحتاج توليد رقم جديد لقراءة ملف الحركات ولا يتكرر الرقم بين نافذتين
+أو برنامجين يكتبان في نفس الوقت
+"""
+
+import json
+import os
+
+from project_lock import project_lock
+
+
+class TransactionIdSequence:
+    """عداد أرقام المعاملات المحفوظ لكل مشروع"""
+
+    def __init__(self, projects_path="projects"):
+        self.projects_path = projects_path
+
+    def get_sequence_file(self, project_name):
+        """الحصول على مسار ملف العداد الخاص بالمشروع"""
+        return os.path.join(self.projects_path, f"{project_name}_sequence.json")
+
+    def _read_next_id(self, project_name):
+        """قراءة الرقم التالي المحفوظ (None إذا لم يكن الملف موجوداً أو كان تالفاً)"""
+        sequence_file = self.get_sequence_file(project_name)
+        if not os.path.exists(sequence_file):
+            return None
+        try:
+            with open(sequence_file, 'r', encoding='utf-8') as f:
+                return int(json.load(f)['next_id'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"تحذير: ملف عداد المعاملات تالف وسيعاد إنشاؤه: {e}")
+            return None
+
+    def _write_next_id(self, project_name, next_id):
+        """حفظ الرقم التالي بشكل آمن (ملف مؤقت ثم استبدال)"""
+        os.makedirs(self.projects_path, exist_ok=True)
+        sequence_file = self.get_sequence_file(project_name)
+        temp_file = sequence_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'next_id': next_id}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, sequence_file)
+
+    def allocate(self, project_name, count=1, get_max_id=None):
+        """
+        حجز count رقم متتالي وإرجاع أول رقم منها
+        get_max_id: دالة تعيد أعلى رقم موجود في بيانات المشروع، تستدعى مرة واحدة فقط
+        عند عدم وجود ملف العداد (للمشاريع القديمة)
+        """
+        with project_lock(project_name, self.projects_path):
+            next_id = self._read_next_id(project_name)
+            if next_id is None:
+                max_id = get_max_id() if get_max_id else 0
+                next_id = int(max_id) + 1
+
+            self._write_next_id(project_name, next_id + count)
+            return next_id
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+سجل المعاملات الإلحاقي لكل مشروع (Write-Ahead Journal)
+كل معاملة جديدة تُلحق كسطر JSON في ملف projects/<name>_Transactions.journal
+ويتم دمج السجل في ملف Excel دورياً (compaction) بدلاً من إعادة كتابته مع كل معاملة
+
+الاستخدام من سطر الأوامر لضغط السجلات وإعادة توليد ملفات Excel:
+    python src/transaction_journal.py <اسم_المشروع>
+    python src/transaction_journal.py --all
+"""
+
+import json
+import os
+
+
+class TransactionJournal:
+    """سجل إلحاقي للمعاملات بصيغة JSON Lines"""
+
+    def __init__(self, projects_path="projects"):
+        self.projects_path = projects_path
+
+    def get_journal_file(self, project_name):
+        """الحصول على مسار ملف السجل الخاص بالمشروع"""
+        return os.path.join(self.projects_path, f"{project_name}_Transactions.journal")
+
+    def append(self, project_name, records):
+        """إلحاق معاملة أو أكثر بالسجل مع fsync لضمان عدم الفقد عند انقطاع التشغيل"""
+        if isinstance(records, dict):
+            records = [records]
+        if not records:
+            return
+
+        os.makedirs(self.projects_path, exist_ok=True)
+        journal_file = self.get_journal_file(project_name)
+
+        # كتابة جميع الأسطر في عملية واحدة ثم إجبار النظام على حفظها في القرص
+        payload = "".join(
+            json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            for record in records
+        )
+        with open(journal_file, 'a', encoding='utf-8') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self, project_name):
+        """قراءة جميع المعاملات المسجلة في السجل"""
+        journal_file = self.get_journal_file(project_name)
+        if not os.path.exists(journal_file):
+            return []
+
+        records = []
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # سطر غير مكتمل بسبب انقطاع أثناء الكتابة - يتم تجاهله
+                    print(f"تحذير: تم تجاهل سطر تالف في سجل المعاملات: {journal_file}")
+        return records
+
+    def read_from(self, project_name, offset):
+        """
+        قراءة المعاملات المسجلة بعد موضع معين في السجل (بالبايت)
+        ترجع (المعاملات، الموضع الجديد) - السطر الأخير غير المكتمل لا يقرأ حتى تكتمل كتابته
+        """
+        journal_file = self.get_journal_file(project_name)
+        if not os.path.exists(journal_file):
+            return [], offset
+
+        with open(journal_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+
+        records = []
+        for line in data[:end].decode('utf-8').splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"تحذير: تم تجاهل سطر تالف في سجل المعاملات: {journal_file}")
+        return records, offset + end
+
+    def size(self, project_name):
+        """حجم ملف السجل بالبايت (0 إذا لم يكن موجوداً)"""
+        try:
+            return os.path.getsize(self.get_journal_file(project_name))
+        except OSError:
+            return 0
+
+    def truncate(self, project_name):
+        """تفريغ السجل بعد دمجه في ملف Excel"""
+        journal_file = self.get_journal_file(project_name)
+        if not os.path.exists(journal_file):
+            return
+        with open(journal_file, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+if __name__ == "__main__":
+    import sys
+
+    from excel_manager import excel_manager
+
+    if len(sys.argv) < 2:
+        print("الاستخدام: python src/transaction_journal.py <اسم_المشروع> | --all")
+        sys.exit(1)
+
+    if sys.argv[1] == "--all":
+        project_names = excel_manager.get_all_projects()
+    else:
+        project_names = sys.argv[1:]
+
+    for name in project_names:
+        if excel_manager.compact_transactions(name):
+            print(f"✅ تم ضغط سجل المعاملات للمشروع: {name}")
+        else:
+            print(f"❌ فشل ضغط سجل المعاملات للمشروع: {name}")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس زمن حساب ملخص المخزون المتجه مقارنة بالطريقة القديمة (تصفية الحركات لكل عنصر)
+
+الاستخدام: python stock_calculator_benchmark.py [عدد الحركات، افتراضيا 100000]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import numpy as np
+import pandas as pd
+
+from stock_calculator import compute_inventory_summary
+
+OPERATIONS = ['دخول', 'خروج', 'تعديل زيادة', 'تعديل نقص']
+
+
+def make_transactions(count, items=500, seed=1):
+    """إنشاء جدول حركات عشوائي بنفس أعمدة ملف الحركات"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'رقم_المعاملة': np.arange(1, count + 1),
+        'اسم_العنصر': [f"عنصر {i}" for i in rng.integers(0, items, count)],
+        'التصنيف': rng.choice(['مواد بناء', 'كهرباء', 'سباكة'], count),
+        'نوع_العملية': rng.choice(OPERATIONS, count),
+        'الكمية': rng.integers(1, 100, count).astype(float),
+        'مدة_الصلاحية_بالأيام': rng.choice([0, 30, 365], count),
+    })
+
+
+def loop_summary(df):
+    """الطريقة القديمة: تصفية الحركات لكل عنصر على حدة"""
+    inventory = []
+    for item_name in df['اسم_العنصر'].unique():
+        item_data = df[df['اسم_العنصر'] == item_name]
+        incoming = item_data[item_data['نوع_العملية'] == 'دخول']['الكمية'].sum()
+        outgoing = item_data[item_data['نوع_العملية'] == 'خروج']['الكمية'].sum()
+        increase = item_data[item_data['نوع_العملية'] == 'تعديل زيادة']['الكمية'].sum()
+        decrease = item_data[item_data['نوع_العملية'] == 'تعديل نقص']['الكمية'].sum()
+        last_entry = item_data.iloc[-1]
+        inventory.append({
+            'اسم_العنصر': item_name,
+            'التصنيف': last_entry['التصنيف'],
+            'الكمية_الحالية': incoming - outgoing + increase - decrease,
+            'إجمالي_الداخل': incoming,
+            'إجمالي_الخارج': outgoing,
+            'مدة_الصلاحية_بالأيام': last_entry['مدة_الصلاحية_بالأيام'],
+        })
+    return pd.DataFrame(inventory)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = make_transactions(count)
+
+    start = time.perf_counter()
+    summary = compute_inventory_summary(df)
+    print(f"⏱️ ملخص {count:,} حركة ({len(summary)} عنصر): {time.perf_counter() - start:.3f} ثانية")
+
+    start = time.perf_counter()
+    loop_summary(df)
+    print(f"⏱️ الطريقة القديمة لنفس البيانات: {time.perf_counter() - start:.3f} ثانية")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس الوقت وذروة الذاكرة لتصدير الحركات بالطريقة المتدفقة مقارنة بالطريقة القديمة
+(ExcelWriter ثم تنسيق كل خلية). كل قياس يعمل في عملية منفصلة
+
+الاستخدام: python streaming_excel_benchmark.py [عدد الحركات، افتراضيا 100000]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import numpy as np
+import pandas as pd
+
+from streaming_excel import StreamingExcelWriter
+
+
+def make_transactions(count):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'التاريخ': pd.date_range('2024-01-01', periods=count, freq='min'),
+        'اسم_العنصر': [f"عنصر {i % 500}" for i in range(count)],
+        'التصنيف': 'مواد بناء',
+        'نوع_العملية': rng.choice(['دخول', 'خروج'], count),
+        'الكمية': rng.integers(1, 100, count).astype(float),
+        'المستخدم': 'أمين المخزن',
+        'الملاحظات': '',
+        'رقم_المعاملة': np.arange(count),
+    })
+
+
+def legacy_export(df, filepath):
+    """الطريقة القديمة: مصنف كامل في الذاكرة ثم المرور على كل خلية للتنسيق والعرض"""
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='الحركات', index=False)
+        sheet = writer.sheets['الحركات']
+        for cell in sheet[1]:
+            cell.font = Font(bold=True, size=12, color="FFFFFF")
+            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+        for row in sheet.iter_rows(min_row=2):
+            for cell in row:
+                cell.font = Font(size=11)
+                cell.alignment = Alignment(horizontal="center", vertical="center")
+        for column in sheet.columns:
+            max_length = max(len(str(cell.value)) for cell in column)
+            sheet.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
+
+
+def streaming_export(df, filepath):
+    with StreamingExcelWriter(filepath) as writer:
+        writer.write(df, sheet_name='الحركات')
+
+
+def _peak_rss_mb():
+    """ذروة ذاكرة العملية الحالية (ميجابايت)"""
+    if os.path.exists('/proc/self/status'):
+        # VmHWM خاص بهذه العملية، بينما ru_maxrss يرث ذروة العملية الأم على لينكس
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def run_benchmark(method, count):
+    """تشغيل التصدير في عملية منفصلة حتى تقاس ذروة الذاكرة لكل طريقة وحدها"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', method, str(count)],
+        capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _benchmark_child(method, count):
+    df = make_transactions(count)
+    before = _peak_rss_mb()
+    export = legacy_export if method == 'legacy' else streaming_export
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        export(df, os.path.join(tmp, 'report.xlsx'))
+        elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'peak_rss_mb': _peak_rss_mb() - before}))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        _benchmark_child(sys.argv[2], int(sys.argv[3]))
+        sys.exit(0)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for method in ('legacy', 'streaming'):
+        result = run_benchmark(method, count)
+        print(f"⏱️ {count:,} حركة ({method}): {result['seconds']:.2f} ثانية، ذروة الذاكرة +{result['peak_rss_mb']:.0f} م.ب")
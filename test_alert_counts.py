@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار أعداد التنبيهات المحفوظة (إعادة الحساب فقط عند تغير ملفات المشروع)
+"""
+
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import alert_counts
+from alert_counts import AlertCountsCache
+from excel_manager import excel_manager
+from sqlite_backend import SQLiteBackend
+
+MILK = {'اسم العنصر': 'حليب', 'التصنيف': 'أغذية', 'مدة الصلاحية (أيام)': 5}
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+
+def _count_computations():
+    """تغليف دالة الحساب لعد مرات استدعائها"""
+    calls = []
+    original = alert_counts.compute_alert_counts
+
+    def counting(project_name, projects_path="projects"):
+        calls.append(project_name)
+        return original(project_name, projects_path)
+
+    alert_counts.compute_alert_counts = counting
+    return calls, original
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_counts_from_lots():
+    """الأعداد تحسب من الدفعات المفتوحة وتحفظ في ملف المشروع"""
+    excel_manager.add_transaction("مشروع", MILK, "دخول", 4, "أمين المخزن")
+    excel_manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+
+    cache = AlertCountsCache()
+    counts, computed = cache.refresh("مشروع")
+    assert computed
+    assert counts == {'low_stock': 1, 'expiry': 1}
+    assert os.path.exists(cache.get_cache_file("مشروع"))
+    assert cache.load("مشروع")[0] == counts
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_recompute_only_when_files_change():
+    """لا يعاد الحساب إذا لم تتغير ملفات الحركات أو الإعدادات"""
+    excel_manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+    cache = AlertCountsCache()
+    calls, original = _count_computations()
+    try:
+        cache.refresh("مشروع")
+        cache.refresh("مشروع")
+        cache.refresh("مشروع")
+        assert len(calls) == 1
+
+        excel_manager.add_transaction("مشروع", CEMENT, "خروج", 45, "أمين المخزن")
+        counts, computed = cache.refresh("مشروع")
+        assert computed and counts['low_stock'] == 1
+        assert len(calls) == 2
+
+        with open(os.path.join("projects", "مشروع_settings.json"), 'w', encoding='utf-8') as f:
+            json.dump({'low_stock_threshold': 10, 'expiry_threshold_days': 60}, f)
+        cache.refresh("مشروع")
+        assert len(calls) == 3
+
+        cache.refresh("مشروع", force=True)
+        assert len(calls) == 4
+    finally:
+        alert_counts.compute_alert_counts = original
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_low_stock_threshold_from_settings():
+    """عتبة المخزون المنخفض تقرأ من إعدادات المشروع مثل مدة تنبيه الصلاحية"""
+    excel_manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+    cache = AlertCountsCache()
+    assert cache.refresh("مشروع")[0]['low_stock'] == 0
+
+    with open(os.path.join("projects", "مشروع_settings.json"), 'w', encoding='utf-8') as f:
+        json.dump({'low_stock_threshold': 60, 'expiry_threshold_days': 30}, f)
+    counts, computed = cache.refresh("مشروع")
+    assert computed and counts['low_stock'] == 1
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_sqlite_commit_changes_counts():
+    """مع قاعدة البيانات (بدون تغير ملفات الحركات) تعيد المعاملة الجديدة حساب الأعداد"""
+    original_backend = excel_manager.storage_backend
+    excel_manager.storage_backend = SQLiteBackend()
+    try:
+        excel_manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+        cache = AlertCountsCache()
+        assert cache.refresh("مشروع")[0]['low_stock'] == 0
+        assert not cache.refresh("مشروع")[1]
+
+        excel_manager.add_transaction("مشروع", CEMENT, "خروج", 45, "عامل")
+        counts, computed = cache.refresh("مشروع")
+        assert computed and counts['low_stock'] == 1
+    finally:
+        excel_manager.storage_backend.close()
+        excel_manager.storage_backend = original_backend
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_corrupt_cache_is_recomputed():
+    """ملف الأعداد التالف يعامل كأنه غير موجود"""
+    excel_manager.add_transaction("مشروع", MILK, "دخول", 4, "أمين المخزن")
+    cache = AlertCountsCache()
+    with open(cache.get_cache_file("مشروع"), 'w', encoding='utf-8') as f:
+        f.write("{")
+    assert cache.load("مشروع") == (None, None)
+    counts, computed = cache.refresh("مشروع")
+    assert computed and counts['expiry'] == 1
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_counts_wait_for_project_lock():
+    """الحساب في الخيط الخلفي ينتظر انتهاء أي معاملة تعدل الدفعات"""
+    excel_manager.add_transaction("مشروع", MILK, "دخول", 4, "أمين المخزن")
+    results = []
+    with excel_manager.lock_project("مشروع"):
+        worker = threading.Thread(target=lambda: results.append(alert_counts.compute_alert_counts("مشروع")))
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive() and results == []
+        excel_manager.add_transaction("مشروع", MILK, "خروج", 4, "عامل")
+    worker.join(5)
+    assert results == [{'low_stock': 0, 'expiry': 0}]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار إضافة مجموعة حركات دفعة واحدة
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from excel_manager import ExcelManager
+
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+PAINT = {'اسم العنصر': 'دهان', 'التصنيف': 'تشطيبات', 'مدة الصلاحية (أيام)': 365}
+
+
+def _line(item_info, operation_type, quantity, receiver_name="أمين المخزن", **extra):
+    line = {'item_info': item_info, 'operation_type': operation_type,
+            'quantity': quantity, 'receiver_name': receiver_name}
+    line.update(extra)
+    return line
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_bulk_commit_single_write():
+    """جميع الأسطر تسجل في كتابة واحدة بأرقام متتالية"""
+    manager = ExcelManager()
+    manager.add_transaction("مشروع", CEMENT, "دخول", 5, "أمين المخزن")
+
+    appends = []
+    original_append = manager.journal.append
+    manager.journal.append = lambda project, records: (appends.append(records), original_append(project, records))
+
+    rows = [_line(CEMENT if i % 2 else PAINT, "دخول", i + 1) for i in range(200)]
+    success, message = manager.add_transactions("مشروع", rows)
+    assert success, message
+    assert len(appends) == 1 and len(appends[0]) == 200
+
+    df = manager.load_transactions("مشروع")
+    assert list(df['رقم_المعاملة']) == list(range(1, 202))
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 5 + sum(i + 1 for i in range(1, 200, 2))
+    assert manager.generate_transaction_id("مشروع") == 202
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_bulk_validates_running_stock():
+    """أسطر الخروج تتحقق من الرصيد بعد الأسطر السابقة ولا يحفظ شيء عند الخطأ"""
+    manager = ExcelManager()
+    manager.add_transaction("مشروع", CEMENT, "دخول", 10, "أمين المخزن")
+
+    success, _ = manager.add_transactions("مشروع", [
+        _line(CEMENT, "خروج", 6, "عامل"),
+        _line(CEMENT, "خروج", 6, "عامل"),
+    ])
+    assert not success
+    assert len(manager.load_transactions("مشروع")) == 1
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 10
+
+    success, message = manager.add_transactions("مشروع", [
+        _line(PAINT, "دخول", 4),
+        _line(PAINT, "خروج", 4, "عامل"),
+        _line(CEMENT, "خروج", 10, "عامل"),
+    ])
+    assert success, message
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 0
+    assert manager.get_item_stock("مشروع", 'دهان') == 0
+
+    success, _ = manager.add_transactions("مشروع", [_line(CEMENT, "دخول", 0)])
+    assert not success
+    success, _ = manager.add_transactions("مشروع", [])
+    assert not success
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_bulk_custom_dates():
+    """الأسطر تحتفظ بالتاريخ المخصص والملاحظات"""
+    manager = ExcelManager()
+    success, message = manager.add_transactions("مشروع", [
+        _line(CEMENT, "دخول", 3, date=datetime(2025, 1, 2, 8, 30), notes="شحنة"),
+        _line(CEMENT, "خروج", 1, "عامل", date="2025-01-03 09:00:00"),
+    ], check_stock=False)
+    assert success, message
+
+    df = manager.load_transactions("مشروع")
+    assert list(df['التاريخ']) == ["2025-01-02 08:30:00", "2025-01-03 09:00:00"]
+    assert list(df['ملاحظات']) == ["شحنة", ""]
+    assert list(df['اسم_المستلم']) == ["أمين المخزن", "عامل"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
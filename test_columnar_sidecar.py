@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار النسخة العمودية (Feather) لملفات المشاريع
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+import columnar_sidecar
+from columnar_sidecar import get_sidecar_file, migrate_projects, read_sidecar, read_table
+from excel_manager import ExcelManager
+
+ITEM = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_writes_create_sidecar():
+    """الكتابة عبر ExcelManager تنشئ نسخة عمودية مطابقة"""
+    manager = ExcelManager()
+    manager.add_transaction("مشروع", ITEM, "دخول", 50, "أمين المخزن")
+    manager.compact_transactions("مشروع")
+
+    excel_file = manager.get_project_transactions_file("مشروع")
+    assert os.path.exists(get_sidecar_file(excel_file))
+
+    df = read_sidecar(excel_file)
+    assert df is not None
+    assert list(df['الكمية']) == [50]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_stale_sidecar_falls_back_to_excel():
+    """تعديل ملف Excel من خارج النظام يجعل النسخة العمودية قديمة فيُقرأ ملف Excel"""
+    os.makedirs("projects")
+    excel_file = os.path.join("projects", "مشروع_Items.xlsx")
+    pd.DataFrame({'اسم_العنصر': ['أسمنت']}).to_excel(excel_file, index=False, engine='openpyxl')
+    assert read_table(excel_file)['اسم_العنصر'].tolist() == ['أسمنت']
+
+    pd.DataFrame({'اسم_العنصر': ['أسمنت', 'حديد']}).to_excel(excel_file, index=False, engine='openpyxl')
+    assert read_sidecar(excel_file) is None
+    assert read_table(excel_file)['اسم_العنصر'].tolist() == ['أسمنت', 'حديد']
+
+    # إعادة إنشاء النسخة تلقائياً بعد القراءة من Excel
+    assert read_sidecar(excel_file)['اسم_العنصر'].tolist() == ['أسمنت', 'حديد']
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_migrate_existing_projects():
+    """أمر الترحيل ينشئ النسخ لجميع ملفات المشاريع"""
+    os.makedirs("projects")
+    for suffix in ("_Items.xlsx", "_Transactions.xlsx", "_Modifications.xlsx"):
+        pd.DataFrame({'عمود': [1, 2]}).to_excel(
+            os.path.join("projects", f"قديم{suffix}"), index=False, engine='openpyxl')
+    pd.DataFrame({'عمود': [1]}).to_excel(os.path.join("projects", "تقرير.xlsx"), index=False)
+
+    migrated = migrate_projects("projects")
+    assert len(migrated) == 3
+    assert migrate_projects("projects") == []
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_works_without_pyarrow():
+    """النظام يعمل بملفات Excel فقط إذا لم تكن pyarrow مثبتة"""
+    available = columnar_sidecar.PYARROW_AVAILABLE
+    columnar_sidecar.PYARROW_AVAILABLE = False
+    try:
+        manager = ExcelManager()
+        manager.add_new_item("أسمنت", "مواد بناء", None, "", project_name="مشروع")
+        items_file = manager.get_project_items_file("مشروع")
+        assert not os.path.exists(get_sidecar_file(items_file))
+        assert list(manager.get_all_items("مشروع")['اسم_العنصر']) == ['أسمنت']
+    finally:
+        columnar_sidecar.PYARROW_AVAILABLE = available
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار التخزين المؤقت المشترك لملفات Excel
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+from dataframe_cache import DataFrameCache
+
+
+def _counting_loader(calls):
+    def loader(path):
+        calls.append(path)
+        return pd.read_excel(path, engine='openpyxl')
+    return loader
+
+
+def _write(path, values):
+    pd.DataFrame({'الكمية': values}).to_excel(path, index=False, engine='openpyxl')
+
+
+def test_repeated_reads_parse_once(tmp_path):
+    """القراءات المتكررة لنفس الملف لا تعيد تحليله"""
+    cache = DataFrameCache()
+    calls = []
+    path = str(tmp_path / "test.xlsx")
+    _write(path, [1, 2, 3])
+
+    for _ in range(5):
+        df = cache.get(path, _counting_loader(calls))
+    assert len(calls) == 1
+    assert list(df['الكمية']) == [1, 2, 3]
+    assert cache.get_stats()['hits'] == 4
+
+    # تعديل النسخة المرجعة لا يؤثر على النسخة المحفوظة
+    df.loc[0, 'الكمية'] = 100
+    assert cache.get(path, _counting_loader(calls)).loc[0, 'الكمية'] == 1
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    """تغير الملف على القرص يؤدي لإعادة قراءته"""
+    cache = DataFrameCache()
+    calls = []
+    path = str(tmp_path / "test.xlsx")
+    _write(path, [1])
+    cache.get(path, _counting_loader(calls))
+
+    _write(path, [1, 2, 3, 4, 5])
+    df = cache.get(path, _counting_loader(calls))
+    assert len(calls) == 2
+    assert len(df) == 5
+
+
+def test_lru_eviction(tmp_path):
+    """حذف الأقدم استخداماً عند تجاوز عدد الملفات أو حد الذاكرة"""
+    cache = DataFrameCache(max_entries=2)
+    calls = []
+    paths = [str(tmp_path / f"{i}.xlsx") for i in range(3)]
+    for path in paths:
+        _write(path, [1])
+        cache.get(path, _counting_loader(calls))
+
+    assert cache.get_stats()['entries'] == 2
+    cache.get(paths[0], _counting_loader(calls))
+    assert len(calls) == 4
+
+    small_cache = DataFrameCache(max_bytes=1)
+    small_cache.get(paths[1], _counting_loader(calls))
+    assert small_cache.get_stats()['entries'] == 0
+
+
+def test_excel_manager_writes_invalidate(manager):
+    """الكتابة عبر ExcelManager تلغي النسخة المخزنة"""
+    manager.add_new_item("أسمنت", "مواد بناء", None, "", project_name="مشروع")
+    assert len(manager.get_all_items("مشروع")) == 1
+
+    manager.add_new_item("حديد", "مواد بناء", None, "", project_name="مشروع")
+    assert list(manager.get_all_items("مشروع")['اسم_العنصر']) == ["أسمنت", "حديد"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
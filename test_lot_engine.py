@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار محرك الدفعات (FIFO) وتنبيهات الصلاحية والمخزون المنخفض
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+from excel_manager import ExcelManager
+from lot_engine import (DATE_FORMAT, LOT_EXPIRY, LOT_ID, LOT_REMAINING, LotEngine, LotState,
+                        build_lot_state)
+from lot_engine_benchmark import random_history
+from stock_calculator import compute_inventory_summary
+
+MILK = {'اسم العنصر': 'حليب', 'التصنيف': 'أغذية', 'مدة الصلاحية (أيام)': 5}
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+
+def test_fifo_consumption():
+    """الخروج يستهلك أقدم دفعة أولاً والدفعات المغلقة لا تظهر في التنبيهات"""
+    now = datetime(2025, 1, 10)
+    state = LotState()
+    state.apply('حليب', 'دخول', 10, 1, '2025-01-05 08:00:00', '2025-01-12 08:00:00')
+    state.apply('حليب', 'دخول', 5, 2, '2025-01-06 08:00:00', '2025-01-14 08:00:00')
+    assert [lot['transaction_id'] for lot in state.get_expiring_lots(10, now)] == [1, 2]
+
+    state.apply('حليب', 'خروج', 12, 3, '2025-01-07 08:00:00', None)
+    lots = state.get_expiring_lots(10, now)
+    assert [(lot['transaction_id'], lot['quantity']) for lot in lots] == [(2, 3)]
+    assert state.get_open_quantity('حليب') == 3
+
+    # خروج يتجاوز الرصيد ثم دخول جديد يغطي العجز أولاً
+    state.apply('حليب', 'خروج', 5, 4, '2025-01-08 08:00:00', None)
+    assert state.get_open_quantity('حليب') == 0 and state.get_expiring_lots(10, now) == []
+    state.apply('حليب', 'دخول', 6, 5, '2025-01-09 08:00:00', '2025-01-15 08:00:00')
+    assert state.get_open_quantity('حليب') == 4
+
+    # الكميات العشرية لا تترك دفعات مفتوحة بسبب التقريب
+    state.apply('زيت', 'دخول', 0.3, 6, '2025-01-09 08:00:00', '2025-01-15 08:00:00')
+    state.apply('زيت', 'خروج', 0.1, 7, '2025-01-09 09:00:00', None)
+    state.apply('زيت', 'خروج', 0.2, 8, '2025-01-09 10:00:00', None)
+    assert state.items['زيت']['lots'] == []
+    assert state.get_low_stock_items(1) == [{'item_name': 'زيت', 'quantity': 0}]
+
+
+def test_incremental_matches_single_pass():
+    """التحديث بعد كل معاملة يعطي نفس نتيجة البناء من كامل السجل"""
+    records = random_history(3000)
+    full = build_lot_state(pd.DataFrame(records))
+
+    incremental = LotState()
+    for record in records:
+        incremental.apply_record(record)
+
+    assert incremental.items == full.items
+    assert incremental.expiry_list == full.expiry_list
+    assert incremental.expiry_keys == [entry[0] for entry in incremental.expiry_list]
+
+    # مجموع الدفعات المفتوحة يساوي الرصيد (بدون القيم السالبة)
+    summary = compute_inventory_summary(pd.DataFrame(records))
+    for item_name, balance in zip(summary['اسم_العنصر'], summary['الكمية_الحالية']):
+        assert full.get_open_quantity(item_name) == max(balance, 0)
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_engine_maintained_on_insert():
+    """الدفعات تحدث مع كل معاملة دون إعادة قراءة الحركات أو إعادة كتابة ملف الدفعات"""
+    manager = ExcelManager()
+    manager.add_transaction("مشروع", MILK, "دخول", 10, "أمين المخزن")
+    manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+    assert [lot['item_name'] for lot in manager.get_expiring_lots("مشروع", 10)] == ['حليب']
+
+    def fail_load(project_name):
+        raise AssertionError("تمت قراءة ملف الحركات")
+
+    manager.load_transactions = fail_load
+    lots_file = manager.lots.get_lots_file("مشروع")
+    with open(lots_file, 'rb') as f:
+        snapshot = f.read()
+    manager.add_transaction("مشروع", MILK, "دخول", 4, "أمين المخزن")
+    manager.add_transaction("مشروع", MILK, "خروج", 12, "عامل")
+    lots = manager.get_expiring_lots("مشروع", 10)
+    assert [lot['quantity'] for lot in lots] == [2]
+    assert lots[0]['days_remaining'] == 4
+    assert manager.get_expiring_lots("مشروع", 3) == []
+    assert manager.get_low_stock_items("مشروع", 10) == [{'item_name': 'حليب', 'quantity': 2}]
+
+    # ملف الدفعات لا يعاد كتابته مع كل معاملة - المعاملات الجديدة تقرأ من السجل الإلحاقي
+    with open(lots_file, 'rb') as f:
+        assert f.read() == snapshot
+
+    # نسخة جديدة تقرأ الدفعات المحفوظة وتكمل من السجل بدون إعادة بنائها
+    state = LotEngine("projects").get_state("مشروع", fail_load)
+    assert state.get_open_quantity('أسمنت') == 50
+    assert [lot['quantity'] for lot in state.get_expiring_lots(10)] == [2]
+    assert state.expiry_keys == [entry[0] for entry in state.expiry_list]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_external_change_rebuilds_lots():
+    """تعديل ملف الحركات من خارج النظام يعيد بناء الدفعات"""
+    manager = ExcelManager()
+    manager.add_transaction("مشروع", MILK, "دخول", 10, "أمين المخزن")
+    assert len(manager.get_expiring_lots("مشروع", 10)) == 1
+
+    df = manager.load_transactions("مشروع")
+    df.loc[0, 'مدة_الصلاحية_بالأيام'] = 60
+    other = ExcelManager()
+    other.save_transactions("مشروع", df)
+
+    assert manager.get_expiring_lots("مشروع", 10) == []
+    assert len(manager.get_expiring_lots("مشروع", 60)) == 1
+
+
+def test_large_history_expiring_lots():
+    """البحث الثنائي على سجل كبير يعطي نفس نتيجة فحص كل الدفعات المفتوحة"""
+    state = build_lot_state(pd.DataFrame(random_history(100000)))
+    now = datetime(2034, 1, 1)
+
+    expected = []
+    for item_name, item in state.items.items():
+        for lot in item['lots']:
+            if lot[LOT_EXPIRY]:
+                days_remaining = (datetime.strptime(lot[LOT_EXPIRY], DATE_FORMAT) - now).days
+                if 0 <= days_remaining <= 30:
+                    expected.append((lot[LOT_EXPIRY], item_name, lot[LOT_ID], lot[LOT_REMAINING]))
+
+    lots = state.get_expiring_lots(30, now)
+    actual = [(lot['expiry_date'], lot['item_name'], lot['transaction_id'], lot['quantity']) for lot in lots]
+    assert expected and sorted(actual) == sorted(expected)
+    assert [lot['expiry_date'] for lot in lots] == sorted(lot['expiry_date'] for lot in lots)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار فهرس تعديلات المعاملات
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+from dataframe_cache import dataframe_cache
+from excel_manager import ExcelManager, normalize_transaction_id
+
+
+def _modification(transaction_id, date, item, quantity):
+    return {
+        'تاريخ_التعديل': '2025-01-05 12:00:00',
+        'معرف_المعاملة_الأصلية': f"{date}_{item}_{quantity}",
+        'اسم_العنصر': item, 'التصنيف': 'مواد بناء', 'نوع_العملية': 'دخول',
+        'تاريخ_المعاملة_الأصلية': date, 'الكمية_الأصلية': quantity,
+        'الكمية_الجديدة': quantity + 1, 'فرق_الكمية': 1, 'سبب_التعديل': 'خطأ في الإدخال',
+        'ملاحظات': '', 'المستخدم': 'النظام', 'رقم_المعاملة_الأصلية': transaction_id,
+    }
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_counts_by_transaction_id():
+    """عدد التعديلات لكل معاملة من قراءة واحدة لملف التعديلات"""
+    manager = ExcelManager()
+    os.makedirs("projects", exist_ok=True)
+    manager.write_excel_file(manager.get_project_modifications_file("مشروع"), pd.DataFrame([
+        _modification(7, '2025-01-01 10:00:00', 'أسمنت', 5),
+        _modification(7, '2025-01-01 10:00:00', 'أسمنت', 6),
+        _modification(9, '2025-01-02 10:00:00', 'دهان', 3),
+        _modification('P_T0004', '2025-01-02 11:00:00', 'رمل', 2),
+    ]))
+    dataframe_cache.clear()
+    misses = dataframe_cache.get_stats()['misses']
+
+    counts = manager.get_modification_counts("مشروع")
+    assert counts == {7: 2, 9: 1, 'P_T0004': 1}
+    assert dataframe_cache.get_stats()['misses'] == misses + 1
+    assert manager.get_modification_counts("لا يوجد") == {}
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_legacy_records_matched_once():
+    """سجلات التعديل القديمة تطابق مع المعاملات بدون إعادة قراءة ملف الحركات"""
+    manager = ExcelManager()
+    os.makedirs("projects", exist_ok=True)
+    legacy = [_modification(None, '2025-01-01 10:00:00', 'أسمنت', 5),
+              _modification(None, '2025-01-03 10:00:00', 'دهان', 4)]
+    for record in legacy:
+        del record['رقم_المعاملة_الأصلية']
+    manager.write_excel_file(manager.get_project_modifications_file("مشروع"), pd.DataFrame(legacy))
+
+    transactions = pd.DataFrame({
+        'رقم_المعاملة': [1, 2, 3],
+        'التاريخ': pd.to_datetime(['2025-01-01 10:00:00', '2025-01-01 10:00:00', '2025-01-03 09:00:00']),
+        'اسم_العنصر': ['أسمنت', 'أسمنت', 'دهان'],
+        'الكمية': [5.0, 5.0, 4.0],
+    })
+    assert manager.get_modification_counts("مشروع", transactions) == {1: 1, 3: 1}
+    assert manager.get_modification_counts("مشروع") == {}
+
+
+def test_normalize_transaction_id():
+    """توحيد أرقام المعاملات الرقمية والنصية"""
+    assert normalize_transaction_id(7.0) == 7
+    assert normalize_transaction_id('12') == 12
+    assert normalize_transaction_id('P_T0004') == 'P_T0004'
+    assert normalize_transaction_id(float('nan')) is None
+    assert normalize_transaction_id('') is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار أقفال الكتابة على ملفات المشروع من عدة برامج في نفس الوقت
+"""
+
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+sys.path.append(SRC_PATH)
+
+import pandas as pd
+
+from excel_manager import ExcelManager
+
+ITEM = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+# عدد البرامج المتزامنة وعدد الحركات لكل برنامج
+PROCESS_COUNT = 4
+TRANSACTIONS_PER_PROCESS = 25
+
+
+def _append_transactions(work_dir, worker, compact_every, queue):
+    """برنامج منفصل يضيف حركات ويدمج السجل بشكل دوري"""
+    sys.path.append(SRC_PATH)
+    os.chdir(work_dir)
+    manager = ExcelManager()
+    failures = 0
+    for i in range(TRANSACTIONS_PER_PROCESS):
+        if not manager.add_transaction("مشروع", ITEM, "دخول", 1, f"برنامج {worker}", f"{worker}-{i}"):
+            failures += 1
+        if compact_every and i % compact_every == compact_every - 1:
+            manager.compact_transactions("مشروع")
+    queue.put(failures)
+
+
+def _run_processes(compact_every):
+    work_dir = os.getcwd()
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_append_transactions, args=(work_dir, worker, compact_every, queue))
+        for worker in range(PROCESS_COUNT)
+    ]
+    for process in processes:
+        process.start()
+    failures = sum(queue.get(timeout=300) for _ in processes)
+    for process in processes:
+        process.join()
+    assert failures == 0
+
+
+def _assert_nothing_lost():
+    total = PROCESS_COUNT * TRANSACTIONS_PER_PROCESS
+    manager = ExcelManager()
+    df = manager.load_transactions("مشروع")
+    expected_notes = {f"{w}-{i}" for w in range(PROCESS_COUNT) for i in range(TRANSACTIONS_PER_PROCESS)}
+    assert len(df) == total
+    assert set(df['ملاحظات']) == expected_notes
+    assert sorted(pd.to_numeric(df['رقم_المعاملة']).astype(int)) == list(range(1, total + 1))
+    assert manager.get_item_stock("مشروع", 'أسمنت') == total
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_concurrent_appends_lose_nothing():
+    """عدة برامج تضيف حركات في نفس الوقت دون فقد أي حركة"""
+    _run_processes(compact_every=0)
+    _assert_nothing_lost()
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_concurrent_appends_with_compaction():
+    """دمج السجل في ملف Excel أثناء إضافة برامج أخرى لا يفقد أي حركة"""
+    _run_processes(compact_every=5)
+    _assert_nothing_lost()
+    # معظم الحركات أصبحت في ملف Excel بعد الدمج
+    assert len(pd.read_excel(os.path.join("projects", "مشروع_Transactions.xlsx"))) >= PROCESS_COUNT * 5
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_failed_write_keeps_original_file():
+    """فشل الكتابة لا يتلف الملف الأصلي ولا يترك ملفات مؤقتة"""
+    manager = ExcelManager()
+    manager.add_transaction("مشروع", ITEM, "دخول", 5, "أمين المخزن")
+    manager.compact_transactions("مشروع")
+    project_file = manager.get_project_transactions_file("مشروع")
+
+    class BrokenFrame(pd.DataFrame):
+        def to_excel(self, path, *args, **kwargs):
+            with open(path, 'wb') as f:
+                f.write(b'partial')
+            raise OSError("انقطاع أثناء الكتابة")
+
+    try:
+        manager.write_excel_file(project_file, BrokenFrame({'رقم_المعاملة': [1]}))
+        assert False, "كان يجب أن تفشل الكتابة"
+    except OSError:
+        pass
+
+    assert len(pd.read_excel(project_file)) == 1
+    assert not [f for f in os.listdir("projects") if '.tmp' in f]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
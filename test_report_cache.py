@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار ذاكرة التقارير المؤقتة (إعادة استخدام التقرير إذا لم تتغير بيانات المشروع)
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from openpyxl import load_workbook
+
+from report_manager import ReportManager
+
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+PAINT = {'اسم العنصر': 'دهان', 'التصنيف': 'تشطيبات', 'مدة الصلاحية (أيام)': 365}
+
+
+@pytest.fixture
+def reports(manager):
+    return ReportManager(manager)
+
+
+def _rows(filepath, sheet_name):
+    return list(load_workbook(filepath)[sheet_name].iter_rows(values_only=True))
+
+
+def _index(reports, project_name):
+    with open(os.path.join(reports.report_cache.get_project_dir(project_name), "index.json"), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_identical_request_returns_cached_report(manager, reports):
+    """نفس التقرير لنفس البيانات ينسخ من التقارير المحفوظة بدون إعادة إنشائه"""
+    for _ in range(20):
+        manager.add_transaction("مشروع", CEMENT, "دخول", 10, "أمين المخزن")
+    manager.add_transaction("مشروع", CEMENT, "خروج", 5, "عامل")
+
+    start = time.perf_counter()
+    first, message = reports.export_ultra_comprehensive_report("مشروع")
+    generated = time.perf_counter() - start
+    assert first, message
+    assert not reports.last_report_cached
+
+    time.sleep(1)  # اسم الملف يحتوي على الثانية الحالية
+    start = time.perf_counter()
+    second, message = reports.export_ultra_comprehensive_report("مشروع")
+    cached = time.perf_counter() - start
+    assert second and second != first, message
+    assert reports.last_report_cached
+    assert reports.report_cache.hits == 1
+    assert cached < generated
+    assert _rows(second, 'جميع الحركات') == _rows(first, 'جميع الحركات')
+
+    # جداول الأوراق محفوظة مع الملف
+    entry = reports.report_cache.lookup('شامل', "مشروع", None, None, manager.get_data_version("مشروع"))
+    frames = reports.report_cache.load_frames(entry)
+    assert list(frames) == load_workbook(first).sheetnames
+    assert len(frames['جميع الحركات']) == 21
+
+
+def test_new_transaction_invalidates_only_its_project(manager, reports):
+    """معاملة جديدة تلغي تقارير مشروعها فقط، وتقارير المشاريع الأخرى تبقى صالحة"""
+    today = date.today()
+    manager.add_transaction("أ", CEMENT, "دخول", 50, "أمين المخزن")
+    manager.add_transaction("ب", PAINT, "دخول", 30, "أمين المخزن")
+    reports.export_ultra_comprehensive_report("أ")
+    reports.export_filtered_report("أ", today - timedelta(days=7), today, "أ_مخصص.xlsx")
+    reports.export_ultra_comprehensive_report("ب")
+    assert len(_index(reports, "أ")) == 2
+
+    manager.add_transaction("أ", CEMENT, "خروج", 20, "عامل")
+
+    filepath, _ = reports.export_filtered_report("أ", today - timedelta(days=7), today, "أ_مخصص.xlsx")
+    assert not reports.last_report_cached
+    assert len(_rows(filepath, 'الحركات')) == 3
+    # التقارير السابقة للمشروع حذفت عند حفظ التقرير الجديد
+    assert [entry['type'] for entry in _index(reports, "أ").values()] == ['مخصص']
+
+    reports.export_ultra_comprehensive_report("ب")
+    assert reports.last_report_cached
+
+    # فترة مختلفة تعتبر تقريراً مختلفاً
+    reports.export_filtered_report("أ", today - timedelta(days=1), today, "أ_يوم.xlsx")
+    assert not reports.last_report_cached
+
+
+def test_reports_from_previous_day_not_reused(manager, reports):
+    """التقارير المحفوظة في يوم سابق لا تستخدم (التنبيهات تحسب بالنسبة لتاريخ اليوم)"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+    reports.export_ultra_comprehensive_report("مشروع")
+
+    index_file = os.path.join(reports.report_cache.get_project_dir("مشروع"), "index.json")
+    index = _index(reports, "مشروع")
+    for entry in index.values():
+        entry['day'] = (date.today() - timedelta(days=1)).isoformat()
+    with open(index_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+
+    reports.export_ultra_comprehensive_report("مشروع")
+    assert not reports.last_report_cached
+    assert len(_index(reports, "مشروع")) == 1
+
+
+def test_settings_change_invalidates_reports(manager, reports):
+    """تغيير إعدادات المشروع يلغي التقارير المحفوظة (ورقة التنبيهات تعتمد عليها)"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+    items_file = manager.get_project_items_file("مشروع")
+    assert not os.path.exists(items_file)
+    version = manager.get_data_version("مشروع")
+    assert not os.path.exists(items_file)  # حساب البصمة لا ينشئ ملفات
+
+    first, _ = reports.export_ultra_comprehensive_report("مشروع")
+    assert 'تنبيهات وإنذارات' not in load_workbook(first).sheetnames
+    assert manager.get_data_version("مشروع") == version
+    reports.export_ultra_comprehensive_report("مشروع")
+    assert reports.last_report_cached
+
+    with open(os.path.join("projects", "مشروع_settings.json"), 'w', encoding='utf-8') as f:
+        json.dump({'low_stock_threshold': 60, 'expiry_threshold_days': 30}, f)
+    assert manager.get_data_version("مشروع") != version
+    filepath, _ = reports.export_ultra_comprehensive_report("مشروع")
+    assert not reports.last_report_cached
+    assert 'مخزون منخفض' in [row[0] for row in _rows(filepath, 'تنبيهات وإنذارات')]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
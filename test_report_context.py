@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار سياق التقرير (تحميل بيانات المشروع مرة واحدة لجميع أوراق التقرير الشامل)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+from excel_manager import excel_manager
+from report_context import ReportContext
+from report_manager import ReportManager
+
+MILK = {'اسم العنصر': 'حليب', 'التصنيف': 'أغذية', 'مدة الصلاحية (أيام)': 5}
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+
+class CountingExcelManager:
+    """تغليف مدير Excel لعد مرات تحميل كل مصدر بيانات"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.calls = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self.manager, name)
+        if not callable(attribute):
+            return attribute
+
+        def counted(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+def _add_transactions():
+    excel_manager.add_transaction("مشروع", MILK, "دخول", 4, "أمين المخزن")
+    excel_manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+    excel_manager.add_transaction("مشروع", CEMENT, "خروج", 20, "أمين المخزن")
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_ultra_report_loads_data_once():
+    """التقرير الشامل يقرأ الحركات والأرصدة والدفعات والعناصر مرة واحدة فقط"""
+    _add_transactions()
+    counting = CountingExcelManager(excel_manager)
+    manager = ReportManager(counting)
+
+    filepath, message = manager.export_ultra_comprehensive_report("مشروع")
+    assert filepath and os.path.exists(filepath), message
+    for name in ('load_transactions', 'get_inventory_summary', 'get_lot_state', 'get_all_items'):
+        assert counting.calls.get(name) == 1, (name, counting.calls)
+
+    sheets = pd.ExcelFile(filepath).sheet_names
+    assert 'الملخص التنفيذي' in sheets and 'جميع الحركات' in sheets and 'إحصائيات شاملة' in sheets
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_timings_recorded_per_sheet():
+    """الوقت المستغرق يسجل لكل ورقة، والتحميل داخل الورقة لا يحسب مرتين في الإجمالي"""
+    _add_transactions()
+    manager = ReportManager(excel_manager)
+    manager.export_ultra_comprehensive_report("مشروع")
+
+    names = [name for name, _ in manager.last_report_timings]
+    for sheet in ('معلومات التقرير', 'الملخص التنفيذي', 'المخزون الحالي', 'جميع الحركات',
+                  'تنبيهات وإنذارات', 'إحصائيات شاملة'):
+        assert sheet in names, sheet
+    assert 'تحميل: الحركات' in names
+    assert all(seconds >= 0 for _, seconds in manager.last_report_timings)
+
+    context = ReportContext(excel_manager, "مشروع")
+    with context.timed('ورقة'):
+        context.transactions
+    assert [name for name, _ in context.timings] == ['تحميل: الحركات', 'ورقة']
+    assert context.total_time() == context.timings[-1][1]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_project_without_transactions():
+    """مشروع بدون ملف حركات: سياق فارغ بدون أخطاء"""
+    context = ReportContext(excel_manager, "جديد")
+    assert not context.has_transactions_file
+    assert context.transactions.empty and context.dated_transactions.empty
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
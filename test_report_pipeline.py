@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار خط إنتاج التقارير (حساب الأوراق بالتوازي وكتابتها بالترتيب)
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from excel_manager import excel_manager
+from report_context import ReportContext
+from report_filter_dialog import ReportFilterDialog
+from report_manager import ReportManager
+from report_pipeline import ReportPipeline
+
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+
+class RecordingWriter:
+    """كاتب وهمي يسجل الأوراق المكتوبة والخيط الذي كتبها"""
+
+    def __init__(self):
+        self.sheets = []
+        self.threads = set()
+
+    def write(self, df, sheet_name, index=False):
+        self.sheets.append(sheet_name)
+        self.threads.add(threading.current_thread().name)
+
+
+def _sheet_at_barrier(name, barrier, wait_for=None, done=None):
+    """ورقة تنتظر عند الحاجز حتى تصله باقي الأوراق (ينكسر بعد المهلة إذا حسبت بالتسلسل)"""
+    def compute():
+        barrier.wait()
+        if wait_for is not None:
+            assert wait_for.wait(timeout=5)
+        if done is not None:
+            done.set()
+        return pd.DataFrame({'الورقة': [name]})
+    return compute
+
+
+def test_sections_computed_concurrently_and_written_in_order():
+    """الأوراق تحسب معاً، وتكتب بترتيب الإضافة من الخيط الرئيسي، والورقة الفاشلة تتجاهل"""
+    context = ReportContext(excel_manager, "مشروع")
+    pipeline = ReportPipeline(context, max_workers=4)
+    # الأوراق الأربع لا تتجاوز الحاجز إلا إذا كانت تحسب في نفس الوقت،
+    # و'أ' تنتهي بعد 'د' حتى يثبت أن الكتابة بترتيب الإضافة لا بترتيب الانتهاء
+    barrier = threading.Barrier(4, timeout=5)
+    last_done = threading.Event()
+    pipeline.add('أ', _sheet_at_barrier('أ', barrier, wait_for=last_done))
+    pipeline.add('ب', _sheet_at_barrier('ب', barrier))
+    pipeline.add('خطأ', lambda: 1 / 0)
+    pipeline.add('فارغة', lambda: pd.DataFrame())
+    pipeline.add('ج', _sheet_at_barrier('ج', barrier))
+    pipeline.add('د', _sheet_at_barrier('د', barrier, done=last_done))
+
+    writer = RecordingWriter()
+    written = pipeline.write(writer)
+
+    assert not barrier.broken
+    assert written == writer.sheets == ['أ', 'ب', 'ج', 'د']
+    assert writer.threads == {threading.main_thread().name}
+    names = [name for name, _ in context.timings]
+    assert 'أ' in names and 'كتابة: د' in names
+
+
+def test_shared_data_loaded_once_across_threads():
+    """البيانات المشتركة تحسب مرة واحدة حتى لو طلبتها عدة أوراق في نفس الوقت"""
+    context = ReportContext(excel_manager, "مشروع")
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.1)
+        return pd.DataFrame({'a': [1]})
+
+    pipeline = ReportPipeline(context, max_workers=6)
+    for i in range(6):
+        pipeline.add(f"ورقة {i}", lambda: context.get('مشتركة', load))
+    results = pipeline.compute()
+    assert len(calls) == 1
+    assert all(df is results[0][1] for _, df, _ in results)
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_reports_use_pipeline():
+    """التقرير الشامل والمخصص وتقرير نافذة الفلترة تكتب نفس الأوراق بالترتيب المعتاد"""
+    today = date.today()
+    excel_manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+    excel_manager.add_transaction("مشروع", CEMENT, "خروج", 20, "أمين المخزن")
+    manager = ReportManager(excel_manager)
+
+    filepath, message = manager.export_ultra_comprehensive_report("مشروع")
+    assert filepath, message
+    sheets = load_workbook(filepath).sheetnames
+    assert sheets[:4] == ['معلومات التقرير', 'الملخص التنفيذي', 'المخزون الحالي', 'جميع الحركات']
+    assert sheets[-1] == 'إحصائيات شاملة'
+
+    filepath, message = manager.export_filtered_report(
+        "مشروع", today - timedelta(days=1), today, os.path.join("reports", "مخصص.xlsx"))
+    assert filepath, message
+    sheets = load_workbook(filepath).sheetnames
+    assert sheets[:4] == ['معلومات التقرير', 'الملخص التنفيذي', 'المخزون الحالي', 'الحركات']
+
+    dialog = SimpleNamespace(project_name="مشروع", report_manager=manager)
+    dialog.get_period_statistics = lambda df: ReportFilterDialog.get_period_statistics(dialog, df)
+    end_of_today = datetime.combine(today, datetime.max.time())
+    assert ReportFilterDialog.create_filtered_report_at_path(dialog, "فلتر.xlsx", today - timedelta(days=1), end_of_today)
+    book = load_workbook("فلتر.xlsx")
+    assert book.sheetnames == ['معلومات التقرير', 'الحركات المفلترة', 'دخول مفلتر', 'خروج مفلتر', 'إحصائيات الفترة']
+    assert book['دخول مفلتر'].max_row == 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
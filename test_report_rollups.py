@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار ملخصات الحركات اليومية المحفوظة وتحليلات التقارير المحسوبة منها
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import numpy as np
+import pandas as pd
+
+from excel_manager import ExcelManager
+from report_filter_dialog import ReportFilterDialog
+from report_rollups import (build_rollups, category_analysis, filter_rollups, monthly_analysis,
+                            period_statistics, top_items_analysis)
+
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+PAINT = {'اسم العنصر': 'دهان', 'التصنيف': 'تشطيبات', 'مدة الصلاحية (أيام)': 365}
+
+
+def _make_transactions(count):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'التاريخ': pd.date_range('2024-01-01', periods=count, freq='37min').strftime('%Y-%m-%d %H:%M:%S'),
+        'اسم_العنصر': [f"عنصر {i % 8}" for i in range(count)],
+        'التصنيف': [f"تصنيف {i % 4}" for i in range(count)],
+        'نوع_العملية': rng.choice(['دخول', 'خروج', 'تعديل زيادة'], count),
+        'الكمية': rng.integers(1, 100, count).astype(float),
+    })
+
+
+def _sorted(df, columns):
+    return df.sort_values(columns).reset_index(drop=True)
+
+
+def test_analyses_match_per_transaction_groupby():
+    """التحليلات من الملخصات تطابق التجميع القديم على كل حركة"""
+    transactions = _make_transactions(5000)
+    rollups = build_rollups(transactions)
+    assert len(rollups) < len(transactions)
+
+    legacy = transactions.groupby(['التصنيف', 'نوع_العملية']).agg(
+        {'الكمية': 'sum', 'التاريخ': 'count'}).reset_index()
+    legacy.columns = ['التصنيف', 'نوع_العملية', 'إجمالي_الكمية', 'عدد_العمليات']
+    assert category_analysis(rollups).equals(legacy)
+
+    dated = transactions.assign(الشهر=pd.to_datetime(transactions['التاريخ']).dt.strftime('%Y-%m'))
+    legacy = dated.groupby(['الشهر', 'نوع_العملية']).agg({'الكمية': 'sum', 'التاريخ': 'count'}).reset_index()
+    legacy.columns = ['الشهر', 'نوع_العملية', 'إجمالي_الكمية', 'عدد_العمليات']
+    assert monthly_analysis(rollups).equals(legacy)
+
+    top = top_items_analysis(rollups)
+    counts = transactions['اسم_العنصر'].value_counts()
+    assert list(top['عدد_العمليات']) == sorted(counts, reverse=True)
+    assert top.set_index('اسم_العنصر')['إجمالي_الكمية'].sort_index().equals(
+        transactions.groupby('اسم_العنصر')['الكمية'].sum().sort_index().rename('إجمالي_الكمية'))
+
+
+def test_period_statistics_by_day():
+    """إحصائيات الفترة من ملخصات أيامها تطابق الحساب على الحركات"""
+    transactions = _make_transactions(2000)
+    period = filter_rollups(build_rollups(transactions), '2024-01-10', pd.Timestamp('2024-01-20 08:00'))
+    assert period['اليوم'].min() == '2024-01-10' and period['اليوم'].max() == '2024-01-20'
+
+    days = pd.to_datetime(transactions['التاريخ']).dt.strftime('%Y-%m-%d')
+    in_period = transactions[(days >= '2024-01-10') & (days <= '2024-01-20')]
+    stats = period_statistics(period)
+    assert stats['إجمالي عدد الحركات'] == len(in_period)
+    assert stats['عدد حركات الدخول'] == (in_period['نوع_العملية'] == 'دخول').sum()
+    assert stats['إجمالي كمية الخروج'] == in_period[in_period['نوع_العملية'] == 'خروج']['الكمية'].sum()
+    assert stats['عدد التصنيفات'] == 4
+    assert period_statistics(filter_rollups(build_rollups(transactions), '2030-01-01')) == {}
+
+    dialog_stats = ReportFilterDialog.get_period_statistics(None, in_period)
+    assert dialog_stats == stats
+
+
+def test_commit_updates_rollups_without_rebuild(manager):
+    """تسجيل معاملة يحدث ملخص يومها دون إعادة بناء الملخصات أو إعادة كتابة ملفها"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 100, "أمين المخزن")
+    manager.get_report_rollups("مشروع")
+
+    rebuilds = []
+    original_rebuild = manager.rollups.rebuild
+
+    def counting_rebuild(project_name, transactions_df, signature=None):
+        rebuilds.append(project_name)
+        return original_rebuild(project_name, transactions_df, signature)
+
+    manager.rollups.rebuild = counting_rebuild
+    rollups_file = manager.rollups.get_rollups_file("مشروع")
+    with open(rollups_file, 'rb') as f:
+        snapshot = f.read()
+    manager.add_transaction("مشروع", CEMENT, "خروج", 30, "عامل")
+    manager.add_transaction("مشروع", PAINT, "دخول", 5, "أمين المخزن")
+    manager.add_transaction("مشروع", CEMENT, "دخول", 20, "أمين المخزن")
+
+    rollups = manager.get_report_rollups("مشروع")
+    assert rebuilds == []
+    # ملف الملخصات لا يعاد كتابته مع كل معاملة - المعاملات الجديدة تقرأ من السجل الإلحاقي
+    with open(rollups_file, 'rb') as f:
+        assert f.read() == snapshot
+    assert ExcelManager().get_report_rollups("مشروع")['الكمية'].sum() == rollups['الكمية'].sum()
+    pd.testing.assert_frame_equal(
+        _sorted(rollups, ['اسم_العنصر', 'نوع_العملية']),
+        _sorted(build_rollups(manager.load_transactions("مشروع")), ['اسم_العنصر', 'نوع_العملية']),
+        check_dtype=False)
+    cement_in = rollups[(rollups['اسم_العنصر'] == 'أسمنت') & (rollups['نوع_العملية'] == 'دخول')].iloc[0]
+    assert cement_in['الكمية'] == 120 and cement_in['عدد_الحركات'] == 2
+
+
+def test_external_change_triggers_rebuild(manager):
+    """تعديل ملف الحركات من خارج النظام يؤدي لإعادة بناء الملخصات"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 100, "أمين المخزن")
+    manager.compact_transactions("مشروع")
+    assert manager.get_report_rollups("مشروع")['الكمية'].sum() == 100
+
+    excel_file = manager.get_project_transactions_file("مشروع")
+    df = pd.read_excel(excel_file, engine='openpyxl')
+    df.loc[0, 'الكمية'] = 70
+    df.to_excel(excel_file, index=False, engine='openpyxl')
+    os.utime(excel_file, ns=(0, 0))
+
+    assert manager.get_report_rollups("مشروع")['الكمية'].sum() == 70
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
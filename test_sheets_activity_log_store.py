@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار التحميل التدريجي لسجل الأنشطة (جلب الصفوف الجديدة فقط)
+"""
+
+import pytest
+
+from fake_sheets import attach_manager, make_inventory_spreadsheet
+from sheets.manager import SheetsManager
+
+LOG = "Activity_Log_v2_20251108"
+
+
+def _log_row(i):
+    return ["2025-01-02", f"10:00:{i:02d}", "إضافة", f"عنصر {i}", "مواد بناء", "5", "0", "0", "5",
+            "admin", "PRJ_001", ""]
+
+
+def _manager(spreadsheet):
+    return attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_only_new_rows_are_fetched():
+    """الفتح الأول ينزل السجل، وبعده قراءة نطاق صغير للصفوف الجديدة فقط"""
+    spreadsheet = make_inventory_spreadsheet()
+    log = spreadsheet.sheets[LOG]
+    log.rows.extend(_log_row(i) for i in range(50))
+    manager = _manager(spreadsheet)
+
+    values = manager.get_activity_log_values(LOG)
+    assert len(values) == 51 and values[1] == _log_row(0)
+
+    log.rows.extend(_log_row(i) for i in range(50, 53))
+    spreadsheet.calls.clear()
+    values = manager.get_activity_log_values(LOG)
+    assert [row[3] for row in values[-3:]] == ["عنصر 50", "عنصر 51", "عنصر 52"]
+    assert spreadsheet.calls == {"get": 1}
+
+    # بعد إعادة التشغيل: النسخة المحفوظة تستخدم ولا جديد لتحميله
+    spreadsheet.calls.clear()
+    restarted = _manager(spreadsheet)
+    assert restarted.get_activity_log_values(LOG) == values
+    assert spreadsheet.calls == {"get": 1, "worksheet": 1}
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_own_activity_and_rewritten_log():
+    """العمليات المعلقة تظهر في السجل، وإعادة كتابة الشيت تعيد التحميل الكامل"""
+    spreadsheet = make_inventory_spreadsheet([("أسمنت", "مواد بناء", "PRJ_001", 10)])
+    manager = _manager(spreadsheet)
+    assert len(manager.get_activity_log_values(LOG)) == 1
+
+    assert manager.update_quantity(("أسمنت", "PRJ_001"), 12)
+    values = manager.get_activity_log_values(LOG)
+    assert len(values) == 2 and values[1][2] == "تعديل"
+    assert len(values[1]) == 12  # عمود معرف العملية (M) لا يخزن
+
+    # مسح السجل وإعادة تعبئته (مثل سكربتات إعادة التهيئة)
+    spreadsheet.sheets[LOG].rows[1:] = [_log_row(1), _log_row(2)]
+    values = manager.get_activity_log_values(LOG)
+    assert [row[3] for row in values[1:]] == ["عنصر 1", "عنصر 2"]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_offline_uses_local_log():
+    """بدون اتصال يعرض السجل المحفوظ بدلاً من الفشل"""
+    spreadsheet = make_inventory_spreadsheet()
+    spreadsheet.sheets[LOG].rows.append(_log_row(1))
+    manager = _manager(spreadsheet)
+    manager.get_activity_log_values(LOG)
+
+    spreadsheet.fail_next = 2
+    assert manager.get_activity_log_values(LOG)[1] == _log_row(1)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
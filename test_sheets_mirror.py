@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار النسخة المحلية من ورقة المخزون (بدون تنزيل الورقة كاملة مع كل عرض)
+"""
+
+import os
+
+import pytest
+
+from fake_sheets import attach_manager, make_inventory_spreadsheet
+from sheets.manager import SheetsManager
+
+ITEMS = [
+    ("أسمنت", "مواد بناء", "PRJ_001", 50),
+    ("حديد", "مواد بناء", "PRJ_001", 20),
+    ("أسمنت", "مواد بناء", "PRJ_002", 5),
+]
+
+
+def _manager(spreadsheet):
+    manager = attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+    return manager
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_reads_are_local_until_sheet_changes():
+    """العرض المتكرر لا ينزل الورقة، والتعديل الخارجي يعيد التنزيل"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    manager = _manager(spreadsheet)
+
+    assert len(manager.get_all_items()) == 3
+    assert spreadsheet.calls["get_all_values"] == 1
+
+    # خلال فترة الفحص: بدون أي طلب
+    assert len(manager.get_items_by_project("PRJ_001")) == 2
+    assert manager.get_all_items_raw()[1][0] == "حديد"
+    assert spreadsheet.calls["get_all_values"] == 1
+    assert spreadsheet.calls["get_lastUpdateTime"] == 1
+
+    # بعد فترة الفحص: فحص صغير فقط طالما لم تتغير الورقة
+    manager.mirror.check_interval_seconds = 0
+    manager.get_all_items()
+    assert spreadsheet.calls["get_all_values"] == 1
+    assert spreadsheet.calls["get_lastUpdateTime"] == 2
+
+    spreadsheet.edit_externally("Inventory", 3, 5, "7")
+    items = manager.get_all_items()
+    assert spreadsheet.calls["get_all_values"] == 2
+    assert [item["quantity"] for item in items if item["item_name"] == "حديد"] == [7]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_mirror_survives_restart():
+    """النسخة المحفوظة تستخدم عند التشغيل التالي بدون تنزيل"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    _manager(spreadsheet).get_all_items()
+    assert os.path.exists(os.path.join("data", "sheets_cache", "Inventory Management_Inventory.json"))
+
+    spreadsheet.calls.clear()
+    restarted = _manager(spreadsheet)
+    assert len(restarted.get_all_items()) == 3
+    assert spreadsheet.calls["get_all_values"] == 0
+    assert spreadsheet.calls["get_lastUpdateTime"] == 1
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_own_writes_update_mirror_and_index():
+    """الإضافة والحذف يحدثان النسخة المحلية وفهرس الصفوف"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    manager = _manager(spreadsheet)
+
+    # نفس العنصر بحروف مختلفة يدمج في نفس الصف
+    assert manager.add_item("  أسمنت ", "مواد بناء", 10, "PRJ_002")
+    assert manager.mirror.find_row("أسمنت", "PRJ_002") == 4
+    assert manager.mirror.get_row(4)[4] == "15.0"
+
+    assert manager.add_item("رمل", "مواد بناء", 3, "PRJ_001")
+    assert manager.mirror.find_row("رمل", "PRJ_001") == 5
+
+    assert manager.remove_item(2)
+    assert manager.mirror.find_row("أسمنت", "PRJ_001") is None
+    assert manager.mirror.find_row("حديد", "PRJ_001") == 2
+    assert manager.mirror.find_row("رمل", "PRJ_001") == 4
+
+    # النسخة المحلية مطابقة للورقة
+    manager.flush()
+    assert manager.mirror.rows == spreadsheet.sheets["Inventory"].rows
+    assert spreadsheet.calls["get_all_values"] == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار محدد معدل طلبات Google Sheets (دلو الرموز وإعادة المحاولة بعد 429)
+"""
+
+import asyncio
+
+import pytest
+
+from fake_sheets import make_inventory_spreadsheet
+from sheets.rate_limiter import READ, WRITE, RateLimiter, rate_limited
+from sheets.session import SheetsSession
+
+
+class FakeClock:
+    """ساعة وهمية: الانتظار يقدم الوقت بدون نوم فعلي"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class QuotaError(Exception):
+    """خطأ 429 كما يرجعه gspread مع ترويسة Retry-After"""
+
+    def __init__(self, retry_after=None):
+        super().__init__("APIError: [429]: Quota exceeded")
+
+        class _Response:
+            status_code = 429
+            headers = {"Retry-After": retry_after} if retry_after is not None else {}
+        self.response = _Response()
+
+
+def _limiter(**kwargs):
+    clock = FakeClock()
+    return RateLimiter(clock=clock, sleep=clock.sleep, **kwargs), clock
+
+
+def test_exact_wait_and_separate_buckets():
+    """بعد نفاد الدفعة: انتظار واحد بالمدة الدقيقة، والكتابة لا تتأثر بالقراءة"""
+    limiter, clock = _limiter(read_per_minute=60, write_per_minute=30)
+    for _ in range(6):  # الدفعة الافتراضية عُشر حصة الدقيقة
+        assert limiter.wait_if_needed(READ) == 0
+    assert clock.sleeps == []
+
+    # باقي الحصة (54 رمزاً) موزع على الدقيقة: كل طلب ينتظر 60/55 ثانية بالضبط
+    wait = 60 / 55
+    assert limiter.wait_if_needed(READ) == pytest.approx(wait)
+    assert limiter.wait_if_needed(READ) == pytest.approx(wait)
+    assert clock.sleeps == pytest.approx([wait, wait])
+    assert limiter.can_make_call(WRITE)
+
+    metrics = limiter.get_metrics()
+    assert metrics[READ]["calls"] == 8
+    assert metrics[READ]["throttled_calls"] == 2
+    assert metrics[READ]["throttled_seconds"] == pytest.approx(2 * wait)
+    assert metrics[WRITE]["calls"] == 1 and metrics[WRITE]["throttled_seconds"] == 0
+
+
+@pytest.mark.parametrize("idle_seconds", [0, 600])
+def test_minute_window_never_exceeds_quota(idle_seconds):
+    """أي نافذة 60 ثانية (من البداية أو بعد خمول طويل) لا تتجاوز حصة الدقيقة"""
+    limiter, clock = _limiter(read_per_minute=60)
+    clock.now += idle_seconds
+    grants = []
+    while clock.now < 1000.0 + idle_seconds + 180:
+        limiter.wait_if_needed(READ)
+        grants.append(clock.now)
+
+    # نطرح هامشاً صغيراً لتجاوز أخطاء التقريب في حساب الوقت
+    busiest = max(sum(1 for t in grants if start <= t < start + 60 - 1e-6) for start in grants)
+    assert busiest == 60
+
+
+def test_retry_after_and_jittered_backoff():
+    """إعادة المحاولة تحترم Retry-After، وبدونها تأخير أسي عشوائي محدود"""
+    limiter, clock = _limiter(max_retries=3, base_delay=1.0, max_delay=8.0)
+    failures = [QuotaError(retry_after="7"), QuotaError(), QuotaError()]
+
+    def request():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    assert limiter.call(request, kind=WRITE) == "ok"
+    assert clock.sleeps[0] == 7.0
+    assert 0 <= clock.sleeps[1] <= 2.0 and 0 <= clock.sleeps[2] <= 4.0
+    metrics = limiter.get_metrics()[WRITE]
+    assert metrics["rate_limit_errors"] == 3 and metrics["calls"] == 4
+
+    # بعد استنفاد المحاولات يرفع الخطأ
+    always = rate_limited(kind=READ, limiter=limiter)(lambda: (_ for _ in ()).throw(QuotaError("1")))
+    try:
+        always()
+        assert False, "expected QuotaError"
+    except QuotaError:
+        pass
+
+
+def test_async_acquire_does_not_block_loop():
+    """acquire() تنتظر بـ asyncio.sleep بدون حجز حلقة الأحداث"""
+    limiter = RateLimiter(read_per_minute=600, write_per_minute=600)
+    limiter.buckets[READ].tokens = 0
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            for _ in range(3):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        waited, _ = await asyncio.gather(limiter.acquire(READ), ticker())
+        return waited, ticks
+
+    waited, ticks = asyncio.run(main())
+    assert 0 < waited <= 0.2
+    assert len(ticks) == 3
+    assert limiter.get_metrics()[READ]["throttled_calls"] == 1
+
+
+def test_session_requests_use_quota_buckets():
+    """طلبات الجلسة تحسب على حصة القراءة، وbatch_update على حصة الكتابة"""
+    limiter, _ = _limiter()
+    spreadsheet = make_inventory_spreadsheet([("أسمنت", "مواد بناء", "PRJ_001", 10)])
+    session = SheetsSession("missing.json", "Inventory Management", connector=lambda: spreadsheet,
+                            rate_limiter=limiter)
+    worksheet = session.worksheet("Inventory")
+    session.run(lambda: worksheet.get_all_values())
+    session.batch_update({"requests": []})
+
+    metrics = limiter.get_metrics()
+    assert metrics[READ]["calls"] == 1 and metrics[WRITE]["calls"] == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار تحديد العناصر بمفتاح ثابت (الاسم + المشروع) بدلاً من أرقام الصفوف
+"""
+
+
+import pytest
+
+from fake_sheets import attach_manager, make_inventory_spreadsheet
+from sheets.inventory_mirror import InventoryMirror
+from sheets.manager import SheetsManager
+
+ITEMS = [
+    ("أسمنت", "مواد بناء", "PRJ_001", 50),
+    ("حديد", "مواد بناء", "PRJ_001", 20),
+    ("رمل", "مواد بناء", "PRJ_002", 8),
+]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_item_keys_survive_row_shifts():
+    """بعد حذف صف، العمليات بالمفتاح تصل للعنصر الصحيح بدون أي قراءة"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    manager = attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+    items = manager.get_all_items()
+    iron = [item for item in items if item["item_name"] == "حديد"][0]
+    assert iron["row"] == 3
+
+    assert manager.remove_item(("أسمنت", "PRJ_001"))
+    # رقم الصف المحفوظ في الواجهة أصبح قديماً، لكن العنصر نفسه يحدد بمفتاحه
+    assert manager.find_item_row(iron) == 2
+    assert manager.update_quantity(iron, 25)
+    assert manager.outbound_item(("  حديد ", "PRJ_001"), 5, "أحمد")
+    assert not manager.outbound_item(("أسمنت", "PRJ_001"), 1, "أحمد")
+
+    manager.flush()
+    assert spreadsheet.sheets["Inventory"].rows[1][:5] == ["حديد", "مواد بناء", "قطعة", "PRJ_001", "20.0"]
+    assert spreadsheet.calls["get_all_values"] == 1
+    assert spreadsheet.calls["cell"] == 0 and spreadsheet.calls["row_values"] == 0
+
+
+def test_delete_updates_index_in_place(tmp_path):
+    """الحذف يزيح الفهرس، والنسخة المكررة التالية تصبح هي الأولى"""
+    mirror = InventoryMirror(str(tmp_path / "mirror.json"))
+    mirror.rows = [["اسم العنصر", "", "", "رقم المشروع"],
+                   ["أسمنت", "", "", "P1"], ["حديد", "", "", "P1"], ["أسمنت", "", "", "P1"], ["رمل", "", "", "P2"]]
+    mirror._rebuild_index()
+
+    mirror.delete_row(2)
+    assert mirror.find_row("حديد", "P1") == 2
+    assert mirror.find_row("أسمنت", "P1") == 3
+    assert mirror.find_row("رمل", "P2") == 4
+
+    mirror.delete_row(2)
+    assert mirror.find_row("حديد", "P1") is None
+    assert mirror.find_row("أسمنت", "P1") == 2 and mirror.find_row("رمل", "P2") == 3
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
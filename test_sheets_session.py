@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار جلسة Google Sheets الدائمة (بدون إعادة اتصال مع كل عملية)
+"""
+
+import pytest
+
+from fake_sheets import attach_manager, make_inventory_spreadsheet
+from sheets.manager import SheetsManager
+from sheets.session import SheetsSession, get_session
+
+
+def _manager(items):
+    spreadsheet = make_inventory_spreadsheet(items)
+    manager = attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+    return manager, spreadsheet
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_no_reconnect_in_steady_state():
+    """العمليات المتتالية لا تستدعي connect() ولا تعيد البحث عن أوراق العمل"""
+    manager, spreadsheet = _manager([("أسمنت", "مواد بناء", "PRJ_001", 50)])
+    assert manager.connect_calls == 1
+    assert manager.session.connect_count == 1
+
+    for _ in range(3):
+        assert manager.outbound_item(2, 1, "أحمد")
+        assert manager.update_quantity(2, 40)
+        assert manager.add_item("أسمنت", "مواد بناء", 5, "PRJ_001")
+    manager.flush()
+
+    assert manager.connect_calls == 1
+    assert manager.session.connect_count == 1
+    # ورقة السجل الجديدة تحدد مرة واحدة فقط
+    assert spreadsheet.calls["worksheet"] == 1
+    log_rows = spreadsheet.sheets["Activity_Log_v2_20251108"].rows[1:]
+    assert [row[2] for row in log_rows[:3]] == ["إخراج", "تعديل", "تحديث"]
+    assert len(log_rows) == 9
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_reconnect_on_transport_error():
+    """خطأ الشبكة يعيد الاتصال مرة واحدة ويعيد تنفيذ الطلب"""
+    manager, spreadsheet = _manager([("أسمنت", "مواد بناء", "PRJ_001", 50)])
+    spreadsheet.fail_next = 1
+
+    items = manager.get_all_items()
+    assert [item["item_name"] for item in items] == ["أسمنت"]
+    assert manager.session.connect_count == 2
+    assert manager.connect_calls == 1
+    assert manager.worksheet is spreadsheet.sheets["Inventory"]
+
+
+def test_other_errors_do_not_reconnect():
+    """الأخطاء الأخرى لا تسبب إعادة الاتصال"""
+    attempts = []
+
+    def failing():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    session = SheetsSession("missing.json", "Inventory Management", connector=make_inventory_spreadsheet)
+    try:
+        session.run(failing)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert len(attempts) == 1
+    assert session.connect_count == 0
+
+
+def test_sessions_are_shared():
+    """كل المدراء لنفس الجدول يستخدمون نفس الجلسة"""
+    first = get_session("config/credentials.json", "Inventory Management")
+    assert get_session("config/credentials.json", "Inventory Management") is first
+    assert get_session("config/credentials.json", "Other") is not first
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار العمل بدون اتصال: طابور التعديلات المحلي ومزامنته مع Google Sheets
+"""
+
+import os
+import time
+
+import pytest
+
+from fake_sheets import attach_manager, make_inventory_spreadsheet
+from sheets.manager import SheetsManager
+from sheets.rate_limiter import READ, WRITE, RateLimiter
+from sheets.session import SheetsSession
+from sheets.sync_queue import APPEND_ACTIVITY, SET_CELLS, SyncQueue, item_key
+from sheets.sync_worker import SheetsSyncer
+
+ITEMS = [
+    ("أسمنت", "مواد بناء", "PRJ_001", 50),
+    ("حديد", "مواد بناء", "PRJ_001", 20),
+]
+
+
+def _offline_manager():
+    """مدير يعمل بدون شبكة (النسخة المحلية محفوظة من تشغيل سابق)"""
+    def no_network():
+        raise ConnectionError("no network")
+
+    manager = SheetsManager("missing.json", "Inventory Management")
+    manager.session = SheetsSession("missing.json", "Inventory Management", connector=no_network)
+    manager.background_sync = False
+    return manager
+
+
+def _quantity(spreadsheet, name):
+    return [row[4] for row in spreadsheet.sheets["Inventory"].rows if row[0] == name]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_offline_changes_are_queued_and_replayed():
+    """التعديلات بدون اتصال تظهر فوراً، تبقى بعد إعادة التشغيل، وترسل بطلب كتابة واحد"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet).get_all_items()
+
+    offline = _offline_manager()
+    assert offline.connect() and offline.offline
+    assert offline.update_quantity(2, 45)
+    assert offline.outbound_item(3, 5, "أحمد")
+    assert offline.add_item("رمل", "مواد بناء", 3, "PRJ_001")
+    assert offline.remove_item(2)
+    quantities = {item["item_name"]: item["quantity"] for item in offline.get_all_items()}
+    assert quantities == {"حديد": 15, "رمل": 3}
+    assert not offline.flush()
+    assert len(offline.sync_queue) == 8
+
+    # إعادة التشغيل مع عودة الاتصال: الطابور محفوظ ويرسل بالترتيب
+    spreadsheet.calls.clear()
+    restarted = attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+    assert len(restarted.sync_queue) == 8
+    assert restarted.flush()
+    assert len(restarted.sync_queue) == 0
+    assert spreadsheet.calls["batch_update"] == 1
+    assert [row[0] for row in spreadsheet.sheets["Inventory"].rows[1:]] == ["حديد", "رمل"]
+    assert _quantity(spreadsheet, "حديد") == ["15.0"] and _quantity(spreadsheet, "رمل") == ["3"]
+    log_rows = spreadsheet.sheets["Activity_Log_v2_20251108"].rows[1:]
+    assert [row[2] for row in log_rows] == ["تعديل", "إخراج", "إضافة", "حذف"]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_replay_is_idempotent():
+    """إعادة إرسال دفعة وصلت قبل انقطاع الاتصال لا تكرر الصفوف"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    manager = attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+    assert manager.add_item("رمل", "مواد بناء", 3, "PRJ_001")
+    assert manager.update_quantity(2, 40)
+
+    # الدفعة تصل إلى الجدول لكن التطبيق يتوقف قبل حذفها من الطابور
+    queue = manager.sync_queue
+    original_ack = queue.ack
+    queue.ack = lambda op_ids: (_ for _ in ()).throw(ConnectionError("crash before ack"))
+    assert not manager.flush()
+    queue.ack = original_ack
+    assert len(queue) == 4
+
+    restarted_queue = SyncQueue(queue.queue_file)
+    assert all(op["attempts"] == 1 for op in restarted_queue.pending())
+    SheetsSyncer(manager.session, restarted_queue).sync()
+    assert len(restarted_queue) == 0
+    assert [row[0] for row in spreadsheet.sheets["Inventory"].rows[1:]] == ["أسمنت", "حديد", "رمل"]
+    assert _quantity(spreadsheet, "أسمنت") == ["40.0"]
+    assert len(spreadsheet.sheets["Activity_Log_v2_20251108"].rows) == 3
+    assert restarted_queue.get_conflicts() == []
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_remote_change_is_a_conflict():
+    """تعديل الكمية من مستخدم آخر لا يتم الكتابة فوقه ويسجل كتعارض"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    manager = attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+    assert manager.outbound_item(2, 10, "أحمد")
+    spreadsheet.edit_externally("Inventory", 2, 5, "30")
+
+    assert manager.flush()
+    assert _quantity(spreadsheet, "أسمنت") == ["30"]
+    conflicts = manager.sync_queue.get_conflicts()
+    assert len(conflicts) == 1
+    assert conflicts[0]["op"]["kind"] == SET_CELLS and conflicts[0]["server_values"][2] == "30"
+    # سجل النشاط يرسل رغم التعارض
+    assert spreadsheet.sheets["Activity_Log_v2_20251108"].rows[-1][2] == "إخراج"
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_row_drift_follows_item():
+    """إذا تحرك صف العنصر (حذف صف قبله) يطبق التعديل على الصف الجديد"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    queue = SyncQueue(os.path.join("data", "Inventory Management_pending.jsonl"))
+    queue.enqueue(SET_CELLS, row=3, key=item_key("حديد", "PRJ_001"), values={"5": 12}, before="20")
+    queue.enqueue(APPEND_ACTIVITY, sheet="Activity_Log_v2_20251108", values=["2025-01-02", "10:00:00", "تعديل", "حديد"])
+    queue_ids = [op["op_id"] for op in queue.pending()]
+    del spreadsheet.sheets["Inventory"].rows[1]  # مستخدم آخر حذف صف الأسمنت
+
+    limiter = RateLimiter(read_per_minute=600, write_per_minute=600)
+    session = SheetsSession("missing.json", "Inventory Management", connector=lambda: spreadsheet,
+                            rate_limiter=limiter)
+    SheetsSyncer(session, queue).sync()
+    assert spreadsheet.sheets["Inventory"].rows[1][:5] == ["حديد", "مواد بناء", "قطعة", "PRJ_001", "12"]
+    log_row = spreadsheet.sheets["Activity_Log_v2_20251108"].rows[-1]
+    assert log_row[3] == "حديد" and log_row[12] == queue_ids[1]  # معرف العملية في العمود M
+    assert queue.get_conflicts() == [] and len(queue) == 0
+    assert spreadsheet.calls["batch_get"] == 1 and spreadsheet.calls["batch_update"] == 1
+    # قراءة التحقق من التعارض تحسب على حصة القراءة والإرسال على حصة الكتابة
+    metrics = limiter.get_metrics()
+    assert metrics[READ]["calls"] == 1 and metrics[WRITE]["calls"] == 1
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_missing_activity_sheet_does_not_block_queue():
+    """غياب ورقة سجل الأنشطة لا يوقف مزامنة الكميات، وصف السجل يسجل كتعارض"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    del spreadsheet.sheets["Activity_Log_v2_20251108"]
+    manager = attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+    assert manager.update_quantity(("أسمنت", "PRJ_001"), 40)
+
+    assert manager.flush()
+    assert len(manager.sync_queue) == 0
+    assert _quantity(spreadsheet, "أسمنت") == ["40.0"]
+    conflicts = manager.sync_queue.get_conflicts()
+    assert [conflict["op"]["kind"] for conflict in conflicts] == [APPEND_ACTIVITY]
+    assert conflicts[0]["reason"] == "activity log sheet not found"
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_failing_operation_moved_to_dead_letters():
+    """عملية ترفض دائماً (مثل خطأ 400) تنقل بعد عدة محاولات وتكمل العمليات التي بعدها"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    original_batch_update = spreadsheet.batch_update
+
+    def reject_bad_rows(body):
+        for request in body["requests"]:
+            cells = request.get("appendCells", {}).get("rows", [{}])[0].get("values", [])
+            if any(cell["userEnteredValue"].get("stringValue") == "مرفوض" for cell in cells):
+                raise ValueError("400 invalid request")
+        return original_batch_update(body)
+
+    spreadsheet.batch_update = reject_bad_rows
+    queue = SyncQueue(os.path.join("data", "Inventory Management_pending.jsonl"))
+    queue.enqueue(APPEND_ACTIVITY, sheet="Activity_Log_v2_20251108", values=["2025-01-02", "10:00:00", "مرفوض"])
+    queue.enqueue(SET_CELLS, row=3, key=item_key("حديد", "PRJ_001"), values={"5": 12}, before="20")
+
+    session = SheetsSession("missing.json", "Inventory Management", connector=lambda: spreadsheet)
+    syncer = SheetsSyncer(session, queue, max_failures=3)
+    for _ in range(2):
+        try:
+            syncer.sync()
+            assert False, "the failing operation must stay queued before max_failures"
+        except ValueError:
+            pass
+        assert len(queue) == 2 and _quantity(spreadsheet, "حديد") == ["20"]
+
+    assert syncer.sync() == 2
+    assert len(queue) == 0 and syncer.dead_letters == 1
+    assert _quantity(spreadsheet, "حديد") == ["12"]
+    dead_letters = SyncQueue(queue.queue_file).get_dead_letters()
+    assert [entry["op"]["values"][2] for entry in dead_letters] == ["مرفوض"]
+    assert dead_letters[0]["error"] == "400 invalid request"
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_background_worker_retries_until_online():
+    """الخيط الخلفي يرسل التعديلات ويعيد المحاولة بعد انقطاع الشبكة"""
+    spreadsheet = make_inventory_spreadsheet(ITEMS)
+    manager = attach_manager(SheetsManager("missing.json", "Inventory Management"), spreadsheet)
+    manager.background_sync = True
+    manager.flush_latency_ms = 10
+    manager.get_all_items()
+    spreadsheet.fail_next = 2  # الطلب وإعادة المحاولة بعد إعادة الاتصال يفشلان
+    manager._start_sync_worker()
+    try:
+        assert manager.update_quantity(3, 7)
+        deadline = time.time() + 5
+        while len(manager.sync_queue) and time.time() < deadline:
+            time.sleep(0.02)
+        assert len(manager.sync_queue) == 0
+        assert _quantity(spreadsheet, "حديد") == ["7.0"]
+    finally:
+        manager.sync_worker.stop()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار واجهة تخزين SQLite لبيانات المشاريع
+"""
+
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+from excel_manager import ExcelManager
+from sqlite_backend import SQLiteBackend, load_storage_backend
+from stock_calculator import compute_inventory_summary
+
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+PAINT = {'اسم العنصر': 'دهان', 'التصنيف': 'تشطيبات', 'مدة الصلاحية (أيام)': 365}
+
+
+def _record(transaction_id, day, item, operation, quantity):
+    return {
+        'رقم_المعاملة': transaction_id, 'المشروع': 'مشروع',
+        'التاريخ': f"2025-01-{day:02d} 10:00:00", 'اسم_العنصر': item,
+        'التصنيف': 'مواد بناء', 'نوع_العملية': operation, 'الكمية': quantity,
+        'اسم_المستلم': 'أمين المخزن', 'مدة_الصلاحية_بالأيام': 0,
+        'ملاحظات': '', 'رقم_المعاملة_المرجعية': None,
+    }
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_existing_excel_project_is_imported():
+    """المشروع الموجود بملفات Excel يستورد تلقائياً عند أول استخدام"""
+    excel_only = ExcelManager()
+    excel_only.add_transaction("مشروع", CEMENT, "دخول", 100, "أمين المخزن")
+    excel_only.add_transaction("مشروع", CEMENT, "خروج", 30, "عامل")
+    excel_only.compact_transactions("مشروع")
+    excel_only.add_transaction("مشروع", PAINT, "دخول", 12, "أمين المخزن")
+
+    manager = ExcelManager(storage_backend=SQLiteBackend())
+    df = manager.load_transactions("مشروع")
+    assert len(df) == 3
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 70
+
+    manager.add_transaction("مشروع", PAINT, "خروج", 2, "عامل")
+    summary = manager.get_inventory_summary("مشروع")
+    expected = compute_inventory_summary(manager.load_transactions("مشروع"))
+    assert list(summary['اسم_العنصر']) == list(expected['اسم_العنصر'])
+    assert list(summary['الكمية_الحالية']) == list(expected['الكمية_الحالية'])
+    assert list(summary['التصنيف']) == list(expected['التصنيف'])
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_date_range_queries():
+    """استعلامات الفترات الزمنية تعطي نفس النتيجة في Excel و SQLite"""
+    records = [_record(i, i, 'أسمنت', 'دخول', i) for i in range(1, 11)]
+    excel_only = ExcelManager()
+    excel_only.create_site_transactions_file("مشروع")
+    excel_only.save_transactions("مشروع", pd.DataFrame(records))
+
+    manager = ExcelManager(storage_backend=SQLiteBackend())
+    for current in (excel_only, manager):
+        in_range = current.get_transactions_in_range("مشروع", date(2025, 1, 3), date(2025, 1, 5))
+        assert list(in_range['رقم_المعاملة']) == [3, 4, 5]
+        since = current.get_transactions_in_range("مشروع", start_date=datetime(2025, 1, 9, 12))
+        assert list(since['رقم_المعاملة']) == [10]
+
+    recent = manager.get_transactions_in_range("مشروع", start_date=datetime.now() - timedelta(hours=24))
+    assert recent.empty
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_queries_use_indexes():
+    """استعلامات الفترة ورصيد العنصر تستخدم الفهارس"""
+    backend = SQLiteBackend()
+    backend.append_rows("مشروع", 'transactions', [_record(1, 1, 'أسمنت', 'دخول', 5)])
+    conn = backend._connect()
+
+    plan = conn.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE _project = ? AND "اسم_العنصر" = ?',
+        ("مشروع", 'أسمنت')).fetchall()
+    assert 'idx_transactions_item_date' in str(plan)
+
+    plan = conn.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE _project = ? AND "التاريخ" >= ?',
+        ("مشروع", '2025-01-01')).fetchall()
+    assert 'idx_transactions_date' in str(plan)
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_export_and_settings():
+    """التصدير إلى Excel واختيار واجهة التخزين من الإعدادات"""
+    assert load_storage_backend() is None
+
+    os.makedirs("projects", exist_ok=True)
+    with open(os.path.join("projects", "storage_settings.json"), 'w', encoding='utf-8') as f:
+        f.write('{"backend": "sqlite"}')
+    backend = load_storage_backend()
+    assert isinstance(backend, SQLiteBackend)
+
+    manager = ExcelManager(storage_backend=backend)
+    manager.add_new_item("أسمنت", "مواد بناء", None, "", project_name="مشروع")
+    manager.add_transaction("مشروع", CEMENT, "دخول", 40, "أمين المخزن")
+    assert manager.export_project_to_excel("مشروع")
+
+    excel_only = ExcelManager()
+    assert excel_only.get_item_stock("مشروع", 'أسمنت') == 40
+    assert list(excel_only.get_all_items("مشروع")['اسم_العنصر']) == ['أسمنت']
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_data_version_changes_with_each_write():
+    """رقم إصدار المشروع يزداد مع كل كتابة ولا يعود للصفر عند إعادة الاستيراد"""
+    manager = ExcelManager(storage_backend=SQLiteBackend())
+    assert manager.get_data_version("مشروع") is None
+
+    manager.add_transaction("مشروع", CEMENT, "دخول", 40, "أمين المخزن")
+    first = manager.get_data_version("مشروع")
+    assert first is not None and manager.get_data_version("مشروع") == first
+
+    versions = {first}
+    manager.add_transaction("مشروع", CEMENT, "خروج", 10, "عامل")
+    versions.add(manager.get_data_version("مشروع"))
+    manager.save_transactions("مشروع", manager.load_transactions("مشروع"))
+    versions.add(manager.get_data_version("مشروع"))
+    assert len(versions) == 3
+
+    counter = manager.storage_backend.get_data_version("مشروع")[1]
+    assert manager.import_project_from_excel("مشروع")
+    assert manager.storage_backend.get_data_version("مشروع")[1] == counter + 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار جدول أرصدة المخزون المحفوظ وتحديثه مع كل معاملة
+"""
+
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+from excel_manager import ExcelManager
+
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+PAINT = {'اسم العنصر': 'دهان', 'التصنيف': 'تشطيبات', 'مدة الصلاحية (أيام)': 365}
+
+
+def _stock(summary, item_name):
+    return summary[summary['اسم_العنصر'] == item_name].iloc[0]['الكمية_الحالية']
+
+
+def test_balances_follow_each_transaction(manager):
+    """الرصيد يتحدث مع كل نوع من أنواع العمليات"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 100, "أمين المخزن")
+    manager.add_transaction("مشروع", PAINT, "دخول", 30, "أمين المخزن")
+    manager.add_transaction("مشروع", CEMENT, "خروج", 40, "عامل")
+    manager.add_transaction("مشروع", CEMENT, "تعديل زيادة", 5, "النظام")
+    manager.add_transaction("مشروع", PAINT, "تعديل نقص", 10, "النظام")
+
+    summary = manager.get_inventory_summary("مشروع")
+    assert list(summary['اسم_العنصر']) == ['أسمنت', 'دهان']
+    assert _stock(summary, 'أسمنت') == 65
+    assert _stock(summary, 'دهان') == 20
+    assert summary.iloc[0]['إجمالي_الداخل'] == 100
+    assert summary.iloc[0]['إجمالي_الخارج'] == 40
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 65
+    assert manager.get_item_stock("مشروع", 'غير موجود') == 0
+
+
+def test_commit_does_not_rebuild_balances(manager):
+    """تسجيل معاملة يحدث رصيد العنصر مباشرة دون إعادة بناء الجدول"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 100, "أمين المخزن")
+    manager.get_inventory_summary("مشروع")
+
+    rebuilds = []
+    original_rebuild = manager.balances.rebuild
+
+    def counting_rebuild(project_name, transactions_df, signature=None):
+        rebuilds.append(project_name)
+        return original_rebuild(project_name, transactions_df, signature)
+
+    manager.balances.rebuild = counting_rebuild
+    manager.add_transaction("مشروع", CEMENT, "خروج", 1, "عامل")
+
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 99
+    assert rebuilds == []
+
+
+def test_external_change_triggers_rebuild(manager):
+    """تعديل ملف الحركات من خارج النظام يؤدي لإعادة بناء الأرصدة"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 100, "أمين المخزن")
+    manager.compact_transactions("مشروع")
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 100
+
+    # تعديل الكمية مباشرة في ملف Excel
+    excel_file = manager.get_project_transactions_file("مشروع")
+    df = pd.read_excel(excel_file, engine='openpyxl')
+    df.loc[0, 'الكمية'] = 70
+    df.to_excel(excel_file, index=False, engine='openpyxl')
+    os.utime(excel_file, ns=(0, 0))
+
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 70
+
+
+def test_rebuild_matches_incremental(manager):
+    """إعادة البناء الكاملة تطابق الأرصدة المحدثة تدريجياً"""
+    for qty in (10, 20, 30):
+        manager.add_transaction("مشروع", CEMENT, "دخول", qty, "أمين المخزن")
+    manager.add_transaction("مشروع", CEMENT, "خروج", 15, "عامل")
+
+    incremental = manager.get_inventory_summary("مشروع")
+    assert manager.rebuild_stock_balances("مشروع")
+    rebuilt = manager.get_inventory_summary("مشروع")
+
+    assert incremental.equals(rebuilt)
+    assert _stock(rebuilt, 'أسمنت') == 45
+
+
+def test_commit_during_rebuild_is_not_lost(manager):
+    """معاملة تسجل أثناء قراءة الحركات لإعادة البناء لا تضيع من الجدول"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 100, "أمين المخزن")
+    manager.balances.invalidate("مشروع")
+    workers = []
+
+    def load_with_concurrent_commit(project_name):
+        df = manager.load_transactions(project_name)
+        worker = threading.Thread(target=manager.add_transaction, args=("مشروع", CEMENT, "خروج", 30, "عامل"))
+        worker.start()
+        worker.join(0.3)  # المعاملة تنتظر قفل المشروع حتى ينتهي البناء
+        workers.append(worker)
+        return df
+
+    manager.balances.get_state("مشروع", load_with_concurrent_commit)
+    workers[0].join()
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 70
+    assert not manager.balances.is_stale("مشروع")
+
+
+def test_commit_does_not_rewrite_balances_file(manager):
+    """المعاملة تلحق بالسجل فقط، والأرصدة تقرأها من نهاية السجل (حتى في برنامج آخر)"""
+    manager.add_transaction("مشروع", CEMENT, "دخول", 100, "أمين المخزن")
+    manager.get_inventory_summary("مشروع")
+    balances_file = manager.balances.get_balances_file("مشروع")
+    with open(balances_file, 'rb') as f:
+        snapshot = f.read()
+
+    manager.add_transaction("مشروع", CEMENT, "خروج", 30, "عامل")
+    manager.add_transaction("مشروع", PAINT, "دخول", 5, "أمين المخزن")
+    assert manager.get_item_stock("مشروع", 'أسمنت') == 70
+    with open(balances_file, 'rb') as f:
+        assert f.read() == snapshot
+
+    other = ExcelManager()
+    other.balances.rebuild = lambda *args: (_ for _ in ()).throw(AssertionError("unexpected rebuild"))
+    assert other.get_item_stock("مشروع", 'أسمنت') == 70
+    assert other.get_item_stock("مشروع", 'دهان') == 5
+
+    # الدمج يحفظ لقطة جديدة تشمل جميع المعاملات
+    assert manager.compact_transactions("مشروع")
+    with open(balances_file, 'r', encoding='utf-8') as f:
+        assert json.load(f)['journal_offset'] == 0
+    assert ExcelManager().get_item_stock("مشروع", 'أسمنت') == 70
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار حساب أرصدة المخزون المتجه (Vectorized)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+
+from stock_calculator import compute_inventory_summary, compute_item_stock
+from stock_calculator_benchmark import loop_summary, make_transactions
+
+
+def test_summary_matches_loop():
+    """النتيجة مطابقة للحساب القديم عنصراً بعنصر"""
+    df = make_transactions(5000, items=50)
+    expected = loop_summary(df)
+    actual = compute_inventory_summary(df)
+
+    assert list(actual['اسم_العنصر']) == list(expected['اسم_العنصر'])
+    for column in expected.columns:
+        assert list(actual[column]) == list(expected[column]), column
+
+
+def test_item_stock_excluding_transaction():
+    """استبعاد معاملة محددة من رصيد العنصر"""
+    df = pd.DataFrame({
+        'رقم_المعاملة': [1, 2, 3, 4],
+        'اسم_العنصر': ['أسمنت', 'أسمنت', 'حديد', 'أسمنت'],
+        'التصنيف': ['مواد بناء'] * 4,
+        'نوع_العملية': ['دخول', 'خروج', 'دخول', 'تعديل زيادة'],
+        'الكمية': [100, 30, 50, 5],
+    })
+
+    assert compute_item_stock(df, 'أسمنت') == 75
+    assert compute_item_stock(df, 'أسمنت', exclude_transaction_id=2) == 105
+    assert compute_item_stock(df, 'غير موجود') == 0
+    assert compute_inventory_summary(pd.DataFrame()).empty
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار الكتابة المتدفقة لتقارير Excel (وضع الكتابة فقط)
+مع قياس الوقت وذروة الذاكرة مقارنة بالطريقة القديمة (ExcelWriter ثم تنسيق كل خلية)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from excel_manager import excel_manager
+from report_manager import ReportManager
+from streaming_excel import StreamingExcelWriter, column_widths
+from streaming_excel_benchmark import legacy_export, run_benchmark, streaming_export
+
+CEMENT = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_same_formatting_as_before():
+    """نفس تنسيق التقارير: رؤوس زرقاء عريضة، بيانات في المنتصف، عرض أعمدة محسوب"""
+    df = pd.DataFrame({
+        'التاريخ': pd.to_datetime(['2025-01-02 10:00', None]),
+        'اسم_العنصر': ['أسمنت بورتلاندي', None],
+        'الكمية': [5.0, np.nan],
+    })
+    streaming_export(df, 'new.xlsx')
+    legacy_export(df, 'old.xlsx')
+
+    new, old = load_workbook('new.xlsx')['الحركات'], load_workbook('old.xlsx')['الحركات']
+    assert [[cell.value for cell in row] for row in new.iter_rows()] == \
+           [[cell.value for cell in row] for row in old.iter_rows()]
+    header, data = new['A1'], new['B2']
+    assert header.font.b and header.font.color.rgb.endswith("FFFFFF")
+    assert header.fill.fgColor.rgb.endswith("366092")
+    assert data.font.sz == 11 and data.alignment.horizontal == "center"
+    assert new['A2'].number_format == old['A2'].number_format
+    assert new.column_dimensions['B'].width == old.column_dimensions['B'].width == 17
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_index_sheet_and_sampled_widths():
+    """الفهرس يكتب كعمود أول باسمه، والعرض في الأوراق الكبيرة يحسب من عينة"""
+    stats = pd.DataFrame({'القيمة': [3, 'نشط']}, index=pd.Index(['عدد العناصر', 'الحالة'], name='الإحصائية'))
+    with StreamingExcelWriter('stats.xlsx') as writer:
+        writer.write(stats, sheet_name='إحصائيات', index=True)
+    rows = list(load_workbook('stats.xlsx')['إحصائيات'].iter_rows(values_only=True))
+    assert rows == [('الإحصائية', 'القيمة'), ('عدد العناصر', 3), ('الحالة', 'نشط')]
+
+    df = pd.DataFrame({'ملاحظة': ['قصير'] * 20000, 'فارغ': None})
+    df.loc[19999, 'ملاحظة'] = 'ملاحظة طويلة في آخر صف'
+    assert column_widths(df, ['ملاحظة', 'فارغ'], sample_rows=3000) == [len('ملاحظة طويلة في آخر صف') + 2, 6]
+    assert column_widths(pd.DataFrame({'a': ['x' * 80]}), ['a']) == [50]
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_report_exports_use_streaming_writer():
+    """التقرير الشامل يكتب بالطريقة المتدفقة ويفتح بشكل صحيح"""
+    excel_manager.add_transaction("مشروع", CEMENT, "دخول", 50, "أمين المخزن")
+    excel_manager.add_transaction("مشروع", CEMENT, "خروج", 20, "أمين المخزن")
+    filepath, message = ReportManager(excel_manager).export_ultra_comprehensive_report("مشروع")
+    assert filepath, message
+
+    book = load_workbook(filepath)
+    assert 'المخزون الحالي' in book.sheetnames and 'إحصائيات شاملة' in book.sheetnames
+    assert book['المخزون الحالي']['A1'].fill.fgColor.rgb.endswith("366092")
+    assert book['إحصائيات شاملة']['A1'].value == 'الإحصائية'
+    assert book['جميع الحركات'].max_row == 3
+
+
+def test_benchmark_streaming_vs_legacy():
+    """10 آلاف حركة: الطريقة المتدفقة أسرع وذروة ذاكرتها أقل بكثير"""
+    legacy = run_benchmark('legacy', 10_000)
+    streaming = run_benchmark('streaming', 10_000)
+    print(f"⏱️ 10,000 حركة: قديم {legacy['seconds']:.2f} ث / {legacy['peak_rss_mb']:.0f} م.ب، "
+          f"متدفق {streaming['seconds']:.2f} ث / {streaming['peak_rss_mb']:.0f} م.ب")
+    assert streaming['seconds'] < legacy['seconds']
+    assert streaming['peak_rss_mb'] < legacy['peak_rss_mb'] / 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
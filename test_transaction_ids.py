@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار عداد أرقام المعاملات المحفوظ
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+
+import pytest
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+sys.path.append(SRC_PATH)
+
+import pandas as pd
+
+from excel_manager import ExcelManager
+from transaction_ids import TransactionIdSequence
+
+ITEM = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+
+def _allocate_many(projects_path, count, queue):
+    """عملية منفصلة تحجز عدداً من الأرقام"""
+    sys.path.append(SRC_PATH)
+    sequence = TransactionIdSequence(projects_path)
+    queue.put([sequence.allocate("مشروع") for _ in range(count)])
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_ids_do_not_read_transactions():
+    """توليد الأرقام لا يقرأ ملف الحركات بعد تهيئة العداد"""
+    manager = ExcelManager()
+    manager.add_transaction("مشروع", ITEM, "دخول", 10, "أمين المخزن")
+
+    def fail_load(project_name):
+        raise AssertionError("تمت قراءة ملف الحركات")
+
+    manager.load_transactions = fail_load
+    assert manager.generate_transaction_id("مشروع") == 2
+    assert manager.generate_transaction_id("مشروع", count=5) == 3
+    assert manager.generate_transaction_id("مشروع") == 8
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_seed_from_existing_project():
+    """المشاريع القديمة تبدأ من أعلى رقم موجود"""
+    manager = ExcelManager()
+    manager.create_site_transactions_file("قديم")
+    manager.save_transactions("قديم", pd.DataFrame({
+        'رقم_المعاملة': [3, 41, 7], 'اسم_العنصر': ['أسمنت'] * 3, 'التصنيف': ['مواد بناء'] * 3,
+        'نوع_العملية': ['دخول'] * 3, 'الكمية': [1, 2, 3],
+    }))
+    assert manager.generate_transaction_id("قديم") == 42
+
+    manager.create_site_transactions_file("نصي")
+    manager.save_transactions("نصي", pd.DataFrame({
+        'رقم_المعاملة': ['P_T0001', 'P_T0002'], 'اسم_العنصر': ['أسمنت'] * 2, 'التصنيف': ['مواد بناء'] * 2,
+        'نوع_العملية': ['دخول'] * 2, 'الكمية': [1, 2],
+    }))
+    assert manager.generate_transaction_id("نصي") == 3
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_concurrent_threads_get_unique_ids():
+    """الخيوط المتزامنة لا تحصل على أرقام مكررة"""
+    sequence = TransactionIdSequence("projects")
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        ids = [sequence.allocate("مشروع") for _ in range(50)]
+        with lock:
+            results.extend(ids)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == list(range(1, 401))
+
+
+@pytest.mark.usefixtures("project_dir")
+def test_concurrent_processes_get_unique_ids():
+    """العمليات المتزامنة لا تحصل على أرقام مكررة"""
+    projects_path = os.path.abspath("projects")
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_allocate_many, args=(projects_path, 30, queue))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    results = []
+    for _ in processes:
+        results.extend(queue.get(timeout=60))
+    for process in processes:
+        process.join()
+
+    assert sorted(results) == list(range(1, 121))
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
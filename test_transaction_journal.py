@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار السجل الإلحاقي للمعاملات ودمجه في ملف Excel
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+ITEM = {'اسم العنصر': 'أسمنت', 'التصنيف': 'مواد بناء', 'مدة الصلاحية (أيام)': 0}
+
+
+def test_add_transaction_does_not_rewrite_excel(manager):
+    """إضافة معاملة تُلحق بالسجل دون إعادة كتابة ملف Excel"""
+    manager.create_site_transactions_file("مشروع")
+    excel_file = manager.get_project_transactions_file("مشروع")
+    mtime_before = os.path.getmtime(excel_file)
+
+    assert manager.add_transaction("مشروع", ITEM, "دخول", 50, "أمين المخزن")
+    assert manager.add_transaction("مشروع", ITEM, "خروج", 20, "أمين المخزن")
+
+    assert os.path.getmtime(excel_file) == mtime_before
+    assert manager.journal.size("مشروع") > 0
+
+    df = manager.load_transactions("مشروع")
+    assert list(df['رقم_المعاملة']) == [1, 2]
+    assert list(df['الكمية']) == [50, 20]
+
+
+def test_compaction_merges_journal(manager):
+    """الضغط يدمج السجل في ملف Excel ويفرغ السجل"""
+    for qty in (10, 5, 7):
+        manager.add_transaction("مشروع", ITEM, "دخول", qty, "أمين المخزن")
+
+    assert manager.compact_transactions("مشروع")
+    assert manager.journal.size("مشروع") == 0
+
+    df = manager.load_transactions("مشروع")
+    assert len(df) == 3
+    assert manager.generate_transaction_id("مشروع") == 4
+
+
+def test_replay_skips_already_compacted_records(manager):
+    """عدم تكرار المعاملات إذا انقطع التشغيل بعد حفظ Excel وقبل تفريغ السجل"""
+    manager.add_transaction("مشروع", ITEM, "دخول", 10, "أمين المخزن")
+    records = manager.journal.read("مشروع")
+    manager.compact_transactions("مشروع")
+
+    # محاكاة سجل لم يُفرغ بعد الدمج
+    manager.journal.append("مشروع", records)
+
+    assert len(manager.load_transactions("مشروع")) == 1
+
+
+def test_torn_line_is_ignored(manager):
+    """تجاهل السطر غير المكتمل في نهاية السجل"""
+    manager.add_transaction("مشروع", ITEM, "دخول", 10, "أمين المخزن")
+    with open(manager.journal.get_journal_file("مشروع"), 'a', encoding='utf-8') as f:
+        f.write('{"رقم_المعاملة": 2, "الكمية"')
+
+    df = manager.load_transactions("مشروع")
+    assert len(df) == 1
+    assert manager.get_inventory_summary("مشروع").iloc[0]['الكمية_الحالية'] == 10
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))